@@ -0,0 +1,22 @@
+"""
+XMLmeta 파이프라인 성능 벤치마크
+- generate.py: xml_submitted 입력을 템플릿으로 1×/10×/100×/1000× 크기의 합성 입력 코퍼스 생성
+- run.py: 합성 코퍼스로 5개 파이프라인의 단계별(parse/fix_structure/group/write/validate)
+  소요 시간, 처리량(records/sec), 최대 RSS를 측정하여 JSON 결과 파일로 저장 (커밋 간 비교용)
+- best_of: 마이크로 벤치마크 공용 반복 측정 (repeat 중 최솟값)
+"""
+import time
+
+
+def best_of(func, repeat, before=None):
+    """func()를 repeat번 실행하여 (가장 짧은 소요 시간(초), 마지막 결과) 반환, before()는 매 실행 전 호출 (측정 제외)"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        if before:
+            before()
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
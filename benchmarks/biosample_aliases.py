@@ -0,0 +1,78 @@
+"""
+BioSample SAMPLE_ATTRIBUTES 별칭 해석 마이크로 벤치마크
+- legacy: 속성마다 원본/소문자/snake/camel(정규식) 4개 키로 tag_value_map을 만들고 필드 규칙의 별칭을 조회
+- compiled: pipeline_biosample의 AliasResolver (TAG → 슬롯 목록 컴파일, 샘플마다 정규식/키 생성 없음)
+  (별칭 값으로 필드를 결정하는 단계는 benchmarks/field_transforms.py에서 측정)
+- 합성 코퍼스(benchmarks/generate.py)의 SAMPLE 전체에 대해 두 방식의 결과가 같은지 확인한 뒤
+  샘플당 소요 시간(us/sample, repeat 중 최솟값)과 속도 향상 비율 출력
+"""
+import argparse
+import os
+import re
+import sys
+
+# 공용 모듈(pipeline_common) 및 각 파이프라인 import를 위해 저장소 루트를 경로에 추가
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pipeline_common.corpus import parse_xml
+from pipeline_biosample.main import ATTRIBUTE_NAME_MAP, ALIASES
+from benchmarks import best_of
+from benchmarks.generate import generate_corpus, DEFAULT_OUT_DIR
+
+
+def legacy_resolve(attrs):
+    """기존 fix_sample 방식: 4개 키로 tag_value_map 생성 후 별칭별 조회"""
+    tag_value_map = {}
+    for attr in attrs:
+        tag = attr.get('TAG')
+        value = attr.get('VALUE')
+        if tag:
+            tag_l = tag.lower()
+            tag_snake = ATTRIBUTE_NAME_MAP.get(tag, tag)
+            tag_value_map[tag] = value
+            tag_value_map[tag_l] = value
+            tag_value_map[tag_snake] = value
+            tag_camel = re.sub(r'_([a-z])', lambda m: m.group(1).upper(), tag_snake)
+            tag_value_map[tag_camel] = value
+    return [tag_value_map.get(alias) for alias in ALIASES.aliases]
+
+
+def compiled_resolve(attrs):
+    return ALIASES.collect(attrs)
+
+
+def load_attribute_lists(path):
+    """ddbj_biosample.xml → SAMPLE별 SAMPLE_ATTRIBUTE 리스트"""
+    samples = parse_xml(path)['SAMPLE_SET'].get('SAMPLE') or []
+    if isinstance(samples, dict):
+        samples = [samples]
+    result = []
+    for sample in samples:
+        attrs = ((sample or {}).get('SAMPLE_ATTRIBUTES') or {}).get('SAMPLE_ATTRIBUTE') or []
+        result.append(attrs if isinstance(attrs, list) else [attrs])
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="BioSample 속성 별칭 해석: 기존 방식 vs 컴파일된 AliasResolver")
+    parser.add_argument('--scale', type=int, default=10, help='합성 코퍼스 배율 (기본: 10)')
+    parser.add_argument('--corpus-dir', default=DEFAULT_OUT_DIR, help=f'합성 코퍼스 디렉토리 (기본: {DEFAULT_OUT_DIR})')
+    parser.add_argument('--repeat', type=int, default=5, help='반복 측정 횟수 (최솟값 사용, 기본: 5)')
+    args = parser.parse_args()
+
+    corpus_path = generate_corpus(args.scale, args.corpus_dir)
+    attr_lists = load_attribute_lists(os.path.join(corpus_path, 'ddbj_biosample.xml'))
+    mismatches = sum(1 for attrs in attr_lists if legacy_resolve(attrs) != compiled_resolve(attrs))
+    if mismatches:
+        print(f"[ERROR] 결과 불일치 샘플 {mismatches}개")
+        sys.exit(1)
+    n = max(1, len(attr_lists))
+    legacy, _ = best_of(lambda: [legacy_resolve(attrs) for attrs in attr_lists], args.repeat)
+    compiled, _ = best_of(lambda: [compiled_resolve(attrs) for attrs in attr_lists], args.repeat)
+    print(f"samples: {len(attr_lists)} (x{args.scale}), 결과 일치")
+    print(f"legacy   : {legacy * 1e6 / n:8.2f} us/sample")
+    print(f"compiled : {compiled * 1e6 / n:8.2f} us/sample")
+    print(f"speedup  : {legacy / compiled:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+자식 순서 보정 마이크로 벤치마크: 레코드마다 OrderedDict 재구성 vs XSD 순서 표 제자리 재정렬
+- legacy: 기존 fix_sample 방식 (Ids → Description → Owner → Providers → Models → Attributes 순서로
+  새 OrderedDict를 만들고 나머지 키를 뒤에 복사)
+- reorder: pipeline_common.schema_order.reorder (경로별 순서 표 조회 후 순서가 다를 때만 제자리 재배치)
+- 합성 코퍼스의 SAMPLE을 fix_sample로 변환한 BioSample(이미 순서대로) / 키 순서를 뒤집은 BioSample
+  두 경우에 대해 결과 자식 요소 순서가 같은지 확인한 뒤 레코드당 소요 시간(repeat 중 최솟값) 출력
+- XSD 순서 표 로드: 컴파일(캐시 없음) / 캐시된 표 로드 시간 (--pub의 biosample_set.xsd)
+"""
+import argparse
+import os
+import sys
+import tempfile
+from collections import OrderedDict
+
+# 공용 모듈(pipeline_common) 및 각 파이프라인 import를 위해 저장소 루트를 경로에 추가
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+from pipeline_common.corpus import parse_xml
+from pipeline_common.fieldspec import CACHE_ENV
+from pipeline_common.schema_order import ChildOrder, compile_schema, load_schema_table, reorder
+from pipeline_biosample.main import fix_sample, SAMPLE_CHILD_ORDER
+from benchmarks import best_of
+from benchmarks.generate import generate_corpus, DEFAULT_OUT_DIR
+
+SAMPLE_PATH = 'BioSampleSet/BioSample'
+LEGACY_ORDER = ['Ids', 'Description', 'Owner', 'Providers', 'Models', 'Attributes']
+
+
+def legacy_order(sample):
+    new_sample = OrderedDict()
+    for key in LEGACY_ORDER:
+        if key in sample:
+            new_sample[key] = sample[key]
+    for k, v in sample.items():
+        if k not in LEGACY_ORDER:
+            new_sample[k] = v
+    return new_sample
+
+
+def child_keys(node):
+    """출력 순서를 결정하는 자식 요소 키 (속성/텍스트 키 제외)"""
+    return [key for key in node if key[:1] not in '@#']
+
+
+def load_samples(path):
+    samples = parse_xml(path)['SAMPLE_SET'].get('SAMPLE') or []
+    if isinstance(samples, dict):
+        samples = [samples]
+    return [fix_sample(sample, {}) for sample in samples]
+
+
+def reversed_copies(samples):
+    return [dict(reversed(list(sample.items()))) for sample in samples]
+
+
+def measure(name, make, order, repeat):
+    items = []
+
+    def before():
+        items[:] = make()
+
+    legacy, _ = best_of(lambda: [legacy_order(sample) for sample in items], repeat, before)
+    compiled, _ = best_of(lambda: [reorder(sample, order) for sample in items], repeat, before)
+    n = max(1, len(items))
+    print(f"  {name:9}: legacy {legacy * 1e6 / n:7.2f} us/record, reorder {compiled * 1e6 / n:7.2f} us/record "
+          f"({legacy / compiled:.1f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="자식 순서 보정: OrderedDict 재구성 vs XSD 순서 표 제자리 재정렬")
+    parser.add_argument('--scale', type=int, default=10, help='합성 코퍼스 배율 (기본: 10)')
+    parser.add_argument('--corpus-dir', default=DEFAULT_OUT_DIR, help=f'합성 코퍼스 디렉토리 (기본: {DEFAULT_OUT_DIR})')
+    parser.add_argument('--pub', default=os.path.join(REPO_ROOT, 'pub'), help='XSD가 있는 pub 디렉토리 (기본: 저장소의 pub)')
+    parser.add_argument('--repeat', type=int, default=5, help='반복 측정 횟수 (최솟값 사용, 기본: 5)')
+    args = parser.parse_args()
+
+    corpus_path = generate_corpus(args.scale, args.corpus_dir)
+    samples = load_samples(os.path.join(corpus_path, 'ddbj_biosample.xml'))
+    # 레거시와 비교할 수 있도록 파이프라인의 기본 순서(XSD에서 찾지 못할 때 쓰는 순서)로 측정
+    order = {key: i for i, key in enumerate(SAMPLE_CHILD_ORDER[SAMPLE_PATH])}
+    mismatches = sum(1 for sample in reversed_copies(samples)
+                     if child_keys(legacy_order(sample)) != child_keys(reorder(dict(sample), order)))
+    if mismatches:
+        print(f"[ERROR] 자식 순서 불일치 레코드 {mismatches}개")
+        sys.exit(1)
+    print(f"BioSample: {len(samples)} records (x{args.scale}), 결과 일치")
+    measure('ordered', lambda: [dict(sample) for sample in samples], order, args.repeat)
+    measure('reversed', lambda: reversed_copies(samples), order, args.repeat)
+
+    xsd_path = os.path.join(args.pub, 'docs', 'biosample', 'xsd', 'biosample_set.xsd')
+    if os.path.exists(xsd_path):
+        os.environ[CACHE_ENV] = tempfile.mkdtemp(prefix='schema_order_')
+        build, table = best_of(lambda: compile_schema(xsd_path), args.repeat)
+        load_schema_table(xsd_path)
+        warm, _ = best_of(lambda: load_schema_table(xsd_path), args.repeat)
+        print(f"{xsd_path}: {len(table['files'])} files, {len(table['types'])} types")
+        print(f"  compile      : {build * 1e3:8.2f} ms")
+        print(f"  cached table : {warm * 1e3:8.2f} ms")
+        print(f"  {SAMPLE_PATH} order: {ChildOrder(xsd_path).schema_order(SAMPLE_PATH) or '(XSD에 없음, 기본 순서 사용)'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Experiment fix_structure 마이크로 벤치마크: 다중 순회 vs 단일 순회 재작성기
+- legacy: 기존 구현 (remove_empty로 전체 복사 → recursive_fix 순회, dict마다 clean_attributes가 하위 트리 전체를 다시 순회
+  → EXPERIMENT별 fix_experiment)
+- fused: pipeline_experiment의 fix_structure (EXPERIMENT_REWRITER 규칙을 한 번의 순회로 적용)
+- 합성 코퍼스(benchmarks/generate.py)의 EXPERIMENT 전체와, 각 EXPERIMENT에 --depth 단계로 중첩된 요소
+  (빈 값/refcenter 속성/IDENTIFIERS 포함)를 붙인 깊은 트리에 대해 결과가 같은지 확인한 뒤
+  EXPERIMENT당 소요 시간(us/record, repeat 중 최솟값)과 속도 향상 비율 출력
+"""
+import argparse
+import json
+import os
+import sys
+
+# 공용 모듈(pipeline_common) 및 각 파이프라인 import를 위해 저장소 루트를 경로에 추가
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pipeline_common.corpus import parse_xml
+from pipeline_experiment.main import fix_structure, fix_experiment, fix_identifiers, InstrumentResolver
+from benchmarks import best_of
+from benchmarks.generate import generate_corpus, DEFAULT_OUT_DIR
+
+
+def clean_attributes(d):
+    # 불필요한 속성(refcenter, refname 등) 제거
+    if isinstance(d, dict):
+        keys_to_del = []
+        for k in d:
+            if k.startswith('@') and k in ['@refcenter', '@refname']:
+                keys_to_del.append(k)
+        for k in keys_to_del:
+            del d[k]
+        for v in d.values():
+            clean_attributes(v)
+    elif isinstance(d, list):
+        for item in d:
+            clean_attributes(item)
+
+
+def remove_empty(d):
+    if isinstance(d, dict):
+        return {k: remove_empty(v) for k, v in d.items() if v not in ("", None, [], {})}
+    elif isinstance(d, list):
+        return [remove_empty(i) for i in d if i not in ("", None, [], {})]
+    else:
+        return d
+
+
+def recursive_fix(d, parent_accession=None, id_type=None, exp_accession=None):
+    if isinstance(d, dict):
+        clean_attributes(d)
+        for k, v in d.items():
+            if k == 'STUDY_REF' and isinstance(v, dict):
+                acc = v.get('@accession')
+                if 'IDENTIFIERS' in v:
+                    v['IDENTIFIERS'] = fix_identifiers(v['IDENTIFIERS'], parent_accession=acc, id_type="BioProject")
+                recursive_fix(v, parent_accession=acc, id_type="BioProject")
+            elif k == 'SAMPLE_DESCRIPTOR' and isinstance(v, dict):
+                acc = v.get('@accession')
+                if 'IDENTIFIERS' in v:
+                    v['IDENTIFIERS'] = fix_identifiers(v['IDENTIFIERS'], parent_accession=acc, id_type="BioSample")
+                recursive_fix(v, parent_accession=acc, id_type="BioSample")
+            elif k == 'IDENTIFIERS':
+                if id_type is None and exp_accession:
+                    d[k] = fix_identifiers(v, exp_accession=exp_accession)
+                elif not (id_type in ["BioProject", "BioSample"]):
+                    d[k] = fix_identifiers(v)
+            else:
+                if k == 'EXPERIMENT' and isinstance(v, dict):
+                    acc = v.get('@accession')
+                    d[k] = recursive_fix(v, exp_accession=acc)
+                else:
+                    d[k] = recursive_fix(v)
+    elif isinstance(d, list):
+        return [recursive_fix(i) for i in d]
+    return d
+
+
+def legacy_fix_structure(doc, instruments=None):
+    """기존 다중 순회 fix_structure"""
+    doc = remove_empty(doc)
+    doc = recursive_fix(doc)
+    root = doc.get('EXPERIMENT_SET', doc)
+    exps = root.get('EXPERIMENT', [])
+    if isinstance(exps, dict):
+        exps = [exps]
+    for i, exp in enumerate(exps):
+        exps[i] = fix_experiment(exp, instruments)
+        if 'IDENTIFIERS' in exps[i]:
+            exps[i]['IDENTIFIERS'] = fix_identifiers(exps[i]['IDENTIFIERS'], exp_accession=exps[i].get('@accession'))
+    if 'EXPERIMENT' in root:
+        root['EXPERIMENT'] = exps
+    return doc
+
+
+def deepen(doc, depth):
+    """EXPERIMENT마다 depth 단계로 중첩된 EXPERIMENT_LINKS 추가 (단계마다 빈 값/refcenter/IDENTIFIERS 포함)"""
+    exps = doc['EXPERIMENT_SET']['EXPERIMENT']
+    for exp in exps if isinstance(exps, list) else [exps]:
+        node = None
+        for level in range(depth, 0, -1):
+            link = {
+                '@refcenter': 'KOBIC',
+                '@refname': f"LINK{level}",
+                'DB': 'KOBIC',
+                'LABEL': '',
+                'IDENTIFIERS': {'PRIMARY_ID': None, 'SUBMITTER_ID': {'@namespace': 'KOBIC', '#text': f"L{level}"}},
+                'URL_LINK': [{'LABEL': f"level {level}", 'URL': None}, ''],
+            }
+            if node is not None:
+                link['EXPERIMENT_LINK'] = node
+            node = link
+        exp['EXPERIMENT_LINKS'] = {'EXPERIMENT_LINK': node}
+    return doc
+
+
+def measure(label, doc, repeat):
+    records = doc['EXPERIMENT_SET']['EXPERIMENT']
+    n = len(records) if isinstance(records, list) else 1
+    instruments = InstrumentResolver()
+    dump = lambda d: json.dumps(d, ensure_ascii=False)
+    if dump(legacy_fix_structure(doc, instruments)) != dump(fix_structure(doc, instruments)):
+        print(f"[ERROR] {label}: 결과 불일치")
+        sys.exit(1)
+    slow, _ = best_of(lambda: legacy_fix_structure(doc, instruments), repeat)
+    fast, _ = best_of(lambda: fix_structure(doc, instruments), repeat)
+    print(f"{label}: {n} EXPERIMENTs, 결과 일치")
+    print(f"  legacy (multi-pass) : {slow * 1e6 / n:8.2f} us/record")
+    print(f"  fused (single-pass) : {fast * 1e6 / n:8.2f} us/record")
+    print(f"  speedup             : {slow / fast:8.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Experiment fix_structure: 다중 순회 vs 단일 순회 재작성기")
+    parser.add_argument('--scale', type=int, default=10, help='합성 코퍼스 배율 (기본: 10)')
+    parser.add_argument('--corpus-dir', default=DEFAULT_OUT_DIR, help=f'합성 코퍼스 디렉토리 (기본: {DEFAULT_OUT_DIR})')
+    parser.add_argument('--depth', type=int, default=12, help='깊은 트리 측정 시 EXPERIMENT마다 붙일 중첩 단계 수 (기본: 12)')
+    parser.add_argument('--repeat', type=int, default=5, help='반복 측정 횟수 (최솟값 사용, 기본: 5)')
+    args = parser.parse_args()
+
+    corpus_path = generate_corpus(args.scale, args.corpus_dir)
+    path = os.path.join(corpus_path, 'ddbj_bioExperiment.xml')
+    measure('experiment', parse_xml(path), args.repeat)
+    measure(f'experiment (depth +{args.depth})', deepen(parse_xml(path), args.depth), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
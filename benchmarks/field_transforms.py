@@ -0,0 +1,100 @@
+"""
+필드 규칙(pipeline_common.fieldspec) 변환 마이크로 벤치마크
+- interpreted: 레코드마다 규칙(원본 후보/기본값/포맷터)을 해석하여 실행 (interpret_spec)
+- compiled: 규칙에서 생성·컴파일한 변환 함수 (BioSample SAMPLE_TRANSFORM, BioProject PACKAGE_TRANSFORM)
+- 합성 코퍼스(benchmarks/generate.py)의 SAMPLE/Package 전체에 대해 두 방식의 결과가 같은지 확인한 뒤
+  레코드당 소요 시간(us/record, repeat 중 최솟값)과 속도 향상 비율, 코드 생성(캐시 없음)/캐시 로드 시간 출력
+"""
+import argparse
+import os
+import sys
+
+# 공용 모듈(pipeline_common) 및 각 파이프라인 import를 위해 저장소 루트를 경로에 추가
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pipeline_common.corpus import parse_xml
+from pipeline_common.fieldspec import compile_spec, interpret_spec
+from pipeline_biosample.main import (SAMPLE_FIELD_SPEC, SAMPLE_ATTRIBUTE_SPEC, SAMPLE_TRANSFORM, ALIASES,
+                                    SAMPLE_OWNER_SPEC, SAMPLE_OWNER_TRANSFORM, known_email)
+from pipeline_bioproject.main import PACKAGE_FIELD_SPEC, PACKAGE_TRANSFORM, known_archive, fix_date_format, fix_text_date
+from benchmarks import best_of
+from benchmarks.generate import generate_corpus, DEFAULT_OUT_DIR
+from benchmarks.biosample_aliases import load_attribute_lists
+
+
+def package_contexts(path):
+    """ddbj_bioproject.xml → Package별 PACKAGE_TRANSFORM 입력(ctx)"""
+    packages = parse_xml(path)['PackageSet'].get('Package') or []
+    if isinstance(packages, dict):
+        packages = [packages]
+    result = []
+    for package in packages:
+        try:
+            project = package['Project']['Project']
+        except (KeyError, TypeError):
+            continue
+        descr = project.get('ProjectDescr')
+        descr = descr if isinstance(descr, dict) else {}
+        result.append({
+            'archive': project['ProjectID']['ArchiveID'].get('@archive'),
+            'SubmitterOrganization': descr.get('SubmitterOrganization'),
+            'ProjectSubmissionDate': descr.get('ProjectSubmissionDate'),
+            'ProjectReleaseDate': descr.get('ProjectReleaseDate'),
+        })
+    return result
+
+
+def measure(label, records, interpreted, compiled, repeat):
+    mismatches = sum(1 for record in records if interpreted(record) != compiled(record))
+    if mismatches:
+        print(f"[ERROR] {label}: 결과 불일치 레코드 {mismatches}개")
+        sys.exit(1)
+    n = max(1, len(records))
+    slow, _ = best_of(lambda: [interpreted(record) for record in records], repeat)
+    fast, _ = best_of(lambda: [compiled(record) for record in records], repeat)
+    print(f"{label}: {len(records)} records, 결과 일치")
+    print(f"  interpreted : {slow * 1e6 / n:8.2f} us/record")
+    print(f"  compiled    : {fast * 1e6 / n:8.2f} us/record")
+    print(f"  speedup     : {slow / fast:8.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="필드 규칙 변환: 해석 실행 vs 생성 코드")
+    parser.add_argument('--scale', type=int, default=10, help='합성 코퍼스 배율 (기본: 10)')
+    parser.add_argument('--corpus-dir', default=DEFAULT_OUT_DIR, help=f'합성 코퍼스 디렉토리 (기본: {DEFAULT_OUT_DIR})')
+    parser.add_argument('--repeat', type=int, default=5, help='반복 측정 횟수 (최솟값 사용, 기본: 5)')
+    args = parser.parse_args()
+
+    corpus_path = generate_corpus(args.scale, args.corpus_dir)
+    sample_formatters = {'str': str}
+    sample_values = [ALIASES.collect(attrs) for attrs in
+                     load_attribute_lists(os.path.join(corpus_path, 'ddbj_biosample.xml'))]
+    measure(
+        'biosample', sample_values,
+        lambda values: interpret_spec(SAMPLE_FIELD_SPEC, SAMPLE_ATTRIBUTE_SPEC, ALIASES.slot_of, values, None, sample_formatters),
+        lambda values: SAMPLE_TRANSFORM.transform(values, None),
+        args.repeat,
+    )
+    # Owner/Contact 규칙은 BioProject 소유자 정보 없이(ctx 빈 dict) SAMPLE 자체 값과 기본값으로 측정
+    owner_formatters = {'known_email': known_email}
+    measure(
+        'biosample_owner', sample_values,
+        lambda values: interpret_spec(SAMPLE_OWNER_SPEC, (), ALIASES.slot_of, values, {}, owner_formatters),
+        lambda values: SAMPLE_OWNER_TRANSFORM.transform(values, {}),
+        args.repeat,
+    )
+    package_formatters = {'known_archive': known_archive, 'fix_date_format': fix_date_format, 'fix_text_date': fix_text_date}
+    measure(
+        'bioproject', package_contexts(os.path.join(corpus_path, 'ddbj_bioproject.xml')),
+        lambda ctx: interpret_spec(PACKAGE_FIELD_SPEC, (), None, None, ctx, package_formatters),
+        lambda ctx: PACKAGE_TRANSFORM.transform(None, ctx),
+        args.repeat,
+    )
+    # 코드 생성 비용: 캐시 없이 생성+컴파일 vs 캐시된 생성 코드 로드+컴파일
+    args_spec = ('biosample', SAMPLE_FIELD_SPEC, SAMPLE_ATTRIBUTE_SPEC, ALIASES.slot_of, sample_formatters)
+    cold, _ = best_of(lambda: compile_spec(*args_spec, use_cache=False), args.repeat)
+    warm, _ = best_of(lambda: compile_spec(*args_spec), args.repeat)
+    print(f"compile biosample spec: generate {cold * 1e3:.2f} ms, cached {warm * 1e3:.2f} ms ({SAMPLE_TRANSFORM.path})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+벤치마크용 합성 입력 코퍼스 생성기
+- xml_submitted의 실제 입력 6종(XML 5개 + KRA CSV)을 템플릿으로, 루트 아래 레코드 전체를 scale번 반복 기록
+- 복제본마다 accession(KAP/KAS/KAE/KAR/KRA/SSUB)과 INPUT_ 경로 번호를 같은 규칙으로 바꾸므로
+  파일 간 교차 참조(KAP→KAS→KAE→KAR, CSV의 KRA/KAE/KAR, file_path.xml의 Read_* 경로)가 그대로 유지됨
+  (0번째 복제본은 원본 그대로 → 1×는 xml_submitted와 동일)
+- 출력: <out_dir>/x<scale>/ 아래 xml_submitted와 같은 파일명 + corpus.json(생성 정보)
+- 원본과 생성 규칙이 같으면 이미 만든 코퍼스는 다시 만들지 않음
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+# 공용 모듈(pipeline_common) import를 위해 저장소 루트를 경로에 추가
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pipeline_common.corpus import INPUT_PATHS
+from pipeline_common.submission_map import detect_encoding
+
+GENERATOR_VERSION = 1
+SCALES = (1, 10, 100, 1000)
+SOURCE_DIR = "xml_submitted"
+DEFAULT_OUT_DIR = "benchmarks/corpus"
+META_NAME = "corpus.json"
+
+# 복제본 번호를 끼워 넣을 식별자: 숫자 앞에 4자리 복제본 번호를 붙여 원본/다른 복제본과 겹치지 않게 함
+ACCESSION_RE = re.compile(r'\b(KAP|KAS|KAE|KAR|KRA|SSUB)(\d+)\b')
+INPUT_DIR_RE = re.compile(r'(INPUT_)(\d+)')
+ROOT_TAG_RE = re.compile(r'<([A-Za-z_][\w.-]*)[^>]*>')
+
+
+def corpus_dir(scale, out_dir=DEFAULT_OUT_DIR):
+    return os.path.join(out_dir, f"x{scale}")
+
+
+def renumber(text, copy):
+    """복제본 copy(0부터)용으로 식별자 번호 변경 (0번째는 그대로)"""
+    if copy == 0:
+        return text
+    tag = f"{copy:04d}"
+    text = ACCESSION_RE.sub(r'\g<1>' + tag + r'\g<2>', text)
+    return INPUT_DIR_RE.sub(r'\g<1>' + tag + r'\g<2>', text)
+
+
+def split_xml(text):
+    """
+    XML 문서를 (루트 여는 태그까지, 레코드 본문, 본문 끝 공백 + 루트 닫는 태그부터)로 분리
+    본문은 끝 공백을 떼어 두므로 반복해서 이어 붙여도 들여쓰기/줄바꿈이 유지됨
+    """
+    offset = text.find('?>') + 2 if text.startswith('<?') else 0
+    match = ROOT_TAG_RE.search(text, offset)
+    root = match.group(1)
+    start = match.end()
+    close = text.rfind(f"</{root}>")
+    if close < start:
+        # 루트가 비어 있는 문서(<ROOT/>): 반복할 레코드 없음
+        return text, '', ''
+    body = text[start:close].rstrip()
+    return text[:start], body, text[start + len(body):]
+
+
+def split_csv(text):
+    """CSV를 (헤더 행, 데이터 행 본문, 끝 줄바꿈)으로 분리"""
+    head, _, body = text.partition('\n')
+    rows = body.rstrip('\r\n')
+    return head + '\n', rows, body[len(rows):]
+
+
+def _source_fingerprint(source_dir):
+    fingerprint = {}
+    for name, path in INPUT_PATHS.items():
+        src = os.path.join(source_dir, os.path.basename(path))
+        if os.path.exists(src):
+            st = os.stat(src)
+            fingerprint[name] = [os.path.basename(path), st.st_size, st.st_mtime_ns]
+    return fingerprint
+
+
+def _read_meta(out_path):
+    try:
+        with open(os.path.join(out_path, META_NAME), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def generate_file(src, dst, scale, encoding='utf-8'):
+    """src를 scale배로 복제하여 dst에 기록, 기록한 바이트 수 반환"""
+    with open(src, encoding=encoding, newline='') as f:
+        text = f.read()
+    if src.endswith('.csv'):
+        # CSV 본문은 줄바꿈 없이 끝나므로 복제본 사이에 원본과 같은 줄바꿈을 넣음
+        head, body, tail = split_csv(text)
+        separator = '\r\n' if head.endswith('\r\n') else '\n'
+    else:
+        # XML 본문은 레코드 앞 줄바꿈/들여쓰기로 시작하므로 그대로 이어 붙임
+        head, body, tail = split_xml(text)
+        separator = ''
+    tmp = dst + '.tmp'
+    with open(tmp, 'w', encoding=encoding, newline='', buffering=1 << 20) as f:
+        f.write(head)
+        if body:
+            for copy in range(scale):
+                if copy:
+                    f.write(separator)
+                f.write(renumber(body, copy))
+        f.write(tail)
+    os.replace(tmp, dst)
+    return os.path.getsize(dst)
+
+
+def generate_corpus(scale, out_dir=DEFAULT_OUT_DIR, source_dir=SOURCE_DIR, force=False):
+    """
+    scale배 합성 코퍼스를 생성하고 디렉토리 경로 반환
+    같은 원본/생성 규칙으로 이미 만든 코퍼스가 있으면 그대로 사용 (force=True면 다시 생성)
+    """
+    out_path = corpus_dir(scale, out_dir)
+    fingerprint = _source_fingerprint(source_dir)
+    meta = _read_meta(out_path)
+    if not force and meta and meta.get('version') == GENERATOR_VERSION and meta.get('sources') == fingerprint:
+        print(f"[CORPUS] x{scale}: {out_path} (기존 코퍼스 사용)")
+        return out_path
+    os.makedirs(out_path, exist_ok=True)
+    start = time.perf_counter()
+    files = {}
+    for name, (filename, _, _) in fingerprint.items():
+        encoding = 'utf-8'
+        if filename.endswith('.csv'):
+            # CSV는 원본 인코딩 그대로 기록 (한글 헤더 보존)
+            with open(os.path.join(source_dir, filename), 'rb') as f:
+                encoding = detect_encoding(f.read())
+        size = generate_file(os.path.join(source_dir, filename), os.path.join(out_path, filename), scale, encoding)
+        files[name] = {'path': filename, 'size_bytes': size}
+    elapsed = time.perf_counter() - start
+    with open(os.path.join(out_path, META_NAME), 'w', encoding='utf-8') as f:
+        json.dump({'version': GENERATOR_VERSION, 'scale': scale, 'sources': fingerprint,
+                   'files': files, 'generate_seconds': elapsed}, f, indent=2)
+    total = sum(info['size_bytes'] for info in files.values())
+    print(f"[CORPUS] x{scale}: {out_path} ({total / 1e6:.1f} MB, {elapsed:.1f}s)")
+    return out_path
+
+
+def parse_scales(value):
+    scales = [int(s) for s in value.split(',') if s.strip()]
+    if not scales or any(s < 1 for s in scales):
+        raise argparse.ArgumentTypeError(f"잘못된 배율: {value}")
+    return scales
+
+
+def main():
+    parser = argparse.ArgumentParser(description="벤치마크용 합성 입력 코퍼스 생성")
+    parser.add_argument('--scales', type=parse_scales, default=[1, 10],
+                        help=f"생성할 배율 (쉼표 구분, 기본: 1,10 / 지원 예: {','.join(map(str, SCALES))})")
+    parser.add_argument('--out', default=DEFAULT_OUT_DIR, help=f'출력 디렉토리 (기본: {DEFAULT_OUT_DIR})')
+    parser.add_argument('--source', default=SOURCE_DIR, help=f'템플릿 입력 디렉토리 (기본: {SOURCE_DIR})')
+    parser.add_argument('--force', action='store_true', help='기존 코퍼스가 있어도 다시 생성')
+    args = parser.parse_args()
+    for scale in args.scales:
+        generate_corpus(scale, args.out, args.source, args.force)
+
+
+if __name__ == "__main__":
+    main()
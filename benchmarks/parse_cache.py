@@ -0,0 +1,104 @@
+"""
+파싱 캐시 벤치마크: 매번 파싱 vs 디스크 캐시(pipeline_common.parse_cache) cold/warm
+- 입력별: parse(캐시 없이 파싱), cold(파싱 + 해시 + pickle 저장), warm(pickle 로드),
+  rehash(mtime만 바뀐 원본: 해시 비교 후 pickle 로드) 소요 시간 (repeat 중 최솟값)과 결과 일치 여부
+- 시작 시간: pipeline_submission의 run_id 하나 모드(EXPERIMENT/RUN 전체를 파싱해 작은 파일 하나 생성)를
+  별도 프로세스로 실행하여 캐시 끔/cold(캐시 삭제 후)/warm 전체 소요 시간 비교
+- 캐시는 작업 디렉토리 아래 별도 위치(XMLMETA_CACHE_DIR)에 만들어 기본 캐시를 건드리지 않음
+"""
+import argparse
+import os
+import pickle
+import shutil
+import subprocess
+import sys
+
+# 공용 모듈(pipeline_common) 및 각 파이프라인 import를 위해 저장소 루트를 경로에 추가
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+from pipeline_common.corpus import INPUT_PATHS, parse_xml, XML_PARSE_KEY
+from pipeline_common.fieldspec import CACHE_ENV
+from pipeline_common.parse_cache import load_cached, PARSE_CACHE_ENV
+from pipeline_common.submission_map import compile_submission_map, load_submission_map
+from benchmarks import best_of
+from benchmarks.generate import generate_corpus, DEFAULT_OUT_DIR
+from benchmarks.run import prepare_work_dir, DEFAULT_WORK_DIR
+
+SUBMISSION_MAIN = os.path.join(REPO_ROOT, 'pipeline_submission', 'main.py')
+
+
+def clear_cache(cache_root):
+    shutil.rmtree(cache_root, ignore_errors=True)
+
+
+def measure_input(name, path, cache_root, repeat):
+    if path.endswith('.csv'):
+        parse, cached = compile_submission_map, lambda: load_submission_map(path)
+    else:
+        parse, cached = parse_xml, lambda: load_cached(path, parse_xml, XML_PARSE_KEY)
+    plain, expected = best_of(lambda: parse(path), repeat)
+    cold, (_, cold_state) = best_of(cached, repeat, lambda: clear_cache(cache_root))
+    warm, (data, warm_state) = best_of(cached, repeat)
+    rehash, (_, rehash_state) = best_of(cached, repeat, lambda: os.utime(path))
+    same = pickle.dumps(data, 5) == pickle.dumps(expected, 5)
+    print(f"{name}: {os.path.getsize(path) / 1e6:.2f} MB, 결과 {'일치' if same else '불일치'}")
+    print(f"  parse (no cache)  : {plain * 1e3:9.1f} ms")
+    print(f"  cold ({cold_state:6})     : {cold * 1e3:9.1f} ms")
+    print(f"  warm ({warm_state:6})     : {warm * 1e3:9.1f} ms  ({plain / warm:.1f}x)")
+    print(f"  touched ({rehash_state:6})  : {rehash * 1e3:9.1f} ms  ({plain / rehash:.1f}x)")
+    return same
+
+
+def first_run_id(path):
+    runs = parse_xml(path)['RUN_SET']['RUN']
+    return (runs[0] if isinstance(runs, list) else runs)['@accession']
+
+
+def measure_startup(work_dir, cache_root, run_id, repeat):
+    def run(cache_enabled):
+        env = dict(os.environ, **{CACHE_ENV: os.path.abspath(cache_root), PARSE_CACHE_ENV: '1' if cache_enabled else '0'})
+        proc = subprocess.run([sys.executable, SUBMISSION_MAIN, run_id], cwd=work_dir, env=env,
+                              stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        if proc.returncode != 0:
+            print(proc.stderr[-2000:])
+            sys.exit(1)
+
+    off, _ = best_of(lambda: run(False), repeat)
+    cold, _ = best_of(lambda: run(True), repeat, lambda: clear_cache(cache_root))
+    warm, _ = best_of(lambda: run(True), repeat)
+    print(f"startup: pipeline_submission/main.py {run_id} (프로세스 전체)")
+    print(f"  no cache          : {off * 1e3:9.1f} ms")
+    print(f"  cold              : {cold * 1e3:9.1f} ms")
+    print(f"  warm              : {warm * 1e3:9.1f} ms  ({off / warm:.1f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="파싱 결과 디스크 캐시: cold/warm 비교")
+    parser.add_argument('--scale', type=int, default=10, help='합성 코퍼스 배율 (기본: 10)')
+    parser.add_argument('--corpus-dir', default=DEFAULT_OUT_DIR, help=f'합성 코퍼스 디렉토리 (기본: {DEFAULT_OUT_DIR})')
+    parser.add_argument('--work-dir', default=DEFAULT_WORK_DIR, help=f'실행/출력 디렉토리 (기본: {DEFAULT_WORK_DIR})')
+    parser.add_argument('--pub', default=os.path.join(REPO_ROOT, 'pub'), help='XSD가 있는 pub 디렉토리 (기본: 저장소의 pub)')
+    parser.add_argument('--repeat', type=int, default=3, help='반복 측정 횟수 (최솟값 사용, 기본: 3)')
+    args = parser.parse_args()
+
+    corpus_path = generate_corpus(args.scale, args.corpus_dir)
+    work_dir = os.path.join(args.work_dir, f"parse_cache_x{args.scale}")
+    prepare_work_dir(work_dir, corpus_path, args.pub)
+    cache_root = os.path.join(work_dir, '.parse_cache_bench')
+    os.environ[CACHE_ENV] = os.path.abspath(cache_root)
+    os.environ[PARSE_CACHE_ENV] = '1'
+
+    same = True
+    for name, rel_path in INPUT_PATHS.items():
+        path = os.path.join(corpus_path, os.path.basename(rel_path))
+        if os.path.exists(path):
+            same = measure_input(name, path, cache_root, args.repeat) and same
+    measure_startup(work_dir, cache_root, first_run_id(os.path.join(corpus_path, 'ddbj_run.xml')), args.repeat)
+    clear_cache(cache_root)
+    if not same:
+        print("[ERROR] 캐시 로드 결과가 파싱 결과와 다름")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
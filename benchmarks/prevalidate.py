@@ -0,0 +1,88 @@
+"""
+사전 검사 벤치마크: XSD 제약 표 사전 검사(pipeline_common.prevalidate) vs 그룹 파일 XSD 검증
+- 합성 코퍼스의 EXPERIMENT를 fix_structure로 보정한 뒤
+    * precheck : PreValidator.check_records (레코드당 dict/set 조회)
+    * validate : 레코드마다 <EXPERIMENT_SET> 그룹 문서를 lxml 트리로 만들어 XSD 검증 (사전 검사 없을 때 그룹 검증 비용, validate_doc)
+  레코드당 소요 시간(repeat 중 최솟값) 출력
+- --violate N: N개 레코드마다 center_name을 허용값 밖으로 바꾼 코퍼스에서 사전 검사가 잡은 레코드와
+  XSD 검증 실패 레코드가 같은지 확인 (--pub의 XSD에 해당 enumeration이 있을 때만 의미 있음)
+- 제약 표 로드: 컴파일(캐시 없음) / 캐시된 표 로드 시간
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+# 공용 모듈(pipeline_common) 및 각 파이프라인 import를 위해 저장소 루트를 경로에 추가
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+from pipeline_common.corpus import parse_xml
+from pipeline_common.fieldspec import CACHE_ENV
+from pipeline_common.prevalidate import PreValidator
+from pipeline_common.schema_order import compile_schema, load_schema_table
+from pipeline_common.validation import validate_doc
+from pipeline_experiment.main import fix_structure
+from benchmarks import best_of
+from benchmarks.generate import generate_corpus, DEFAULT_OUT_DIR
+
+EXPERIMENT_PATH = 'EXPERIMENT_SET/EXPERIMENT'
+INVALID_VALUE = '__not_in_enumeration__'
+
+
+def load_experiments(path, violate):
+    doc = fix_structure(parse_xml(path))
+    exps = doc['EXPERIMENT_SET']['EXPERIMENT']
+    if violate:
+        for exp in exps[::violate]:
+            exp['@center_name'] = INVALID_VALUE
+    return exps
+
+
+def validate_all(exps, xsd_path):
+    return [validate_doc({'EXPERIMENT_SET': {'EXPERIMENT': exp}}, xsd_path, str(i))[0] for i, exp in enumerate(exps)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="사전 검사: XSD 제약 표 조회 vs 그룹 파일 XSD 검증")
+    parser.add_argument('--scale', type=int, default=10, help='합성 코퍼스 배율 (기본: 10)')
+    parser.add_argument('--corpus-dir', default=DEFAULT_OUT_DIR, help=f'합성 코퍼스 디렉토리 (기본: {DEFAULT_OUT_DIR})')
+    parser.add_argument('--pub', default=os.path.join(REPO_ROOT, 'pub'), help='XSD가 있는 pub 디렉토리 (기본: 저장소의 pub)')
+    parser.add_argument('--violate', type=int, default=0, metavar='N', help='N개 레코드마다 center_name을 허용값 밖으로 변경 (기본: 0, 변경 없음)')
+    parser.add_argument('--repeat', type=int, default=5, help='반복 측정 횟수 (최솟값 사용, 기본: 5)')
+    args = parser.parse_args()
+
+    xsd_path = os.path.join(args.pub, 'docs', 'dra', 'xsd', '1-6', 'SRA.experiment.xsd')
+    if not os.path.exists(xsd_path):
+        print(f"[ERROR] XSD 없음: {xsd_path}")
+        sys.exit(1)
+    os.environ[CACHE_ENV] = tempfile.mkdtemp(prefix='prevalidate_')
+    corpus_path = generate_corpus(args.scale, args.corpus_dir)
+    exps = load_experiments(os.path.join(corpus_path, 'ddbj_bioExperiment.xml'), args.violate)
+    validator = PreValidator(xsd_path)
+    flagged = validator.check_records(exps, EXPERIMENT_PATH)
+    valid = validate_all(exps, xsd_path)
+    # 사전 검사는 XSD 검증 실패의 부분집합이어야 함 (잡은 레코드는 모두 XSD 검증도 실패)
+    false_positives = [i for i in flagged if valid[i]]
+    if false_positives:
+        print(f"[ERROR] 사전 검사 위반이지만 XSD 검증 통과한 레코드 {len(false_positives)}개: {flagged[false_positives[0]][0]}")
+        sys.exit(1)
+    failed = valid.count(False)
+    print(f"EXPERIMENT: {len(exps)} records (x{args.scale}), XSD 검증 실패 {failed}, 사전 검사 위반 {len(flagged)} "
+          f"({len(flagged)}/{failed} 검출)")
+
+    n = max(1, len(exps))
+    check, _ = best_of(lambda: validator.check_records(exps, EXPERIMENT_PATH), args.repeat)
+    full, _ = best_of(lambda: validate_all(exps, xsd_path), args.repeat)
+    print(f"  precheck : {check * 1e6 / n:8.2f} us/record")
+    print(f"  validate : {full * 1e6 / n:8.2f} us/record  ({full / check:.1f}x)")
+
+    build, table = best_of(lambda: compile_schema(xsd_path), args.repeat)
+    load_schema_table(xsd_path)
+    warm, _ = best_of(lambda: load_schema_table(xsd_path), args.repeat)
+    print(f"{xsd_path}: {len(table['files'])} files, {len(table['types'])} types, {len(table['simple'])} simple types")
+    print(f"  compile      : {build * 1e3:8.2f} ms")
+    print(f"  cached table : {warm * 1e3:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
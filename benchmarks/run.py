@@ -0,0 +1,394 @@
+"""
+파이프라인 벤치마크 실행기
+- 배율별 합성 코퍼스(benchmarks/generate.py)를 작업 디렉토리의 xml_submitted로 연결하고
+  5개 파이프라인을 각각 별도 프로세스에서 실행 (최대 RSS가 파이프라인마다 따로 측정되도록)
+- 단계별 측정: parse → fix_structure → group → write → validate
+  (Submission은 fix_structure 대신 accession 색인 생성 단계 index)
+  각 단계의 소요 시간, records/sec, 단계 종료 시점의 최대 RSS를 기록
+- 결과는 커밋/환경 정보와 함께 JSON으로 저장, --compare로 이전 결과와 단계별 비교
+- 파이프라인 출력(콘솔)은 작업 디렉토리의 bench_<파이프라인>.log에 저장
+"""
+import argparse
+import contextlib
+import importlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+
+# 공용 모듈(pipeline_common) 및 각 파이프라인 import를 위해 저장소 루트를 경로에 추가
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+from pipeline_common.corpus import Corpus, count_records, rss_bytes
+from pipeline_common.metrics import peak_rss_bytes
+from pipeline_common.emit import emit_groups
+from pipeline_common.validation import validate_xsd, get_backend
+from pipeline_common.parse_cache import PARSE_CACHE_ENV
+from benchmarks.generate import generate_corpus, parse_scales, DEFAULT_OUT_DIR
+
+PIPELINES = ['bioproject', 'biosample', 'experiment', 'run', 'submission']
+DEFAULT_WORK_DIR = "benchmarks/work"
+DEFAULT_RESULTS_DIR = "benchmarks/results"
+RESULTS_VERSION = 1
+# --compare에서 이 비율 이상 느려진 단계는 REGRESSION으로 표시
+# (측정 오차가 큰 짧은 단계는 제외: 두 결과 모두 MIN_COMPARE_SECONDS 미만이면 표시하지 않음)
+REGRESSION_THRESHOLD = 0.10
+MIN_COMPARE_SECONDS = 0.05
+
+
+class StageTimer:
+    """with timer.stage(name, records) as st: ... → 단계별 측정값을 stages에 순서대로 기록"""
+    def __init__(self):
+        self.stages = []
+
+    @contextlib.contextmanager
+    def stage(self, name, records=0):
+        entry = {'stage': name, 'records': records}
+        start = time.perf_counter()
+        yield entry
+        seconds = time.perf_counter() - start
+        entry['seconds'] = seconds
+        entry['records_per_sec'] = entry['records'] / seconds if seconds > 0 else None
+        entry['rss_mb'] = rss_bytes() / 1e6
+        entry['peak_rss_mb'] = peak_rss_bytes() / 1e6
+        self.stages.append(entry)
+
+
+def _write_and_validate(timer, records, render, xsd_path, groups, doc=None, output_xml=None, jobs=1):
+    """
+    write: 전체 보정본(doc) + 그룹 파일 저장 (emit_groups, 검증 없이)
+    validate: 저장한 파일 전체를 XSD 검증
+    """
+    paths = []
+
+    def track(items):
+        for out_path, group_doc in items:
+            paths.append(out_path)
+            yield out_path, group_doc
+
+    with timer.stage('write', records) as st:
+        if doc is not None:
+            render(doc, output_xml)
+        emit_groups(track(groups), render, None, jobs)
+        st['groups'] = len(paths)
+    files = ([output_xml] if doc is not None else []) + paths
+    with timer.stage('validate', records) as st:
+        failed = 0
+        for path in files:
+            valid, _ = validate_xsd(path, xsd_path)
+            if not valid:
+                failed += 1
+        st['files'] = len(files)
+        st['failed'] = failed
+
+
+def bench_bioproject(timer, jobs):
+    m = importlib.import_module('pipeline_bioproject.main')
+    output_dir = "xml_fixed/ddbj_bioproject_fixed"
+    os.makedirs(output_dir, exist_ok=True)
+    corpus = Corpus()
+    with timer.stage('parse') as st:
+        for name in ('bioproject', 'biosample', 'experiment', 'run', 'run_file_path'):
+            corpus.load(name)
+        records = st['records'] = count_records(corpus.get('bioproject'), 'PackageSet', 'Package')
+    with timer.stage('fix_structure', records):
+        doc = m.fix_structure(corpus.get('bioproject'), corpus.join_index())
+    with timer.stage('group', records) as st:
+        groups = [
+            (os.path.join(output_dir, f"{kapid}.xml"), {'PackageSet': {'Package': package}})
+            for kapid, package in m.group_packages_by_kapid(doc)
+        ]
+        st['groups'] = len(groups)
+    _write_and_validate(timer, records, m.save_xml, m.XSD_PATH, groups, doc, m.OUTPUT_XML, jobs)
+    return records
+
+
+def bench_biosample(timer, jobs):
+    m = importlib.import_module('pipeline_biosample.main')
+    output_dir = "xml_fixed/ddbj_biosample_fixed"
+    os.makedirs(output_dir, exist_ok=True)
+    corpus = Corpus()
+    with timer.stage('parse') as st:
+        for name in ('biosample', 'bioproject'):
+            corpus.load(name)
+        records = st['records'] = count_records(corpus.get('biosample'), 'SAMPLE_SET', 'SAMPLE')
+    with timer.stage('fix_structure', records):
+        joins = corpus.join_index(('bioproject',))
+        doc = m.fix_structure(corpus.get('biosample'), joins.project_owners)
+    with timer.stage('group', records) as st:
+        groups = [
+            (os.path.join(output_dir, f"{ssubid}.xml"), {'BioSampleSet': {'BioSample': samples}})
+            for ssubid, samples in m.group_samples_by_ssubid(doc).items()
+        ]
+        st['groups'] = len(groups)
+    _write_and_validate(timer, records, m.save_xml, m.XSD_PATH, groups, doc, m.OUTPUT_XML, jobs)
+    return records
+
+
+def bench_experiment(timer, jobs):
+    m = importlib.import_module('pipeline_experiment.main')
+    output_dir = "xml_fixed/ddbj_experiment_fixed"
+    os.makedirs(output_dir, exist_ok=True)
+    corpus = Corpus()
+    with timer.stage('parse') as st:
+        for name in ('experiment', 'submission_csv'):
+            corpus.load(name)
+        records = st['records'] = count_records(corpus.get('experiment'), 'EXPERIMENT_SET', 'EXPERIMENT')
+    with timer.stage('fix_structure', records):
+        submission_map = corpus.get('submission_csv')
+        doc = m.fix_structure(corpus.get('experiment'))
+    with timer.stage('group', records) as st:
+        submission_groups, access_type_map = m.group_experiments_by_submission_id(doc, submission_map)
+        st['groups'] = len(submission_groups)
+    # LIBRARY_LAYOUT 보정은 그룹을 꺼낼 때 적용되므로 write 단계에 포함
+    groups = m.iter_experiment_groups(submission_groups, access_type_map, output_dir)
+    _write_and_validate(timer, records, m.save_xml, m.XSD_PATH, groups, doc, m.OUTPUT_XML, jobs)
+    return records
+
+
+def bench_run(timer, jobs):
+    m = importlib.import_module('pipeline_run.main')
+    output_dir = "xml_fixed/ddbj_run_fixed"
+    os.makedirs(output_dir, exist_ok=True)
+    corpus = Corpus()
+    with timer.stage('parse') as st:
+        for name in ('run', 'submission_csv'):
+            corpus.load(name)
+        # file_path.xml은 파이프라인과 같이 영구 색인으로 조회 (원본이 바뀌었을 때만 재생성)
+        file_path_runs = m.open_file_path_index(corpus.paths['run_file_path'])
+        records = st['records'] = count_records(corpus.get('run'), 'RUN_SET', 'RUN')
+    with timer.stage('fix_structure', records):
+        submission_map = corpus.get('submission_csv')
+        doc = m.fix_structure(corpus.get('run'), file_path_runs)
+    with timer.stage('group', records) as st:
+        groups = [
+            (os.path.join(output_dir, f"{submission_id}.run.xml"), {'RUN_SET': {'RUN': runs}})
+            for submission_id, runs in m.group_runs_by_submission_id(doc, submission_map).items()
+        ]
+        st['groups'] = len(groups)
+    _write_and_validate(timer, records, m.save_xml, m.XSD_PATH, groups, doc, m.OUTPUT_XML, jobs)
+    return records
+
+
+def _render_submission(payload, out_path):
+    # emit_groups의 render 형식으로 make_submission 호출 (병렬 모드에서 pickle 가능하도록 모듈 수준 함수)
+    m = importlib.import_module('pipeline_submission.main')
+    experiment, run, project_id, submission_id = payload
+    m.make_submission(experiment, run, project_id, submission_id, out_path)
+
+
+def bench_submission(timer, jobs):
+    m = importlib.import_module('pipeline_submission.main')
+    os.makedirs("xml_fixed/ddbj_submission_fixed", exist_ok=True)
+    corpus = Corpus()
+    with timer.stage('parse') as st:
+        for name in ('experiment', 'run', 'submission_csv'):
+            corpus.load(name)
+        records = st['records'] = count_records(corpus.get('run'), 'RUN_SET', 'RUN')
+    with timer.stage('index', records):
+        submission_map = corpus.get('submission_csv')
+        index = m.build_accession_index(corpus.get('experiment'), corpus.get('run'), submission_map)
+    with timer.stage('group', records) as st:
+        runs = corpus.get('run')['RUN_SET']['RUN']
+        if isinstance(runs, dict):
+            runs = [runs]
+        generated_files = m.collect_submission_files(runs, index)
+        groups = [
+            (output_path, (experiment, run, project_id, submission_id))
+            for (submission_id, output_path), (experiment, run, project_id) in generated_files.items()
+        ]
+        st['groups'] = len(groups)
+    _write_and_validate(timer, records, _render_submission, m.XSD_PATH, groups, jobs=jobs)
+    return records
+
+
+BENCHES = {
+    'bioproject': bench_bioproject,
+    'biosample': bench_biosample,
+    'experiment': bench_experiment,
+    'run': bench_run,
+    'submission': bench_submission,
+}
+
+
+def run_worker(name, jobs):
+    """작업 디렉토리(cwd)에서 파이프라인 하나를 측정하고 결과 JSON을 stdout 마지막 줄로 출력"""
+    timer = StageTimer()
+    start = time.perf_counter()
+    with open(f"bench_{name}.log", 'w', encoding='utf-8') as log, contextlib.redirect_stdout(log):
+        records = BENCHES[name](timer, jobs)
+    wall = time.perf_counter() - start
+    print(json.dumps({
+        'pipeline': name,
+        'records': records,
+        'wall_seconds': wall,
+        'records_per_sec': records / wall if wall > 0 else None,
+        'peak_rss_mb': peak_rss_bytes() / 1e6,
+        'peak_rss_children_mb': peak_rss_bytes(children=True) / 1e6,
+        'stages': timer.stages,
+    }))
+
+
+def prepare_work_dir(work_dir, corpus_path, pub_dir=None):
+    """작업 디렉토리에 xml_submitted(합성 코퍼스)/pub(XSD) 링크를 만들고 이전 출력(xml_fixed) 삭제"""
+    os.makedirs(work_dir, exist_ok=True)
+    links = {'xml_submitted': corpus_path, 'pub': pub_dir}
+    for name, target in links.items():
+        link = os.path.join(work_dir, name)
+        if os.path.islink(link):
+            os.unlink(link)
+        if target and os.path.exists(target):
+            os.symlink(os.path.abspath(target), link)
+    shutil.rmtree(os.path.join(work_dir, "xml_fixed"), ignore_errors=True)
+    os.makedirs(os.path.join(work_dir, "xml_fixed"))
+
+
+def run_pipeline_bench(name, work_dir, jobs, parse_cache=False):
+    """
+    파이프라인 하나를 새 프로세스로 측정 (실패 시 error 항목에 stderr 마지막 부분 기록)
+    parse_cache=False면 파싱 캐시를 꺼서 parse 단계가 항상 실제 파싱을 측정하도록 함
+    """
+    env = dict(os.environ, **{PARSE_CACHE_ENV: '1' if parse_cache else '0'})
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--worker', name, '--jobs', str(jobs)],
+        cwd=work_dir, capture_output=True, text=True, env=env,
+    )
+    lines = proc.stdout.strip().splitlines()
+    if proc.returncode != 0 or not lines:
+        return {'pipeline': name, 'error': (proc.stderr or proc.stdout)[-2000:]}
+    return json.loads(lines[-1])
+
+
+def format_result(scale, result):
+    if 'error' in result:
+        return [f"[BENCH] x{scale} {result['pipeline']}: ERROR\n{result['error']}"]
+    lines = [
+        f"[BENCH] x{scale} {result['pipeline']}: {result['wall_seconds']:.3f}s, {result['records']} records "
+        f"({result['records_per_sec'] or 0:.0f} rec/s), peak RSS {result['peak_rss_mb']:.1f} MB"
+    ]
+    for st in result['stages']:
+        lines.append(
+            f"[BENCH]   {st['stage']:<13} {st['seconds']:8.3f}s  {st['records_per_sec'] or 0:10.0f} rec/s  "
+            f"peak RSS {st['peak_rss_mb']:.1f} MB"
+        )
+    return lines
+
+
+def git_revision():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO_ROOT, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=REPO_ROOT,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, dirty
+
+
+def _stage_seconds(results):
+    # (배율, 파이프라인, 단계) → 초, 단계 '*'는 파이프라인 전체
+    table = {}
+    for entry in results.get('results', []):
+        if 'error' in entry:
+            continue
+        key = (entry['scale'], entry['pipeline'])
+        table[key + ('*',)] = entry['wall_seconds']
+        for st in entry['stages']:
+            table[key + (st['stage'],)] = st['seconds']
+    return table
+
+
+def compare_results(base, new, threshold=REGRESSION_THRESHOLD):
+    """두 결과(JSON dict)의 공통 (배율, 파이프라인, 단계) 소요 시간 비교 라인"""
+    base_table = _stage_seconds(base)
+    new_table = _stage_seconds(new)
+    lines = [f"[COMPARE] base {(base.get('git_commit') or '?')[:10]} → new {(new.get('git_commit') or '?')[:10]}"]
+    for key, seconds in new_table.items():
+        if key not in base_table:
+            continue
+        scale, pipeline, stage = key
+        before = base_table[key]
+        change = (seconds - before) / before if before > 0 else 0.0
+        significant = max(before, seconds) >= MIN_COMPARE_SECONDS
+        mark = ' REGRESSION' if change >= threshold and significant else ''
+        name = pipeline if stage == '*' else f"{pipeline}.{stage}"
+        lines.append(f"[COMPARE] x{scale} {name}: {before:.3f}s → {seconds:.3f}s ({change * 100:+.1f}%){mark}")
+    return lines
+
+
+def load_results(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="합성 코퍼스로 5개 파이프라인 단계별 성능 측정")
+    parser.add_argument('--scales', type=parse_scales, default=[1, 10], help='측정할 배율 (쉼표 구분, 기본: 1,10)')
+    parser.add_argument('--pipelines', default=','.join(PIPELINES), help='측정할 파이프라인 (쉼표 구분, 기본: 전체)')
+    parser.add_argument('--jobs', type=int, default=1, help='그룹 파일 저장 병렬 프로세스 수 (기본: 1)')
+    parser.add_argument('--corpus-dir', default=DEFAULT_OUT_DIR, help=f'합성 코퍼스 디렉토리 (기본: {DEFAULT_OUT_DIR})')
+    parser.add_argument('--work-dir', default=DEFAULT_WORK_DIR, help=f'실행/출력 디렉토리 (기본: {DEFAULT_WORK_DIR})')
+    parser.add_argument('--pub', default=os.path.join(REPO_ROOT, 'pub'), help='XSD가 있는 pub 디렉토리 (기본: 저장소의 pub)')
+    parser.add_argument('--output', help=f'결과 JSON 경로 (기본: {DEFAULT_RESULTS_DIR}/<시각>_<커밋>.json)')
+    parser.add_argument('--parse-cache', action='store_true',
+                        help='파싱 캐시 사용 (기본: 끔, cold/warm 비교는 benchmarks/parse_cache.py)')
+    parser.add_argument('--compare', nargs='+', metavar='RESULT_JSON',
+                        help='BASE: 측정 후 BASE와 비교 / BASE NEW: 측정 없이 두 결과만 비교')
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.jobs)
+        return
+    if args.compare and len(args.compare) == 2:
+        for line in compare_results(load_results(args.compare[0]), load_results(args.compare[1])):
+            print(line)
+        return
+    pipelines = [p.strip() for p in args.pipelines.split(',') if p.strip()]
+    unknown = [p for p in pipelines if p not in PIPELINES]
+    if unknown:
+        parser.error(f"알 수 없는 파이프라인: {', '.join(unknown)}")
+
+    commit, dirty = git_revision()
+    results = {
+        'version': RESULTS_VERSION,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'git_commit': commit,
+        'git_dirty': dirty,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'jobs': args.jobs,
+        'validator': get_backend(),
+        'parse_cache': args.parse_cache,
+        'scales': args.scales,
+        'results': [],
+    }
+    for scale in args.scales:
+        corpus_path = generate_corpus(scale, args.corpus_dir)
+        work_dir = os.path.join(args.work_dir, f"x{scale}")
+        for name in pipelines:
+            prepare_work_dir(work_dir, corpus_path, args.pub)
+            result = run_pipeline_bench(name, work_dir, args.jobs, args.parse_cache)
+            result['scale'] = scale
+            results['results'].append(result)
+            for line in format_result(scale, result):
+                print(line)
+
+    output = args.output
+    if not output:
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        output = os.path.join(DEFAULT_RESULTS_DIR, f"{stamp}_{(commit or 'nogit')[:10]}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    print("Benchmark complete. See results:", output)
+    if args.compare:
+        for line in compare_results(load_results(args.compare[0]), results):
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
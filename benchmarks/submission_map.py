@@ -0,0 +1,95 @@
+"""
+제출 매핑 CSV 벤치마크: 파이프라인별 매핑 생성 vs 컴파일된 공용 색인(pipeline_common.submission_map)
+- legacy: 기존 구현 (csv.DictReader(iso-8859-1)로 CSV 전체를 읽어 Experiment/Run/Submission이
+  각자 (experiment_id, run_id) 매핑을 만들고 Experiment는 experiment_id 역색인까지 생성)
+- compile: CSV를 읽어 SubmissionMap으로 컴파일 (캐시 없음), cached: 캐시된 컴파일 결과 로드
+- 세 파이프라인이 쓰는 조회 결과((KAE, KAR) → KRA, KAE → [(KRA, Library Layout)])가 같은지 확인한 뒤
+  소요 시간(repeat 중 최솟값)과 조회당 시간 출력
+"""
+import argparse
+import csv
+import os
+import sys
+
+# 공용 모듈(pipeline_common) import를 위해 저장소 루트를 경로에 추가
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pipeline_common.submission_map import compile_submission_map, load_submission_map
+from benchmarks import best_of
+from benchmarks.generate import generate_corpus, DEFAULT_OUT_DIR
+
+LEGACY_ENCODING = 'iso-8859-1'
+
+
+def legacy_rows(path):
+    with open(path, encoding=LEGACY_ENCODING) as f:
+        return list(csv.DictReader(f))
+
+
+def legacy_map(rows, with_layout):
+    mapping = {}
+    for row in rows:
+        submission_id = row.get('KRA submission ID')
+        experiment_id = row.get('Experiment ID')
+        run_id = row.get('Run ID')
+        if submission_id and experiment_id and run_id:
+            key = (experiment_id.strip(), run_id.strip())
+            if with_layout:
+                mapping[key] = (submission_id.strip(), (row.get('Library Layout') or '').strip().lower())
+            else:
+                mapping[key] = submission_id.strip()
+    return mapping
+
+
+def legacy_experiment_index(submission_map):
+    index = {}
+    for (exp_id, _), matched in submission_map.items():
+        index.setdefault(exp_id, {})[matched] = None
+    return {exp_id: list(matched) for exp_id, matched in index.items()}
+
+
+def legacy_build(path):
+    """Experiment/Run/Submission 세 파이프라인이 각자 만들던 매핑"""
+    experiment_map = legacy_map(legacy_rows(path), True)
+    return {
+        'experiment': legacy_experiment_index(experiment_map),
+        'run': legacy_map(legacy_rows(path), False),
+        'submission': legacy_map(legacy_rows(path), False),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="제출 매핑 CSV: 파이프라인별 매핑 vs 컴파일된 공용 색인")
+    parser.add_argument('--scale', type=int, default=10, help='합성 코퍼스 배율 (기본: 10)')
+    parser.add_argument('--corpus-dir', default=DEFAULT_OUT_DIR, help=f'합성 코퍼스 디렉토리 (기본: {DEFAULT_OUT_DIR})')
+    parser.add_argument('--repeat', type=int, default=5, help='반복 측정 횟수 (최솟값 사용, 기본: 5)')
+    args = parser.parse_args()
+
+    path = os.path.join(generate_corpus(args.scale, args.corpus_dir), 'KRA_after_20240311_pp_lib.csv')
+    legacy = legacy_build(path)
+    compiled = compile_submission_map(path)
+    pairs = list(legacy['run'])
+    exp_ids = list(legacy['experiment'])
+    same = (all(compiled.submission_id(*pair) == legacy['run'][pair] for pair in pairs)
+            and len(compiled) == len(pairs)
+            and all(compiled.experiment_submissions(exp_id) == legacy['experiment'][exp_id] for exp_id in exp_ids))
+    if not same:
+        print("[ERROR] 컴파일된 색인의 조회 결과가 기존 매핑과 다름")
+        sys.exit(1)
+
+    slow, _ = best_of(lambda: legacy_build(path), args.repeat)
+    build, _ = best_of(lambda: compile_submission_map(path), args.repeat)
+    load_submission_map(path)
+    warm, (_, state) = best_of(lambda: load_submission_map(path), args.repeat)
+    legacy_lookup, _ = best_of(lambda: [legacy['run'].get(pair) for pair in pairs], args.repeat)
+    compiled_lookup, _ = best_of(lambda: [compiled.submission_id(*pair) for pair in pairs], args.repeat)
+    print(f"{path}: {os.path.getsize(path) / 1e6:.2f} MB, {len(compiled.rows)} rows, {len(pairs)} (KAE, KAR), "
+          f"encoding {compiled.encoding}, 결과 일치")
+    print(f"  legacy (3 pipelines)   : {slow * 1e3:9.1f} ms")
+    print(f"  compile (no cache)     : {build * 1e3:9.1f} ms")
+    print(f"  cached load ({state:4})    : {warm * 1e3:9.1f} ms  ({slow / warm:.1f}x)")
+    print(f"  lookup legacy dict     : {legacy_lookup * 1e9 / len(pairs):9.1f} ns/query")
+    print(f"  lookup SubmissionMap   : {compiled_lookup * 1e9 / len(pairs):9.1f} ns/query")
+
+
+if __name__ == "__main__":
+    main()
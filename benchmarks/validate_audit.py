@@ -0,0 +1,59 @@
+"""
+단일 검증 감사: 그룹 파이프라인을 XMLMETA_VALIDATE_AUDIT=1로 실행하여 단일 검증 결과가 그룹 파일 개별 검증과 같은지 확인
+- 각 파이프라인의 "[AUDIT] N groups, M mismatched, K per-group" 줄을 읽어
+    * mismatched: 단일 검증(전체 보정본 또는 그룹별로 보정된 레코드를 모은 트리)에서 나눈 결과가 개별 검증과 다른 그룹 수
+    * per-group : 단일 검증 결과로 나눌 수 없어 개별 검증으로 대체되는 그룹 수
+  mismatched가 있거나 per-group이 --max-fallback보다 많으면 실패(종료 코드 1)
+- 파이프라인은 --dir(기본: 저장소 루트)의 xml_submitted 입력과 pub/ XSD로 실행되며 xml_fixed 출력을 덮어씀
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+# 공용 모듈(pipeline_common) 및 각 파이프라인 import를 위해 저장소 루트를 경로에 추가
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+from pipeline_common.validation import AUDIT_ENV
+
+PIPELINES = ['bioproject', 'biosample', 'experiment', 'run']
+AUDIT_RE = re.compile(r"^\[AUDIT\] (\d+) groups, (\d+) mismatched, (\d+) per-group$", re.M)
+
+
+def run_audit(name, work_dir):
+    """→ (groups, mismatched, per-group) 또는 실패 시 None과 출력 마지막 부분"""
+    env = dict(os.environ, **{AUDIT_ENV: '1'})
+    proc = subprocess.run(
+        [sys.executable, os.path.join(REPO_ROOT, f'pipeline_{name}', 'main.py')],
+        cwd=work_dir, capture_output=True, text=True, env=env, stdin=subprocess.DEVNULL,
+    )
+    found = AUDIT_RE.findall(proc.stdout)
+    if proc.returncode != 0 or not found:
+        return None, (proc.stderr or proc.stdout)[-2000:]
+    return tuple(int(n) for n in found[-1]), None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="단일 검증 감사: 그룹별 결과 불일치/개별 검증 대체 수 확인")
+    parser.add_argument('--dir', default=REPO_ROOT, help='파이프라인 실행 디렉토리 (xml_submitted, pub 포함, 기본: 저장소 루트)')
+    parser.add_argument('--pipelines', default=','.join(PIPELINES), help=f'검사할 파이프라인 (기본: {",".join(PIPELINES)})')
+    parser.add_argument('--max-fallback', type=int, default=0, help='파이프라인별 허용하는 개별 검증 대체 그룹 수 (기본: 0)')
+    args = parser.parse_args()
+
+    failed = False
+    for name in args.pipelines.split(','):
+        counts, error = run_audit(name, args.dir)
+        if counts is None:
+            print(f"[ERROR] {name}: 감사 결과 없음\n{error}")
+            failed = True
+            continue
+        groups, mismatched, fallback = counts
+        ok = mismatched == 0 and fallback <= args.max_fallback
+        failed |= not ok
+        print(f"  {name:<11}: {groups:6d} groups, {mismatched} mismatched, {fallback} per-group  {'OK' if ok else 'FAIL'}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+import os
+import sys
+import time
+import argparse
+import importlib
+
+# 공용 모듈(pipeline_common) 및 각 파이프라인 import를 위해 저장소 루트를 경로에 추가
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pipeline_common.corpus import Corpus
+from pipeline_common.emit import default_jobs
+from pipeline_common.checksum import DEFAULT_WORKERS
+from pipeline_common.metrics import create_metrics, metrics_enabled
+from pipeline_common.joins import RECORD_TAGS
+from pipeline_common.trace import create_trace, parse_level
+
+REPORT_PATH = "xml_fixed/run_all_report.txt"
+
+# 실행 순서: 각 단계는 Corpus를 공유
+# - BioProject/BioSample은 자기 입력을 Corpus.copy()로 받아 수정하므로 다른 단계의 공유 입력은 원본 그대로 유지됨
+STAGES = ['bioproject', 'biosample', 'experiment', 'run', 'submission']
+
+# 단계별로 미리 읽을 입력 (Corpus 이름, BioProject의 교차 문서 조인 색인은 RECORD_TAGS의 입력 전체, BioSample은 BioProject만)
+# - Run의 ddbj_run_file_path.xml은 Corpus를 거치지 않고 영구 색인(SQLite)으로 직접 읽음
+STAGE_INPUTS = {
+    'bioproject': ('bioproject',) + tuple(RECORD_TAGS),
+    'biosample': ('biosample', 'bioproject'),
+    'experiment': ('experiment', 'submission_csv'),
+    'run': ('run', 'submission_csv'),
+    'submission': ('experiment', 'run', 'submission_csv'),
+}
+
+
+def run_stage(name, corpus, jobs, incremental=False, checksum_workers=0, collect_metrics=False, options=None):
+    """
+    collect_metrics=True면 단계별 계측 결과를 xml_fixed/<name>_metrics.json/.prom에 저장
+    options: 단계별 옵션 (trace, trace_every, organism_policy, organism_decisions, instrument_auto, 없으면 각 파이프라인 기본값)
+    """
+    options = options or {}
+    module = importlib.import_module(f"pipeline_{name}.main")
+    metrics = create_metrics(name, collect_metrics)
+    if name == 'submission':
+        module.run_pipeline(corpus, all_runs=True, incremental=incremental, metrics=metrics)
+    elif name == 'run':
+        module.run_pipeline(corpus, jobs, incremental, checksum_workers, metrics)
+    elif name == 'bioproject':
+        organisms = module.OrganismResolver(options.get('organism_policy', 'default'), options.get('organism_decisions'))
+        module.run_pipeline(corpus, jobs, incremental, metrics, organisms)
+    elif name == 'biosample':
+        # --trace가 없으면 XMLMETA_TRACE / XMLMETA_TRACE_EVERY 환경변수로 결정
+        trace = create_trace(name, options.get('trace'), options.get('trace_every'))
+        module.run_pipeline(corpus, jobs, incremental, metrics, trace)
+    elif name == 'experiment':
+        module.run_pipeline(corpus, jobs, incremental, metrics, module.InstrumentResolver(options.get('instrument_auto')))
+    else:
+        module.run_pipeline(corpus, jobs, incremental, metrics)
+    metrics.save()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="5개 파이프라인 일괄 실행 (입력 파일별 1회 파싱)")
+    parser.add_argument('--jobs', type=int, default=1, help='그룹별 저장/검증 병렬 프로세스 수 (0: CPU 코어 수)')
+    parser.add_argument('--incremental', action='store_true', help='각 단계에서 내용이 바뀐 그룹 파일만 다시 저장/검증')
+    parser.add_argument('--checksum', action='store_true', help='Run 단계에서 DATA_BLOCK 파일(Read_*)의 MD5 계산')
+    parser.add_argument('--checksum-workers', type=int, default=DEFAULT_WORKERS, help=f'MD5 계산 스레드 수 (기본: {DEFAULT_WORKERS})')
+    parser.add_argument('--metrics', action='store_true', help='단계별 계측 결과 저장 (xml_fixed/<단계>_metrics.json, .prom)')
+    parser.add_argument('--only', default=','.join(STAGES), help='실행할 단계 (쉼표 구분, 기본: 전체)')
+    parser.add_argument('--trace', nargs='?', const='debug', default=None, metavar='LEVEL',
+                        help='BioSample 단계의 SAMPLE별 진단을 xml_fixed/biosample_trace.jsonl에 기록 (레벨: error/warning/info/debug, 기본 debug)')
+    parser.add_argument('--trace-every', type=int, default=None, metavar='N', help='N개 SAMPLE 중 1개만 상세 트레이스 (기본: 1)')
+    parser.add_argument('--organism-policy', choices=('default', 'most-frequent', 'first', 'prompt'), default='default',
+                        help='BioProject 단계에서 Organism 후보가 여러 개인 KAP의 결정 방식 (default/most-frequent/first/prompt)')
+    parser.add_argument('--organism-decisions', metavar='JSON', help='BioProject 단계의 KAP별 Organism 결정 파일')
+    parser.add_argument('--instrument-auto', nargs='?', type=float, const=0.8, default=None, metavar='THRESHOLD',
+                        help='Experiment 단계에서 정확히 일치하지 않는 INSTRUMENT_MODEL을 유사도 THRESHOLD(0~1, 기본 0.8) 이상인 후보로 자동 변환')
+    args = parser.parse_args()
+    jobs = args.jobs or default_jobs()
+    checksum_workers = max(1, args.checksum_workers) if args.checksum else 0
+    stages = [s.strip() for s in args.only.split(',') if s.strip()]
+    unknown = [s for s in stages if s not in STAGES]
+    if unknown:
+        parser.error(f"알 수 없는 단계: {', '.join(unknown)}")
+    if args.trace is not None:
+        try:
+            parse_level(args.trace)
+        except ValueError as e:
+            parser.error(str(e))
+    if args.instrument_auto is not None and not 0 < args.instrument_auto <= 1:
+        parser.error("--instrument-auto 기준은 0보다 크고 1 이하여야 합니다")
+    options = {
+        'trace': args.trace,
+        'trace_every': args.trace_every,
+        'organism_policy': args.organism_policy,
+        'organism_decisions': args.organism_decisions,
+        'instrument_auto': args.instrument_auto,
+    }
+
+    print("=== Run-All Pipeline Start ===")
+    os.makedirs("xml_fixed", exist_ok=True)
+    # 선택한 단계가 쓰는 입력만 읽음 (예: --only run이면 RUN XML과 제출 매핑 CSV만)
+    corpus = Corpus()
+    for name in dict.fromkeys(n for stage in stages for n in STAGE_INPUTS[stage]):
+        corpus.load(name)
+    report_lines = corpus.format_stats()
+    for line in report_lines:
+        print(line)
+    for name in STAGES:
+        if name not in stages:
+            continue
+        start = time.perf_counter()
+        run_stage(name, corpus, jobs, args.incremental, checksum_workers, args.metrics or metrics_enabled(), options)
+        line = f"[STAGE] {name}: {time.perf_counter() - start:.3f}s"
+        print(line)
+        report_lines.append(line)
+    with open(REPORT_PATH, 'w', encoding='utf-8') as rf:
+        rf.write('\n'.join(report_lines))
+    print("Run-all complete. See report:", REPORT_PATH)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,23 @@
 import xmltodict
-from lxml import etree
 import difflib
-import subprocess
 import os
 import re
+import sys
+import json
+import argparse
+
+# 공용 모듈(pipeline_common) import를 위해 저장소 루트를 경로에 추가
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pipeline_common.xmlwriter import write_xml
+from pipeline_common.manifest import load_manifest, CallRecorder
+from pipeline_common.emit import emit_groups, emit_groups_once, default_jobs
+from pipeline_common.corpus import Corpus, INPUT_PATHS, count_records
+from pipeline_common.joins import stream_join_index
+from pipeline_common.metrics import create_metrics, NULL_METRICS
+from pipeline_common.fieldspec import compile_spec, cache_dir
+from pipeline_common.schema_order import ChildOrder
+from pipeline_common.prevalidate import PreValidator, group_violations, print_precheck_summary
+from pipeline_common.streaming import iter_records, render_record, wrap_document, write_text, StreamDocumentWriter
 
 # 주요 경로 상수 정의
 XSD_PATH = "pub/docs/bioproject/xsd/Package.xsd"            # XSD 스키마 파일 경로
@@ -11,33 +25,63 @@ INPUT_XML = "xml_submitted/ddbj_bioproject.xml"             # 입력 XML 파일
 EXAMPLE_XML = "real_examples/PRJDB19520.xml"                # 예시 XML 파일 경로
 OUTPUT_XML = "xml_fixed/ddbj_bioproject.fixed.xml"      # 변환 후 저장할 XML 파일 경로
 REPORT_PATH = "xml_fixed/bioproject_report.txt"              # 리포트 파일 경로
+MANIFEST_PATH = "xml_fixed/bioproject_manifest.json"
 BIOSAMPLE_XML = "xml_submitted/ddbj_biosample.xml"
 RUN_XML = "xml_submitted/ddbj_run.xml"
+# 조인 색인 커버리지를 리포트에 기록할 조인 (Organism 후보: sample→project, UserTerm 날짜: run→project)
+REPORT_JOINS = ('sample→project', 'run→project')
+ORGANISM_DECISIONS_FILE = "bioproject_organism_decisions.json"  # Organism 후보 결정 캐시 (.xmlmeta_cache/organism/ 아래)
+
+# Package의 KAPid(ArchiveID accession), 구조가 다르면 UNKNOWN_KAPID
+def get_package_kapid(package):
+    try:
+        return package['Project']['Project']['ProjectID']['ArchiveID'].get('@accession')
+    except Exception:
+        return 'UNKNOWN_KAPID'
+
+# Package마다 (KAPid, Package) 리스트 (Package 하나가 그룹 파일 하나)
+def group_packages_by_kapid(doc):
+    packages = doc.get('PackageSet', {}).get('Package', [])
+    if isinstance(packages, dict):
+        packages = [packages]
+    return [(get_package_kapid(package), package) for package in packages]
 
-def save_bioproject_grouped_by_kapid(doc, output_dir, xsd_path=None, report_path=None):
+def save_bioproject_grouped_by_kapid(doc, output_dir, xsd_path=None, report_path=None, jobs=1, manifest=None, metrics=NULL_METRICS, document=None, precheck=None):
     """
     BioProject XML을 KAPid(ArchiveID의 accession)별로 분리하여 각각 <PackageSet>으로 저장
     xsd_path가 주어지면 각 파일에 대해 XSD 검증도 수행
+    document(이미 저장한 doc의 전체 보정본 경로)가 주어지면 그룹 파일 대신 document를 한 번만 검증하여
+    에러를 Package별로 나누고 document의 (통과 여부, 리포트)를 반환 (emit_groups_once)
+    precheck(Package 위치 → 사전 검사 위반 목록, PRECHECK.check_document)가 주어지면 위반이 있는 그룹은 XSD 검증 대신 위반 목록을 리포트
     report_path가 주어지면 결과를 해당 파일에 기록
+    jobs > 1이면 그룹 저장/검증을 프로세스 풀로 병렬 처리 (출력/리포트 순서는 동일)
+    manifest가 주어지면 변경 없는 그룹은 다시 저장/검증하지 않고 이전 결과를 리포트에 사용 (--incremental)
+    metrics가 주어지면 그룹화/저장/검증 단계를 계측 (--metrics)
     """
     os.makedirs(output_dir, exist_ok=True)
     report_lines = []
-    packages = doc.get('PackageSet', {}).get('Package', [])
-    if isinstance(packages, dict):
-        packages = [packages]
-    for package in packages:
-        try:
-            kapid = package['Project']['Project']['ProjectID']['ArchiveID'].get('@accession')
-        except Exception:
-            kapid = 'UNKNOWN_KAPID'
-        group_doc = {'PackageSet': {'Package': package}}
-        out_path = os.path.join(output_dir, f"{kapid}.xml")
-        with open(out_path, 'w', encoding='utf-8') as f:
-            f.write(xmltodict.unparse(group_doc, pretty=True))
+    kapids = []
+    groups = []
+    with metrics.stage('group') as st:
+        # Package 하나가 그룹 하나 → 그룹 레코드 위치는 document의 i번째 Package
+        for i, (kapid, package) in enumerate(group_packages_by_kapid(doc)):
+            group_doc = {'PackageSet': {'Package': package}}
+            out_path = os.path.join(output_dir, f"{kapid}.xml")
+            kapids.append(kapid)
+            groups.append((out_path, group_doc, [i]))
+            if manifest is not None:
+                manifest.set_group_inputs(out_path, [package])
+        st.records_in = st.records_out = len(groups)
+    group_precheck = {out_path: group_violations(precheck, indices) for out_path, _, indices in groups} if precheck else None
+    document_result = None
+    if document and xsd_path:
+        results, document_result = emit_groups_once(groups, save_xml, xsd_path, document, jobs, manifest, metrics, group_precheck)
+    else:
+        results = emit_groups([group[:2] for group in groups], save_xml, xsd_path, jobs, manifest, metrics, group_precheck)
+    for kapid, (out_path, _, _), (valid, xsd_report) in zip(kapids, groups, results):
         print(f"[INFO] Saved Package for {kapid} to {out_path}")
         # XSD 검증 및 리포트 기록
         if xsd_path:
-            valid, xsd_report = validate_xsd(out_path, xsd_path)
             result_str = f"[XSD] {kapid}.xml: {'PASS' if valid else 'FAIL'}"
             print(result_str)
             if not valid:
@@ -49,6 +93,7 @@ def save_bioproject_grouped_by_kapid(doc, output_dir, xsd_path=None, report_path
     if report_path and report_lines:
         with open(report_path, 'w', encoding='utf-8') as rf:
             rf.write('\n'.join(report_lines))
+    return document_result
 
 # XML 파일을 파싱하여 dict 형태로 반환
 # xmltodict는 XML을 파이썬 dict로 변환해줌
@@ -57,11 +102,9 @@ def parse_xml(path):
         return xmltodict.parse(f.read())
 
 # dict 형태의 XML 데이터를 파일로 저장
-# pretty=True 옵션으로 보기 좋게 저장
+# 증분 작성기로 요소 단위로 바로 기록 (탭 들여쓰기, xmltodict pretty 출력과 동일)
 def save_xml(doc, path):
-    xml_str = xmltodict.unparse(doc, pretty=True)
-    with open(path, "w", encoding="utf-8") as f:
-        f.write(xml_str)
+    write_xml(doc, path)
 
 # 날짜 포맷을 YYYY-MM-DD로 보정
 # 월/일이 한 자리일 때 0을 붙여줌
@@ -72,97 +115,160 @@ def fix_date_format(date_str):
         return f"{y}-{int(mo):02d}-{int(d):02d}"
     return date_str
 
-# BioSample XML에서 bioProjectId별 taxID, OrganismName 매핑 테이블 생성 함수
-# 반환값 예시: {'KAP240632': [{'taxID': '10116', 'OrganismName': 'Rattus norvegicus'}, ...]}
-def build_biosample_project_organism_map(biosample_path):
-    project_map = {}
-    with open(biosample_path, encoding="utf-8") as f:
-        doc = xmltodict.parse(f.read())
-    samples = doc.get('SAMPLE_SET', {}).get('SAMPLE', [])
-    if not isinstance(samples, list):
-        samples = [samples]
-    for sample in samples:
-        project_id = None
-        taxid = None
-        orgname = None
-        sn = sample.get('SAMPLE_NAME', {})
-        taxid = sn.get('TAXON_ID')
-        orgname = sn.get('SCIENTIFIC_NAME')
-        attrs = sample.get('SAMPLE_ATTRIBUTES', {}).get('SAMPLE_ATTRIBUTE', [])
-        if not isinstance(attrs, list):
-            attrs = [attrs]
-        for attr in attrs:
-            tag = attr.get('TAG')
-            val = attr.get('VALUE')
-            if tag == 'bioProjectId':
-                project_id = val
-            if tag == 'NCBITaxonomyID' and not taxid:
-                taxid = val
-            if tag == 'organism' and not orgname:
-                orgname = val
-        if project_id:
-            if project_id not in project_map:
-                project_map[project_id] = []
-            # 중복 방지: taxID/OrganismName 쌍이 이미 있으면 추가하지 않음
-            candidate = {'taxID': taxid, 'OrganismName': orgname}
-            if candidate not in project_map[project_id]:
-                project_map[project_id].append(candidate)
-    return project_map
-
-# RUN XML에서 BioProject와 연결되는 KOBIC_*_date를 추출해 매핑 테이블 생성
-# 반환값 예시: {'KAP240632': {'KOBIC_submission_date': '2024-3-12', ...}}
-def build_run_project_date_map(run_path, biosample_path):
-    # BioSample에서 accession <-> sampleName/title 연결용 보조 맵 생성
-    biosample_map = {}
-    with open(biosample_path, encoding="utf-8") as f:
-        doc = xmltodict.parse(f.read())
-    samples = doc.get('SAMPLE_SET', {}).get('SAMPLE', [])
-    if not isinstance(samples, list):
-        samples = [samples]
-    for sample in samples:
-        project_id = None
-        sample_name = None
-        attrs = sample.get('SAMPLE_ATTRIBUTES', {}).get('SAMPLE_ATTRIBUTE', [])
-        if not isinstance(attrs, list):
-            attrs = [attrs]
-        for attr in attrs:
-            tag = attr.get('TAG')
-            val = attr.get('VALUE')
-            if tag == 'bioProjectId':
-                project_id = val
-            if tag == 'sampleName':
-                sample_name = val
-        if project_id and sample_name:
-            biosample_map[sample_name] = project_id
-    # RUN XML 파싱 및 project_id별 대표 날짜 추출
-    project_date_map = {}
-    with open(run_path, encoding="utf-8") as f:
-        doc = xmltodict.parse(f.read())
-    runs = doc.get('RUN_SET', {}).get('RUN', [])
-    if not isinstance(runs, list):
-        runs = [runs]
-    for run in runs:
-        # RUN의 TITLE에서 sampleName 추출(간접 연결)
-        title = run.get('TITLE', '')
-        # 예: 'Sequel II paired-end Sequencing of SCI'에서 'SCI' 추출
-        sample_name = title.split()[-1] if title else None
-        project_id = biosample_map.get(sample_name)
-        if not project_id:
-            continue
-        # RUN_ATTRIBUTE에서 날짜 추출
-        attrs = run.get('RUN_ATTRIBUTES', {}).get('RUN_ATTRIBUTE', [])
-        if not isinstance(attrs, list):
-            attrs = [attrs]
-        date_info = {}
-        for attr in attrs:
-            tag = attr.get('TAG')
-            val = attr.get('VALUE')
-            if tag in ['KOBIC_submission_date', 'KOBIC_registration_date', 'KOBIC_release_date']:
-                date_info[tag] = val
-        # 대표값: 첫 번째 RUN의 값만 사용
-        if project_id not in project_date_map and date_info:
-            project_date_map[project_id] = date_info
-    return project_date_map
+# 문자열 날짜만 보정 (속성이 붙은 값 등은 None → 원래 값 유지)
+def fix_text_date(date_str):
+    return fix_date_format(date_str) if isinstance(date_str, str) else None
+
+# ArchiveID @archive 허용값 (그 외/누락은 DDBJ)
+ARCHIVES = ['DDBJ', 'NCBI', 'EBI']
+
+def known_archive(archive):
+    return archive if archive in ARCHIVES else None
+
+# Package 필드 규칙: (대상, 원본 후보(앞에서부터 처음으로 값이 있는 것 사용), 기본값, 포맷터)
+# - ctx:archive ArchiveID의 @archive, ctx:SubmitterOrganization/ProjectSubmissionDate/ProjectReleaseDate ProjectDescr의 원래 값
+# - contact_*: Submission/Organization/Contact 블록 (KOBIC 대표 연락처)
+# 규칙은 pipeline_common.fieldspec으로 한 번에 실행되는 변환 함수로 컴파일됨 (PACKAGE_TRANSFORM)
+PACKAGE_FIELD_SPEC = (
+    ('archive', ('ctx:archive',), 'DDBJ', 'known_archive'),
+    ('organization_name', ('ctx:SubmitterOrganization',), '', None),
+    ('submitted', ('ctx:ProjectSubmissionDate',), '', 'fix_date_format'),
+    ('released', ('ctx:ProjectReleaseDate',), None, 'fix_text_date'),
+    ('contact_email', (), 'kobic_ddbj@kobic.kr', None),
+    ('contact_first', (), '', None),
+    ('contact_last', (), '', None),
+)
+PACKAGE_TRANSFORM = compile_spec('bioproject', PACKAGE_FIELD_SPEC,
+                                 formatters={'known_archive': known_archive, 'fix_date_format': fix_date_format,
+                                             'fix_text_date': fix_text_date})
+
+# Organism 후보가 여러 개인 KAP의 결정 방식
+#   default: taxID=32644/unidentified, most-frequent: 샘플 수가 가장 많은 후보(같으면 먼저 나온 후보),
+#   first: 먼저 나온 후보, prompt: 터미널에서 선택 (입력 오류/EOF면 default)
+DEFAULT_ORGANISM = {'taxID': '32644', 'OrganismName': 'unidentified'}
+ORGANISM_POLICIES = ('default', 'most-frequent', 'first', 'prompt')
+
+class OrganismResolver:
+    """
+    Organism 후보가 여러 개인 KAP의 taxID/OrganismName 결정 (대화형 입력 없이 배치 실행 가능)
+    - 우선순위: 결정 파일(decisions_path) → 캐시의 prompt 결정(후보 목록이 같을 때) → policy
+    - 모든 결정은 캐시 파일(cache_path)에 후보 목록과 함께 저장되어 다음 실행에서 재사용/검토 가능
+      (캐시 파일은 그대로 결정 파일로도 사용 가능)
+    - 캐시 기본 위치는 공용 캐시 디렉토리(.xmlmeta_cache/organism/, 커밋하는 xml_fixed/ 밖), 결정 내역은 리포트의 [ORGANISM] 라인
+    - use_cache=False면 캐시를 읽거나 저장하지 않음
+    """
+
+    def __init__(self, policy='default', decisions_path=None, cache_path=None, use_cache=True):
+        if policy not in ORGANISM_POLICIES:
+            raise ValueError(f"알 수 없는 Organism 결정 방식: {policy}")
+        self.policy = policy
+        if use_cache and cache_path is None:
+            cache_path = os.path.join(cache_dir('organism'), ORGANISM_DECISIONS_FILE)
+        self.cache_path = cache_path if use_cache else None
+        self.fixed = self._load(decisions_path) if decisions_path else {}
+        self.cache = self._load(self.cache_path) if self.cache_path else {}
+        self.decisions = {}     # KAP → 결정 내역 (이번 실행)
+
+    @staticmethod
+    def _load(path):
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return data.get('decisions', data) if isinstance(data, dict) else {}
+
+    def choose(self, accession, candidates):
+        key = [[c['taxID'], c['OrganismName']] for c in candidates]
+        counts = [c.get('count', 1) for c in candidates]
+        entry = self.fixed.get(accession)
+        if entry and entry.get('taxID') and entry.get('OrganismName'):
+            source = 'file'
+        else:
+            entry = self.cache.get(accession)
+            if entry and entry.get('source') == 'prompt' and entry.get('candidates') == key:
+                source = 'cache'
+            else:
+                entry, source = self._apply_policy(accession, candidates, counts), self.policy
+        organism = {'taxID': entry['taxID'], 'OrganismName': entry['OrganismName']}
+        self.decisions[accession] = dict(organism, source='prompt' if source == 'cache' else source,
+                                         reused=source == 'cache', candidates=key, counts=counts)
+        return organism
+
+    @property
+    def replayable(self):
+        """같은 입력이면 choose가 같은 결정을 내리는지 (캐시 없는 대화형 결정은 매번 입력을 받으므로 아님)"""
+        return self.policy != 'prompt' or bool(self.cache_path)
+
+    def decision_inputs(self, accession):
+        """accession의 결정에 쓰이는 입력 (방식, 결정 파일/캐시 항목) — 증분 실행의 Package 입력 해시용"""
+        return [self.policy, self.fixed.get(accession), self.cache.get(accession)]
+
+    def _apply_policy(self, accession, candidates, counts):
+        if self.policy == 'most-frequent':
+            return candidates[counts.index(max(counts))]
+        if self.policy == 'first':
+            return candidates[0]
+        if self.policy == 'prompt':
+            print(f"[선택 필요] ProjectID {accession}에 대해 여러 Organism 후보가 있습니다:")
+            for idx, cand in enumerate(candidates):
+                print(f"  {idx+1}: taxID={cand['taxID']}, OrganismName={cand['OrganismName']}")
+            print(f"  {len(candidates)+1}: taxID=32644, OrganismName=unidentified (기본값)")
+            try:
+                sel = int(input(f"원하는 Organism 번호를 입력하세요 (1~{len(candidates)+1}): "))
+                if 1 <= sel <= len(candidates):
+                    return candidates[sel-1]
+            except Exception:
+                print("입력 오류: 기본값 사용")
+        return DEFAULT_ORGANISM
+
+    def report_lines(self):
+        lines = []
+        for accession, d in self.decisions.items():
+            cands = ', '.join(f"{tax}/{name} ({count}건)" for (tax, name), count in zip(d['candidates'], d['counts']))
+            how = 'prompt 결정 재사용' if d['reused'] else d['source']
+            lines.append(f"[ORGANISM] {accession}: taxID={d['taxID']}, OrganismName={d['OrganismName']} ({how}; 후보: {cands})")
+        return lines
+
+    def save(self):
+        """이번 실행의 결정을 캐시에 병합하여 저장 (결정이 없으면 저장하지 않음)"""
+        if not self.cache_path or not self.decisions:
+            return
+        merged = dict(self.cache)
+        for accession, d in self.decisions.items():
+            merged[accession] = {k: d[k] for k in ('taxID', 'OrganismName', 'source', 'candidates', 'counts')}
+        os.makedirs(os.path.dirname(self.cache_path) or '.', exist_ok=True)
+        tmp = self.cache_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'version': 1, 'decisions': merged}, f, indent=2, ensure_ascii=False)
+        os.replace(tmp, self.cache_path)
+
+    def write_report(self, report_path):
+        """결정 내역을 출력하고 리포트 파일 끝에 추가한 뒤 캐시 저장"""
+        lines = self.report_lines()
+        if lines:
+            for line in lines:
+                print(line)
+            with open(report_path, 'a', encoding='utf-8') as rf:
+                if rf.tell():
+                    rf.write('\n')
+                rf.write('\n'.join(lines))
+        self.save()
+
+# 라이브러리로 호출할 때의 기본 결정기 (default 방식, 캐시 저장 없음)
+ORGANISMS = OrganismResolver(use_cache=False)
+
+# XSD에서 자식 순서를 찾지 못할 때(XSD 없음 등) 쓰는 ProjectDescr 자식 순서
+DESCR_CHILD_ORDER = {
+    'PackageSet/Package/Project/Project/ProjectDescr': [
+        'Name', 'Title', 'Description', 'ExternalLink', 'Grant', 'Publication', 'ProjectReleaseDate', 'UserTerm',
+    ],
+}
+SCHEMA_ORDER = ChildOrder(XSD_PATH, DESCR_CHILD_ORDER)
+# XSD 제약 표(enumeration/필수 속성·요소/최대 횟수)로 Package 레코드 사전 검사
+# (ProjectTypeSubmission의 sample_scope/material/capture, Organism의 taxID 등)
+PACKAGE_PATH = 'PackageSet/Package'
+PRECHECK = PreValidator(XSD_PATH)
 
 # XML 구조를 정책에 맞게 보정하는 핵심 함수
 # 각종 누락/오류 필드를 자동으로 채워주거나 수정
@@ -181,152 +287,135 @@ def build_run_project_date_map(run_path, biosample_path):
 #   6. ProjectReleaseDate 포맷 보정
 #   7. Project 하위 Submission 블록 제거
 
-def fix_structure(doc):
-    biosample_map = build_biosample_project_organism_map(BIOSAMPLE_XML)
-    run_date_map = build_run_project_date_map(RUN_XML, BIOSAMPLE_XML)
-    packages = doc.get('PackageSet', {}).get('Package', [])
-    if not isinstance(packages, list):
-        packages = [packages]
-    for package in packages:
-        try:
-            project = package['Project']['Project']
-            archive = project['ProjectID']['ArchiveID'].get('@archive')
-            if not archive or archive not in ['DDBJ', 'NCBI', 'EBI']:
-                project['ProjectID']['ArchiveID']['@archive'] = 'DDBJ'
-            grant = project['ProjectDescr']['Grant']
-            if 'Agency' not in grant:
-                grant['Agency'] = {'@abbr': 'N/A', '#text': 'N/A'}
-            # RUN XML에서 UserTerm 정보 추출 (ProjectDescr 하위에 추가)
-            accession = project['ProjectID']['ArchiveID'].get('@accession')
-            user_terms = []
-            run_dates = run_date_map.get(accession)
-            if run_dates:
-                for k, v in run_dates.items():
-                    user_terms.append({'@term': k, '#text': v})
-            # ProjectDescr 하위에 UserTerm 삽입 (ProjectReleaseDate 바로 뒤)
-            descr = project['ProjectDescr']
-            if user_terms:
-                new_descr = {}
-                inserted = False
-                for key in descr:
-                    new_descr[key] = descr[key]
-                    # ProjectReleaseDate 뒤에 UserTerm 삽입
-                    if key == 'ProjectReleaseDate' and not inserted:
-                        for ut in user_terms:
-                            if 'UserTerm' not in new_descr:
-                                new_descr['UserTerm'] = []
-                            new_descr['UserTerm'].append(ut)
-                        inserted = True
-                # ProjectReleaseDate가 없으면 Grant 뒤에 삽입
-                if not inserted and 'Grant' in descr:
-                    temp_descr = {}
-                    for key in descr:
-                        temp_descr[key] = descr[key]
-                        if key == 'Grant' and not inserted:
-                            for ut in user_terms:
-                                if 'UserTerm' not in temp_descr:
-                                    temp_descr['UserTerm'] = []
-                                temp_descr['UserTerm'].append(ut)
-                            inserted = True
-                    new_descr = temp_descr
-                # Grant도 없으면 Title 뒤에 삽입
-                if not inserted and 'Title' in descr:
-                    temp_descr = {}
-                    for key in descr:
-                        temp_descr[key] = descr[key]
-                        if key == 'Title' and not inserted:
-                            for ut in user_terms:
-                                if 'UserTerm' not in temp_descr:
-                                    temp_descr['UserTerm'] = []
-                                temp_descr['UserTerm'].append(ut)
-                            inserted = True
-                    new_descr = temp_descr
-                descr.clear()
-                descr.update(new_descr)
-            # ProjectTypeSubmission 등 나머지 구조는 기존대로 유지
-            organism_candidates = biosample_map.get(accession)
-            organism_block = None
-            if organism_candidates and len(organism_candidates) > 0:
-                unique_candidates = []
-                seen = set()
-                for cand in organism_candidates:
-                    key = (cand['taxID'], cand['OrganismName'])
-                    if key not in seen and cand['taxID'] and cand['OrganismName']:
-                        unique_candidates.append(cand)
-                        seen.add(key)
-                if len(unique_candidates) == 1:
-                    organism_block = unique_candidates[0]
-                elif len(unique_candidates) > 1:
-                    print(f"[선택 필요] ProjectID {accession}에 대해 여러 Organism 후보가 있습니다:")
-                    for idx, cand in enumerate(unique_candidates):
-                        print(f"  {idx+1}: taxID={cand['taxID']}, OrganismName={cand['OrganismName']}")
-                    print(f"  {len(unique_candidates)+1}: taxID=32644, OrganismName=unidentified (기본값)")
-                    try:
-                        sel = int(input(f"원하는 Organism 번호를 입력하세요 (1~{len(unique_candidates)+1}): "))
-                        if sel == len(unique_candidates)+1:
-                            organism_block = {'taxID': '32644', 'OrganismName': 'unidentified'}
-                        else:
-                            organism_block = unique_candidates[sel-1]
-                    except Exception:
-                        print("입력 오류: 기본값 사용")
-            if not organism_block:
-                organism_block = {'taxID': '32644', 'OrganismName': 'unidentified'}
-            project['ProjectType'] = {
-                'ProjectTypeSubmission': {
-                    'Target': {
-                        '@sample_scope': 'eOther',
-                        '@material': 'eOther',
-                        '@capture': 'eOther',
-                        'Organism': {
-                            '@taxID': organism_block['taxID'],
-                            'OrganismName': organism_block['OrganismName']
-                        }
-                    },
-                    'Method': {'@method_type': 'eOther'},
-                    'Objectives': {'Data': {'@data_type': 'eOther'}},
-                    'ProjectDataTypeSet': {'DataType': 'Other'}
-                }
-            }
-            # --- Submission/Description/Organization/Contact 구조를 실제 사례처럼 항상 생성 ---
-            org_name = descr.pop('SubmitterOrganization', None)
-            submitted_date = descr.pop('ProjectSubmissionDate', None)
-            organization_block = {
-                '@type': 'center',
-                '@role': 'owner',
-                'Name': org_name if org_name else '',
-                'Contact': {
-                    '@email': 'kobic_ddbj@kobic.kr',
-                    'Name': {
-                        'First': '',
-                        'Last': ''
+# Package 하나를 정책에 맞게 보정 (fix_structure 및 --stream 모드에서 사용, 제자리 수정)
+# 보정 중 예외가 발생하면 해당 패키지는 그 시점까지의 상태로 둔다
+def fix_package(package, biosample_map, run_date_map, organisms=None):
+    organisms = organisms or ORGANISMS
+    try:
+        project = package['Project']['Project']
+        descr_in = project.get('ProjectDescr')
+        descr_in = descr_in if isinstance(descr_in, dict) else {}
+        fields, _ = PACKAGE_TRANSFORM.transform(None, {
+            'archive': project['ProjectID']['ArchiveID'].get('@archive'),
+            'SubmitterOrganization': descr_in.get('SubmitterOrganization'),
+            'ProjectSubmissionDate': descr_in.get('ProjectSubmissionDate'),
+            'ProjectReleaseDate': descr_in.get('ProjectReleaseDate'),
+        })
+        project['ProjectID']['ArchiveID']['@archive'] = fields['archive']
+        grant = project['ProjectDescr']['Grant']
+        if 'Agency' not in grant:
+            grant['Agency'] = {'@abbr': 'N/A', '#text': 'N/A'}
+        # RUN XML에서 UserTerm 정보 추출 (ProjectDescr 하위에 추가)
+        accession = project['ProjectID']['ArchiveID'].get('@accession')
+        user_terms = []
+        run_dates = run_date_map.get(accession)
+        if run_dates:
+            for k, v in run_dates.items():
+                user_terms.append({'@term': k, '#text': v})
+        # ProjectDescr 하위에 UserTerm 추가 후 XSD의 ProjectDescr 자식 순서로 재배치 (기본: ProjectReleaseDate 바로 뒤)
+        descr = project['ProjectDescr']
+        if user_terms:
+            existing = descr.get('UserTerm', [])
+            if not isinstance(existing, list):
+                existing = [existing]
+            descr['UserTerm'] = existing + user_terms
+        SCHEMA_ORDER.reorder(descr, 'PackageSet/Package/Project/Project/ProjectDescr')
+        # ProjectTypeSubmission 등 나머지 구조는 기존대로 유지
+        organism_candidates = biosample_map.get(accession)
+        organism_block = None
+        if organism_candidates and len(organism_candidates) > 0:
+            unique_candidates = []
+            seen = set()
+            for cand in organism_candidates:
+                key = (cand['taxID'], cand['OrganismName'])
+                if key not in seen and cand['taxID'] and cand['OrganismName']:
+                    unique_candidates.append(cand)
+                    seen.add(key)
+            if len(unique_candidates) == 1:
+                organism_block = unique_candidates[0]
+            elif len(unique_candidates) > 1:
+                organism_block = organisms.choose(accession, unique_candidates)
+        if not organism_block:
+            organism_block = DEFAULT_ORGANISM
+        project['ProjectType'] = {
+            'ProjectTypeSubmission': {
+                'Target': {
+                    '@sample_scope': 'eOther',
+                    '@material': 'eOther',
+                    '@capture': 'eOther',
+                    'Organism': {
+                        '@taxID': organism_block['taxID'],
+                        'OrganismName': organism_block['OrganismName']
                     }
+                },
+                'Method': {'@method_type': 'eOther'},
+                'Objectives': {'Data': {'@data_type': 'eOther'}},
+                'ProjectDataTypeSet': {'DataType': 'Other'}
+            }
+        }
+        # --- Submission/Description/Organization/Contact 구조를 실제 사례처럼 항상 생성 ---
+        descr.pop('SubmitterOrganization', None)
+        descr.pop('ProjectSubmissionDate', None)
+        organization_block = {
+            '@type': 'center',
+            '@role': 'owner',
+            'Name': fields['organization_name'],
+            'Contact': {
+                '@email': fields['contact_email'],
+                'Name': {
+                    'First': fields['contact_first'],
+                    'Last': fields['contact_last']
                 }
             }
-            submission_block = {
-                'Submission': {
-                    '@submitted': fix_date_format(submitted_date) if submitted_date else '',
-                    'Description': {
-                        'Organization': organization_block,
-                        'Access': 'public'
-                    }
+        }
+        submission_block = {
+            'Submission': {
+                '@submitted': fields['submitted'],
+                'Description': {
+                    'Organization': organization_block,
+                    'Access': 'public'
                 }
             }
-            # Project 내부가 아니라 Package 하위에 Submission 추가 (중첩 구조)
-            package['Submission'] = {'Submission': submission_block['Submission']}
-            if 'ProjectReleaseDate' in descr:
-                descr['ProjectReleaseDate'] = fix_date_format(descr['ProjectReleaseDate'])
-        except Exception as e:
-            continue
-    return doc
+        }
+        # Project 내부가 아니라 Package 하위에 Submission 추가 (중첩 구조)
+        package['Submission'] = {'Submission': submission_block['Submission']}
+        if fields['released']:
+            descr['ProjectReleaseDate'] = fields['released']
+    except Exception as e:
+        pass
+    return package
+
+# joins: 교차 문서 조인 색인 (pipeline_common.joins.JoinIndex)
+def fix_structure(doc, joins, organisms=None):
+    return fix_packages(doc, joins.project_organisms(), joins.project_run_dates(), organisms)
+
+# 매핑 테이블(JoinIndex.project_organisms/project_run_dates 결과)로 모든 Package 보정
+# biosample_map 예시: {'KAP240632': [{'taxID': '10116', 'OrganismName': 'Rattus norvegicus', 'count': 3}, ...]}
+# run_date_map 예시: {'KAP240632': {'KOBIC_submission_date': '2024-3-12', ...}}
+# manifest(--incremental)가 주어지면 입력 해시(Package + KAP의 Organism 후보/RUN 날짜/결정 입력)가 같은 Package는
+# 보정하지 않고 이전 보정 결과 사용 (Organism 결정은 다시 호출하여 [ORGANISM] 리포트 유지)
+def fix_packages(doc, biosample_map, run_date_map, organisms=None, manifest=None):
+    packages = doc.get('PackageSet', {}).get('Package', [])
+    if not isinstance(packages, list):
+        packages = [packages]
+    organisms = organisms or ORGANISMS
+    if manifest is not None and packages and organisms.replayable:
+        recorder = CallRecorder(organisms, 'choose')
+
+        def fix(package):
+            fix_package(package, biosample_map, run_date_map, recorder)
+            return package
 
-# xmllint를 이용해 XSD 스키마 검증 수행
-# 유효성 통과 여부와 에러 메시지 반환
-def validate_xsd(xml_path, xsd_path):
-    result = subprocess.run(
-        ["xmllint", "--schema", xsd_path, "--noout", xml_path],
-        capture_output=True, text=True
-    )
-    return result.returncode == 0, result.stderr
+        def aux(package):
+            accession = get_package_kapid(package)
+            return [biosample_map.get(accession), run_date_map.get(accession), organisms.decision_inputs(accession)]
+
+        fixed = manifest.fix_records(packages, fix, aux, recorder)
+        doc['PackageSet']['Package'] = fixed if isinstance(doc['PackageSet']['Package'], list) else fixed[0]
+        return doc
+    for package in packages:
+        fix_package(package, biosample_map, run_date_map, organisms)
+    return doc
 
 # 변환된 XML과 예시 XML을 비교하여 diff 리포트 생성
 def diff_with_example(fixed_xml, example_xml):
@@ -338,30 +427,146 @@ def diff_with_example(fixed_xml, example_xml):
         return "".join(diff)
 
 # 전체 파이프라인 실행 함수
-# 1. 요구사항 로드
-# 2. 입력 XML 파싱
-# 3. 구조 보정
-# 4. 보정된 XML 저장
-# 5. XSD 검증
-# 6. 예시 XML과 diff 비교
-# 7. 리포트 파일 작성
-# 8. 완료 메시지 출력
-def main():
+# 1. 입력 코퍼스(Corpus)에서 BioProject/BioSample/RUN 파싱 결과 사용 (파일별 1회 파싱)
+# 2. 구조 보정
+# 3. 보정된 XML 저장
+# 4. KAPid별 분리 저장 + 전체 XML을 한 번만 XSD 검증하여 KAPid별 리포트 작성
+# 5. 예시 XML과 diff 비교
+# 6. 완료 메시지 출력
+def run_pipeline(corpus, jobs=1, incremental=False, metrics=NULL_METRICS, organisms=None):
     print("=== BioProject Pipeline Start ===")
+    # Organism 후보 결정기 (기본: default 방식 + .xmlmeta_cache/organism/ 결정 캐시)
+    organisms = organisms or OrganismResolver()
     os.makedirs("xml_fixed", exist_ok=True)
-    doc = parse_xml(INPUT_XML)          # 입력 XML 파싱
-    doc_fixed = fix_structure(doc)      # 구조 보정
-    save_xml(doc_fixed, OUTPUT_XML)     # 보정된 XML 저장
+    # --incremental: 입력이 그대로인 Package는 보정하지 않고, 그대로인 그룹은 저장/검증하지 않음
+    manifest = load_manifest(MANIFEST_PATH, os.path.abspath(__file__), XSD_PATH) if incremental else None
+    with metrics.stage('parse') as st:
+        doc = corpus.copy('bioproject')     # 입력 XML (fix_structure가 제자리 수정하므로 복사본 사용)
+        records = st.records_out = count_records(doc, 'PackageSet', 'Package')
+    with metrics.stage('aux_maps') as st:
+        # 교차 문서 조인 색인 (biosample/experiment/run/run_file_path, 코퍼스당 한 번 생성)
+        joins = corpus.join_index()
+        biosample_map = joins.project_organisms()
+        run_date_map = joins.project_run_dates()
+        st.records_out = len(biosample_map) + len(run_date_map)
+    with metrics.stage('fix_structure', records, records):
+        doc_fixed = fix_packages(doc, biosample_map, run_date_map, organisms, manifest)  # 구조 보정 (--incremental: 바뀐 Package만)
+    with metrics.stage('precheck', records, records):
+        precheck = PRECHECK.check_document(doc_fixed, 'PackageSet', 'Package', metrics)  # XSD 제약 사전 검사
+    with metrics.stage('serialize', records, records):
+        save_xml(doc_fixed, OUTPUT_XML)     # 보정된 XML 저장
+    metrics.add_file(OUTPUT_XML)
     # KAPid별로 분리 저장 + XSD 검증 + 리포트 저장
-    save_bioproject_grouped_by_kapid(doc_fixed, "xml_fixed/ddbj_bioproject_fixed", XSD_PATH, REPORT_PATH)
-    valid, xsd_report = validate_xsd(OUTPUT_XML, XSD_PATH)  # XSD 검증
-    diff_report = diff_with_example(OUTPUT_XML, EXAMPLE_XML) # 예시와 diff 비교
+    # 전체 보정본을 한 번만 검증하고 결과를 KAPid별 리포트로 나눔
+    valid, xsd_report = save_bioproject_grouped_by_kapid(doc_fixed, "xml_fixed/ddbj_bioproject_fixed", XSD_PATH, REPORT_PATH, jobs, manifest, metrics, OUTPUT_XML, precheck)
+    organisms.write_report(REPORT_PATH)
+    joins.write_report(REPORT_PATH, REPORT_JOINS)
+    if manifest is not None:
+        manifest.save()
+        print(manifest.summary('bioproject'))
     print("# XSD Validation: {}\n".format("PASS" if valid else "FAIL"))
     print(xsd_report)
-    print("\n# Diff with Example\n")
-    print(diff_report)
+    if os.path.exists(EXAMPLE_XML):
+        diff_report = diff_with_example(OUTPUT_XML, EXAMPLE_XML) # 예시와 diff 비교
+        print("\n# Diff with Example\n")
+        print(diff_report)
+    else:
+        print(f"[INFO] 예시 XML 없음, diff 생략: {EXAMPLE_XML}")
     print("Pipeline complete. See fixed XML:", OUTPUT_XML)
 
+def run_pipeline_stream(jobs=1, incremental=False, metrics=NULL_METRICS, organisms=None):
+    """
+    --stream 모드: biosample/experiment/run/run_file_path 입력은 레코드 단위로 읽어 조인 색인만 유지하고,
+    ddbj_bioproject.xml의 Package를 하나씩 보정하여 전체 보정본과 KAPid별 파일에 바로 기록
+    - KAPid 그룹은 Package 1개씩이므로 스풀 없이 바로 저장/검증 (jobs > 1이면 그룹 문자열을 모아 병렬 처리)
+    - 전체 보정본의 XSD 검증은 그룹 파일 검증으로 대체
+    """
+    print("=== BioProject Pipeline Start (stream) ===")
+    organisms = organisms or OrganismResolver()
+    output_dir = "xml_fixed/ddbj_bioproject_fixed"
+    os.makedirs(output_dir, exist_ok=True)
+    with metrics.stage('aux_maps') as st:
+        joins = stream_join_index(dict(INPUT_PATHS, bioproject=INPUT_XML, biosample=BIOSAMPLE_XML, run=RUN_XML))
+        biosample_map = joins.project_organisms()
+        run_date_map = joins.project_run_dates()
+        st.records_out = len(biosample_map) + len(run_date_map)
+    kapids = []
+    precheck = {}
+    root_attrs = {}
+    records = metrics.timed_iter('parse', iter_records(INPUT_XML, 'Package', root_attrs))
+    writer = None
+
+    def iter_groups():
+        nonlocal writer
+        # 첫 레코드를 읽어야 루트 속성이 채워지므로 writer는 첫 레코드 이후 생성
+        for package in records:
+            with metrics.stage('fix_structure', 1, 1):
+                fix_package(package, biosample_map, run_date_map, organisms)
+            with metrics.stage('precheck', 1, 1):
+                violations = PRECHECK.check(package, PACKAGE_PATH)
+            with metrics.stage('serialize', 1, 1):
+                fragment = render_record('Package', package)
+                if writer is None:
+                    writer = StreamDocumentWriter(OUTPUT_XML, 'PackageSet', root_attrs)
+                writer.write(fragment)
+            with metrics.stage('group', 1, 1):
+                kapid = get_package_kapid(package)
+                kapids.append(kapid)
+                group_xml = wrap_document('PackageSet', fragment)
+            out_path = os.path.join(output_dir, f"{kapid}.xml")
+            # emit_groups는 그룹을 꺼낸 뒤 조회하므로 yield 전에 채움 (같은 KAPid가 다시 나와도 이전 레코드의 위반 유지)
+            precheck.setdefault(out_path, []).extend(violations)
+            yield out_path, group_xml
+
+    manifest = load_manifest(MANIFEST_PATH, os.path.abspath(__file__), XSD_PATH) if incremental else None
+    results = emit_groups(iter_groups(), write_text, XSD_PATH, jobs, manifest, metrics, precheck)
+    if writer is None:
+        writer = StreamDocumentWriter(OUTPUT_XML, 'PackageSet', root_attrs)
+    writer.close()
+    metrics.add_file(OUTPUT_XML)
+    print(f"[INFO] Streamed {writer.count} Packages to {OUTPUT_XML}")
+    print_precheck_summary('Package', sum(1 for violations in precheck.values() if violations), writer.count, metrics)
+    # KAPid별 리포트
+    report_lines = []
+    for kapid, (valid, xsd_report) in zip(kapids, results):
+        print(f"[INFO] Saved Package for {kapid} to {os.path.join(output_dir, f'{kapid}.xml')}")
+        result_str = f"[XSD] {kapid}.xml: {'PASS' if valid else 'FAIL'}"
+        print(result_str)
+        if not valid:
+            print(xsd_report)
+        report_lines.append(result_str)
+        if not valid:
+            report_lines.append(xsd_report)
+    if report_lines:
+        with open(REPORT_PATH, 'w', encoding='utf-8') as rf:
+            rf.write('\n'.join(report_lines))
+    organisms.write_report(REPORT_PATH)
+    joins.write_report(REPORT_PATH, REPORT_JOINS)
+    if manifest is not None:
+        manifest.save()
+        print(manifest.summary('bioproject'))
+    print("Pipeline complete. See fixed XML:", OUTPUT_XML)
+
+def main():
+    parser = argparse.ArgumentParser(description="DDBJ BioProject XML 변환/검증")
+    parser.add_argument('--jobs', type=int, default=1, help='그룹별 저장/검증 병렬 프로세스 수 (0: CPU 코어 수)')
+    parser.add_argument('--incremental', action='store_true', help='내용이 바뀐 그룹만 다시 저장/검증 (매니페스트: xml_fixed/bioproject_manifest.json)')
+    parser.add_argument('--stream', action='store_true', help='Package 단위 스트리밍 처리 (대용량 입력, 메모리 사용량 고정)')
+    parser.add_argument('--metrics', action='store_true', help='단계별 계측 결과 저장 (xml_fixed/bioproject_metrics.json, .prom)')
+    parser.add_argument('--organism-policy', choices=ORGANISM_POLICIES, default='default',
+                        help='Organism 후보가 여러 개인 KAP의 결정 방식 (기본: default=32644/unidentified, prompt만 대화형)')
+    parser.add_argument('--organism-decisions', metavar='JSON',
+                        help='KAP별 결정 파일 {"KAP...": {"taxID": ..., "OrganismName": ...}} (결정 방식보다 우선)')
+    args = parser.parse_args()
+    jobs = args.jobs or default_jobs()
+    metrics = create_metrics('bioproject', args.metrics or None)
+    organisms = OrganismResolver(args.organism_policy, args.organism_decisions)
+    if args.stream:
+        run_pipeline_stream(jobs, args.incremental, metrics, organisms)
+    else:
+        run_pipeline(Corpus({'bioproject': INPUT_XML, 'biosample': BIOSAMPLE_XML, 'run': RUN_XML}), jobs, args.incremental, metrics, organisms)
+    metrics.save()
+
 # 메인 함수 실행 (직접 실행 시)
 if __name__ == "__main__":
     main()
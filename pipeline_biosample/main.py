@@ -1,16 +1,31 @@
 import xmltodict
-from lxml import etree
 import difflib
-import subprocess
 import os
 import re
-from collections import OrderedDict
+import sys
+import argparse
+
+# 공용 모듈(pipeline_common) import를 위해 저장소 루트를 경로에 추가
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pipeline_common.xmlwriter import write_xml
+from pipeline_common.manifest import load_manifest, group_digest
+from pipeline_common.emit import emit_groups, emit_groups_once, default_jobs
+from pipeline_common.corpus import Corpus, count_records
+from pipeline_common.joins import stream_join_index
+from pipeline_common.metrics import create_metrics, NULL_METRICS
+from pipeline_common.trace import create_trace, parse_level, NULL_TRACE
+from pipeline_common.fieldspec import compile_spec, spec_aliases
+from pipeline_common.schema_order import ChildOrder
+from pipeline_common.prevalidate import PreValidator, group_violations, print_precheck_summary
+from pipeline_common.streaming import iter_records, render_record, StreamDocumentWriter, GroupSpool, emit_spool
 
 XSD_PATH = "pub/docs/biosample/xsd/biosample_set.xsd"
 INPUT_XML = "xml_submitted/ddbj_biosample.xml"
 EXAMPLE_XML = "real_examples/SAMD00844971-2.xml"
 OUTPUT_XML = "xml_fixed/ddbj_biosample.fixed.xml"
 REPORT_PATH = "xml_fixed/biosample_report.txt"
+MANIFEST_PATH = "xml_fixed/biosample_manifest.json"
+BIOPROJECT_XML = "xml_submitted/ddbj_bioproject.xml"
 
 # Attribute 이름 매핑 (camelCase → snake_case)
 ATTRIBUTE_NAME_MAP = {
@@ -35,11 +50,52 @@ ATTRIBUTE_NAME_MAP = {
     "lab_host": "lab_host",
     # ... 필요시 추가 ...
 }
-# 정답 예시 기준 필수 속성 리스트
-REQUIRED_ATTRIBUTES = [
-    "sample_name", "bioproject_id", "collection_date", "geo_loc_name", "host", "isolate", "isolation_source",
-    "kobic_project_id", "kobic_registration_date", "kobic_release_date", "kobic_sample_group_id", "kobic_sample_id", "kobic_submission_date", "lab_host"
-]
+# SAMPLE 필드 규칙: (대상, 원본 후보(앞에서부터 처음으로 값이 있는 것 사용), 기본값, 포맷터)
+# - attr:<별칭> SAMPLE_ATTRIBUTE TAG의 원본/소문자/ATTRIBUTE_NAME_MAP snake/camel 이름 중 하나와 일치하는 TAG 값
+# - field:<대상> 앞에서 결정된 필드 값
+# 규칙은 pipeline_common.fieldspec으로 한 번에 실행되는 변환 함수로 컴파일됨 (SAMPLE_TRANSFORM)
+SAMPLE_FIELD_SPEC = (
+    ('organism_name', ('attr:scientific_name', 'attr:SCIENTIFIC_NAME', 'attr:organism_name', 'attr:organism'), 'unknown', None),
+    ('taxonomy_id', ('attr:taxon_id', 'attr:TAXON_ID', 'attr:ncbi_taxonomy_id', 'attr:ncbitaxonomyid'), 'unknown', None),
+    ('bio_sample_id', ('attr:kobic_sample_id', 'attr:bioSampleId', 'attr:bio_sample_id', 'attr:biosampleid', 'attr:kobicSampleId'), None, None),
+    ('sample_name_attr', ('attr:sample_name', 'attr:sampleName', 'attr:samplename'), None, None),
+    ('sample_name', ('field:sample_name_attr', 'field:bio_sample_id'), 'unknown', None),
+    ('isolate', ('attr:isolate', 'attr:isolation_source'), 'unknown', None),
+    ('kobic_project_id', ('attr:bioproject_id', 'attr:bioProjectId', 'attr:bioprojectid'), 'unknown', None),
+    ('kobic_registration_date', ('attr:registration_date', 'attr:submission_date', 'attr:release_date',
+                                 'attr:kobic_registration_date', 'attr:kobic_submission_date', 'attr:kobic_release_date'), 'unknown', None),
+    ('kobic_submission_date', ('attr:submission_date', 'attr:registration_date', 'attr:release_date',
+                               'attr:kobic_submission_date', 'attr:kobic_registration_date', 'attr:kobic_release_date'), 'unknown', None),
+    ('lab_host', ('attr:lab_host', 'attr:host', 'attr:organism', 'attr:organism_name', 'attr:scientific_name'), 'unknown', None),
+)
+# Owner/Contact 규칙: ctx는 SAMPLE이 가리키는 KAP의 BioProject 소유자 정보 (JoinIndex.project_owners 항목, 없으면 빈 dict)
+# - SAMPLE 자체 소유자 값 → BioProject 소유자 → unknown, 연락처 email은 BioProject 값 (없거나 'None'이면 KOBIC 기본 주소)
+# kobic_project_id가 SAMPLE_TRANSFORM에서 정해져야 ctx를 고를 수 있으므로 따로 컴파일 (SAMPLE_OWNER_TRANSFORM)
+SAMPLE_OWNER_SPEC = (
+    ('owner_name', ('attr:owner', 'attr:submitter', 'attr:organization', 'attr:center_name', 'ctx:owner_name'), 'unknown', None),
+    ('contact_email', ('ctx:contact_email',), 'kobic_ddbj@kobic.kr', 'known_email'),
+    ('contact_first', (), 'KOBIC', None),
+    ('contact_last', (), 'KOBIC', None),
+)
+# 정답 예시 기준 필수 속성: <Attributes>에 이 순서대로 생성 (이름, 원본 후보, 기본값, 포맷터)
+SAMPLE_ATTRIBUTE_SPEC = (
+    ('sample_name', ('field:sample_name',), 'unknown', None),
+    ('bioproject_id', ('attr:bioproject_id',), 'unknown', 'str'),
+    ('collection_date', ('attr:collection_date',), 'unknown', 'str'),
+    ('geo_loc_name', ('attr:geo_loc_name',), 'unknown', 'str'),
+    ('host', ('attr:host',), 'unknown', 'str'),
+    ('isolate', ('field:isolate',), 'unknown', None),
+    ('isolation_source', ('field:isolate',), 'unknown', None),
+    ('kobic_project_id', ('field:kobic_project_id',), 'unknown', None),
+    ('kobic_registration_date', ('field:kobic_registration_date',), 'unknown', None),
+    ('kobic_release_date', ('attr:kobic_release_date',), 'unknown', 'str'),
+    ('kobic_sample_group_id', ('attr:kobic_sample_group_id',), 'unknown', 'str'),
+    ('kobic_sample_id', ('attr:kobic_sample_id',), 'unknown', 'str'),
+    ('kobic_submission_date', ('field:kobic_submission_date',), 'unknown', None),
+    ('lab_host', ('field:lab_host',), 'unknown', None),
+)
+REQUIRED_ATTRIBUTES = [name for name, _, _, _ in SAMPLE_ATTRIBUTE_SPEC]
+
 
 
 def parse_xml(path):
@@ -47,60 +103,187 @@ def parse_xml(path):
         return xmltodict.parse(f.read())
 
 def save_xml(doc, path):
-    xml_str = xmltodict.unparse(doc, pretty=True)
-    with open(path, "w", encoding="utf-8") as f:
-        f.write(xml_str)
+    write_xml(doc, path)
 
-def parse_bioproject_owners(bioproject_xml_path):
-    doc = parse_xml(bioproject_xml_path)
-    bioprojects = {}
-    packages = doc['PackageSet']['Package']
-    if isinstance(packages, dict):
-        packages = [packages]
-    for pkg in packages:
-        try:
-            proj = pkg['Project']['Project']
-            proj_id = proj['ProjectID']['ArchiveID']['@accession']
-            org = proj['ProjectDescr'].get('SubmitterOrganization', 'unknown')
-            bioprojects[proj_id] = {
-                'owner_name': org,
-                'contact_email': None
-            }
-        except Exception as e:
-            continue
-    return bioprojects
+def tag_aliases(tag):
+    """TAG 하나가 가리키는 별칭 (원본, 소문자, ATTRIBUTE_NAME_MAP snake, snake의 camelCase)"""
+    tag_snake = ATTRIBUTE_NAME_MAP.get(tag, tag)
+    tag_camel = re.sub(r'_([a-z])', lambda m: m.group(1).upper(), tag_snake)
+    return (tag, tag.lower(), tag_snake, tag_camel)
 
-def parse_bioexperiment_isolate_map(bioexp_xml_path):
-    doc = parse_xml(bioexp_xml_path)
-    result = {}
-    experiments = doc['EXPERIMENT_SET']['EXPERIMENT']
-    if isinstance(experiments, dict):
-        experiments = [experiments]
-    for exp in experiments:
-        sample_id = exp['DESIGN']['SAMPLE_DESCRIPTOR']['@accession']
-        attrs = exp.get('EXPERIMENT_ATTRIBUTES', {}).get('EXPERIMENT_ATTRIBUTE', [])
-        if isinstance(attrs, dict):
-            attrs = [attrs]
-        isolate = ''
-        isolation_source = ''
+class AliasResolver:
+    """
+    필드 규칙이 참조하는 별칭을 슬롯 번호로 컴파일하여
+    SAMPLE_ATTRIBUTE TAG → 슬롯 목록으로 바로 값을 배치 (샘플마다 정규식/별칭 dict 생성 없음)
+    - TAG별 슬롯 목록은 처음 본 TAG에서 한 번만 계산하여 캐시
+    - 같은 별칭에 여러 TAG가 걸리면 SAMPLE_ATTRIBUTE 순서상 나중 TAG 값이 우선
+    """
+
+    def __init__(self, aliases):
+        self.aliases = list(aliases)    # 슬롯 번호 → 별칭
+        slot_of = self.slot_of = {name: slot for slot, name in enumerate(self.aliases)}
+        self._tag_slots = {}
+        # 별칭과 ATTRIBUTE_NAME_MAP에 있는 TAG는 미리 컴파일
+        for tag in list(slot_of) + list(ATTRIBUTE_NAME_MAP):
+            self.tag_slots(tag)
+
+    def tag_slots(self, tag):
+        slots = self._tag_slots.get(tag)
+        if slots is None:
+            slot_of = self.slot_of
+            slots = self._tag_slots[tag] = tuple(sorted({slot_of[a] for a in tag_aliases(tag) if a in slot_of}))
+        return slots
+
+    def collect(self, attrs):
+        """SAMPLE_ATTRIBUTE 리스트 → 슬롯별 값 리스트"""
+        values = [None] * len(self.aliases)
+        tag_slots = self._tag_slots
         for attr in attrs:
-            tag = attr.get('TAG', '').lower()
-            if tag == 'isolate':
-                isolate = attr.get('VALUE', '')
-            elif tag == 'isolation_source':
-                isolation_source = attr.get('VALUE', '')
-        result[sample_id] = {
-            'isolate': isolate,
-            'isolation_source': isolation_source
+            tag = attr.get('TAG')
+            if tag:
+                value = attr.get('VALUE')
+                slots = tag_slots.get(tag)
+                if slots is None:
+                    slots = self.tag_slots(tag)
+                for slot in slots:
+                    values[slot] = value
+        return values
+
+    def value(self, values, alias):
+        return values[self.slot_of[alias]]
+
+def known_email(email):
+    return email if email != 'None' else None
+
+ALIASES = AliasResolver(spec_aliases(SAMPLE_FIELD_SPEC, SAMPLE_ATTRIBUTE_SPEC, SAMPLE_OWNER_SPEC))
+SAMPLE_TRANSFORM = compile_spec('biosample', SAMPLE_FIELD_SPEC, SAMPLE_ATTRIBUTE_SPEC, ALIASES.slot_of, {'str': str})
+SAMPLE_OWNER_TRANSFORM = compile_spec('biosample_owner', SAMPLE_OWNER_SPEC, (), ALIASES.slot_of, {'known_email': known_email})
+
+SAMPLE_PATH = 'BioSampleSet/BioSample'
+# XSD에서 자식 순서를 찾지 못할 때(XSD 없음 등) 쓰는 BioSample 자식 순서
+SAMPLE_CHILD_ORDER = {
+    SAMPLE_PATH: ['Ids', 'Description', 'Owner', 'Providers', 'Models', 'Attributes'],
+}
+SCHEMA_ORDER = ChildOrder(XSD_PATH, SAMPLE_CHILD_ORDER)
+# XSD 제약 표(enumeration/필수 속성·요소/최대 횟수)로 BioSample 레코드 사전 검사
+PRECHECK = PreValidator(XSD_PATH)
+
+def fix_sample(sample, bioprojects=None, trace=NULL_TRACE):
+    """
+    SAMPLE 레코드 하나를 BioSample 구조로 변환 (fix_structure 및 --stream 모드에서 사용)
+    trace가 이 레코드를 선택하면 원본 속성, 결정된 값, 사용된 fallback 키를 트레이스 파일에 기록 (--trace)
+    """
+    original = sample
+    sample = dict(sample)
+    # 트레이스 대상 레코드만 fallback 키 기록
+    winners = {} if trace.sample() else None
+    # SAMPLE_ATTRIBUTES에서 값 추출을 pop/변환 이전에 먼저 실행
+    # SAMPLE_ATTRIBUTES가 없는 샘플에서 이전 샘플의 attrs가 쓰이지 않도록 초기화
+    attrs = []
+    if 'SAMPLE_ATTRIBUTES' in sample and 'SAMPLE_ATTRIBUTE' in sample['SAMPLE_ATTRIBUTES']:
+        attrs = sample['SAMPLE_ATTRIBUTES']['SAMPLE_ATTRIBUTE']
+        if not isinstance(attrs, list):
+            attrs = [attrs]
+    values = ALIASES.collect(attrs)
+    attrs_in = attrs
+    # Models 생성 (SAMPLE_ATTRIBUTES 삭제 이전에 taxonomicType 추출)
+    model_val = None
+    for attr in attrs:
+        if attr.get('TAG') == 'taxonomicType':
+            model_val = attr.get('VALUE')
+            break
+    if model_val:
+        sample['Models'] = {'Model': model_val}
+    else:
+        sample['Models'] = {'Model': 'unknown'}
+    # SAMPLE_ATTRIBUTES 등 원본 구조 제거
+    sample.pop('SAMPLE_ATTRIBUTES', None)
+    sample.pop('SAMPLE_NAME', None)
+    # 필드 규칙(SAMPLE_FIELD_SPEC/SAMPLE_ATTRIBUTE_SPEC)으로 주요 값과 필수 Attribute 목록을 한 번에 결정
+    if winners is None:
+        fields, attrs_out = SAMPLE_TRANSFORM.transform(values, None)
+    else:
+        fields, attrs_out = SAMPLE_TRANSFORM.transform_traced(values, None, winners)
+    organism_name = fields['organism_name']
+    taxonomy_id = fields['taxonomy_id']
+    bio_sample_id = fields['bio_sample_id']
+    sample_name_val = fields['sample_name_attr']
+    sample_name = fields['sample_name']
+    if sample_name_val:
+        title = f"{sample_name_val} ({bio_sample_id})" if bio_sample_id else sample_name_val
+    else:
+        title = sample_name
+    # Description robust 생성 (sample_name, title 등)
+    organism_struct = {'OrganismName': organism_name}
+    if taxonomy_id and taxonomy_id != 'unknown':
+        organism_struct['@taxonomy_id'] = taxonomy_id
+    sample['Description'] = {
+        'SampleName': sample_name,
+        'Title': title or 'unknown',
+        'Organism': organism_struct
+    }
+    kobic_project_id_val = fields['kobic_project_id']
+    if attrs_out:
+        sample['Attributes'] = {'Attribute': attrs_out}
+    # 속성 보정
+    sample = {k: v for k, v in sample.items() if k not in ['@accession', '@alias', '@center_name']}
+    sample['@access'] = 'public'
+    # <IDENTIFIERS> → <Ids> 변환
+    if 'IDENTIFIERS' in sample:
+        sample['Ids'] = sample.pop('IDENTIFIERS')
+    # <PRIMARY_ID> → <Id> 변환, label 제거, namespace 추가, value가 dict면 #text만 추출
+    if 'Ids' in sample and 'PRIMARY_ID' in sample['Ids']:
+        value = sample['Ids'].pop('PRIMARY_ID')
+        if isinstance(value, dict):
+            value = value.get('#text', '')
+        sample['Ids']['Id'] = {'@namespace': 'BioSample', '#text': str(value)}
+    # <Models>가 리스트가 아니면 리스트로 변환
+    if 'Models' in sample and 'Model' in sample['Models']:
+        if isinstance(sample['Models']['Model'], dict):
+            sample['Models']['Model'] = [sample['Models']['Model']]
+        elif isinstance(sample['Models']['Model'], str):
+            sample['Models']['Model'] = [sample['Models']['Model']]
+    # Owner/Contact: SAMPLE_OWNER_SPEC 규칙 (ctx: kobic_project_id의 BioProject 소유자 정보)
+    project_owner = (bioprojects or {}).get(kobic_project_id_val) or {}
+    if winners is None:
+        owner, _ = SAMPLE_OWNER_TRANSFORM.transform(values, project_owner)
+    else:
+        owner, _ = SAMPLE_OWNER_TRANSFORM.transform_traced(values, project_owner, winners)
+    owner_name = owner['owner_name']
+    sample['Owner'] = {
+        'Name': owner_name,
+        'Contacts': {
+            'Contact': {
+                '@email': owner['contact_email'],
+                'Name': {
+                    'First': owner['contact_first'],
+                    'Last': owner['contact_last']
+                }
+            }
         }
-    return result
+    }
+    # 순서 보정: XSD의 BioSample 자식 순서 (XSD에서 찾지 못하면 SAMPLE_CHILD_ORDER), 나머지는 뒤에
+    SCHEMA_ORDER.reorder(sample, SAMPLE_PATH)
+    if winners is not None:
+        trace.event(
+            'sample',
+            accession=original.get('@accession'),
+            attributes=attrs_in,
+            resolved=lambda: {attr['@attribute_name']: attr['#text'] for attr in attrs_out},
+            organism={'name': organism_name, 'taxonomy_id': taxonomy_id},
+            owner=owner_name,
+            fallback=winners,
+        )
+    return sample
 
-def fix_structure(doc, bioprojects=None, bioexp_isolate_map=None):
+def fix_structure(doc, bioprojects=None, trace=NULL_TRACE, manifest=None):
     """
     [2024-06-XX] BioSample XSD PASS 구조
     - 본 함수는 real_examples/SAMD00844971-2.xml 및 pub/docs/biosample/xsd/biosample.xsd 기준으로 설계됨
     - 반복/위치/태그명/속성 등 모든 요소가 XSD와 일치하도록 보정
     - 정책 변경 시 반드시 requirements.txt와 동기화할 것
+    - manifest(--incremental)가 주어지면 입력 해시(SAMPLE + KAP별 owner 색인)가 같은 SAMPLE은 이전 보정 결과 사용
+      (트레이스는 레코드를 보정할 때 기록되므로 --trace와 함께 쓰지 않음)
     """
     # 루트 태그명 보정
     if 'SAMPLE_SET' in doc:
@@ -111,253 +294,17 @@ def fix_structure(doc, bioprojects=None, bioexp_isolate_map=None):
     if samples:
         if isinstance(samples, dict):
             samples = [samples]
-        root['BioSample'] = []
-        for sample in samples:
-            sample = dict(sample)
-            tag_value_map = {}
-            sample_name = None
-            organism_name = None
-            taxonomy_id = None
-            title = None
-            # 디버깅: sample 전체 구조, SAMPLE_ATTRIBUTES/SAMPLE_ATTRIBUTE 실제 타입과 내용 출력
-            if 'SAMPLE_ATTRIBUTES' in sample:
-                print('DEBUG: SAMPLE_ATTRIBUTES:', sample['SAMPLE_ATTRIBUTES'])
-                if 'SAMPLE_ATTRIBUTE' in sample['SAMPLE_ATTRIBUTES']:
-                    print('DEBUG: SAMPLE_ATTRIBUTE:', type(sample['SAMPLE_ATTRIBUTES']['SAMPLE_ATTRIBUTE']), sample['SAMPLE_ATTRIBUTES']['SAMPLE_ATTRIBUTE'])
-            print('DEBUG: sample 전체:', sample)
-            # SAMPLE_ATTRIBUTES에서 값 추출을 pop/변환 이전에 먼저 실행
-            bio_sample_id = None
-            sample_name_val = None
-            bio_project_id = None
-            if 'SAMPLE_ATTRIBUTES' in sample and 'SAMPLE_ATTRIBUTE' in sample['SAMPLE_ATTRIBUTES']:
-                attrs = sample['SAMPLE_ATTRIBUTES']['SAMPLE_ATTRIBUTE']
-                if not isinstance(attrs, list):
-                    attrs = [attrs]
-                for attr in attrs:
-                    tag = attr.get('TAG')
-                    value = attr.get('VALUE')
-                    if tag:
-                        tag_l = tag.lower()
-                        tag_snake = ATTRIBUTE_NAME_MAP.get(tag, tag)
-                        tag_value_map[tag] = value
-                        tag_value_map[tag_l] = value
-                        tag_value_map[tag_snake] = value
-                        tag_camel = re.sub(r'_([a-z])', lambda m: m.group(1).upper(), tag_snake)
-                        tag_value_map[tag_camel] = value
-            # Models 생성 (SAMPLE_ATTRIBUTES 삭제 이전에 taxonomicType 추출)
-            model_val = None
-            for attr in attrs:
-                if attr.get('TAG') == 'taxonomicType':
-                    model_val = attr.get('VALUE')
-                    break
-            if model_val:
-                sample['Models'] = {'Model': model_val}
-            else:
-                sample['Models'] = {'Model': 'unknown'}
-            # SAMPLE_ATTRIBUTES 등 원본 구조 제거
-            sample.pop('SAMPLE_ATTRIBUTES', None)
-            sample.pop('SAMPLE_NAME', None)
-            # Description 생성 직전 robust 추출
-            organism_name = (
-                tag_value_map.get('scientific_name') or
-                tag_value_map.get('SCIENTIFIC_NAME') or
-                tag_value_map.get('organism_name') or
-                tag_value_map.get('organism') or
-                'unknown'
-            )
-            taxonomy_id = (
-                tag_value_map.get('taxon_id') or
-                tag_value_map.get('TAXON_ID') or
-                tag_value_map.get('ncbi_taxonomy_id') or
-                tag_value_map.get('ncbitaxonomyid') or
-                'unknown'
-            )
-            title = (
-                tag_value_map.get('title') or
-                tag_value_map.get('TITLE') or
-                title or
-                'unknown'
-            )
-            # tag_value_map에서 주요 값 robust 추출
-            bio_sample_id = (
-                tag_value_map.get('kobic_sample_id') or
-                tag_value_map.get('bioSampleId') or
-                tag_value_map.get('bio_sample_id') or
-                tag_value_map.get('biosampleid') or
-                tag_value_map.get('kobicSampleId')
-            )
-            sample_name_val = (
-                tag_value_map.get('sample_name') or
-                tag_value_map.get('sampleName') or
-                tag_value_map.get('samplename')
-            )
-            if sample_name_val:
-                sample_name = sample_name_val
-                title = f"{sample_name_val} ({bio_sample_id})" if bio_sample_id else sample_name_val
-            else:
-                sample_name = bio_sample_id or 'unknown'
-                title = sample_name
-            # Description robust 생성 (sample_name, title 등)
-            organism_struct = {'OrganismName': organism_name}
-            if taxonomy_id and taxonomy_id != 'unknown':
-                organism_struct['@taxonomy_id'] = taxonomy_id
-            sample['Description'] = {
-                'SampleName': sample_name or 'unknown',
-                'Title': title or 'unknown',
-                'Organism': organism_struct
-            }
-            # Attributes 생성/정제: 반드시 Description 생성 이후에 실행
-            attrs_out = []
-            # isolate/isolation_source robust 추출
-            isolate_val = (
-                tag_value_map.get('isolate') or
-                tag_value_map.get('isolation_source') or
-                'unknown'
-            )
-            # kobic_project_id, kobic_registration_date robust 추출
-            kobic_project_id_val = (
-                tag_value_map.get('bioproject_id') or
-                tag_value_map.get('bioProjectId') or
-                tag_value_map.get('bioprojectid') or
-                'unknown'
-            )
-            kobic_registration_date_val = (
-                tag_value_map.get('registration_date') or
-                tag_value_map.get('submission_date') or
-                tag_value_map.get('release_date') or
-                tag_value_map.get('kobic_registration_date') or
-                tag_value_map.get('kobic_submission_date') or
-                tag_value_map.get('kobic_release_date') or
-                'unknown'
-            )
-            # kobic_submission_date robust 추출
-            kobic_submission_date_val = (
-                tag_value_map.get('submission_date') or
-                tag_value_map.get('registration_date') or
-                tag_value_map.get('release_date') or
-                tag_value_map.get('kobic_submission_date') or
-                tag_value_map.get('kobic_registration_date') or
-                tag_value_map.get('kobic_release_date') or
-                'unknown'
-            )
-            # lab_host robust 추출
-            lab_host_val = (
-                tag_value_map.get('lab_host') or
-                tag_value_map.get('host') or
-                tag_value_map.get('organism') or
-                tag_value_map.get('organism_name') or
-                tag_value_map.get('scientific_name') or
-                'unknown'
-            )
-            for req in REQUIRED_ATTRIBUTES:
-                if req == 'sample_name':
-                    val = sample['Description']['SampleName']
-                    attrs_out.append({'@attribute_name': req, '#text': val})
-                elif req in ['isolate', 'isolation_source']:
-                    attrs_out.append({'@attribute_name': req, '#text': isolate_val})
-                elif req == 'kobic_project_id':
-                    attrs_out.append({'@attribute_name': req, '#text': kobic_project_id_val})
-                elif req == 'kobic_registration_date':
-                    attrs_out.append({'@attribute_name': req, '#text': kobic_registration_date_val})
-                elif req == 'kobic_submission_date':
-                    attrs_out.append({'@attribute_name': req, '#text': kobic_submission_date_val})
-                elif req == 'lab_host':
-                    attrs_out.append({'@attribute_name': req, '#text': lab_host_val})
-                elif req in tag_value_map and tag_value_map[req] is not None:
-                    attrs_out.append({'@attribute_name': req, '#text': str(tag_value_map[req]) or 'unknown'})
-                else:
-                    attrs_out.append({'@attribute_name': req, '#text': 'unknown'})
-            if attrs_out:
-                sample['Attributes'] = {'Attribute': attrs_out}
-            # 속성 보정
-            sample = {k: v for k, v in sample.items() if k not in ['@accession', '@alias', '@center_name']}
-            sample['@access'] = 'public'
-            # <IDENTIFIERS> → <Ids> 변환
-            if 'IDENTIFIERS' in sample:
-                sample['Ids'] = sample.pop('IDENTIFIERS')
-            # <PRIMARY_ID> → <Id> 변환, label 제거, namespace 추가, value가 dict면 #text만 추출
-            if 'Ids' in sample and 'PRIMARY_ID' in sample['Ids']:
-                value = sample['Ids'].pop('PRIMARY_ID')
-                if isinstance(value, dict):
-                    value = value.get('#text', '')
-                sample['Ids']['Id'] = {'@namespace': 'BioSample', '#text': str(value)}
-            # Description 하위 태그 보정 (SampleName, Title, OrganismName, taxonomy_id robust 추출)
-            if 'Attributes' in sample and 'Attribute' in sample['Attributes']:
-                attrs = sample['Attributes']['Attribute']
-                if isinstance(attrs, dict):
-                    attrs = [attrs]
-                for attr in attrs:
-                    if attr.get('@attribute_name') == 'SCIENTIFIC_NAME' and not organism_name:
-                        organism_name = attr.get('#text')
-                    if attr.get('@attribute_name') == 'TAXON_ID' and not taxonomy_id:
-                        taxonomy_id = attr.get('#text')
-                    if attr.get('@attribute_name') == 'TITLE' and not title:
-                        title = attr.get('#text')
-            # <Models>가 리스트가 아니면 리스트로 변환
-            if 'Models' in sample and 'Model' in sample['Models']:
-                if isinstance(sample['Models']['Model'], dict):
-                    sample['Models']['Model'] = [sample['Models']['Model']]
-                elif isinstance(sample['Models']['Model'], str):
-                    sample['Models']['Model'] = [sample['Models']['Model']]
-            # Owner 정보 robust 추출
-            owner_name = 'unknown'
-            contact_email = 'kobic_ddbj@kobic.kr'
-            contact_first = 'KOBIC'
-            contact_last = 'KOBIC'
-            if bioprojects and kobic_project_id_val in bioprojects:
-                owner_name = bioprojects[kobic_project_id_val].get('owner_name', 'unknown')
-                contact_email = bioprojects[kobic_project_id_val].get('contact_email', 'kobic_ddbj@kobic.kr')
-            # email None/빈값 보정
-            if not contact_email or contact_email == 'None':
-                contact_email = 'kobic_ddbj@kobic.kr'
-            owner_name = (
-                tag_value_map.get('owner') or
-                tag_value_map.get('submitter') or
-                tag_value_map.get('organization') or
-                tag_value_map.get('center_name') or
-                owner_name
-            )
-            sample['Owner'] = {
-                'Name': owner_name,
-                'Contacts': {
-                    'Contact': {
-                        '@email': contact_email,
-                        'Name': {
-                            'First': contact_first,
-                            'Last': contact_last
-                        }
-                    }
-                }
-            }
-            # 순서 보정: Ids → Description → Owner → Providers(optional) → Models(필수) → Attributes(optional) → 나머지
-            new_sample = OrderedDict()
-            if 'Ids' in sample:
-                new_sample['Ids'] = sample['Ids']
-            if 'Description' in sample:
-                new_sample['Description'] = sample['Description']
-            if 'Owner' in sample:
-                new_sample['Owner'] = sample['Owner']
-            if 'Providers' in sample:
-                new_sample['Providers'] = sample['Providers']
-            if 'Models' in sample:
-                new_sample['Models'] = sample['Models']
-            if 'Attributes' in sample:
-                new_sample['Attributes'] = sample['Attributes']
-            for k, v in sample.items():
-                if k not in ['Ids', 'Description', 'Owner', 'Providers', 'Models', 'Attributes']:
-                    new_sample[k] = v
-            root['BioSample'].append(new_sample)
+        if manifest is not None and not trace.enabled:
+            owners = group_digest(bioprojects)
+            root['BioSample'] = manifest.fix_records(samples, lambda sample: fix_sample(sample, bioprojects), lambda sample: owners)
+        else:
+            root['BioSample'] = []
+            for sample in samples:
+                root['BioSample'].append(fix_sample(sample, bioprojects, trace))
         if 'SAMPLE' in root:
             del root['SAMPLE']
     return doc
 
-def validate_xsd(xml_path, xsd_path):
-    result = subprocess.run(
-        ["xmllint", "--schema", xsd_path, "--noout", xml_path],
-        capture_output=True, text=True
-    )
-    return result.returncode == 0, result.stderr
-
 def diff_with_example(fixed_xml, example_xml):
     with open(fixed_xml, encoding="utf-8") as f1, open(example_xml, encoding="utf-8") as f2:
         diff = difflib.unified_diff(
@@ -366,45 +313,71 @@ def diff_with_example(fixed_xml, example_xml):
         )
         return "".join(diff)
 
-def save_biosample_grouped_by_ssubid(doc, output_dir, xsd_path=None, report_path=None):
-    """
-    BioSample XML을 bioSampleGroupId(SSUBid)별로 분리하여 각각 <BioSampleSet>으로 저장
-    xsd_path가 주어지면 각 파일에 대해 XSD 검증도 수행
-    report_path가 주어지면 결과를 해당 파일에 기록
-    """
-    import os
-    os.makedirs(output_dir, exist_ok=True)
+# Attributes에서 bioSampleGroupId(SSUBid) 찾기 (없으면 UNKNOWN_GROUP)
+def get_sample_group_id(sample):
+    attrs = sample.get('Attributes', {}).get('Attribute', [])
+    if isinstance(attrs, dict):
+        attrs = [attrs]
+    for attr in attrs:
+        if attr.get('@attribute_name') == 'kobic_sample_group_id':
+            return attr.get('#text') or 'UNKNOWN_GROUP'
+    return 'UNKNOWN_GROUP'
+
+# SSUBid → 해당 BioSample 리스트 (그룹은 최초 등장 순서)
+def group_samples_by_ssubid(doc):
     root = doc.get('BioSampleSet', doc.get('BioSampleSet'))
     samples = root.get('BioSample', [])
     if isinstance(samples, dict):
         samples = [samples]
-    # SSUBid별로 샘플 분류
     ssubid_map = {}
     for sample in samples:
-        ssubid = None
-        # Attributes에서 bioSampleGroupId 찾기
-        attrs = sample.get('Attributes', {}).get('Attribute', [])
-        if isinstance(attrs, dict):
-            attrs = [attrs]
-        for attr in attrs:
-            if attr.get('@attribute_name') == 'kobic_sample_group_id':
-                ssubid = attr.get('#text')
-                break
-        if not ssubid:
-            ssubid = 'UNKNOWN_GROUP'
+        ssubid = get_sample_group_id(sample)
         if ssubid not in ssubid_map:
             ssubid_map[ssubid] = []
         ssubid_map[ssubid].append(sample)
+    return ssubid_map
+
+def save_biosample_grouped_by_ssubid(doc, output_dir, xsd_path=None, report_path=None, jobs=1, manifest=None, metrics=NULL_METRICS, document=None, precheck=None):
+    """
+    BioSample XML을 bioSampleGroupId(SSUBid)별로 분리하여 각각 <BioSampleSet>으로 저장
+    xsd_path가 주어지면 각 파일에 대해 XSD 검증도 수행
+    document(이미 저장한 doc의 전체 보정본 경로)가 주어지면 그룹 파일 대신 document를 한 번만 검증하여
+    에러를 SSUBid별로 나누고 document의 (통과 여부, 리포트)를 반환 (emit_groups_once)
+    precheck(BioSample 위치 → 사전 검사 위반 목록, PRECHECK.check_document)가 주어지면 위반이 있는 그룹은 XSD 검증 대신 위반 목록을 리포트
+    report_path가 주어지면 결과를 해당 파일에 기록
+    jobs > 1이면 그룹 저장/검증을 프로세스 풀로 병렬 처리 (출력/리포트 순서는 동일)
+    manifest가 주어지면 변경 없는 그룹은 다시 저장/검증하지 않고 이전 결과를 리포트에 사용 (--incremental)
+    metrics가 주어지면 그룹화/저장/검증 단계를 계측 (--metrics)
+    """
+    import os
+    os.makedirs(output_dir, exist_ok=True)
+    with metrics.stage('group') as st:
+        ssubid_map = group_samples_by_ssubid(doc)
+        st.records_in = sum(len(group_samples) for group_samples in ssubid_map.values())
+        st.records_out = len(ssubid_map)
     # 각 그룹별로 <BioSampleSet> 생성 및 저장 + XSD 검증 + 리포트
     report_lines = []
-    for ssubid, group_samples in ssubid_map.items():
-        group_doc = {'BioSampleSet': {'BioSample': group_samples}}
-        out_path = os.path.join(output_dir, f"{ssubid}.xml")
-        save_xml(group_doc, out_path)
+    # BioSample → document 루트 아래 위치 (그룹 레코드 위치 목록용)
+    samples = doc.get('BioSampleSet', doc).get('BioSample', [])
+    positions = {id(sample): i for i, sample in enumerate(samples if isinstance(samples, list) else [samples])}
+    groups = [
+        (os.path.join(output_dir, f"{ssubid}.xml"), {'BioSampleSet': {'BioSample': group_samples}},
+         [positions[id(sample)] for sample in group_samples])
+        for ssubid, group_samples in ssubid_map.items()
+    ]
+    if manifest is not None:
+        for out_path, group_doc, _ in groups:
+            manifest.set_group_inputs(out_path, group_doc['BioSampleSet']['BioSample'])
+    group_precheck = {out_path: group_violations(precheck, indices) for out_path, _, indices in groups} if precheck else None
+    document_result = None
+    if document and xsd_path:
+        results, document_result = emit_groups_once(groups, save_xml, xsd_path, document, jobs, manifest, metrics, group_precheck)
+    else:
+        results = emit_groups([group[:2] for group in groups], save_xml, xsd_path, jobs, manifest, metrics, group_precheck)
+    for (ssubid, group_samples), (out_path, _, _), (valid, xsd_report) in zip(ssubid_map.items(), groups, results):
         print(f"[INFO] Saved {len(group_samples)} samples to {out_path}")
         # XSD 검증 및 리포트 기록
         if xsd_path:
-            valid, xsd_report = validate_xsd(out_path, xsd_path)
             result_str = f"[XSD] {ssubid}.xml: {'PASS' if valid else 'FAIL'}"
             print(result_str)
             if not valid:
@@ -416,26 +389,136 @@ def save_biosample_grouped_by_ssubid(doc, output_dir, xsd_path=None, report_path
     if report_path and report_lines:
         with open(report_path, 'w', encoding='utf-8') as rf:
             rf.write('\n'.join(report_lines))
+    return document_result
 
-def main():
+def run_pipeline(corpus, jobs=1, incremental=False, metrics=NULL_METRICS, trace=NULL_TRACE):
     print("=== BioSample Pipeline Start ===")
     os.makedirs("xml_fixed", exist_ok=True)
-    doc = parse_xml(INPUT_XML)
-    # bioproject 정보 파싱
-    bioprojects = parse_bioproject_owners("xml_submitted/ddbj_bioproject.xml")
-    # bioexperiment 정보 파싱 (isolate, isolation_source)
-    bioexp_isolate_map = parse_bioexperiment_isolate_map("xml_submitted/ddbj_bioExperiment.xml")
-    doc_fixed = fix_structure(doc, bioprojects, bioexp_isolate_map)
-    save_xml(doc_fixed, OUTPUT_XML)
+    # --incremental: 입력이 그대로인 SAMPLE은 보정하지 않고, 그대로인 그룹은 저장/검증하지 않음
+    manifest = load_manifest(MANIFEST_PATH, os.path.abspath(__file__), XSD_PATH) if incremental else None
+    with metrics.stage('parse') as st:
+        # fix_structure가 입력을 제자리 수정하므로 복사본 사용
+        doc = corpus.copy('biosample')
+        records = st.records_out = count_records(doc, 'SAMPLE_SET', 'SAMPLE')
+    with metrics.stage('aux_maps') as st:
+        # KAP별 owner만 쓰므로 BioProject 입력만으로 조인 색인 생성 (--stream 모드와 같음)
+        bioprojects = corpus.join_index(('bioproject',)).project_owners
+        st.records_out = len(bioprojects)
+    with metrics.stage('fix_structure', records, records):
+        doc_fixed = fix_structure(doc, bioprojects, trace, manifest)
+    trace.close()
+    with metrics.stage('precheck', records, records):
+        # XSD 제약 표(enumeration/필수/최대 횟수)로 BioSample별 사전 검사
+        precheck = PRECHECK.check_document(doc_fixed, 'BioSampleSet', 'BioSample', metrics)
+    with metrics.stage('serialize', records, records):
+        save_xml(doc_fixed, OUTPUT_XML)
+    metrics.add_file(OUTPUT_XML)
     # SSUBid별로 분리 저장 + XSD 검증 + 리포트 저장
-    save_biosample_grouped_by_ssubid(doc_fixed, "xml_fixed/ddbj_biosample_fixed", XSD_PATH, REPORT_PATH)
-    valid, xsd_report = validate_xsd(OUTPUT_XML, XSD_PATH)
-    diff_report = diff_with_example(OUTPUT_XML, EXAMPLE_XML)
+    # 전체 보정본을 한 번만 검증하고 결과를 SSUBid별 리포트로 나눔
+    valid, xsd_report = save_biosample_grouped_by_ssubid(doc_fixed, "xml_fixed/ddbj_biosample_fixed", XSD_PATH, REPORT_PATH, jobs, manifest, metrics, OUTPUT_XML, precheck)
+    if manifest is not None:
+        manifest.save()
+        print(manifest.summary('biosample'))
     print("# XSD Validation: {}\n".format("PASS" if valid else "FAIL"))
     print(xsd_report)
-    print("\n# Diff with Example\n")
-    print(diff_report)
+    if os.path.exists(EXAMPLE_XML):
+        diff_report = diff_with_example(OUTPUT_XML, EXAMPLE_XML)
+        print("\n# Diff with Example\n")
+        print(diff_report)
+    else:
+        print(f"[INFO] 예시 XML 없음, diff 생략: {EXAMPLE_XML}")
     print("Pipeline complete. See fixed XML:", OUTPUT_XML)
 
+def run_pipeline_stream(jobs=1, incremental=False, metrics=NULL_METRICS, trace=NULL_TRACE):
+    """
+    --stream 모드: ddbj_biosample.xml의 SAMPLE을 하나씩 읽어 BioSample로 변환한 뒤
+    전체 보정본과 SSUBid별 스풀 파일에 바로 기록 (메모리는 가장 큰 SAMPLE 크기로 제한)
+    - bioproject 입력도 Package 단위로 읽어 owner 정보만 유지
+    - 전체 보정본의 XSD 검증은 그룹 파일 검증으로 대체
+    """
+    print("=== BioSample Pipeline Start (stream) ===")
+    output_dir = "xml_fixed/ddbj_biosample_fixed"
+    os.makedirs(output_dir, exist_ok=True)
+    with metrics.stage('aux_maps') as st:
+        bioprojects = stream_join_index({'bioproject': BIOPROJECT_XML}).project_owners
+        st.records_out = len(bioprojects)
+    spool = GroupSpool('BioSampleSet')
+    precheck = {}
+    failed = 0
+    root_attrs = {}
+    records = metrics.timed_iter('parse', iter_records(INPUT_XML, 'SAMPLE', root_attrs))
+    try:
+        # 첫 레코드를 읽어야 루트 속성이 채워지므로 writer는 첫 레코드 이후 생성
+        writer = None
+        for sample in records:
+            with metrics.stage('fix_structure', 1, 1):
+                sample = fix_sample(sample or {}, bioprojects, trace)
+            with metrics.stage('precheck', 1, 1):
+                violations = PRECHECK.check(sample, SAMPLE_PATH)
+            with metrics.stage('serialize', 1, 1):
+                fragment = render_record('BioSample', sample)
+                if writer is None:
+                    writer = StreamDocumentWriter(OUTPUT_XML, 'BioSampleSet', root_attrs)
+                writer.write(fragment)
+            with metrics.stage('group', 1, 1):
+                ssubid = get_sample_group_id(sample)
+                spool.add(ssubid, fragment)
+                if violations:
+                    failed += 1
+                    precheck.setdefault(ssubid, []).extend(violations)
+        if writer is None:
+            writer = StreamDocumentWriter(OUTPUT_XML, 'BioSampleSet', root_attrs)
+        writer.close()
+        trace.close()
+        metrics.add_file(OUTPUT_XML)
+        print(f"[INFO] Streamed {writer.count} samples to {OUTPUT_XML}")
+        print_precheck_summary('BioSample', failed, writer.count, metrics)
+        # SSUBid별 BioSampleSet 저장 + XSD 검증 + 리포트
+        report_lines = []
+        manifest = load_manifest(MANIFEST_PATH, os.path.abspath(__file__), XSD_PATH) if incremental else None
+        results = emit_spool(spool, lambda ssubid: os.path.join(output_dir, f"{ssubid}.xml"), XSD_PATH, jobs, manifest, metrics, precheck)
+        for ssubid, out_path, count, valid, xsd_report in results:
+            print(f"[INFO] Saved {count} samples to {out_path}")
+            result_str = f"[XSD] {ssubid}.xml: {'PASS' if valid else 'FAIL'}"
+            print(result_str)
+            if not valid:
+                print(xsd_report)
+            report_lines.append(result_str)
+            if not valid:
+                report_lines.append(xsd_report)
+        if report_lines:
+            with open(REPORT_PATH, 'w', encoding='utf-8') as rf:
+                rf.write('\n'.join(report_lines))
+        if manifest is not None:
+            manifest.save()
+            print(manifest.summary('biosample'))
+    finally:
+        spool.cleanup()
+    print("Pipeline complete. See fixed XML:", OUTPUT_XML)
+
+def main():
+    parser = argparse.ArgumentParser(description="DDBJ BioSample XML 변환/검증")
+    parser.add_argument('--jobs', type=int, default=1, help='그룹별 저장/검증 병렬 프로세스 수 (0: CPU 코어 수)')
+    parser.add_argument('--incremental', action='store_true', help='내용이 바뀐 그룹만 다시 저장/검증 (매니페스트: xml_fixed/biosample_manifest.json)')
+    parser.add_argument('--stream', action='store_true', help='SAMPLE 단위 스트리밍 처리 (대용량 입력, 메모리 사용량 고정)')
+    parser.add_argument('--metrics', action='store_true', help='단계별 계측 결과 저장 (xml_fixed/biosample_metrics.json, .prom)')
+    parser.add_argument('--trace', nargs='?', const='debug', default=None, metavar='LEVEL',
+                        help='SAMPLE별 진단을 xml_fixed/biosample_trace.jsonl에 기록 (레벨: error/warning/info/debug, 기본 debug)')
+    parser.add_argument('--trace-every', type=int, default=None, metavar='N', help='N개 SAMPLE 중 1개만 상세 트레이스 (기본: 1)')
+    args = parser.parse_args()
+    jobs = args.jobs or default_jobs()
+    if args.trace is not None:
+        try:
+            parse_level(args.trace)
+        except ValueError as e:
+            parser.error(str(e))
+    metrics = create_metrics('biosample', args.metrics or None)
+    trace = create_trace('biosample', args.trace, args.trace_every)
+    if args.stream:
+        run_pipeline_stream(jobs, args.incremental, metrics, trace)
+    else:
+        run_pipeline(Corpus({'biosample': INPUT_XML}), jobs, args.incremental, metrics, trace)
+    metrics.save()
+
 if __name__ == "__main__":
     main()
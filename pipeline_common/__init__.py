@@ -0,0 +1,5 @@
+"""
+XMLmeta 파이프라인 공용 모듈
+- 5개 파이프라인(pipeline_bioproject/biosample/experiment/run/submission)이 함께 사용하는 기능을 모아둔 패키지
+- 각 main.py는 저장소 루트를 sys.path에 추가한 뒤 pipeline_common.* 을 import 한다
+"""
@@ -0,0 +1,157 @@
+"""
+RUN DATA_BLOCK 파일용 MD5 체크섬 엔진
+- 스레드 풀(최대 workers개)로 여러 파일을 동시에 해시 (hashlib은 큰 버퍼 처리 중 GIL을 놓으므로 I/O/해시가 겹쳐 실행됨)
+- 파일은 mmap으로 매핑하여 chunk_size 단위로 복사 없이 해시, mmap이 안 되는 파일은 같은 크기의 readinto로 대체
+- 결과는 (절대경로, 크기, mtime) 기준의 영구 캐시(JSON)에 보관 → 바뀌지 않은 파일은 다시 읽지 않음
+- 처리량(MB/s), 캐시 적중률, 파일별 소요 시간을 리포트로 제공
+"""
+import hashlib
+import json
+import mmap
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+CHUNK_SIZE = 8 << 20
+DEFAULT_WORKERS = 8
+CACHE_VERSION = 1
+
+
+def md5_file(path, chunk_size=CHUNK_SIZE):
+    h = hashlib.md5()
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return h.hexdigest()
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            mm = None
+        if mm is not None:
+            with mm:
+                if hasattr(mm, 'madvise'):
+                    mm.madvise(mmap.MADV_SEQUENTIAL)
+                with memoryview(mm) as view:
+                    for offset in range(0, size, chunk_size):
+                        h.update(view[offset:offset + chunk_size])
+            return h.hexdigest()
+        # mmap 불가(특수 파일시스템 등): 고정 버퍼에 읽어 해시
+        buf = bytearray(chunk_size)
+        with memoryview(buf) as view:
+            while True:
+                n = f.readinto(buf)
+                if not n:
+                    break
+                h.update(view[:n])
+    return h.hexdigest()
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))]
+
+
+class ChecksumEngine:
+    """
+    compute(paths) → {path: md5 hex 또는 None(없거나 읽을 수 없는 파일)}
+    results에 파일별 (path, size, seconds, cached, md5, error) 기록
+    """
+    def __init__(self, cache_path=None, workers=DEFAULT_WORKERS, chunk_size=CHUNK_SIZE):
+        self.cache_path = cache_path
+        self.workers = max(1, workers)
+        self.chunk_size = chunk_size
+        self.cache = {}
+        self.results = []
+        self.wall_seconds = 0.0
+        if cache_path:
+            try:
+                with open(cache_path, encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get('version') == CACHE_VERSION:
+                    self.cache = data.get('files', {})
+            except (OSError, ValueError):
+                pass
+
+    def _hash_one(self, key, path, size):
+        start = time.perf_counter()
+        try:
+            digest, error = md5_file(path, self.chunk_size), None
+        except OSError as e:
+            digest, error = None, str(e)
+        return {'path': path, 'key': key, 'size': size, 'seconds': time.perf_counter() - start,
+                'cached': False, 'md5': digest, 'error': error}
+
+    def compute(self, paths):
+        start = time.perf_counter()
+        checksums = {}
+        pending = []
+        for path in dict.fromkeys(paths):
+            key = os.path.abspath(path)
+            try:
+                st = os.stat(key)
+            except OSError as e:
+                checksums[path] = None
+                self.results.append({'path': path, 'size': 0, 'seconds': 0.0, 'cached': False,
+                                     'md5': None, 'error': str(e)})
+                continue
+            entry = self.cache.get(key)
+            if entry and entry['size'] == st.st_size and entry['mtime_ns'] == st.st_mtime_ns:
+                checksums[path] = entry['md5']
+                self.results.append({'path': path, 'size': st.st_size, 'seconds': 0.0, 'cached': True,
+                                     'md5': entry['md5'], 'error': None})
+                continue
+            pending.append((key, path, st))
+        if pending:
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(pending))) as pool:
+                futures = [pool.submit(self._hash_one, key, path, st.st_size) for key, path, st in pending]
+                for (key, path, st), future in zip(pending, futures):
+                    result = future.result()
+                    checksums[path] = result['md5']
+                    self.results.append(result)
+                    if result['md5'] is not None:
+                        # 해시 시작 전 stat 값으로 기록 → 해시 도중 파일이 바뀌면 다음 실행에서 다시 해시
+                        self.cache[key] = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'md5': result['md5']}
+        self.wall_seconds += time.perf_counter() - start
+        return checksums
+
+    def save(self):
+        if not self.cache_path:
+            return
+        os.makedirs(os.path.dirname(self.cache_path) or '.', exist_ok=True)
+        tmp_path = self.cache_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': CACHE_VERSION, 'files': self.cache}, f)
+        os.replace(tmp_path, self.cache_path)
+
+    def format_stats(self):
+        hashed = [r for r in self.results if not r['cached'] and r['md5'] is not None]
+        hits = sum(1 for r in self.results if r['cached'])
+        failed = sum(1 for r in self.results if r['md5'] is None)
+        found = len(self.results) - failed
+        hashed_bytes = sum(r['size'] for r in hashed)
+        rate = hashed_bytes / 1e6 / self.wall_seconds if self.wall_seconds > 0 else 0.0
+        latencies = [r['seconds'] for r in hashed]
+        mean = sum(latencies) / len(latencies) if latencies else 0.0
+        return [
+            f"[CHECKSUM] files: {len(self.results)}, hashed: {len(hashed)}, cache hits: {hits} "
+            f"({hits / found * 100 if found else 0.0:.1f}%), missing/unreadable: {failed}",
+            f"[CHECKSUM] hashed {hashed_bytes / 1e6:.1f} MB in {self.wall_seconds:.3f}s "
+            f"({rate:.1f} MB/s, {self.workers} threads)",
+            f"[CHECKSUM] per-file latency: mean {mean:.3f}s, p50 {_percentile(latencies, 50):.3f}s, "
+            f"p95 {_percentile(latencies, 95):.3f}s, max {max(latencies, default=0.0):.3f}s",
+        ]
+
+    def format_report(self):
+        """요약 + 파일별 (상태, 크기, 소요 시간, md5) 라인"""
+        lines = self.format_stats()
+        for r in self.results:
+            if r['md5'] is None:
+                status = 'MISSING'
+            elif r['cached']:
+                status = 'CACHED'
+            else:
+                status = 'HASHED'
+            lines.append(f"{status}\t{r['path']}\t{r['size']}\t{r['seconds']:.3f}s\t{r['md5'] or r['error']}")
+        return lines
@@ -0,0 +1,118 @@
+"""
+xml_submitted 입력 코퍼스
+- 각 입력 파일(XML/CSV)을 프로세스 당 한 번만 파싱하여 여러 파이프라인 단계가 공유
+- submission_csv는 행 목록 대신 컴파일된 제출 매핑(pipeline_common.submission_map.SubmissionMap)으로 읽음
+- get(name): 공유 객체 반환 (읽기 전용으로만 사용할 것)
+- copy(name): 제자리(in-place) 수정이 필요한 단계용 복사본 반환 (재파싱 대신 pickle 왕복 복사)
+- 파싱 결과는 디스크 캐시(pipeline_common.parse_cache)를 거침 → 바뀌지 않은 입력은 다시 파싱하지 않음
+- 파일별 파싱 시간/메모리(RSS 증가량)/캐시 상태를 stats에 기록
+- join_index(names): 입력 문서의 교차 조인 색인 (pipeline_common.joins, 입력 조합별로 코퍼스당 한 번 생성, 지정한 입력만 파싱)
+"""
+import os
+import pickle
+import time
+from importlib.metadata import version as package_version
+
+import xmltodict
+
+from pipeline_common.joins import RECORD_TAGS, build_join_index
+from pipeline_common.parse_cache import load_cached
+from pipeline_common.submission_map import load_submission_map
+
+# 입력 이름 → 기본 경로
+INPUT_PATHS = {
+    'bioproject': "xml_submitted/ddbj_bioproject.xml",
+    'biosample': "xml_submitted/ddbj_biosample.xml",
+    'experiment': "xml_submitted/ddbj_bioExperiment.xml",
+    'run': "xml_submitted/ddbj_run.xml",
+    'run_file_path': "xml_submitted/ddbj_run_file_path.xml",
+    'submission_csv': "xml_submitted/KRA_after_20240311_pp_lib.csv",
+}
+# 파싱 캐시 키 (파싱 방식이 바뀌면 캐시 무효)
+XML_PARSE_KEY = f"xmltodict-{package_version('xmltodict')}"
+
+
+def parse_xml(path):
+    with open(path, encoding="utf-8") as f:
+        return xmltodict.parse(f.read())
+
+
+def count_records(doc, root_tag, record_tag):
+    """파싱된 문서의 <root_tag> 아래 record_tag 레코드 수"""
+    records = ((doc or {}).get(root_tag) or {}).get(record_tag) or []
+    return 1 if isinstance(records, dict) else len(records)
+
+
+def rss_bytes():
+    """현재 프로세스 RSS(bytes), 측정 불가 환경에서는 0"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+
+class Corpus:
+    def __init__(self, paths=None):
+        self.paths = dict(INPUT_PATHS)
+        if paths:
+            self.paths.update(paths)
+        self._docs = {}
+        self._join_indexes = {}
+        self.stats = []
+
+    def load(self, name):
+        if name in self._docs:
+            return self._docs[name]
+        path = self.paths[name]
+        if not os.path.exists(path):
+            # 선택 입력(예: ddbj_run_file_path.xml)이 없으면 None
+            self._docs[name] = None
+            return None
+        rss_before = rss_bytes()
+        start = time.perf_counter()
+        if path.endswith('.csv'):
+            data, cache_state = load_submission_map(path)
+        else:
+            data, cache_state = load_cached(path, parse_xml, XML_PARSE_KEY)
+        elapsed = time.perf_counter() - start
+        self._docs[name] = data
+        self.stats.append({
+            'name': name,
+            'path': path,
+            'size_bytes': os.path.getsize(path),
+            'parse_seconds': elapsed,
+            'rss_delta_bytes': max(0, rss_bytes() - rss_before),
+            'cache': cache_state,
+        })
+        return data
+
+    def load_all(self):
+        for name in self.paths:
+            self.load(name)
+        return self
+
+    def get(self, name):
+        return self.load(name)
+
+    def copy(self, name):
+        data = self.load(name)
+        if data is None:
+            return None
+        return pickle.loads(pickle.dumps(data, pickle.HIGHEST_PROTOCOL))
+
+    def join_index(self, names=None):
+        """names: 색인에 넣을 입력 이름 (기본: RECORD_TAGS 전체)"""
+        names = tuple(RECORD_TAGS) if names is None else tuple(names)
+        if names not in self._join_indexes:
+            self._join_indexes[names] = build_join_index({name: self.get(name) for name in names})
+        return self._join_indexes[names]
+
+    def format_stats(self):
+        lines = []
+        for st in self.stats:
+            lines.append(
+                f"[PARSE] {st['name']} ({st['path']}): {st['size_bytes'] / 1e6:.2f} MB, "
+                f"{st['parse_seconds']:.3f}s, +{st['rss_delta_bytes'] / 1e6:.1f} MB RSS, cache {st['cache']}"
+            )
+        return lines
@@ -0,0 +1,219 @@
+"""
+그룹별 XML 저장(unparse → write → XSD 검증) 실행기
+- jobs <= 1: 기존과 같이 한 그룹씩 순차 처리
+- jobs > 1: 그룹을 프로세스 풀(worker)로 분배, 각 worker가 unparse/저장/검증을 수행
+- 결과는 항상 입력 그룹 순서대로 반환되므로 리포트/콘솔 출력은 순차 실행과 동일하다
+- manifest가 주어지면 변경 없는 그룹은 건너뛰고 이전 검증 결과를 그대로 반환 (증분 재생성)
+- metrics가 주어지면 그룹별 저장(serialize)/검증(validate) 시간, 저장 바이트 수, 검증 실패 수를 집계
+  (병렬 모드의 시간은 worker 프로세스에서 측정한 시간의 합)
+- emit_groups_once: 그룹 파일은 검증 없이 저장하고 전체 보정본을 한 번만 검증하여 결과를 그룹별로 나눔
+- precheck(out_path → 사전 검사 위반 목록, pipeline_common.prevalidate)가 주어지면 위반이 있는 그룹은
+  그룹 파일을 저장만 하고 XSD 검증 대신 위반 목록을 리포트로 사용 (검증은 사전 검사를 통과한 그룹만)
+"""
+import os
+import pickle
+import time
+from multiprocessing import Pool
+
+from pipeline_common.validation import (validate_doc, validate_xml_string, validate_xsd, DocumentValidation,
+                                        RegroupedRecords, audit_enabled)
+from pipeline_common.manifest import file_digest
+from pipeline_common.metrics import NULL_METRICS
+from pipeline_common.prevalidate import precheck_report
+
+
+def _emit_one(render, out_path, group_doc, xsd_path, measure=False):
+    """
+    반환: ((valid, xsd_report), 측정값) - 측정값은 measure=True일 때 (저장 시간, 검증 시간, 파일 크기), 아니면 None
+    """
+    start = time.perf_counter()
+    xml_str = render(group_doc, out_path)
+    rendered = time.perf_counter()
+    if not xsd_path:
+        result = (None, '')
+    elif isinstance(group_doc, dict):
+        # dict 그룹은 저장한 파일을 다시 읽지 않고 메모리 상의 트리로 검증
+        result = validate_doc(group_doc, xsd_path, out_path)
+    elif xml_str is None:
+        result = validate_xsd(out_path, xsd_path)
+    else:
+        result = validate_xml_string(xml_str, xsd_path, out_path)
+    if not measure:
+        return result, None
+    try:
+        size = os.path.getsize(out_path)
+    except OSError:
+        size = 0
+    return result, (rendered - start, time.perf_counter() - rendered, size)
+
+
+def _emit_worker(task):
+    render, out_path, payload, xsd_path, measure = task
+    return _emit_one(render, out_path, pickle.loads(payload), xsd_path, measure)
+
+
+def _record_emit(metrics, xsd_path, result, measured):
+    if measured is None:
+        return
+    render_seconds, validate_seconds, size = measured
+    metrics.record('serialize', render_seconds, records_in=1, records_out=1)
+    metrics.count('files_written')
+    metrics.count('bytes_written', size)
+    if xsd_path:
+        metrics.record('validate', validate_seconds, records_in=1)
+        metrics.validation(result[0])
+
+
+def _prechecked(metrics, out_path, violations):
+    metrics.count('precheck_failed_groups')
+    metrics.validation(False)
+    return precheck_report(out_path, violations)
+
+
+def emit_groups(groups, render, xsd_path=None, jobs=1, manifest=None, metrics=NULL_METRICS, precheck=None):
+    """
+    groups: (out_path, group_doc) 튜플의 iterable (generator 가능)
+    render: render(group_doc, out_path) → 저장한 XML 문자열, 파일에 바로 기록했으면 None (각 파이프라인의 save_xml)
+    manifest: pipeline_common.manifest.GroupManifest (--incremental)
+      → 그룹 해시(등록된 입력 해시 또는 내용 해시)가 같고 파일이 그대로인 그룹은 저장/검증 없이 이전 결과 사용
+    metrics: pipeline_common.metrics.Metrics (--metrics)
+    precheck: out_path → 사전 검사 위반 목록 (위반이 있는 그룹만, 그룹을 꺼낸 뒤 조회하므로 generator가 채워도 됨)
+      → 해당 그룹은 저장만 하고 XSD 검증 없이 (False, 위반 리포트), XMLMETA_VALIDATE_AUDIT=1이면 사용하지 않음
+    반환: 그룹 순서대로 (valid, xsd_report) 리스트 (xsd_path가 없으면 valid=None)
+
+    병렬 모드에서는 그룹 문서를 꺼내는 즉시 직렬화한다.
+    → generator가 다음 그룹을 만들며 공유 레코드를 수정해도(예: EXPERIMENT의 LIBRARY_LAYOUT)
+      각 그룹은 순차 실행 때와 같은 시점의 값으로 저장된다
+    """
+    parallel = jobs and jobs > 1
+    measure = metrics.enabled
+    use_precheck = precheck is not None and xsd_path and not audit_enabled()
+    results = []
+    pending = []  # 병렬 처리할 (결과 위치, out_path, digest)
+    tasks = []
+    for out_path, group_doc in groups:
+        digest = None
+        if manifest is not None:
+            digest = manifest.digest(out_path, group_doc)
+            cached = manifest.lookup(out_path, digest)
+            if cached is not None:
+                metrics.count('files_unchanged')
+                results.append(tuple(cached))
+                continue
+        violations = precheck.get(out_path) if precheck and use_precheck else None
+        if violations:
+            # 사전 검사에서 실패가 확정된 그룹은 검증하지 않음 (병렬 모드에서도 저장만 하므로 바로 처리)
+            _, measured = _emit_one(render, out_path, group_doc, None, measure)
+            _record_emit(metrics, None, None, measured)
+            result = _prechecked(metrics, out_path, violations)
+            if manifest is not None:
+                manifest.record(out_path, digest, *result)
+            results.append(result)
+            continue
+        if not parallel:
+            result, measured = _emit_one(render, out_path, group_doc, xsd_path, measure)
+            _record_emit(metrics, xsd_path, result, measured)
+            if manifest is not None:
+                manifest.record(out_path, digest, *result)
+            results.append(result)
+            continue
+        pending.append((len(results), out_path, digest))
+        tasks.append((render, out_path, pickle.dumps(group_doc, pickle.HIGHEST_PROTOCOL), xsd_path, measure))
+        results.append(None)
+    if not tasks:
+        return results
+    chunksize = max(1, len(tasks) // (jobs * 4))
+    with Pool(processes=min(jobs, len(tasks))) as pool:
+        emitted = pool.map(_emit_worker, tasks, chunksize=chunksize)
+    for (index, out_path, digest), (result, measured) in zip(pending, emitted):
+        _record_emit(metrics, xsd_path, result, measured)
+        if manifest is not None:
+            manifest.record(out_path, digest, *result)
+        results[index] = result
+    return results
+
+
+def emit_groups_once(groups, render, xsd_path, document, jobs=1, manifest=None, metrics=NULL_METRICS, precheck=None):
+    """
+    단일 검증 모드의 emit_groups
+    groups: (out_path, group_doc, record_indices) 튜플의 iterable
+      record_indices: 그룹 레코드의 document(이미 저장한 전체 보정본) 루트 아래 위치 목록
+      None이면 그룹 내용이 전체 보정본과 다름 (예: 그룹별로 보정되는 레코드)
+      → 그런 그룹들의 레코드는 그룹 파일과 같은 줄 번호로 한 트리에 모아 한 번 더 검증 (RegroupedRecords)
+    그룹 파일은 검증 없이 저장(emit_groups)하고 document를 한 번만 검증한 뒤 에러를 그룹별로 나눔
+    (루트 콘텐츠 모델 에러 이후의 레코드가 있는 그룹은 나눌 수 없으므로 개별 검증: DocumentValidation.covers)
+    precheck(out_path → 사전 검사 위반 목록)에 있는 그룹은 단일 검증 결과로 나눌 수 없을 때 개별 검증 대신 위반 리포트 사용
+    (나눌 수 있으면 이미 검증한 결과이므로 그대로 사용)
+    manifest(--incremental)에서 모든 그룹이 그대로이고 document 내용도 같으면 검증 없이 이전 결과 사용
+    XMLMETA_VALIDATE_AUDIT=1이면 모든 그룹 파일을 개별 검증하여 그 결과를 사용하고 단일 검증 결과와 다른 그룹을 [AUDIT]로 출력
+    (나눌 수 없어 개별 검증으로 대체되는 그룹은 per-group으로 셈)
+    (사전 검사 결과는 사용하지 않음)
+    반환: (그룹 순서대로 (valid, xsd_report) 리스트, document의 (valid, xsd_report))
+    """
+    audit = audit_enabled()
+    paths = []
+    indices = []
+    regrouped = RegroupedRecords() if xsd_path else None
+
+    def track(items):
+        for out_path, group_doc, record_indices in items:
+            paths.append(out_path)
+            indices.append(record_indices)
+            if record_indices is None and regrouped is not None:
+                regrouped.add(out_path, group_doc)
+            yield out_path, group_doc
+
+    misses = manifest.misses if manifest is not None else 0
+    results = emit_groups(track(groups), render, xsd_path if audit else None, jobs, manifest, metrics)
+    digest = None
+    if manifest is not None:
+        digest = file_digest(document)
+        # 다시 만든 그룹이 없고 전체 보정본도 그대로면 그룹/문서 모두 이전 검증 결과 사용
+        cached = manifest.lookup_document(document, digest) if manifest.misses == misses and not audit else None
+        if cached is not None:
+            metrics.count('document_validation_skipped')
+            return results, cached
+    with metrics.stage('validate', 1):
+        check = DocumentValidation(document, xsd_path)
+    metrics.validation(check.valid)
+    if manifest is not None:
+        manifest.record_document(document, digest, check.valid, check.report)
+    patched = None
+    if regrouped is not None and regrouped.indices:
+        with metrics.stage('validate', 1):
+            patched = regrouped.validation(xsd_path)
+    mismatched = fallback = 0
+    for i, (out_path, record_indices) in enumerate(zip(paths, indices)):
+        source = check
+        if record_indices is None and patched is not None and out_path in regrouped.indices:
+            source, record_indices = patched, regrouped.indices[out_path]
+        if audit:
+            covered = source.covers(record_indices)
+            fallback += not covered
+            if covered:
+                split = source.group_result(out_path, record_indices)
+                # 모은 트리의 결과는 줄 번호/파일 이름까지 그룹 파일 검증과 같아야 함
+                if split[0] != results[i][0] or (source is patched and split != tuple(results[i])):
+                    mismatched += 1
+                    print(f"[AUDIT] {out_path}: 개별 검증 {'PASS' if results[i][0] else 'FAIL'}, 단일 검증 결과와 다름")
+            continue
+        if source.covers(record_indices):
+            result = source.group_result(out_path, record_indices)
+        elif precheck and precheck.get(out_path):
+            result = _prechecked(metrics, out_path, precheck[out_path])
+        else:
+            with metrics.stage('validate', 1):
+                result = validate_xsd(out_path, xsd_path)
+            metrics.validation(result[0])
+        if not result[0]:
+            metrics.count('group_validation_failures')
+        if manifest is not None:
+            manifest.set_result(out_path, *result)
+        results[i] = result
+    if audit:
+        print(f"[AUDIT] {len(paths)} groups, {mismatched} mismatched, {fallback} per-group")
+    return results, (check.valid, check.report)
+
+
+def default_jobs():
+    return os.cpu_count() or 1
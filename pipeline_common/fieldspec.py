@@ -0,0 +1,246 @@
+"""
+선언형 필드 규칙(spec) → 레코드별 변환 함수 코드 생성
+- 규칙 하나: (대상 필드, 원본 후보, 기본값, 포맷터 이름)
+  * 원본 후보는 앞에서부터 처음으로 값이 있는(truthy) 것을 사용
+      attr:<별칭>  레코드 속성 별칭 슬롯 값 (slot_of로 슬롯 번호 지정, 예: BioSample SAMPLE_ATTRIBUTE)
+      field:<대상> 앞에서 결정된 필드 값
+      ctx:<키>     레코드 밖에서 넘겨준 값 (ctx dict)
+  * 값을 찾으면 포맷터(formatters[이름])를 적용, 결과가 없거나 비어 있으면 기본값
+    (기본값도 attr:/field:/ctx: 형식이면 해당 값을 그대로 사용)
+- attributes 규칙(이름, 원본 후보, 기본값, 포맷터)을 주면 [{'@attribute_name': 이름, '#text': 값}, ...] 목록도 같은 함수에서 생성
+- 규칙마다 분기/조회를 해석하지 않도록 한 번에 실행되는 파이썬 함수로 생성하여 컴파일
+  transform(values, ctx) → (fields, attributes)
+  transform_traced(values, ctx, winners) → 위와 같고, 필드별로 사용한 원본 후보를 winners에 기록 (--trace)
+- 생성 코드는 규칙 해시로 캐시 디렉토리(XMLMETA_CACHE_DIR, 기본 .xmlmeta_cache)/fieldspec/에 저장하여 재사용
+  * 규칙 해시에는 생성기(이 모듈) 소스 해시도 포함 → 생성기가 바뀌면 다른 파일로 다시 생성
+  * 생성 코드 첫 줄에 나머지 소스의 sha256을 기록하고, 캐시 파일을 실행하기 전에 확인 (다르면 다시 생성)
+"""
+import hashlib
+import json
+import os
+
+FIELDSPEC_VERSION = 1
+CACHE_ENV = "XMLMETA_CACHE_DIR"
+DEFAULT_CACHE_DIR = ".xmlmeta_cache"
+SOURCE_KINDS = ('attr', 'field', 'ctx')
+ATTRIBUTE_KEYS = ('@attribute_name', '#text')
+
+
+def _generator_digest():
+    with open(os.path.abspath(__file__), 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+GENERATOR_DIGEST = _generator_digest()
+
+
+def cache_dir(kind):
+    """공용 캐시 디렉토리 아래 kind별 디렉토리 경로"""
+    return os.path.join(os.environ.get(CACHE_ENV) or DEFAULT_CACHE_DIR, kind)
+
+
+def parse_source(source):
+    """'attr:sample_name' → ('attr', 'sample_name'), 형식이 아니면 None"""
+    if isinstance(source, str):
+        kind, sep, name = source.partition(':')
+        if sep and kind in SOURCE_KINDS:
+            return kind, name
+    return None
+
+
+def spec_aliases(*specs):
+    """규칙들이 참조하는 attr: 별칭 목록 (처음 등장 순서)"""
+    aliases = []
+    for spec in specs:
+        for _, sources, default, _ in spec:
+            for source in tuple(sources) + (default,):
+                ref = parse_source(source)
+                if ref and ref[0] == 'attr' and ref[1] not in aliases:
+                    aliases.append(ref[1])
+    return aliases
+
+
+def spec_digest(name, fields, attributes=(), slot_of=None):
+    payload = {
+        'version': FIELDSPEC_VERSION,
+        'generator': GENERATOR_DIGEST,
+        'name': name,
+        'fields': [list(rule[:1]) + [list(rule[1])] + list(rule[2:]) for rule in fields],
+        'attributes': [list(rule[:1]) + [list(rule[1])] + list(rule[2:]) for rule in attributes],
+        'slots': sorted((slot_of or {}).items()),
+    }
+    data = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=repr)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+class _Generator:
+    def __init__(self, fields, attributes, slot_of, traced):
+        self.fields = fields
+        self.attributes = attributes
+        self.slot_of = slot_of or {}
+        self.traced = traced
+        self.lines = []
+        self.field_vars = {}
+        self.ctx_vars = {}
+
+    def expr(self, source):
+        ref = parse_source(source)
+        if ref is None:
+            return repr(source)
+        kind, name = ref
+        if kind == 'attr':
+            if name not in self.slot_of:
+                raise ValueError(f"슬롯이 없는 별칭: {name}")
+            return f"values[{self.slot_of[name]}]"
+        if kind == 'field':
+            if name not in self.field_vars:
+                raise ValueError(f"앞에서 정의되지 않은 필드: {name}")
+            return self.field_vars[name]
+        if name not in self.ctx_vars:
+            var = self.ctx_vars[name] = f"c{len(self.ctx_vars)}"
+            self.lines.append(f"    {var} = ctx.get({name!r})")
+        return self.ctx_vars[name]
+
+    def rule(self, var, label, sources, default, formatter):
+        """var = 규칙 결과 (원본 후보를 중첩 if로 펼침)"""
+        exprs = [self.expr(source) for source in sources]
+        default_expr = self.expr(default)
+        indent = '    '
+        if self.traced:
+            self.lines.append(f"{indent}w = None")
+        if exprs:
+            for i, (source, expr) in enumerate(zip(sources, exprs)):
+                self.lines.append(f"{indent}v = {expr}")
+                if self.traced:
+                    self.lines.append(f"{indent}if v:")
+                    self.lines.append(f"{indent}    w = {source!r}")
+                if i < len(exprs) - 1:
+                    self.lines.append(f"{indent}{'else' if self.traced else 'if not v'}:")
+                    indent += '    '
+            indent = '    '
+            if formatter:
+                self.lines.append(f"{indent}if v:")
+                self.lines.append(f"{indent}    v = {formatter}(v)")
+            self.lines.append(f"{indent}{var} = v or {default_expr}")
+        else:
+            self.lines.append(f"{indent}{var} = {default_expr}")
+        if self.traced:
+            self.lines.append(f"{indent}winners[{label!r}] = w")
+
+    def generate(self, func_name):
+        args = "values, ctx, winners" if self.traced else "values, ctx"
+        self.lines = [f"def {func_name}({args}):"]
+        self.field_vars = {}
+        self.ctx_vars = {}
+        for i, (target, sources, default, formatter) in enumerate(self.fields):
+            var = f"f{i}"
+            self.lines.append(f"    # {target}")
+            self.rule(var, target, sources, default, formatter)
+            self.field_vars[target] = var
+        attr_vars = []
+        for i, (name, sources, default, formatter) in enumerate(self.attributes):
+            var = f"a{i}"
+            self.lines.append(f"    # Attribute {name}")
+            self.rule(var, f"attribute:{name}", sources, default, formatter)
+            attr_vars.append((name, var))
+        fields = ', '.join(f"{target!r}: {var}" for target, var in self.field_vars.items())
+        key_name, key_text = ATTRIBUTE_KEYS
+        attrs = ', '.join(f"{{{key_name!r}: {name!r}, {key_text!r}: {var}}}" for name, var in attr_vars)
+        self.lines.append(f"    return {{{fields}}}, [{attrs}]")
+        return '\n'.join(self.lines) + '\n'
+
+
+def generate_source(name, fields, attributes=(), slot_of=None, digest=None):
+    """규칙 → 모듈 소스 (transform, transform_traced 두 함수, 첫 줄은 나머지 소스의 sha256)"""
+    header = f"# {name} 필드 규칙에서 생성된 코드 (pipeline_common.fieldspec, spec sha256 {digest or '-'})\n"
+    plain = _Generator(fields, attributes, slot_of, traced=False).generate('transform')
+    traced = _Generator(fields, attributes, slot_of, traced=True).generate('transform_traced')
+    body = header + '\n' + plain + '\n' + traced
+    return _checksum_line(body) + body
+
+
+def _checksum_line(body):
+    return f"# sha256 {hashlib.sha256(body.encode('utf-8')).hexdigest()}\n"
+
+
+def verified_source(source):
+    """캐시에서 읽은 생성 코드의 첫 줄 sha256이 나머지 소스와 같으면 source, 아니면(손상/수정) None"""
+    line, sep, body = source.partition('\n')
+    return source if sep and line + sep == _checksum_line(body) else None
+
+
+class CompiledSpec:
+    """compile_spec 결과: transform/transform_traced와 생성 코드 경로"""
+
+    def __init__(self, name, digest, path, namespace):
+        self.name = name
+        self.digest = digest
+        self.path = path
+        self.transform = namespace['transform']
+        self.transform_traced = namespace['transform_traced']
+
+
+def compile_spec(name, fields, attributes=(), slot_of=None, formatters=None, use_cache=True):
+    """
+    규칙을 변환 함수로 컴파일 (같은 규칙 해시의 생성 코드가 캐시에 있고 sha256이 맞으면 그대로 사용)
+    formatters: 포맷터 이름 → 함수 (생성 코드의 전역 이름으로 제공)
+    """
+    digest = spec_digest(name, fields, attributes, slot_of)
+    path = os.path.join(cache_dir('fieldspec'), f"{name}_{digest[:16]}.py")
+    source = None
+    if use_cache:
+        try:
+            with open(path, encoding='utf-8') as f:
+                source = verified_source(f.read())
+        except OSError:
+            source = None
+    if source is None:
+        source = generate_source(name, fields, attributes, slot_of, digest)
+        if use_cache:
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp = f"{path}.{os.getpid()}.tmp"
+                with open(tmp, 'w', encoding='utf-8') as f:
+                    f.write(source)
+                os.replace(tmp, path)
+            except OSError:
+                pass    # 캐시 저장 실패는 무시 (다음 실행에서 다시 생성)
+    namespace = dict(formatters or {})
+    exec(compile(source, path, 'exec'), namespace)
+    return CompiledSpec(name, digest, path, namespace)
+
+
+def interpret_spec(fields, attributes, slot_of, values, ctx, formatters=None):
+    """
+    규칙을 레코드마다 해석하여 실행 (생성 코드와 같은 결과, 벤치마크/검증용 기준 구현)
+    """
+    formatters = formatters or {}
+    resolved = {}
+
+    def lookup(source):
+        ref = parse_source(source)
+        if ref is None:
+            return source
+        kind, name = ref
+        if kind == 'attr':
+            return values[slot_of[name]]
+        if kind == 'field':
+            return resolved[name]
+        return ctx.get(name)
+
+    def apply(sources, default, formatter):
+        value = None
+        for source in sources:
+            value = lookup(source)
+            if value:
+                break
+        if value and formatter:
+            value = formatters[formatter](value)
+        return value or lookup(default)
+
+    for target, sources, default, formatter in fields:
+        resolved[target] = apply(sources, default, formatter)
+    key_name, key_text = ATTRIBUTE_KEYS
+    attrs = [{key_name: name, key_text: apply(sources, default, formatter)}
+             for name, sources, default, formatter in attributes]
+    return resolved, attrs
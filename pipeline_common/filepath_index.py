@@ -0,0 +1,185 @@
+"""
+ddbj_run_file_path.xml 영구 색인 (SQLite, KAR accession → Read_* 파일 경로 + BIOPROJECT/BIOSAMPLE/EXPERIMENT ID)
+- 색인 파일: 캐시 디렉토리(XMLMETA_CACHE_DIR, 기본 .xmlmeta_cache)/filepath/<파일명>_<경로 해시>.sqlite
+- 원본의 (크기, mtime)가 색인 생성 당시와 같으면 그대로 사용 (stat 한 번 + SQLite 열기)
+  다르면 sha256을 계산해 같으면 (크기, mtime)만 갱신, 내용이 바뀌었으면 레코드 단위 스트리밍 파싱으로 다시 생성
+- FilePathIndex는 읽기 전용 Mapping: index[KAR] → {'Read_1': 경로, ...} (원본의 Read_* 순서, 빈 값 제외)
+  XML 전체를 읽지 않고 KAR별로 조회 (pipeline_run의 fix_run/compute_checksums에 dict 대신 그대로 전달)
+- 같은 KAR이 여러 번 나오면 dict 색인과 같이 마지막 레코드 값을 첫 등장 위치에 유지
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from collections.abc import Mapping
+
+from pipeline_common.fieldspec import cache_dir
+from pipeline_common.streaming import iter_records
+
+FILEPATH_INDEX_VERSION = 1
+READ_PREFIX = 'Read_'
+ID_TAGS = ('BIOPROJECT_ID', 'BIOSAMPLE_ID', 'EXPERIMENT_ID')
+HASH_CHUNK = 1 << 20
+
+_SCHEMA = (
+    "CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)",
+    "CREATE TABLE runs (accession TEXT PRIMARY KEY, reads TEXT NOT NULL,"
+    " bioproject TEXT, biosample TEXT, experiment TEXT)",
+)
+
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def index_path(source):
+    """원본 경로별 색인 파일 경로 (같은 파일명의 다른 원본과 겹치지 않도록 절대경로 해시 포함)"""
+    source = os.path.abspath(source)
+    tag = hashlib.sha1(source.encode('utf-8')).hexdigest()[:12]
+    name = os.path.splitext(os.path.basename(source))[0]
+    return os.path.join(cache_dir('filepath'), f"{name}_{tag}.sqlite")
+
+
+def _text(value):
+    if isinstance(value, dict):
+        value = value.get('#text')
+    return value if isinstance(value, str) else None
+
+
+def build_index(source, db_path, digest=None):
+    """source를 레코드 단위로 읽어 db_path에 색인 생성 (임시 파일에 만든 뒤 교체), 레코드 수 반환"""
+    st = os.stat(source)
+    digest = digest or file_sha256(source)
+    os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+    tmp = f"{db_path}.{os.getpid()}.tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    conn = sqlite3.connect(tmp)
+    count = 0
+    try:
+        for statement in _SCHEMA:
+            conn.execute(statement)
+        rows = []
+        for frun in iter_records(source, 'RUN'):
+            kar = (frun or {}).get('@accession')
+            if not kar:
+                continue
+            reads = [[key, val] for key, val in frun.items() if key.startswith(READ_PREFIX) and val]
+            rows.append((kar, json.dumps(reads, ensure_ascii=False)) + tuple(_text(frun.get(tag)) for tag in ID_TAGS))
+            count += 1
+            if len(rows) >= 10000:
+                _insert(conn, rows)
+                rows = []
+        _insert(conn, rows)
+        conn.executemany("INSERT INTO meta VALUES (?, ?)", [
+            ('version', str(FILEPATH_INDEX_VERSION)),
+            ('source', os.path.abspath(source)),
+            ('size', str(st.st_size)),
+            ('mtime_ns', str(st.st_mtime_ns)),
+            ('sha256', digest),
+            ('records', str(count)),
+        ])
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp, db_path)
+    return count
+
+
+def _insert(conn, rows):
+    # 같은 KAR은 값만 바꾸고 처음 등장한 위치(rowid) 유지
+    conn.executemany(
+        "INSERT INTO runs VALUES (?, ?, ?, ?, ?) ON CONFLICT(accession) DO UPDATE SET"
+        " reads=excluded.reads, bioproject=excluded.bioproject,"
+        " biosample=excluded.biosample, experiment=excluded.experiment",
+        rows,
+    )
+
+
+def _read_meta(db_path):
+    try:
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        try:
+            return dict(conn.execute("SELECT key, value FROM meta"))
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return None
+
+
+class FilePathIndex(Mapping):
+    """KAR → {'Read_*': 경로} 읽기 전용 매핑 (SQLite 조회)"""
+
+    def __init__(self, db_path, rebuilt=False, seconds=0.0):
+        self.path = db_path
+        self.rebuilt = rebuilt
+        self.seconds = seconds
+        self._conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, check_same_thread=False)
+
+    def __getitem__(self, kar):
+        row = self._conn.execute("SELECT reads FROM runs WHERE accession = ?", (kar,)).fetchone()
+        if row is None:
+            raise KeyError(kar)
+        return dict(json.loads(row[0]))
+
+    def __contains__(self, kar):
+        return self._conn.execute("SELECT 1 FROM runs WHERE accession = ?", (kar,)).fetchone() is not None
+
+    def __iter__(self):
+        return (row[0] for row in self._conn.execute("SELECT accession FROM runs ORDER BY rowid"))
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+
+    def values(self):
+        return [dict(json.loads(row[0])) for row in self._conn.execute("SELECT reads FROM runs ORDER BY rowid")]
+
+    def ids(self, kar):
+        """KAR → {'bioproject', 'biosample', 'experiment'} (없으면 None)"""
+        row = self._conn.execute(
+            "SELECT bioproject, biosample, experiment FROM runs WHERE accession = ?", (kar,)).fetchone()
+        return dict(zip(('bioproject', 'biosample', 'experiment'), row)) if row else None
+
+    def summary(self):
+        state = 'rebuilt' if self.rebuilt else 'reused'
+        return f"[FILEPATH] {len(self)} RUNs, index {state} in {self.seconds * 1e3:.1f} ms ({self.path})"
+
+    def close(self):
+        self._conn.close()
+
+
+def open_file_path_index(source, rebuild=False):
+    """
+    source(ddbj_run_file_path.xml)의 색인을 열어 FilePathIndex 반환 (원본이 바뀌었으면 다시 생성)
+    원본이 없으면 None
+    """
+    if not os.path.exists(source):
+        return None
+    start = time.perf_counter()
+    db_path = index_path(source)
+    st = os.stat(source)
+    meta = None if rebuild else _read_meta(db_path)
+    rebuilt = False
+    if not meta or meta.get('version') != str(FILEPATH_INDEX_VERSION):
+        build_index(source, db_path)
+        rebuilt = True
+    elif meta.get('size') != str(st.st_size) or meta.get('mtime_ns') != str(st.st_mtime_ns):
+        digest = file_sha256(source)
+        if digest == meta.get('sha256'):
+            # 내용은 같고 mtime만 바뀜 (복사/touch): 기준 stat만 갱신
+            conn = sqlite3.connect(db_path)
+            try:
+                conn.executemany("UPDATE meta SET value = ? WHERE key = ?",
+                                 [(str(st.st_size), 'size'), (str(st.st_mtime_ns), 'mtime_ns')])
+                conn.commit()
+            finally:
+                conn.close()
+        else:
+            build_index(source, db_path, digest)
+            rebuilt = True
+    return FilePathIndex(db_path, rebuilt, time.perf_counter() - start)
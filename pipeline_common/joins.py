@@ -0,0 +1,310 @@
+"""
+교차 문서 조인 색인 (BioProject ↔ BioSample ↔ Experiment ↔ Run ↔ 파일 경로)
+- 입력 문서마다 한 번씩만 순회하여 조인 키(KAP/KAS/KAE/KAR)와 보조 값만 보관한 뒤 dict 조회로 연결
+    KAP → samples(KAS), KAS → experiments(KAE), KAE → runs(KAR), KAR → files, KAP → runs
+- 조인 근거: ddbj_run_file_path.xml의 BIOPROJECT_ID/BIOSAMPLE_ID/EXPERIMENT_ID(있으면 우선),
+  RUN의 EXPERIMENT_REF, EXPERIMENT의 STUDY_REF/SAMPLE_DESCRIPTOR, SAMPLE의 bioProjectId 속성
+  (RUN TITLE 마지막 단어 = sampleName 같은 간접 연결은 사용하지 않음)
+- 조인별 커버리지: matched(대상 레코드 있음), unmatched(참조 없음/대상 레코드 없음),
+  ambiguous(근거끼리 서로 다른 대상을 가리킴, 우선순위가 높은 근거 사용 — matched/unmatched에도 포함)
+- 문서는 파싱된 dict 또는 {'RUN_SET': {'RUN': iter_records(...)}}처럼 레코드 iterator를 감싼 dict 모두 가능
+"""
+import os
+
+from pipeline_common.streaming import iter_records
+
+RUN_DATE_TAGS = ('KOBIC_submission_date', 'KOBIC_registration_date', 'KOBIC_release_date')
+JOINS = ('sample→project', 'experiment→sample', 'experiment→project', 'run→experiment', 'run→project', 'run→files')
+
+# 입력 이름 → (루트 태그, 레코드 태그)
+RECORD_TAGS = {
+    'bioproject': ('PackageSet', 'Package'),
+    'biosample': ('SAMPLE_SET', 'SAMPLE'),
+    'experiment': ('EXPERIMENT_SET', 'EXPERIMENT'),
+    'run': ('RUN_SET', 'RUN'),
+    'run_file_path': ('RUN_SET', 'RUN'),
+}
+
+
+def _records(doc, root_tag, record_tag):
+    records = ((doc or {}).get(root_tag) or {}).get(record_tag) or []
+    return [records] if isinstance(records, dict) else records
+
+
+def _as_list(value):
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _text(value):
+    """xmltodict 값 → 문자열 (속성이 있는 요소는 '#text')"""
+    if isinstance(value, dict):
+        value = value.get('#text')
+    return value.strip() if isinstance(value, str) and value.strip() else None
+
+
+def _append(index, key, value):
+    if key not in index:
+        index[key] = []
+    index[key].append(value)
+
+
+class JoinIndex:
+    def __init__(self):
+        # 문서별 레코드 (입력 순서 유지)
+        self.project_owners = {}        # KAP → {'owner_name', 'contact_email'}
+        self.samples = {}               # KAS → {'project', 'taxID', 'OrganismName'}
+        self.experiments = {}           # KAE → {'sample', 'project'}
+        self.runs = {}                  # KAR → {'experiment', 'dates'}
+        self.run_file_ids = {}          # KAR → {'project', 'sample', 'experiment'} (ddbj_run_file_path.xml)
+        self.run_files = {}             # KAR → [파일 경로]
+        self.loaded = set()
+        # 결정된 조인 (finalize)
+        self.sample_project = {}
+        self.experiment_sample = {}
+        self.experiment_project = {}
+        self.run_experiment = {}
+        self.run_project = {}
+        self.project_samples = {}
+        self.sample_experiments = {}
+        self.experiment_runs = {}
+        self.project_runs = {}
+        self.coverage = {}
+
+    # --- 문서별 1회 순회 -------------------------------------------------
+
+    def add_bioproject(self, doc):
+        self.loaded.add('bioproject')
+        for pkg in _records(doc, *RECORD_TAGS['bioproject']):
+            try:
+                proj = pkg['Project']['Project']
+                proj_id = proj['ProjectID']['ArchiveID']['@accession']
+                org = proj['ProjectDescr'].get('SubmitterOrganization', 'unknown')
+            except Exception:
+                continue
+            self.project_owners[proj_id] = {'owner_name': org, 'contact_email': None}
+
+    def add_biosample(self, doc):
+        self.loaded.add('biosample')
+        for sample in _records(doc, *RECORD_TAGS['biosample']):
+            sample = sample or {}
+            sn = sample.get('SAMPLE_NAME') or {}
+            entry = {'project': None, 'taxID': sn.get('TAXON_ID'), 'OrganismName': sn.get('SCIENTIFIC_NAME')}
+            accession = sample.get('@accession')
+            attrs = (sample.get('SAMPLE_ATTRIBUTES') or {}).get('SAMPLE_ATTRIBUTE')
+            for attr in _as_list(attrs):
+                tag = attr.get('TAG')
+                val = attr.get('VALUE')
+                if tag == 'bioProjectId':
+                    entry['project'] = val
+                elif tag == 'bioSampleId' and not accession:
+                    accession = val
+                elif tag == 'NCBITaxonomyID' and not entry['taxID']:
+                    entry['taxID'] = val
+                elif tag == 'organism' and not entry['OrganismName']:
+                    entry['OrganismName'] = val
+            # accession이 없는 SAMPLE도 bioProjectId 기준 Organism 후보에는 포함
+            self.samples[accession or ('#', len(self.samples))] = entry
+
+    def add_experiment(self, doc):
+        self.loaded.add('experiment')
+        for exp in _records(doc, *RECORD_TAGS['experiment']):
+            exp = exp or {}
+            accession = exp.get('@accession')
+            if not accession:
+                continue
+            descriptor = (exp.get('DESIGN') or {}).get('SAMPLE_DESCRIPTOR') or {}
+            study = exp.get('STUDY_REF') or {}
+            entry = {
+                'sample': descriptor.get('@accession') if isinstance(descriptor, dict) else None,
+                'project': study.get('@accession') if isinstance(study, dict) else None,
+            }
+            self.experiments[accession] = entry
+
+    def add_run(self, doc):
+        self.loaded.add('run')
+        for run in _records(doc, *RECORD_TAGS['run']):
+            run = run or {}
+            accession = run.get('@accession')
+            if not accession:
+                continue
+            ref = run.get('EXPERIMENT_REF') or {}
+            dates = {}
+            attrs = (run.get('RUN_ATTRIBUTES') or {}).get('RUN_ATTRIBUTE')
+            for attr in _as_list(attrs):
+                if attr.get('TAG') in RUN_DATE_TAGS:
+                    dates[attr['TAG']] = attr.get('VALUE')
+            self.runs[accession] = {
+                'experiment': ref.get('@accession') if isinstance(ref, dict) else None,
+                'dates': dates,
+            }
+
+    def add_run_file_path(self, doc):
+        self.loaded.add('run_file_path')
+        for run in _records(doc, *RECORD_TAGS['run_file_path']):
+            run = run or {}
+            accession = run.get('@accession')
+            if not accession:
+                continue
+            self.run_file_ids[accession] = {
+                'project': _text(run.get('BIOPROJECT_ID')),
+                'sample': _text(run.get('BIOSAMPLE_ID')),
+                'experiment': _text(run.get('EXPERIMENT_ID')),
+            }
+            files = []
+            for key, value in run.items():
+                if key.startswith('Read_'):
+                    files.extend(path for path in map(_text, _as_list(value)) if path)
+            self.run_files[accession] = files
+
+    # --- 조인 결정 -------------------------------------------------------
+
+    def _resolve(self, name, keys, sources, targets):
+        """
+        keys 레코드마다 sources(우선순위 순 함수 목록)로 대상 키를 찾고 커버리지 기록
+        targets: 대상 레코드 dict (문서가 로드되지 않았으면 None → 참조만 있으면 matched)
+        """
+        result = {}
+        matched = unmatched = ambiguous = 0
+        for key in keys:
+            found = [value for value in (source(key) for source in sources) if value]
+            target = found[0] if found else None
+            if target and (targets is None or target in targets):
+                matched += 1
+            else:
+                unmatched += 1
+            if len(set(found)) > 1:
+                ambiguous += 1
+            if target:
+                result[key] = target
+        self.coverage[name] = {'records': len(keys), 'matched': matched, 'unmatched': unmatched, 'ambiguous': ambiguous}
+        return result
+
+    def _targets(self, name, records):
+        return records if name in self.loaded else None
+
+    def finalize(self):
+        files = self.run_file_ids
+        exp_runs_ids = {}       # KAE → ddbj_run_file_path.xml의 (project, sample) 목록
+        for run_id, ids in files.items():
+            if ids['experiment']:
+                _append(exp_runs_ids, ids['experiment'], ids)
+        projects = self._targets('bioproject', self.project_owners)
+        samples = self._targets('biosample', self.samples)
+        experiments = self._targets('experiment', self.experiments)
+
+        self.run_experiment = self._resolve('run→experiment', list(self.runs), [
+            lambda r: files.get(r, {}).get('experiment'),
+            lambda r: self.runs[r]['experiment'],
+        ], experiments)
+        self.experiment_sample = self._resolve('experiment→sample', list(self.experiments), [
+            lambda e: self.experiments[e]['sample'],
+            lambda e: next((ids['sample'] for ids in exp_runs_ids.get(e, ()) if ids['sample']), None),
+        ], samples)
+        self.experiment_project = self._resolve('experiment→project', list(self.experiments), [
+            lambda e: self.experiments[e]['project'],
+            lambda e: next((ids['project'] for ids in exp_runs_ids.get(e, ()) if ids['project']), None),
+        ], projects)
+        sample_exp_projects = {}
+        for exp_id, sample_id in self.experiment_sample.items():
+            if exp_id in self.experiment_project:
+                sample_exp_projects.setdefault(sample_id, self.experiment_project[exp_id])
+        self.sample_project = self._resolve('sample→project', list(self.samples), [
+            lambda s: self.samples[s]['project'],
+            lambda s: sample_exp_projects.get(s),
+        ], projects)
+        self.run_project = self._resolve('run→project', list(self.runs), [
+            lambda r: files.get(r, {}).get('project'),
+            lambda r: self.experiment_project.get(self.run_experiment.get(r)),
+            lambda r: self.sample_project.get(self.experiment_sample.get(self.run_experiment.get(r))),
+        ], projects)
+        run_ids = list(self.runs) if 'run' in self.loaded else list(self.run_files)
+        self._resolve('run→files', run_ids, [lambda r: r if self.run_files.get(r) else None], None)
+
+        # 역방향 색인 (입력 순서 유지)
+        self.project_samples, self.sample_experiments, self.experiment_runs, self.project_runs = {}, {}, {}, {}
+        for sample_id, project_id in self.sample_project.items():
+            _append(self.project_samples, project_id, sample_id)
+        for exp_id, sample_id in self.experiment_sample.items():
+            _append(self.sample_experiments, sample_id, exp_id)
+        for run_id, exp_id in self.run_experiment.items():
+            _append(self.experiment_runs, exp_id, run_id)
+        for run_id, project_id in self.run_project.items():
+            _append(self.project_runs, project_id, run_id)
+        return self
+
+    # --- 파이프라인용 보조 맵 --------------------------------------------
+
+    def project_organisms(self):
+        """
+        KAP → Organism 후보 목록 (SAMPLE 순서, taxID/OrganismName 쌍별 샘플 수)
+        예: {'KAP240632': [{'taxID': '10116', 'OrganismName': 'Rattus norvegicus', 'count': 3}, ...]}
+        """
+        result = {}
+        for project_id, sample_ids in self.project_samples.items():
+            candidates = result[project_id] = []
+            for sample_id in sample_ids:
+                sample = self.samples[sample_id]
+                for candidate in candidates:
+                    if candidate['taxID'] == sample['taxID'] and candidate['OrganismName'] == sample['OrganismName']:
+                        candidate['count'] += 1
+                        break
+                else:
+                    candidates.append({'taxID': sample['taxID'], 'OrganismName': sample['OrganismName'], 'count': 1})
+        return result
+
+    def project_run_dates(self):
+        """KAP → 대표 KOBIC_*_date (RUN 입력 순서에서 날짜가 있는 첫 RUN)"""
+        result = {}
+        for run_id, run in self.runs.items():
+            project_id = self.run_project.get(run_id)
+            if project_id and project_id not in result and run['dates']:
+                result[project_id] = run['dates']
+        return result
+
+    def coverage_lines(self, names=JOINS):
+        lines = []
+        for name in names:
+            st = self.coverage.get(name)
+            if st and st['records']:
+                lines.append(f"[JOIN] {name}: {st['records']} records, matched {st['matched']}, "
+                             f"unmatched {st['unmatched']}, ambiguous {st['ambiguous']}")
+        return lines
+
+    def write_report(self, report_path, names=JOINS):
+        """names 조인의 커버리지를 출력하고 리포트 파일 끝에 추가"""
+        lines = self.coverage_lines(names)
+        if lines:
+            for line in lines:
+                print(line)
+            with open(report_path, 'a', encoding='utf-8') as rf:
+                if rf.tell():
+                    rf.write('\n')
+                rf.write('\n'.join(lines))
+
+
+def build_join_index(docs):
+    """docs: 입력 이름(RECORD_TAGS) → 파싱된 dict (없는 입력은 None 또는 생략)"""
+    index = JoinIndex()
+    adders = {
+        'bioproject': index.add_bioproject,
+        'biosample': index.add_biosample,
+        'experiment': index.add_experiment,
+        'run': index.add_run,
+        'run_file_path': index.add_run_file_path,
+    }
+    for name, add in adders.items():
+        if docs.get(name) is not None:
+            add(docs[name])
+    return index.finalize()
+
+
+def stream_join_index(paths):
+    """--stream 모드: 입력 이름 → 경로의 각 파일을 레코드 단위로 한 번씩 읽어 조인 색인 생성 (없는 파일은 생략)"""
+    docs = {}
+    for name, (root_tag, record_tag) in RECORD_TAGS.items():
+        path = paths.get(name)
+        if path and os.path.exists(path):
+            docs[name] = {root_tag: {record_tag: iter_records(path, record_tag)}}
+    return build_join_index(docs)
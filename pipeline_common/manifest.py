@@ -0,0 +1,259 @@
+"""
+그룹별 출력 파일의 증분 재생성용 매니페스트 (--incremental)
+- 그룹 파일 경로 → (그룹 해시, 파일 크기/mtime, 검증 결과/리포트)를 JSON으로 보관
+- 레코드 입력 해시: 보정 전 입력 레코드와 그 레코드의 보조 입력(CSV, file_path.xml, biosample 등 조회 결과)의 sha256
+  → 해시가 같은 레코드는 보정하지 않고 이전 보정 결과를 사용 (fix_records, 캐시: .xmlmeta_cache/incremental/)
+  → 보정 중 결정기(resolver) 호출은 함께 기록했다가 다시 호출하여 리포트([ORGANISM]/[INSTRUMENT])를 그대로 유지
+- 그룹 해시: 파이프라인이 그룹의 입력(레코드 입력 해시 + 그룹별 보정 인자)을 등록했으면 그 해시(set_group_inputs),
+  아니면 보정이 끝난 그룹 문서(dict) 또는 조립된 XML 문자열의 sha256 (--stream)
+- 파이프라인 버전: 파이프라인 코드, 공용 저장/검증 모듈, XSD 내용, 출력 모드(pretty/compact)의 해시
+  → 버전이 바뀌면 매니페스트 전체를 무효화
+- 해시와 버전이 같고 출력 파일이 그대로면 저장/검증을 건너뛰고 이전 검증 결과를 그대로 사용
+- 단일 검증 모드의 전체 보정본: 파일 내용 해시 → 검증 결과/리포트 (모든 그룹이 그대로이고 해시가 같으면 재검증 생략)
+"""
+import hashlib
+import json
+import os
+
+from pipeline_common.fieldspec import cache_dir
+from pipeline_common.xmlwriter import default_pretty
+
+MANIFEST_VERSION = 1
+
+# 출력 내용에 영향을 주는 공용 모듈
+_COMMON_DIR = os.path.dirname(os.path.abspath(__file__))
+COMMON_SOURCES = [
+    os.path.join(_COMMON_DIR, "xmlwriter.py"),
+    os.path.join(_COMMON_DIR, "streaming.py"),
+    os.path.join(_COMMON_DIR, "validation.py"),
+    os.path.join(_COMMON_DIR, "fieldspec.py"),
+    os.path.join(_COMMON_DIR, "joins.py"),
+    os.path.join(_COMMON_DIR, "rewrite.py"),
+    os.path.join(_COMMON_DIR, "filepath_index.py"),
+    os.path.join(_COMMON_DIR, "schema_order.py"),
+    os.path.join(_COMMON_DIR, "prevalidate.py"),
+    os.path.join(_COMMON_DIR, "vocab.py"),
+    os.path.join(_COMMON_DIR, "submission_map.py"),
+]
+
+
+def pipeline_version(*paths):
+    """파이프라인 코드/XSD 등 paths와 공용 모듈의 내용으로 버전 해시 생성 (실행 위치와 무관)"""
+    h = hashlib.sha256()
+    h.update(f"manifest={MANIFEST_VERSION};pretty={default_pretty()}".encode("utf-8"))
+    for path in list(paths) + COMMON_SOURCES:
+        try:
+            with open(path, "rb") as f:
+                h.update(hashlib.sha256(f.read()).digest())
+        except OSError:
+            h.update(f"<missing {os.path.basename(path)}>".encode("utf-8"))
+    return h.hexdigest()
+
+
+def group_digest(group_doc):
+    """그룹 문서(dict) 또는 XML 문자열의 내용 해시"""
+    if isinstance(group_doc, str):
+        data = group_doc
+    else:
+        data = json.dumps(group_doc, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def record_digest(record, aux=None):
+    """입력 레코드와 보조 입력(aux)의 해시 (보정 전에 계산)"""
+    return group_digest([record, aux])
+
+
+def file_digest(path):
+    """파일 내용의 sha256 (파일이 없으면 None)"""
+    h = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+    except OSError:
+        return None
+    return h.hexdigest()
+
+
+def _file_state(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+def _load_json(path, version):
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) and data.get("version") == version else {}
+
+
+def _dump_json(path, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+class CallRecorder:
+    """
+    결정기(resolver)의 메서드 호출을 기록하는 대리 객체 (fix_records)
+    - 보정 함수에 결정기 대신 넘기면 methods 호출 인자를 기록하고 결과는 결정기 그대로 반환
+    - 이전 보정 결과를 쓰는 레코드는 기록해 둔 호출을 replay로 다시 실행하여 결정 내역(리포트)을 채움
+    """
+
+    def __init__(self, target, *methods):
+        self.target = target
+        self.calls = []
+        for name in methods:
+            setattr(self, name, self._recording(name))
+
+    def _recording(self, name):
+        method = getattr(self.target, name)
+
+        def call(*args):
+            self.calls.append([name, list(args)])
+            return method(*args)
+        return call
+
+    def __getattr__(self, name):
+        return getattr(self.target, name)
+
+    def take(self):
+        calls, self.calls = self.calls, []
+        return calls
+
+    def replay(self, calls):
+        for name, args in calls:
+            getattr(self.target, name)(*args)
+
+
+class GroupManifest:
+    def __init__(self, path, version):
+        self.path = path
+        self.version = version
+        # 레코드 보정 결과 캐시는 출력 디렉토리 밖 공용 캐시 디렉토리에 매니페스트별로 보관
+        self.records_path = os.path.join(cache_dir("incremental"), os.path.basename(path))
+        self.groups = {}
+        self.documents = {}
+        self.records = {}
+        self.inputs = {}        # id(보정된 레코드) → 입력 해시 (이번 실행의 그룹 해시용, 저장하지 않음)
+        self.group_inputs = {}  # 그룹 파일 경로 → 그룹 입력 해시
+        data = _load_json(path, version)
+        self._previous = data.get("groups", {})
+        self._previous_documents = data.get("documents", {})
+        self._previous_records = _load_json(self.records_path, version).get("records", {})
+        self.hits = 0
+        self.misses = 0
+        self.record_hits = 0
+        self.record_misses = 0
+
+    def fix_records(self, records, fix, aux=None, recorder=None):
+        """
+        입력 해시가 같은 레코드는 fix 없이 이전 보정 결과(새 객체)를, 나머지는 fix(record) 결과를 순서대로 반환
+        aux(record): 레코드 보정에 쓰이는 보조 입력 (JSON 직렬화 가능한 값)
+        recorder: fix가 사용하는 CallRecorder (보정 결과와 함께 호출을 기록, 재사용할 때 다시 호출)
+        """
+        fixed = []
+        for record in records:
+            digest = record_digest(record, aux(record) if aux else None)
+            entry = self.records.get(digest) or self._previous_records.get(digest)
+            if entry is not None:
+                if recorder is not None:
+                    recorder.replay(entry["calls"])
+                result = json.loads(entry["fixed"])
+                self.record_hits += 1
+            else:
+                result = fix(record)
+                entry = {
+                    "fixed": json.dumps(result, ensure_ascii=False, separators=(",", ":")),
+                    "calls": recorder.take() if recorder is not None else [],
+                }
+                self.record_misses += 1
+            self.records[digest] = entry
+            self.inputs[id(result)] = digest
+            fixed.append(result)
+        return fixed
+
+    def set_group_inputs(self, out_path, records, *extra):
+        """
+        그룹 해시를 그룹 레코드의 입력 해시와 그룹별 보정 인자(extra)로 정함 (fix_records로 보정한 레코드만 있을 때)
+        → 변경 없는 그룹은 그룹 문서를 직렬화/해시하지 않고 건너뜀
+        """
+        digests = [self.inputs.get(id(record)) for record in records]
+        if digests and None not in digests:
+            self.group_inputs[out_path] = group_digest([list(extra), digests])
+
+    def digest(self, out_path, group_doc):
+        """그룹 해시 (등록된 그룹 입력 해시, 없으면 그룹 내용 해시)"""
+        return self.group_inputs.get(out_path) or group_digest(group_doc)
+
+    def lookup(self, out_path, digest):
+        """
+        변경 없는 그룹이면 이전 (valid, xsd_report) 반환, 다시 만들어야 하면 None
+        """
+        entry = self._previous.get(out_path)
+        if entry and entry["digest"] == digest and entry["file"] == _file_state(out_path):
+            self.groups[out_path] = entry
+            self.hits += 1
+            return entry["valid"], entry["report"]
+        self.misses += 1
+        return None
+
+    def record(self, out_path, digest, valid, xsd_report):
+        self.groups[out_path] = {
+            "digest": digest,
+            "file": _file_state(out_path),
+            "valid": valid,
+            "report": xsd_report,
+        }
+
+    def set_result(self, out_path, valid, xsd_report):
+        """이번 실행에 기록된 그룹의 검증 결과 갱신 (단일 검증 모드: 저장 후 전체 문서 검증 결과로 채움)"""
+        entry = self.groups.get(out_path)
+        if entry is not None:
+            entry["valid"] = valid
+            entry["report"] = xsd_report
+
+    def lookup_document(self, path, digest):
+        """내용이 같은 전체 보정본이면 이전 (valid, xsd_report) 반환, 아니면 None"""
+        entry = self._previous_documents.get(path)
+        if digest and entry and entry["digest"] == digest:
+            self.documents[path] = entry
+            return entry["valid"], entry["report"]
+        return None
+
+    def record_document(self, path, digest, valid, xsd_report):
+        if digest:
+            self.documents[path] = {"digest": digest, "valid": valid, "report": xsd_report}
+
+    def save(self, partial=False):
+        """
+        이번 실행에 없던 그룹/레코드는 매니페스트에서 제외
+        partial=True(일부만 처리한 실행, 예: pipeline_submission <run_id>)면 이전 항목에 이번 실행 항목을 병합
+        """
+        groups, documents, records = self.groups, self.documents, self.records
+        if partial:
+            groups = dict(self._previous, **groups)
+            documents = dict(self._previous_documents, **documents)
+            records = dict(self._previous_records, **records)
+        _dump_json(self.path, {"version": self.version, "groups": groups, "documents": documents})
+        if records:
+            os.makedirs(os.path.dirname(self.records_path), exist_ok=True)
+            _dump_json(self.records_path, {"version": self.version, "records": records})
+
+    def summary(self, name):
+        line = f"[INCREMENTAL] {name}: {self.misses} regenerated, {self.hits} unchanged"
+        if self.record_hits or self.record_misses:
+            line += f" (records: {self.record_misses} fixed, {self.record_hits} reused)"
+        return line
+
+
+def load_manifest(path, *version_paths):
+    """path의 매니페스트를 읽어 GroupManifest 반환 (버전: version_paths + 공용 모듈)"""
+    return GroupManifest(path, pipeline_version(*version_paths))
@@ -0,0 +1,210 @@
+"""
+파이프라인 단계별 계측 (--metrics 또는 XMLMETA_METRICS=1)
+- 단계(parse/aux_maps/fix_structure/group/serialize/validate)별 소요 시간, 호출 수, 입력/출력 레코드 수,
+  단계 종료 시점의 최대 RSS를 누적 (같은 단계를 여러 번 실행하면 합산 → 스트리밍 모드의 레코드별 처리도 집계)
+- 카운터: 저장 파일 수/바이트 수, XSD 검증 수/실패 수, 증분 모드에서 유지된 파일 수 등
+- 결과는 xml_fixed/<파이프라인>_metrics.json 과 Prometheus 텍스트 형식 xml_fixed/<파이프라인>_metrics.prom 으로 저장
+- 비활성화 시에는 NULL_METRICS(아무 것도 하지 않는 객체)를 사용하므로 계측 비용은 함수 호출 1회 수준
+"""
+import contextlib
+import json
+import os
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # Windows 등 resource 모듈이 없는 환경에서는 최대 RSS 0
+    resource = None
+
+# 계측 활성화: "1"/"true"/"yes"이면 --metrics 없이도 계측
+METRICS_ENV = "XMLMETA_METRICS"
+METRICS_DIR = "xml_fixed"
+PROM_PREFIX = "xmlmeta"
+
+
+def peak_rss_bytes(children=False):
+    """현재 프로세스(children=True면 종료된 자식 프로세스) 최대 RSS(bytes), 측정 불가 환경에서는 0"""
+    if resource is None:
+        return 0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    # ru_maxrss 단위: Linux는 KiB, macOS는 bytes
+    return usage.ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+
+
+def metrics_enabled():
+    return os.environ.get(METRICS_ENV, "").strip().lower() in ("1", "true", "yes")
+
+
+class StageCall:
+    """stage() 블록 안에서 출력 레코드 수 등을 채우는 객체 (블록 종료 시 단계 합계에 더해짐)"""
+    __slots__ = ('records_in', 'records_out')
+
+    def __init__(self, records_in=0, records_out=0):
+        self.records_in = records_in
+        self.records_out = records_out
+
+
+class Metrics:
+    enabled = True
+
+    def __init__(self, pipeline):
+        self.pipeline = pipeline
+        self.stages = {}    # 단계 이름 → 누적값 (최초 실행 순서 유지)
+        self.counters = {}
+        self._start = time.perf_counter()
+        self._started_at = time.strftime('%Y-%m-%dT%H:%M:%S%z')
+
+    def _entry(self, name):
+        entry = self.stages.get(name)
+        if entry is None:
+            entry = self.stages[name] = {
+                'seconds': 0.0, 'calls': 0, 'records_in': 0, 'records_out': 0, 'peak_rss_bytes': 0,
+            }
+        return entry
+
+    def record(self, name, seconds, calls=1, records_in=0, records_out=0):
+        """단계 소요 시간을 직접 더함 (worker 프로세스에서 측정한 시간 등)"""
+        entry = self._entry(name)
+        entry['seconds'] += seconds
+        entry['calls'] += calls
+        entry['records_in'] += records_in
+        entry['records_out'] += records_out
+        entry['peak_rss_bytes'] = max(entry['peak_rss_bytes'], peak_rss_bytes())
+
+    @contextlib.contextmanager
+    def stage(self, name, records_in=0, records_out=0):
+        call = StageCall(records_in, records_out)
+        start = time.perf_counter()
+        try:
+            yield call
+        finally:
+            self.record(name, time.perf_counter() - start, 1, call.records_in, call.records_out)
+
+    def timed_iter(self, name, iterable):
+        """iterable에서 항목을 꺼내는 시간을 name 단계로 집계 (스트리밍 모드의 레코드 파싱)"""
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.record(name, time.perf_counter() - start, 0)
+                return
+            self.record(name, time.perf_counter() - start, 1, 0, 1)
+            yield item
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def add_file(self, path):
+        """저장한 파일 수/바이트 수 집계"""
+        self.count('files_written')
+        try:
+            self.count('bytes_written', os.path.getsize(path))
+        except OSError:
+            pass
+
+    def validation(self, valid):
+        self.count('validations')
+        if not valid:
+            self.count('validation_failures')
+
+    def to_dict(self):
+        return {
+            'pipeline': self.pipeline,
+            'started': self._started_at,
+            'wall_seconds': time.perf_counter() - self._start,
+            'peak_rss_bytes': peak_rss_bytes(),
+            'peak_rss_children_bytes': peak_rss_bytes(children=True),
+            'stages': [dict(stage=name, **entry) for name, entry in self.stages.items()],
+            'counters': dict(self.counters),
+        }
+
+    def to_prometheus(self):
+        """Prometheus 텍스트 노출 형식 (node_exporter textfile collector 등에서 수집 가능)"""
+        data = self.to_dict()
+        label = f'pipeline="{self.pipeline}"'
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {PROM_PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {PROM_PREFIX}_{name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{PROM_PREFIX}_{name}{{{labels}}} {value}")
+
+        stage_fields = [
+            ('stage_seconds_total', 'seconds', 'Time spent in each pipeline stage.'),
+            ('stage_calls_total', 'calls', 'Number of times each pipeline stage ran.'),
+            ('stage_records_in_total', 'records_in', 'Records consumed by each pipeline stage.'),
+            ('stage_records_out_total', 'records_out', 'Records produced by each pipeline stage.'),
+        ]
+        for name, field, help_text in stage_fields:
+            metric(name, 'counter', help_text,
+                   [(f'{label},stage="{st["stage"]}"', st[field]) for st in data['stages']])
+        metric('stage_peak_rss_bytes', 'gauge', 'Peak RSS observed at the end of each pipeline stage.',
+               [(f'{label},stage="{st["stage"]}"', st['peak_rss_bytes']) for st in data['stages']])
+        for name, value in data['counters'].items():
+            metric(f"{name}_total", 'counter', f"Pipeline counter {name}.", [(label, value)])
+        metric('wall_seconds', 'gauge', 'Wall time of the pipeline run.', [(label, data['wall_seconds'])])
+        metric('peak_rss_bytes', 'gauge', 'Peak RSS of the pipeline process.', [(label, data['peak_rss_bytes'])])
+        metric('peak_rss_children_bytes', 'gauge', 'Peak RSS of finished worker processes.',
+               [(label, data['peak_rss_children_bytes'])])
+        return '\n'.join(lines) + '\n'
+
+    def save(self, directory=METRICS_DIR):
+        """<directory>/<파이프라인>_metrics.json/.prom 저장 후 경로 출력"""
+        base = os.path.join(directory, f"{self.pipeline}_metrics")
+        with open(base + '.json', 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2, ensure_ascii=False)
+        with open(base + '.prom', 'w', encoding='utf-8') as f:
+            f.write(self.to_prometheus())
+        print(f"[METRICS] {self.pipeline}: {base}.json, {base}.prom")
+
+
+class _NullStage:
+    # 매번 새 컨텍스트 매니저를 만들지 않도록 하나를 재사용
+    _call = StageCall()
+
+    def __enter__(self):
+        return self._call
+
+    def __exit__(self, *exc):
+        return False
+
+
+class NullMetrics:
+    """계측 비활성화용: 모든 메서드가 아무 것도 하지 않음"""
+    enabled = False
+    _stage = _NullStage()
+
+    def record(self, name, seconds, calls=1, records_in=0, records_out=0):
+        pass
+
+    def stage(self, name, records_in=0, records_out=0):
+        return self._stage
+
+    def timed_iter(self, name, iterable):
+        return iterable
+
+    def count(self, name, n=1):
+        pass
+
+    def add_file(self, path):
+        pass
+
+    def validation(self, valid):
+        pass
+
+    def save(self, directory=METRICS_DIR):
+        pass
+
+
+NULL_METRICS = NullMetrics()
+
+
+def create_metrics(pipeline, enabled=None):
+    """enabled가 None이면 XMLMETA_METRICS 환경변수로 결정"""
+    if enabled is None:
+        enabled = metrics_enabled()
+    return Metrics(pipeline) if enabled else NULL_METRICS
@@ -0,0 +1,114 @@
+"""
+파싱 결과 디스크 캐시 (xml_submitted 입력 → pickle protocol 5)
+- 캐시 파일: 캐시 디렉토리(XMLMETA_CACHE_DIR, 기본 .xmlmeta_cache)/parsed/<파일명>_<경로 해시>.{pickle,json}
+    * .pickle: 파싱 결과, .json: 기준 정보(버전, 파서 키, 원본 크기/mtime/sha256)
+- 원본의 (크기, mtime)가 기준과 같으면 파싱 없이 pickle 로드
+  다르면 sha256을 계산해 같으면 기준 stat만 갱신하고 로드, 내용이 바뀌었으면 다시 파싱하여 저장
+- 파서 키(예: xmltodict 버전, CSV 인코딩)가 바뀌어도 다시 파싱
+- XMLMETA_PARSE_CACHE=0 환경변수로 끔 (항상 파싱, 캐시 파일을 읽거나 쓰지 않음)
+- 캐시를 읽거나 쓰지 못하면(손상, 권한 등) 파싱 결과를 그대로 사용 (캐시는 최선 노력)
+- 캐시 디렉토리는 신뢰할 수 있는 로컬 경로여야 함 (pickle 로드)
+"""
+import gc
+import hashlib
+import json
+import os
+import pickle
+
+from pipeline_common.fieldspec import cache_dir
+from pipeline_common.filepath_index import file_sha256
+
+PARSE_CACHE_VERSION = 1
+PARSE_CACHE_ENV = 'XMLMETA_PARSE_CACHE'
+PICKLE_PROTOCOL = 5
+
+
+def parse_cache_enabled():
+    return os.environ.get(PARSE_CACHE_ENV, '1').strip().lower() not in ('0', 'off', 'false', 'no')
+
+
+def cache_paths(source):
+    """원본 경로별 (기준 json, pickle) 경로 (같은 파일명의 다른 원본과 겹치지 않도록 절대경로 해시 포함)"""
+    source = os.path.abspath(source)
+    tag = hashlib.sha1(source.encode('utf-8')).hexdigest()[:12]
+    name = os.path.basename(source)
+    stem = os.path.join(cache_dir('parsed'), f"{name}_{tag}")
+    return f"{stem}.json", f"{stem}.pickle"
+
+
+def _read_json(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_atomic(path, write, mode):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, mode) as f:
+        write(f)
+    os.replace(tmp, path)
+
+
+def _write_meta(meta_path, meta):
+    _write_atomic(meta_path, lambda f: f.write(json.dumps(meta, ensure_ascii=False)), 'w')
+
+
+def _load_pickle(data_path):
+    # 작은 dict/list가 대량으로 생기는 동안 순환 GC가 반복 실행되지 않도록 로드 중에는 끔
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        with open(data_path, 'rb') as f:
+            return True, pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError, ValueError):
+        return False, None
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def load_cached(source, parse, key):
+    """
+    source를 parse(source)로 파싱한 결과를 캐시를 거쳐 반환 → (data, 상태)
+    상태: 'hit'(stat 일치), 'rehash'(stat은 다르지만 내용 같음), 'miss'(파싱 후 저장), 'off'(캐시 끔)
+    key: 파싱 방식 식별 문자열 (바뀌면 캐시 무효)
+    """
+    if not parse_cache_enabled():
+        return parse(source), 'off'
+    meta_path, data_path = cache_paths(source)
+    st = os.stat(source)
+    meta = _read_json(meta_path)
+    digest = None
+    if meta and meta.get('version') == PARSE_CACHE_VERSION and meta.get('key') == key:
+        state = 'hit'
+        if meta.get('size') != st.st_size or meta.get('mtime_ns') != st.st_mtime_ns:
+            digest = file_sha256(source)
+            state = 'rehash' if digest == meta.get('sha256') else None
+        if state:
+            ok, data = _load_pickle(data_path)
+            if ok:
+                if state == 'rehash':
+                    # 내용은 같고 mtime만 바뀜 (복사/touch): 기준 stat만 갱신
+                    meta.update(size=st.st_size, mtime_ns=st.st_mtime_ns)
+                    try:
+                        _write_meta(meta_path, meta)
+                    except OSError:
+                        pass
+                return data, state
+    data = parse(source)
+    try:
+        os.makedirs(os.path.dirname(data_path), exist_ok=True)
+        _write_atomic(data_path, lambda f: pickle.dump(data, f, PICKLE_PROTOCOL), 'wb')
+        _write_meta(meta_path, {
+            'version': PARSE_CACHE_VERSION,
+            'key': key,
+            'source': os.path.abspath(source),
+            'size': st.st_size,
+            'mtime_ns': st.st_mtime_ns,
+            'sha256': digest or file_sha256(source),
+        })
+    except OSError:
+        pass
+    return data, 'miss'
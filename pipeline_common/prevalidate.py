@@ -0,0 +1,192 @@
+"""
+XSD 제약 표를 이용한 레코드 사전 검사 (직렬화/XSD 검증 전, BioProject, BioSample, Experiment, Run 공용)
+- 제약은 pipeline_common.schema_order의 컴파일된 표에서 가져옴 (XSD별로 한 번 컴파일, 디스크 캐시)
+    * 요소 값/속성 값의 enumeration (기반 타입까지 따라감)
+    * 필수 속성(use="required"), 필수 자식 요소(minOccurs >= 1, xs:choice 아래는 제외)
+    * 최대 1회 자식 요소가 여러 번 나오는 경우
+- 레코드(xmltodict dict)를 타입별로 미리 만든 검사 계획(dict/set)으로 한 번 순회하며 위반 목록 생성
+  (XSD에 없는 자식/속성, 타입을 찾지 못한 요소는 검사하지 않으므로 위반이 있으면 XSD 검증도 실패)
+- enumeration(path): 경로의 허용값 (XSD → defaults 순, 파이프라인의 보정/어휘 색인에 사용)
+- 위반 형식: "<레코드 태그>[<accession>]/<경로>: <내용>"
+- 파이프라인은 fix_structure 직후 check_document로 레코드별 위반을 구하고, 위반이 있는 그룹은
+  pipeline_common.emit에서 XSD 검증 없이 precheck_report를 결과로 사용
+"""
+from collections import namedtuple
+
+from pipeline_common.metrics import NULL_METRICS
+from pipeline_common.schema_order import schema_index
+
+# children: 자식 이름 → (타입 키, 반복 가능 여부), required: 필수 자식 이름,
+# attributes: '@속성' → (필수 여부, 허용값 set 또는 None), text: 요소 값 허용값 set 또는 None
+_Plan = namedtuple('_Plan', 'children required attributes text')
+_EMPTY_PLAN = _Plan({}, (), {}, None)
+_SPECIAL = '@#'
+
+
+def _text(value):
+    # xmlwriter와 같은 문자열 변환 (bool은 소문자, None은 빈 값)
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return str(value)
+
+
+def _allowed(value, allowed):
+    # 공백 정규화(xs:token 계열) 후 값도 허용
+    return value in allowed or ' '.join(value.split()) in allowed
+
+
+class PreValidator:
+    """
+    XSD 하나의 제약 표로 레코드를 사전 검사
+    defaults: 경로 → 허용값 목록 (XSD에서 enumeration을 찾지 못한 경로에 사용, 예: XSD가 없을 때)
+    """
+
+    def __init__(self, xsd_path, defaults=None):
+        self.xsd_path = xsd_path
+        self.defaults = defaults or {}
+        self.index = schema_index(xsd_path)
+        self._plans = {}
+        self._enums = {}
+
+    def schema_enumeration(self, path):
+        """
+        XSD 기준 path의 허용값 튜플 (XSD 선언 순서, 없으면 None)
+        path의 마지막이 '@속성'이면 속성 값, 아니면 요소 값
+        """
+        parent, _, last = path.rpartition('/')
+        if last.startswith('@'):
+            type_key = self.index.resolve(parent)
+            if type_key is None:
+                return None
+            simple = next((key for name, _, key in self.index.attributes(type_key) if name == last[1:]), None)
+        else:
+            type_key = self.index.resolve(path)
+            simple = self.index.text_type(type_key) if type_key else None
+        return self.index.enumeration(simple) if simple else None
+
+    def enumeration(self, path):
+        """path의 허용값 튜플 (XSD → defaults, 둘 다 없으면 None)"""
+        if path not in self._enums:
+            values = self.schema_enumeration(path) or self.defaults.get(path)
+            self._enums[path] = tuple(values) if values else None
+        return self._enums[path]
+
+    def allowed(self, path):
+        """path의 허용값 set (XSD → defaults, 둘 다 없으면 None)"""
+        values = self.enumeration(path)
+        return frozenset(values) if values else None
+
+    def _plan(self, type_key):
+        plan = self._plans.get(type_key)
+        if plan is not None:
+            return plan
+        index = self.index
+        children = {}
+        required = []
+        for name, child_type, is_required, multi in index.children(type_key):
+            if name in children:
+                # 같은 이름이 여러 번 선언되면(선택지 등) 반복 가능, 필수 판단은 첫 선언 기준
+                children[name] = (children[name][0] or child_type, True)
+                continue
+            children[name] = (child_type, multi)
+            if is_required:
+                required.append(name)
+        attributes = {}
+        for name, is_required, simple in index.attributes(type_key):
+            enum = index.enumeration(simple) if simple else None
+            attributes['@' + name] = (is_required, frozenset(enum) if enum else None)
+        text_type = index.text_type(type_key)
+        text = index.enumeration(text_type) if text_type else None
+        plan = _Plan(children, tuple(required), attributes, frozenset(text) if text else None)
+        if not (children or attributes or text):
+            plan = _EMPTY_PLAN
+        self._plans[type_key] = plan
+        return plan
+
+    def check(self, record, path, label=None):
+        """record(path 요소 하나)의 위반 목록 (위반이 없으면 빈 리스트)"""
+        type_key = self.index.resolve(path)
+        if type_key is None:
+            return []
+        tag = path.rsplit('/', 1)[-1]
+        if label is None and isinstance(record, dict):
+            label = record.get('@accession')
+        violations = []
+        self._walk(record, type_key, f"{tag}[{label}]" if label else tag, violations)
+        return violations
+
+    def _walk(self, node, type_key, where, violations):
+        plan = self._plan(type_key)
+        if plan is _EMPTY_PLAN:
+            return
+        items = node if isinstance(node, dict) else {}
+        if plan.text is not None:
+            value = _text(items.get('#text') if isinstance(node, dict) else node)
+            if not _allowed(value, plan.text):
+                violations.append(f"{where}: 값 {value!r}이(가) 허용값(enumeration)에 없음")
+        for attr, (is_required, allowed) in plan.attributes.items():
+            if attr in items:
+                if allowed is not None:
+                    value = _text(items[attr])
+                    if not _allowed(value, allowed):
+                        violations.append(f"{where}/{attr}: 값 {value!r}이(가) 허용값(enumeration)에 없음")
+            elif is_required:
+                violations.append(f"{where}: 필수 속성 {attr} 없음")
+        for name in plan.required:
+            if name not in items or items[name] == []:
+                violations.append(f"{where}: 필수 요소 {name} 없음")
+        for key, value in items.items():
+            if key[0] in _SPECIAL:
+                continue
+            child = plan.children.get(key)
+            if child is None:
+                continue
+            child_type, multi = child
+            values = value if isinstance(value, list) else (value,)
+            if not multi and len(values) > 1:
+                violations.append(f"{where}/{key}: 최대 1회인 요소가 {len(values)}회 나옴")
+            if child_type is not None:
+                for item in values:
+                    self._walk(item, child_type, f"{where}/{key}", violations)
+
+    def check_records(self, records, path):
+        """레코드 목록 → {레코드 위치: 위반 목록} (위반이 있는 레코드만)"""
+        found = {}
+        for i, record in enumerate(records):
+            violations = self.check(record, path)
+            if violations:
+                found[i] = violations
+        return found
+
+    def check_document(self, doc, root_tag, record_tag, metrics=NULL_METRICS):
+        """
+        파싱된 문서의 <root_tag> 아래 record_tag 레코드 → {문서 루트 아래 위치: 위반 목록}
+        위반이 있으면 [PRECHECK] 요약을 출력하고 metrics에 위반 레코드 수를 집계
+        """
+        records = ((doc or {}).get(root_tag) or {}).get(record_tag) or []
+        if isinstance(records, dict):
+            records = [records]
+        found = self.check_records(records, f"{root_tag}/{record_tag}")
+        print_precheck_summary(record_tag, len(found), len(records), metrics)
+        return found
+
+
+def print_precheck_summary(record_tag, failed, total, metrics=NULL_METRICS):
+    """위반 레코드가 있으면 [PRECHECK] 요약 출력 + metrics에 위반 레코드 수 집계"""
+    if not failed:
+        return
+    metrics.count('precheck_failed_records', failed)
+    print(f"[PRECHECK] {record_tag}: {failed}/{total} records violate XSD constraints (해당 그룹은 XSD 검증 생략, 리포트 참조)")
+
+
+def group_violations(found, indices):
+    """check_document 결과에서 그룹 레코드(문서 루트 아래 위치 목록)의 위반 목록"""
+    return [line for i in indices if i in found for line in found[i]]
+
+
+def precheck_report(out_path, violations):
+    """사전 검사 위반 → XSD 검증 대신 쓰는 (False, xmllint 형식 리포트)"""
+    lines = [f"{out_path}: [PRECHECK] {violation}" for violation in violations]
+    return False, "\n".join(lines + [f"{out_path} fails to validate"]) + "\n"
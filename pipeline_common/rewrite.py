@@ -0,0 +1,57 @@
+"""
+xmltodict 트리 단일 순회 재작성기 (요소 이름별 규칙 등록)
+- 한 번의 순회로 빈 값 제거 + 불필요한 키 제거 + 요소별 규칙 적용을 함께 수행하고 새 트리를 반환
+  (입력 트리는 수정하지 않음 → 코퍼스 공유 입력을 그대로 넘겨도 됨, 중간 복사본 없음)
+    * 빈 값: "", None, [], {} (자식을 정리하기 전 원래 값 기준, 정리 후 비게 된 dict/list는 유지)
+    * drop_keys: 모든 dict에서 제거할 키 (예: '@refcenter')
+- 규칙: register(이름, enter, exit, opaque)
+    enter(value, ctx) → 하위 요소(value가 list면 각 항목)에 넘길 문맥 (없으면 None)
+    exit(value, ctx, state) → 정리된 value를 받아 최종 값 반환 (ctx: 이 요소를 가진 부모의 문맥)
+    opaque=True면 하위 요소에는 규칙을 적용하지 않고 정리만 수행
+- 규칙이 없는 요소의 하위 요소는 문맥 None으로 처리
+"""
+
+EMPTY_VALUES = ("", None, [], {})
+
+
+class TreeRewriter:
+    def __init__(self, drop_keys=()):
+        self.drop_keys = frozenset(drop_keys)
+        self.rules = {}
+
+    def register(self, name, enter=None, exit=None, opaque=False):
+        self.rules[name] = (enter, exit, opaque)
+
+    def rewrite(self, node, ctx=None, state=None):
+        """node(dict/list)를 한 번 순회하여 재작성한 새 트리 반환 (state: 규칙에 넘길 실행별 객체)"""
+        return self._visit(node, ctx, state)
+
+    def _visit(self, node, ctx, state):
+        if isinstance(node, dict):
+            drop_keys = self.drop_keys
+            rules = self.rules
+            out = {}
+            for k, v in node.items():
+                if k in drop_keys or v in EMPTY_VALUES:
+                    continue
+                rule = rules.get(k)
+                if rule is None:
+                    out[k] = self._visit(v, None, state)
+                    continue
+                enter, exit, opaque = rule
+                child_ctx = enter(v, ctx) if enter else None
+                v = self._prune(v) if opaque else self._visit(v, child_ctx, state)
+                out[k] = exit(v, ctx, state) if exit else v
+            return out
+        if isinstance(node, list):
+            return [self._visit(item, ctx, state) for item in node if item not in EMPTY_VALUES]
+        return node
+
+    def _prune(self, node):
+        """규칙 없이 빈 값/drop_keys만 정리"""
+        if isinstance(node, dict):
+            drop_keys = self.drop_keys
+            return {k: self._prune(v) for k, v in node.items() if k not in drop_keys and v not in EMPTY_VALUES}
+        if isinstance(node, list):
+            return [self._prune(item) for item in node if item not in EMPTY_VALUES]
+        return node
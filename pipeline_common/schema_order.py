@@ -0,0 +1,435 @@
+"""
+XSD 스키마 컴파일러: 요소별 자식 순서/제약 표 + 제자리 재정렬 (BioProject, BioSample, Experiment, Run 공용)
+- compile_schema(xsd_path): XSD(xs:include/xs:import/xs:redefine 포함)를 한 번 읽어 내용 모델 표로 컴파일
+    * elements/attributes: 전역 요소/속성 이름 → 타입 키
+    * types: 복합 타입 키 → 항목 목록 (자식 요소와 필수/반복 여부, 속성과 필수 여부, simpleContent 값 타입, 기반 타입, 그룹 참조)
+    * simple: 단순 타입 키 → (기반 타입, enumeration 값 목록)
+    * xs:sequence/xs:choice/xs:all은 선언 순서대로 펼치고, xs:extension은 기반 타입 자식을 앞에 둠
+      (xs:choice 아래 요소와 minOccurs="0"인 묶음 아래 요소는 필수가 아님, maxOccurs > 1인 묶음 아래 요소는 반복 가능)
+    * xs:any, xs:union/xs:list, 찾을 수 없는 타입/그룹은 순서/제약 정보 없음
+- load_schema_table(xsd_path): 컴파일 결과를 캐시 디렉토리(XMLMETA_CACHE_DIR)/schema/에 JSON으로 저장하고
+  XSD 파일들의 (크기, mtime)가 같으면 다시 컴파일하지 않음 (XSD가 없으면 빈 표)
+- SchemaIndex(schema_index(xsd_path)로 XSD별 공유): 요소 경로 → 타입, 타입 → 자식/속성/enumeration 조회 (결과 기억)
+- ChildOrder(xsd_path, defaults): 요소 경로('BioSampleSet/BioSample' 등) → 자식 이름 순서
+    * XSD에서 경로의 자식 요소를 찾으면 그 순서, 없으면(XSD 없음, xs:any만 있는 타입 등) defaults의 순서
+    * 경로별 결과를 기억하므로 레코드마다 표를 다시 찾지 않음
+- reorder(node, order): xmltodict dict의 키를 order 순서로 제자리 재배치 (order에 없는 키는 원래 순서대로 뒤에)
+- 제약 표를 쓰는 레코드 사전 검사는 pipeline_common.prevalidate
+"""
+import hashlib
+import json
+import os
+
+from lxml import etree
+
+from pipeline_common.fieldspec import cache_dir
+
+SCHEMA_ORDER_VERSION = 2
+XS = '{http://www.w3.org/2001/XMLSchema}'
+INCLUDE_TAGS = (XS + 'include', XS + 'import', XS + 'redefine')
+PARTICLE_TAGS = (XS + 'sequence', XS + 'choice', XS + 'all')
+
+
+def _local(name):
+    # 'xs:string', 'com:typeName' → 접두어를 뗀 이름 (네임스페이스는 구분하지 않음)
+    return name.rsplit(':', 1)[-1] if name else None
+
+
+class _Compiler:
+    """XSD 파일들을 읽어 elements/attributes/types/groups/attrgroups/simple 표를 만듦"""
+
+    def __init__(self):
+        self.files = {}
+        self.elements = {}
+        self.attributes = {}
+        self.types = {}
+        self.groups = {}
+        self.attrgroups = {}
+        self.simple = {}
+        self._anonymous = 0
+
+    def load(self, path):
+        path = os.path.abspath(path)
+        if path in self.files or not os.path.exists(path):
+            return
+        st = os.stat(path)
+        self.files[path] = [st.st_size, st.st_mtime_ns]
+        root = etree.parse(path).getroot()
+        for node in root:
+            if node.tag in INCLUDE_TAGS:
+                location = node.get('schemaLocation')
+                if location and '://' not in location:
+                    self.load(os.path.join(os.path.dirname(path), location))
+        for node in root:
+            self._define(node, redefine=False)
+            if node.tag == XS + 'redefine':
+                # 재정의된 타입/그룹이 원본보다 우선
+                for child in node:
+                    self._define(child, redefine=True)
+
+    def _define(self, node, redefine):
+        name = node.get('name')
+        if not name:
+            return
+        if node.tag == XS + 'element':
+            table, value = self.elements, self._element_type(node)
+        elif node.tag == XS + 'attribute':
+            table, value = self.attributes, self._simple_ref(node)
+        elif node.tag == XS + 'complexType':
+            table, value = self.types, self._content(node)
+        elif node.tag == XS + 'simpleType':
+            table, value = self.simple, self._simple_content(node)
+        elif node.tag == XS + 'group':
+            table, value = self.groups, self._particles(node)
+        elif node.tag == XS + 'attributeGroup':
+            table, value = self.attrgroups, self._attribute_entries(node)
+        else:
+            return
+        if redefine:
+            table[name] = value
+        else:
+            table.setdefault(name, value)
+
+    def _anonymous_key(self, prefix):
+        self._anonymous += 1
+        return f"{prefix}{self._anonymous}"
+
+    def _element_type(self, node):
+        inline = node.find(XS + 'complexType')
+        if inline is not None:
+            key = self._anonymous_key('#')
+            self.types[key] = self._content(inline)
+            return key
+        return self._simple_ref(node)
+
+    def _simple_ref(self, node):
+        # type 속성의 타입 이름, 인라인 xs:simpleType이면 익명 단순 타입 키
+        inline = node.find(XS + 'simpleType')
+        if inline is not None:
+            key = self._anonymous_key('~')
+            self.simple[key] = self._simple_content(inline)
+            return key
+        return _local(node.get('type'))
+
+    def _simple_content(self, simple_type):
+        """xs:simpleType → [기반 타입, enumeration 값 목록 또는 None] (xs:union/xs:list는 정보 없음)"""
+        restriction = simple_type.find(XS + 'restriction')
+        if restriction is None:
+            return [None, None]
+        return self._restriction(restriction)
+
+    def _restriction(self, restriction):
+        base = _local(restriction.get('base'))
+        if base is None:
+            inline = restriction.find(XS + 'simpleType')
+            if inline is not None:
+                base = self._anonymous_key('~')
+                self.simple[base] = self._simple_content(inline)
+        enum = [facet.get('value') for facet in restriction.findall(XS + 'enumeration')]
+        return [base, enum or None]
+
+    def _content(self, complex_type):
+        for child in complex_type:
+            if child.tag == XS + 'complexContent':
+                for derivation in child:
+                    if derivation.tag == XS + 'extension':
+                        return ([['base', _local(derivation.get('base'))]] + self._particles(derivation)
+                                + self._attribute_entries(derivation))
+                    if derivation.tag == XS + 'restriction':
+                        return self._particles(derivation) + self._attribute_entries(derivation)
+            elif child.tag == XS + 'simpleContent':
+                for derivation in child:
+                    if derivation.tag == XS + 'extension':
+                        return [['text', _local(derivation.get('base'))]] + self._attribute_entries(derivation)
+                    if derivation.tag == XS + 'restriction':
+                        key = self._anonymous_key('~')
+                        self.simple[key] = self._restriction(derivation)
+                        return [['text', key]] + self._attribute_entries(derivation)
+                return []
+        return self._particles(complex_type) + self._attribute_entries(complex_type)
+
+    def _particles(self, node, optional=False, multi=False):
+        """
+        자식 요소 항목: ['element', 이름, 타입 키, 필수 여부, 반복 여부], ['ref', 이름, 필수, 반복],
+        ['group', 그룹 이름, 선택 여부, 반복 여부], ['any']
+        """
+        entries = []
+        for child in node:
+            opt = optional or child.get('minOccurs') == '0'
+            many = multi or child.get('maxOccurs', '1') != '1'
+            if child.tag in PARTICLE_TAGS:
+                entries.extend(self._particles(child, opt or child.tag == XS + 'choice', many))
+            elif child.tag == XS + 'element':
+                if child.get('ref'):
+                    entries.append(['ref', _local(child.get('ref')), not opt, many])
+                elif child.get('name'):
+                    entries.append(['element', child.get('name'), self._element_type(child), not opt, many])
+            elif child.tag == XS + 'group' and child.get('ref'):
+                entries.append(['group', _local(child.get('ref')), opt, many])
+            elif child.tag == XS + 'any':
+                entries.append(['any'])
+        return entries
+
+    def _attribute_entries(self, node):
+        """속성 항목: ['attribute', 이름, 필수 여부, 단순 타입 키], ['attrref', 전역 속성 이름, 필수 여부], ['attrgroup', 그룹 이름]"""
+        entries = []
+        for child in node:
+            if child.tag == XS + 'attribute':
+                required = child.get('use') == 'required'
+                if child.get('ref'):
+                    entries.append(['attrref', _local(child.get('ref')), required])
+                elif child.get('name') and child.get('use') != 'prohibited':
+                    entries.append(['attribute', child.get('name'), required, self._simple_ref(child)])
+            elif child.tag == XS + 'attributeGroup' and child.get('ref'):
+                entries.append(['attrgroup', _local(child.get('ref'))])
+        return entries
+
+    def table(self):
+        return {
+            'version': SCHEMA_ORDER_VERSION,
+            'files': self.files,
+            'elements': self.elements,
+            'attributes': self.attributes,
+            'types': self.types,
+            'groups': self.groups,
+            'attrgroups': self.attrgroups,
+            'simple': self.simple,
+        }
+
+
+def compile_schema(xsd_path):
+    """xsd_path(와 include/import한 XSD)의 내용 모델 표 (XSD가 없으면 빈 표)"""
+    compiler = _Compiler()
+    compiler.load(xsd_path)
+    return compiler.table()
+
+
+def table_path(xsd_path):
+    source = os.path.abspath(xsd_path)
+    tag = hashlib.sha1(source.encode('utf-8')).hexdigest()[:12]
+    return os.path.join(cache_dir('schema'), f"{os.path.basename(source)}_{tag}.json")
+
+
+def _fresh(table):
+    # 컴파일에 쓴 XSD 파일들이 모두 그대로인지 (크기, mtime)
+    if not table or table.get('version') != SCHEMA_ORDER_VERSION or not table.get('files'):
+        return False
+    for path, stamp in table['files'].items():
+        try:
+            st = os.stat(path)
+        except OSError:
+            return False
+        if [st.st_size, st.st_mtime_ns] != stamp:
+            return False
+    return True
+
+
+def load_schema_table(xsd_path):
+    """캐시된 표가 최신이면 로드, 아니면 컴파일하여 저장 (캐시는 최선 노력)"""
+    if not os.path.exists(xsd_path):
+        return compile_schema(xsd_path)
+    path = table_path(xsd_path)
+    try:
+        with open(path, encoding='utf-8') as f:
+            table = json.load(f)
+    except (OSError, ValueError):
+        table = None
+    if _fresh(table):
+        return table
+    try:
+        table = compile_schema(xsd_path)
+    except etree.XMLSyntaxError:
+        return _Compiler().table()
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(table, f, ensure_ascii=False)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+    return table
+
+
+def reorder(node, order):
+    """
+    dict node의 자식 요소 키를 order(이름 목록 또는 이름 순서대로 만든 {이름: 순위}) 순서로 제자리 재배치
+    - order에 없는 자식은 원래 순서대로 order 자식 뒤에 둠
+    - 속성('@...')/텍스트('#text') 키는 출력 위치와 무관하므로 순서 판단에서 제외하고 재배치 시 앞에 둠
+    - 이미 순서대로면 키를 한 번 훑고 끝남
+    """
+    if not order or not isinstance(node, dict):
+        return node
+    rank = order if isinstance(order, dict) else {key: i for i, key in enumerate(order)}
+    last = -1
+    tail = False
+    for key in node:
+        r = rank.get(key)
+        if r is None:
+            if key[0] not in '@#':
+                tail = True
+        elif tail or r < last:
+            break
+        else:
+            last = r
+    else:
+        return node
+    # 같은 dict 객체를 유지해야 하므로(부모/호출자가 참조) 새 dict 대신 비우고 순서대로 다시 채움
+    head = []
+    rest = []
+    for item in node.items():
+        if item[0] not in rank:
+            (head if item[0][0] in '@#' else rest).append(item)
+    head += [(key, node[key]) for key in rank if key in node]
+    head += rest
+    node.clear()
+    node.update(head)
+    return node
+
+
+class SchemaIndex:
+    """
+    컴파일된 표 조회 (처음 조회할 때 표를 로드, 타입별 펼친 결과를 기억)
+    - resolve(path): 요소 경로 → 타입 키 (찾지 못하면 None)
+    - children(type_key): [(이름, 타입 키, 필수 여부, 반복 여부), ...] (기반 타입/그룹/ref 펼침)
+    - attributes(type_key): [(이름, 필수 여부, 단순 타입 키), ...]
+    - text_type(type_key): 요소 값의 단순 타입 키 (단순 타입 요소 또는 simpleContent)
+    - enumeration(simple_key): enumeration 값 튜플 (기반 타입을 따라가며 찾음, 없으면 None)
+    """
+
+    def __init__(self, xsd_path):
+        self.xsd_path = xsd_path
+        self._table = None
+        self._children = {}
+        self._attributes = {}
+
+    @property
+    def table(self):
+        if self._table is None:
+            self._table = load_schema_table(self.xsd_path)
+        return self._table
+
+    def children(self, type_key, seen=()):
+        if type_key in self._children:
+            return self._children[type_key]
+        entries = self.table['types'].get(type_key) if type_key else None
+        children = self._expand(entries or [], seen + (type_key,), False, False)
+        self._children[type_key] = children
+        return children
+
+    def _expand(self, entries, seen, optional, multi):
+        table = self.table
+        children = []
+        for entry in entries:
+            kind = entry[0]
+            if kind == 'element':
+                children.append((entry[1], entry[2], entry[3] and not optional, entry[4] or multi))
+            elif kind == 'ref':
+                children.append((entry[1], table['elements'].get(entry[1]), entry[2] and not optional, entry[3] or multi))
+            elif kind == 'base' and entry[1] not in seen:
+                children.extend((name, key, required and not optional, many or multi)
+                                for name, key, required, many in self.children(entry[1], seen))
+            elif kind == 'group' and ('group', entry[1]) not in seen:
+                children.extend(self._expand(table['groups'].get(entry[1], []), seen + (('group', entry[1]),),
+                                             optional or entry[2], multi or entry[3]))
+        return children
+
+    def attributes(self, type_key, seen=()):
+        if type_key in self._attributes:
+            return self._attributes[type_key]
+        entries = self.table['types'].get(type_key) if type_key else None
+        attributes = self._expand_attributes(entries or [], seen + (type_key,))
+        self._attributes[type_key] = attributes
+        return attributes
+
+    def _expand_attributes(self, entries, seen):
+        table = self.table
+        attributes = []
+        for entry in entries:
+            kind = entry[0]
+            if kind == 'attribute':
+                attributes.append((entry[1], entry[2], entry[3]))
+            elif kind == 'attrref':
+                attributes.append((entry[1], entry[2], table['attributes'].get(entry[1])))
+            elif kind == 'base' and entry[1] not in seen:
+                attributes.extend(self.attributes(entry[1], seen))
+            elif kind == 'attrgroup' and ('attrgroup', entry[1]) not in seen:
+                attributes.extend(self._expand_attributes(table['attrgroups'].get(entry[1], []),
+                                                          seen + (('attrgroup', entry[1]),)))
+        return attributes
+
+    def text_type(self, type_key):
+        if type_key in self.table['simple']:
+            return type_key
+        for entry in self.table['types'].get(type_key) or ():
+            if entry[0] == 'text':
+                return entry[1]
+            if entry[0] == 'base':
+                return self.text_type(entry[1]) if entry[1] != type_key else None
+        return None
+
+    def enumeration(self, simple_key):
+        seen = set()
+        while simple_key and simple_key not in seen:
+            seen.add(simple_key)
+            simple = self.table['simple'].get(simple_key)
+            if simple is None:
+                # simpleContent 복합 타입을 기반으로 한 경우
+                simple_key = self.text_type(simple_key) if simple_key in self.table['types'] else None
+                continue
+            if simple[1]:
+                return tuple(simple[1])
+            simple_key = simple[0]
+        return None
+
+    def resolve(self, path):
+        parts = path.split('/')
+        type_key = self.table['elements'].get(parts[0])
+        for part in parts[1:]:
+            if type_key is None:
+                return None
+            type_key = next((key for name, key, _, _ in self.children(type_key) if name == part), None)
+        return type_key
+
+
+_INDEXES = {}
+
+
+def schema_index(xsd_path):
+    """XSD 경로별로 공유하는 SchemaIndex (ChildOrder와 PreValidator가 같은 표를 사용)"""
+    key = os.path.abspath(xsd_path)
+    if key not in _INDEXES:
+        _INDEXES[key] = SchemaIndex(xsd_path)
+    return _INDEXES[key]
+
+
+class ChildOrder:
+    """
+    XSD 하나의 요소 경로 → 자식 이름 순서 (처음 조회할 때 표를 로드)
+    defaults: 경로 → 자식 이름 목록 (XSD에서 순서를 찾지 못한 경로에 사용)
+    """
+
+    def __init__(self, xsd_path, defaults=None):
+        self.xsd_path = xsd_path
+        self.defaults = defaults or {}
+        self.index = schema_index(xsd_path)
+        self._orders = {}
+
+    def schema_order(self, path):
+        """XSD 기준 path의 자식 이름 순서 (경로를 찾지 못하거나 자식 요소가 없으면 None)"""
+        type_key = self.index.resolve(path)
+        if type_key is None:
+            return None
+        names = list(dict.fromkeys(name for name, _, _, _ in self.index.children(type_key)))
+        return names or None
+
+    def order(self, path):
+        """path의 자식 순서 {이름: 순위} (XSD → defaults, 둘 다 없으면 None)"""
+        if path not in self._orders:
+            names = self.schema_order(path) or self.defaults.get(path)
+            self._orders[path] = {name: i for i, name in enumerate(names)} if names else None
+        return self._orders[path]
+
+    def reorder(self, node, path):
+        """node(path 요소)의 자식을 순서대로 제자리 재배치"""
+        return reorder(node, self.order(path))
@@ -0,0 +1,177 @@
+"""
+대용량 입력용 스트리밍 처리 도구 (--stream 모드)
+- iter_records: lxml.etree.iterparse로 루트 바로 아래의 레코드(RUN/EXPERIMENT/SAMPLE/Package)를 하나씩
+  xmltodict와 같은 dict 구조로 반환하고, 처리한 요소는 즉시 해제 → 메모리는 가장 큰 레코드 크기로 제한
+- render_record: 레코드 하나를 증분 작성기(pipeline_common.xmlwriter)로 문서 저장 시와 같은 조각으로 렌더링
+- StreamDocumentWriter: 전체 보정본(*.fixed.xml)을 레코드 단위로 바로 디스크에 기록
+- GroupSpool: 그룹(KAP/SSUB/KRA)별 조각을 임시 파일에 모았다가 마지막에 그룹 파일로 조립 (열린 파일은 LRU로 제한)
+"""
+import os
+import shutil
+import tempfile
+from collections import OrderedDict
+from xml.sax.saxutils import escape
+
+import xmltodict
+from lxml import etree
+
+from pipeline_common.xmlwriter import XML_HEADER, DEFAULT_BUFFER_SIZE, default_pretty, render_fragment
+from pipeline_common.metrics import NULL_METRICS
+
+# GroupSpool이 동시에 열어 두는 스풀 파일 수 (프로세스 파일 디스크립터 한도보다 충분히 작게)
+DEFAULT_MAX_OPEN = 64
+
+
+def iter_records(path, record_tag, root_attrs=None):
+    """
+    path의 루트 바로 아래 record_tag 요소를 하나씩 dict로 변환하여 반환
+    root_attrs(dict)가 주어지면 루트 요소의 속성을 '@이름' 형식으로 채워준다
+    """
+    depth = 0
+    context = etree.iterparse(path, events=('start', 'end'), huge_tree=True)
+    for event, elem in context:
+        if event == 'start':
+            if depth == 0 and root_attrs is not None:
+                root_attrs.update({f"@{k}": v for k, v in elem.attrib.items()})
+            depth += 1
+            continue
+        depth -= 1
+        if depth != 1:
+            continue
+        if elem.tag == record_tag:
+            record = xmltodict.parse(etree.tostring(elem, encoding='unicode', with_tail=False))[record_tag]
+            yield record
+        # 처리한 레코드와 앞선 형제 요소 해제
+        elem.clear()
+        parent = elem.getparent()
+        while parent is not None and elem.getprevious() is not None:
+            del parent[0]
+
+
+def render_record(tag, record, depth=1, self_closing=()):
+    return render_fragment(tag, record, depth, self_closing=self_closing)
+
+
+_ATTR_ENTITIES = {'"': '&quot;', '\n': '&#10;', '\r': '&#13;', '\t': '&#9;'}
+
+
+def _open_tag(tag, attrs):
+    # lxml(xmlwriter)과 같은 방식으로 속성 인용
+    parts = [tag]
+    for k, v in (attrs or {}).items():
+        parts.append('%s="%s"' % (k[1:], escape(v, _ATTR_ENTITIES)))
+    return '<' + ' '.join(parts) + '>'
+
+
+def wrap_document(root_tag, body):
+    """레코드 조각들을 <root_tag> 문서로 감싸기 (루트 속성 없는 그룹 파일용)"""
+    newline = '\n' if default_pretty() else ''
+    return f"{XML_HEADER}<{root_tag}>{newline}{body}</{root_tag}>"
+
+
+def write_text(xml_str, path):
+    """조립된 XML 문자열을 그대로 저장 (emit_groups의 render 인자로 사용)"""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(xml_str)
+    return xml_str
+
+
+class StreamDocumentWriter:
+    """
+    <root> 아래 레코드를 하나씩 써 나가는 문서 작성기
+    출력은 xmlwriter.write_xml({root: {record_tag: [...]}})와 동일
+    """
+    def __init__(self, path, root_tag, root_attrs=None, buffer_size=DEFAULT_BUFFER_SIZE):
+        self.root_tag = root_tag
+        self.count = 0
+        self._pretty = default_pretty()
+        self._f = open(path, 'w', encoding='utf-8', buffering=buffer_size)
+        self._f.write(XML_HEADER)
+        self._f.write(_open_tag(root_tag, root_attrs))
+
+    def write(self, fragment):
+        if self.count == 0 and self._pretty:
+            self._f.write('\n')
+        self._f.write(fragment)
+        self.count += 1
+
+    def close(self):
+        self._f.write(f"</{self.root_tag}>")
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class GroupSpool:
+    """
+    그룹별 레코드 조각을 임시 디렉토리의 파일에 이어 붙여 두었다가
+    iter_documents()에서 그룹 순서(최초 등장 순)대로 (그룹 키, 완성된 XML 문자열)을 반환
+    - 스풀 파일은 최근에 쓴 max_open개 그룹만 열어 둠 (LRU, 레코드마다 open/close하지 않음)
+    """
+    def __init__(self, root_tag, tmp_dir=None, max_open=DEFAULT_MAX_OPEN):
+        self.root_tag = root_tag
+        self._dir = tempfile.mkdtemp(prefix='xmlmeta_spool_', dir=tmp_dir)
+        self._order = {}
+        self._handles = OrderedDict()
+        self._max_open = max(1, max_open)
+        self.counts = {}
+
+    def _path(self, key):
+        return os.path.join(self._dir, f"{self._order[key]}.part")
+
+    def _handle(self, key):
+        f = self._handles.pop(key, None)
+        if f is None:
+            f = open(self._path(key), 'a', encoding='utf-8')
+            if len(self._handles) >= self._max_open:
+                self._handles.popitem(last=False)[1].close()
+        self._handles[key] = f
+        return f
+
+    def _close_all(self):
+        while self._handles:
+            self._handles.popitem()[1].close()
+
+    def add(self, key, fragment):
+        if key not in self._order:
+            self._order[key] = len(self._order)
+            self.counts[key] = 0
+        self._handle(key).write(fragment)
+        self.counts[key] += 1
+
+    def keys(self):
+        return list(self._order)
+
+    def iter_documents(self):
+        self._close_all()
+        for key in self._order:
+            with open(self._path(key), encoding='utf-8') as f:
+                body = f.read()
+            yield key, wrap_document(self.root_tag, body)
+
+    def cleanup(self):
+        self._close_all()
+        shutil.rmtree(self._dir, ignore_errors=True)
+
+
+def emit_spool(spool, out_path_for, xsd_path=None, jobs=1, manifest=None, metrics=NULL_METRICS, precheck=None):
+    """
+    GroupSpool의 그룹 문서를 저장/검증 (pipeline_common.emit.emit_groups 사용, manifest는 --incremental, metrics는 --metrics)
+    out_path_for(key) → 그룹 파일 경로
+    precheck: key → 사전 검사 위반 목록 (위반이 있는 그룹은 XSD 검증 없이 위반 리포트 사용)
+    반환: 그룹 순서대로 (key, out_path, 레코드 수, valid, xsd_report)
+    """
+    from pipeline_common.emit import emit_groups
+    keys = spool.keys()
+    groups = ((out_path_for(key), xml_str) for key, xml_str in spool.iter_documents())
+    if precheck:
+        precheck = {out_path_for(key): violations for key, violations in precheck.items()}
+    results = emit_groups(groups, write_text, xsd_path, jobs, manifest, metrics, precheck)
+    return [
+        (key, out_path_for(key), spool.counts[key], valid, xsd_report)
+        for key, (valid, xsd_report) in zip(keys, results)
+    ]
@@ -0,0 +1,136 @@
+"""
+KRA 제출 매핑 CSV(KRA_after_20240311_pp_lib.csv) 컴파일 색인 (Experiment, Run, Submission 공용)
+- CSV를 한 번 읽어 행 튜플 목록 + 색인으로 컴파일
+    * (KAE, KAR) → 행: 같은 쌍이 여러 번 나오면 마지막 행 값을 첫 등장 위치에 유지 (기존 dict 매핑과 동일)
+    * KAE → 행 목록, KAR → 행 목록, KRA → 행 목록 (CSV 등장 순서)
+    * KAE → [(KRA, Library Layout), ...]: (KAE, KAR) 매핑 순서대로 중복 제거 (Experiment 그룹 분류용)
+- KRA/KAE/KAR가 모두 있는 행만 색인에 포함, 값은 앞뒤 공백 제거, Library Layout은 소문자
+- 행은 일반 튜플로 저장하고(캐시 로드가 빠르도록) 행을 돌려주는 조회만 SubmissionRow로 감싸서 반환
+- 인코딩은 BOM/UTF-8 → CP949(한글 헤더) → ISO-8859-1 순으로 판별 (CSV_ENCODINGS)
+- open_submission_map(path): 파싱 캐시(pipeline_common.parse_cache)를 거쳐 CSV가 바뀌었을 때만 다시 컴파일
+"""
+import csv
+import io
+from collections import namedtuple
+
+from pipeline_common.parse_cache import load_cached
+
+SUBMISSION_MAP_VERSION = 1
+CSV_ENCODINGS = ('utf-8-sig', 'cp949', 'iso-8859-1')
+
+# CSV 열 이름
+COL_SUBMISSION = 'KRA submission ID'
+COL_EXPERIMENT = 'Experiment ID'
+COL_ACCESS_TYPE = 'Experiment Access type'
+COL_RUN = 'Run ID'
+COL_LIBRARY_LAYOUT = 'Library Layout'
+COL_FILE_PATH = 'file path'
+FILE_PATH_SEPARATOR = ';'
+
+SubmissionRow = namedtuple('SubmissionRow', 'submission_id experiment_id access_type run_id library_layout file_paths')
+
+
+def detect_encoding(data):
+    """CSV 바이트열의 인코딩 (CSV_ENCODINGS 중 오류 없이 디코딩되는 첫 번째)"""
+    for encoding in CSV_ENCODINGS:
+        try:
+            data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+        return encoding
+    return CSV_ENCODINGS[-1]
+
+
+def read_csv(path):
+    """CSV → (인코딩, 헤더 열 목록, 데이터 행 목록)"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    encoding = detect_encoding(data)
+    reader = csv.reader(io.StringIO(data.decode(encoding), newline=''))
+    header = next(reader, [])
+    return encoding, header, list(reader)
+
+
+class SubmissionMap:
+    """컴파일된 제출 매핑 (조회는 모두 dict 한 번)"""
+
+    def __init__(self, rows=(), encoding=None, header=()):
+        self.encoding = encoding
+        self.header = list(header)
+        self.rows = []
+        self.pairs = {}
+        self.by_experiment = {}
+        self.by_run = {}
+        self.by_submission = {}
+        # 열 이름 → 위치 (없는 열은 빈 값)
+        columns = [self.header.index(name) if name in self.header else None
+                   for name in (COL_SUBMISSION, COL_EXPERIMENT, COL_ACCESS_TYPE, COL_RUN, COL_LIBRARY_LAYOUT, COL_FILE_PATH)]
+        for row in rows:
+            self._add([row[i].strip() if i is not None and i < len(row) else '' for i in columns])
+        self._experiment_submissions = self._build_experiment_submissions()
+
+    def _add(self, values):
+        submission_id, experiment_id, access_type, run_id, layout, file_paths = values
+        record = (submission_id, experiment_id, access_type, run_id, layout.lower(),
+                  tuple(p.strip() for p in file_paths.split(FILE_PATH_SEPARATOR) if p.strip()))
+        self.rows.append(record)
+        if not (submission_id and experiment_id and run_id):
+            return
+        self.pairs[(experiment_id, run_id)] = record
+        self.by_experiment.setdefault(experiment_id, []).append(record)
+        self.by_run.setdefault(run_id, []).append(record)
+        self.by_submission.setdefault(submission_id, []).append(record)
+
+    def _build_experiment_submissions(self):
+        index = {}
+        for (exp_id, _), record in self.pairs.items():
+            index.setdefault(exp_id, {})[(record[0], record[4])] = None
+        return {exp_id: list(matched) for exp_id, matched in index.items()}
+
+    def __len__(self):
+        """(KAE, KAR) 쌍 수"""
+        return len(self.pairs)
+
+    def lookup(self, experiment_id, run_id):
+        """(KAE, KAR) → SubmissionRow (없으면 None)"""
+        record = self.pairs.get((experiment_id, run_id))
+        return SubmissionRow(*record) if record else None
+
+    def submission_id(self, experiment_id, run_id):
+        """(KAE, KAR) → KRA (없으면 None)"""
+        record = self.pairs.get((experiment_id, run_id))
+        return record[0] if record else None
+
+    def experiment_submissions(self, experiment_id):
+        """KAE → [(KRA, Library Layout), ...] (run_id를 모를 때 EXPERIMENT가 속한 모든 제출)"""
+        return self._experiment_submissions.get(experiment_id, [])
+
+    def for_experiment(self, experiment_id):
+        return [SubmissionRow(*record) for record in self.by_experiment.get(experiment_id, ())]
+
+    def for_run(self, run_id):
+        return [SubmissionRow(*record) for record in self.by_run.get(run_id, ())]
+
+    def for_submission(self, submission_id):
+        return [SubmissionRow(*record) for record in self.by_submission.get(submission_id, ())]
+
+    def file_paths(self, run_id):
+        """KAR → CSV의 file path 목록 (';' 구분, 마지막 행 기준)"""
+        records = self.by_run.get(run_id)
+        return records[-1][5] if records else ()
+
+
+def compile_submission_map(path):
+    encoding, header, rows = read_csv(path)
+    return SubmissionMap(rows, encoding, header)
+
+
+def open_submission_map(path):
+    """CSV → SubmissionMap (CSV가 바뀌지 않았으면 캐시된 컴파일 결과 로드)"""
+    data, _ = load_submission_map(path)
+    return data
+
+
+def load_submission_map(path):
+    """CSV → (SubmissionMap, 캐시 상태)"""
+    return load_cached(path, compile_submission_map, f"submission_map-{SUBMISSION_MAP_VERSION}")
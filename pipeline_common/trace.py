@@ -0,0 +1,104 @@
+"""
+레코드 단위 진단 트레이스 (--trace 또는 XMLMETA_TRACE=<레벨>)
+- 레벨: error < warning < info < debug (지정 레벨 이상만 기록, debug는 레코드별 진단 포함)
+- 출력은 표준 출력이 아닌 xml_fixed/<파이프라인>_trace.jsonl (한 줄에 이벤트 하나, 공백 없는 JSON)
+- 이벤트 필드 값으로 함수(인자 없는 callable)를 넘기면 실제로 기록할 때만 호출 → 비활성/미선택 레코드는 포맷 비용 없음
+- every=N(--trace-every, XMLMETA_TRACE_EVERY)이면 레코드 N개 중 1개만 상세 기록 (1-in-N 샘플링)
+- 비활성화 시에는 NULL_TRACE(아무 것도 하지 않는 객체)를 사용
+"""
+import json
+import os
+
+TRACE_ENV = "XMLMETA_TRACE"
+TRACE_EVERY_ENV = "XMLMETA_TRACE_EVERY"
+TRACE_DIR = "xml_fixed"
+
+LEVELS = {'error': 40, 'warning': 30, 'info': 20, 'debug': 10}
+DEFAULT_LEVEL = 'debug'
+
+
+def parse_level(value):
+    """레벨 이름 → 숫자 (빈 값/off/0이면 None = 비활성)"""
+    value = (value or '').strip().lower()
+    if value in ('', '0', 'off', 'false', 'no'):
+        return None
+    if value in ('1', 'true', 'yes'):
+        value = DEFAULT_LEVEL
+    if value not in LEVELS:
+        raise ValueError(f"알 수 없는 트레이스 레벨: {value} (가능: {', '.join(LEVELS)})")
+    return LEVELS[value]
+
+
+class Trace:
+    enabled = True
+
+    def __init__(self, pipeline, level=LEVELS[DEFAULT_LEVEL], every=1, path=None):
+        self.pipeline = pipeline
+        self.level = level
+        self.every = max(1, every)
+        self.path = path or os.path.join(TRACE_DIR, f"{pipeline}_trace.jsonl")
+        self.seen = 0       # sample()로 확인한 레코드 수
+        self.events = 0
+        self._file = None
+
+    def is_enabled(self, level):
+        return LEVELS[level] >= self.level
+
+    def sample(self):
+        """
+        레코드 하나마다 호출: 이번 레코드를 debug 레벨로 상세 기록할지 여부
+        (debug 레벨이 아니거나 1-in-N 샘플링에서 제외되면 False)
+        """
+        self.seen += 1
+        return self.level <= LEVELS['debug'] and (self.seen - 1) % self.every == 0
+
+    def event(self, kind, level='debug', **fields):
+        if LEVELS[level] < self.level:
+            return
+        record = {'event': kind, 'level': level}
+        for key, value in fields.items():
+            record[key] = value() if callable(value) else value
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self._file = open(self.path, 'w', encoding='utf-8', buffering=1 << 16)
+        self._file.write(json.dumps(record, ensure_ascii=False, separators=(',', ':'), default=str))
+        self._file.write('\n')
+        self.events += 1
+
+    def close(self):
+        """요약 이벤트(info)를 남기고 파일을 닫은 뒤 경로 출력"""
+        self.event('summary', 'info', pipeline=self.pipeline, records=self.seen, every=self.every, events=self.events)
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            print(f"[TRACE] {self.pipeline}: {self.events} events -> {self.path}")
+
+
+class NullTrace:
+    """트레이스 비활성화용: 모든 메서드가 아무 것도 하지 않음"""
+    enabled = False
+
+    def is_enabled(self, level):
+        return False
+
+    def sample(self):
+        return False
+
+    def event(self, kind, level='debug', **fields):
+        pass
+
+    def close(self):
+        pass
+
+
+NULL_TRACE = NullTrace()
+
+
+def create_trace(pipeline, level=None, every=None):
+    """level/every가 None이면 XMLMETA_TRACE / XMLMETA_TRACE_EVERY 환경변수로 결정"""
+    level = parse_level(os.environ.get(TRACE_ENV) if level is None else level)
+    if level is None:
+        return NULL_TRACE
+    if every is None:
+        every = int(os.environ.get(TRACE_EVERY_ENV) or 1)
+    return Trace(pipeline, level, every)
@@ -0,0 +1,275 @@
+"""
+공용 XSD 검증 엔진
+- 기본 백엔드(lxml): XSD를 한 번만 컴파일하여 lxml.etree.XMLSchema로 프로세스 전역 캐시에 보관
+  (캐시 키: XSD 절대경로, XSD 파일 mtime이 바뀌면 자동 재컴파일)
+- 보조 백엔드(xmllint): 기존처럼 외부 xmllint 명령으로 검증 (lxml이 없거나 XMLMETA_VALIDATOR=xmllint 일 때)
+- 두 백엔드 모두 (통과 여부, xmllint 형식의 에러 메시지) 튜플을 반환하므로
+  *_report.txt의 PASS/FAIL 라인은 백엔드와 무관하게 동일하다
+- DocumentValidation: 전체 보정본을 한 번만 검증하고 에러를 레코드(→ 그룹)별로 나눔
+  (그룹 파일마다 다시 검증하지 않음, XMLMETA_VALIDATE_AUDIT=1이면 그룹 파일 개별 검증도 수행)
+"""
+import bisect
+import os
+import subprocess
+
+try:
+    from lxml import etree
+except ImportError:  # lxml 미설치 환경에서는 xmllint만 사용
+    etree = None
+
+# 검증 백엔드 선택: "lxml"(기본) 또는 "xmllint"
+VALIDATOR_ENV = "XMLMETA_VALIDATOR"
+
+# XSD 절대경로 → (mtime_ns, XMLSchema)
+_SCHEMA_CACHE = {}
+
+
+def get_backend():
+    backend = os.environ.get(VALIDATOR_ENV, "lxml").strip().lower()
+    if backend == "lxml" and etree is None:
+        return "xmllint"
+    return backend if backend in ("lxml", "xmllint") else "lxml"
+
+
+def load_schema(xsd_path):
+    """
+    컴파일된 XMLSchema를 캐시에서 반환 (없거나 XSD가 수정되었으면 새로 컴파일)
+    XSD 파일이 없거나 읽지/컴파일하지 못하면 OSError/etree.XMLSyntaxError/etree.XMLSchemaParseError 발생
+    """
+    key = os.path.abspath(xsd_path)
+    mtime = os.stat(key).st_mtime_ns
+    cached = _SCHEMA_CACHE.get(key)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    schema = etree.XMLSchema(etree.parse(key))
+    _SCHEMA_CACHE[key] = (mtime, schema)
+    return schema
+
+
+def clear_schema_cache():
+    _SCHEMA_CACHE.clear()
+
+
+def _format_errors(error_log, name):
+    # xmllint --noout 의 stderr 형식과 동일하게 구성
+    lines = []
+    for err in error_log:
+        lines.append(f"{name}:{err.line}: Schemas validity error : {err.message}")
+    lines.append(f"{name} fails to validate")
+    return "\n".join(lines) + "\n"
+
+
+def validate_tree(tree, xsd_path, name="-"):
+    """
+    메모리 상의 lxml 트리(ElementTree 또는 Element)를 캐시된 스키마로 검증
+    name은 에러 메시지에 표시될 파일명
+    """
+    try:
+        schema = load_schema(xsd_path)
+    except (OSError, etree.XMLSyntaxError, etree.XMLSchemaParseError) as e:
+        return False, f"{e}\nWXS schema {xsd_path} failed to compile\n"
+    if schema.validate(tree):
+        return True, f"{name} validates\n"
+    return False, _format_errors(schema.error_log, name)
+
+
+def _xmllint(xsd_path, xml_path="-", xml_str=None):
+    result = subprocess.run(
+        ["xmllint", "--schema", xsd_path, "--noout", xml_path],
+        input=xml_str, capture_output=True, text=True
+    )
+    return result.returncode == 0, result.stderr
+
+
+def validate_doc(doc, xsd_path, name="-"):
+    """
+    저장할 문서(xmltodict 형식 dict)를 직렬화/재파싱 없이 lxml 트리로 만들어 검증
+    (xmlwriter.build_tree: 줄 번호는 write_xml로 저장한 파일과 같음, xmllint 백엔드는 렌더링한 문자열을 검증)
+    """
+    from pipeline_common.xmlwriter import XML_HEADER, build_tree, render_fragment
+    if get_backend() == "xmllint":
+        (root_tag, root), = doc.items()
+        return validate_xml_string(XML_HEADER + render_fragment(root_tag, root, 0), xsd_path, name)
+    return validate_tree(build_tree(doc), xsd_path, name)
+
+
+def validate_xml_string(xml_str, xsd_path, name="-"):
+    """
+    파일로 쓰기 전의 XML 문자열을 검증 (디스크 재읽기/프로세스 생성 없음)
+    트리가 없는 입력용 (예: --stream 모드에서 조각을 이어 붙인 그룹 문서), dict 문서는 validate_doc 사용
+    """
+    if get_backend() == "xmllint":
+        valid, report = _xmllint(xsd_path, xml_str=xml_str)
+        # stdin("-")으로 넘긴 경우 메시지의 파일명을 실제 이름으로 치환
+        report = "\n".join(
+            name + line[1:] if line.startswith("-") else line
+            for line in report.split("\n")
+        )
+        return valid, report
+    try:
+        tree = etree.fromstring(xml_str.encode("utf-8"))
+    except etree.XMLSyntaxError as e:
+        return False, f"{name}: {e}\n{name} fails to validate\n"
+    return validate_tree(tree, xsd_path, name)
+
+
+def validate_xsd(xml_path, xsd_path):
+    """
+    XML 파일을 XSD로 검증하여 (통과 여부, 에러 메시지) 반환
+    기존 xmllint subprocess 방식과 같은 인터페이스
+    """
+    if get_backend() == "xmllint":
+        return _xmllint(xsd_path, xml_path)
+    try:
+        tree = etree.parse(xml_path)
+    except (OSError, etree.XMLSyntaxError) as e:
+        return False, f"{e}\n{xml_path} fails to validate\n"
+    return validate_tree(tree, xsd_path, xml_path)
+
+
+# 단일 검증 모드에서 그룹 파일도 모두 개별 검증 (감사용, 결과 불일치는 [AUDIT]로 표시)
+AUDIT_ENV = "XMLMETA_VALIDATE_AUDIT"
+
+
+def audit_enabled():
+    return os.environ.get(AUDIT_ENV, "").strip().lower() in ("1", "true", "yes", "on")
+
+
+class RegroupedRecords:
+    """
+    전체 보정본과 내용이 다른 그룹(그룹별로 보정되는 레코드)의 레코드를 한 루트 아래 모아 한 번에 검증하기 위한 트리
+    - add(out_path, group_doc): 그룹 문서를 build_tree로 만들어 레코드를 옮김 (줄 번호는 그룹 파일 기준 그대로)
+      generator가 다음 그룹을 만들며 레코드를 수정하기 전에 호출해야 함, 모을 수 없는 그룹(루트가 다름)은 False
+    - names: 레코드 위치 → 그룹 파일 이름, indices: out_path → 레코드 위치 목록
+    - validation(xsd_path): DocumentValidation (모은 그룹이 없으면 None)
+    """
+
+    def __init__(self):
+        self.root = None
+        self.names = []
+        self.indices = {}
+
+    def add(self, out_path, group_doc):
+        if etree is None or get_backend() == "xmllint" or not isinstance(group_doc, dict) or len(group_doc) != 1:
+            return False
+        from pipeline_common.xmlwriter import build_tree
+        group_root = build_tree(group_doc)
+        if self.root is None:
+            self.root = etree.Element(group_root.tag, dict(group_root.attrib), nsmap=group_root.nsmap)
+            self.root.sourceline = group_root.sourceline
+        elif group_root.tag != self.root.tag or dict(group_root.attrib) != dict(self.root.attrib):
+            return False
+        start = len(self.names)
+        for child in list(group_root):
+            if isinstance(child.tag, str):
+                self.root.append(child)
+                self.names.append(out_path)
+        self.indices[out_path] = range(start, len(self.names))
+        return True
+
+    def validation(self, xsd_path):
+        if self.root is None:
+            return None
+        return DocumentValidation("-", xsd_path, self.root, self.names)
+
+
+class DocumentValidation:
+    """
+    전체 문서(루트 아래 레코드 목록)를 한 번 검증하고 에러를 레코드 단위로 나눔
+    - 에러 위치: lxml 에러의 요소 경로(path)로 요소를 찾아 루트의 자식(레코드)까지 올라감,
+      경로로 찾지 못하면 에러 줄 번호가 속한 레코드(레코드 시작 줄 기준)
+    - 레코드 밖(루트 자체)의 에러는 문서 에러로 모든 그룹에 포함
+    - group_result(out_path, indices): 해당 레코드들의 에러만 모은 (통과 여부, xmllint 형식 리포트)
+      (줄 번호는 전체 문서 기준, 마지막 줄은 그룹 파일 이름)
+    - xmllint 백엔드이거나 문서를 읽지 못하면 attributable=False (그룹 파일을 개별 검증해야 함)
+    - 레코드 자체가 루트의 콘텐츠 모델에 맞지 않으면("This element is not expected") libxml2가 그 뒤 형제를
+      검증하지 않으므로 그 위치(cut)부터의 레코드는 나눌 수 없음 → covers(indices)가 False인 그룹은 개별 검증
+    - root가 주어지면 xml_path를 읽지 않고 메모리 상의 루트 요소를 검증하고, record_names(레코드 위치 → 파일 이름)로
+      에러를 표시 (그룹 파일별 줄 번호를 가진 레코드를 모은 트리, 루트 에러는 group_result의 그룹 파일 이름으로 표시)
+    """
+
+    def __init__(self, xml_path, xsd_path, root=None, record_names=None):
+        self.xml_path = xml_path
+        self.xsd_path = xsd_path
+        self.record_names = record_names
+        self.record_errors = {}
+        self.doc_errors = []
+        self.attributable = False
+        self.records = 0
+        self.cut = None
+        if get_backend() == "xmllint":
+            # 메모리 상의 트리는 외부 명령으로 검증할 수 없으므로 나누지 않음 (그룹 파일 개별 검증)
+            self.valid, self.report = validate_xsd(xml_path, xsd_path) if root is None else (False, "")
+            return
+        try:
+            schema = load_schema(xsd_path)
+        except (OSError, etree.XMLSyntaxError, etree.XMLSchemaParseError) as e:
+            self.valid, self.report = False, f"{e}\nWXS schema {xsd_path} failed to compile\n"
+            return
+        if root is None:
+            try:
+                tree = etree.parse(xml_path)
+            except (OSError, etree.XMLSyntaxError) as e:
+                self.valid, self.report = False, f"{e}\n{xml_path} fails to validate\n"
+                return
+            root = tree.getroot()
+        else:
+            tree = root.getroottree()
+        self.valid = schema.validate(tree)
+        self.report = f"{xml_path} validates\n" if self.valid else _format_errors(schema.error_log, xml_path)
+        self.attributable = True
+        records = [child for child in root if isinstance(child.tag, str)]
+        self.records = len(records)
+        if self.valid:
+            return
+        positions = {child: i for i, child in enumerate(records)}
+        # 레코드마다 줄 번호 기준이 다르면(record_names) 줄 번호로는 레코드를 찾지 않음
+        starts = [child.sourceline or 0 for child in records] if record_names is None else []
+        for err in schema.error_log:
+            index, direct = self._locate(tree, positions, starts, err)
+            if index is None:
+                self.doc_errors.append((err.line, err.message))
+                continue
+            name = xml_path if record_names is None else record_names[index]
+            self.record_errors.setdefault(index, []).append(self._line(name, err.line, err.message))
+            # 레코드 요소 자체의 콘텐츠 모델 에러 (경로로 찾지 못한 경우도 깊이를 알 수 없으므로 포함)
+            if err.type_name == 'SCHEMAV_ELEMENT_CONTENT' and direct is not False:
+                self.cut = index if self.cut is None else min(self.cut, index)
+
+    @staticmethod
+    def _locate(tree, positions, starts, err):
+        """→ (레코드 위치 또는 None, 에러 요소가 레코드 자체인지: 경로로 찾지 못하면 None)"""
+        path = getattr(err, 'path', None)
+        if path:
+            try:
+                found = tree.xpath(path)
+            except etree.XPathError:
+                found = None
+            if found and isinstance(found, list) and etree.iselement(found[0]):
+                node = found[0]
+                direct = node in positions
+                while node is not None and node not in positions:
+                    node = node.getparent()
+                return (positions.get(node) if node is not None else None), direct
+        if err.line and starts and err.line >= starts[0]:
+            return bisect.bisect_right(starts, err.line) - 1, None
+        return None, None
+
+    def covers(self, indices):
+        """indices 레코드의 에러를 단일 검증 결과로 나눌 수 있는지 (cut 이후 레코드가 있으면 False)"""
+        if not self.attributable or indices is None:
+            return False
+        return self.cut is None or all(index < self.cut for index in indices)
+
+    @staticmethod
+    def _line(name, line, message):
+        return f"{name}:{line}: Schemas validity error : {message}"
+
+    def group_result(self, out_path, indices):
+        name = self.xml_path if self.record_names is None else out_path
+        lines = [self._line(name, line, message) for line, message in self.doc_errors]
+        for index in indices:
+            lines.extend(self.record_errors.get(index, ()))
+        if not lines:
+            return True, f"{out_path} validates\n"
+        return False, "\n".join(lines + [f"{out_path} fails to validate"]) + "\n"
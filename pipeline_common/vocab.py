@@ -0,0 +1,118 @@
+"""
+통제 어휘(XSD enumeration 등) 색인과 유사도 매칭
+- exact: 원문 그대로 일치 (dict 조회)
+- normalized: 대소문자/공백/구두점 무시 + 로마 숫자 토큰(II, III, IV) → 아라비아 숫자
+  (예: "illumina novaseq6000" → "Illumina NovaSeq 6000", "Sequel2" → "Sequel II")
+- fuzzy: 정규화 문자열의 문자 n-gram 역색인으로 후보를 모은 뒤 Dice 계수로 순위
+  (Dice 계수는 원문을 포함하는 가장 짧은 값을 선호하므로 정규화 토큰 단위로 한 번 더 확인)
+    * 원문 토큰이 여러 값의 앞부분이면 모호 (예: "Illumina HiSeq" → HiSeq 1000/2000/X ...)
+    * 원문 토큰에 토큰이 모두 들어 있는 값이 있으면 그중 가장 긴 값 선택, 서로 포함하지 않는 값이 여럿이면 모호
+      (예: "Illumina NovaSeq X Plus" → "Illumina NovaSeq X", "Illumina Hiseq X Ten" → "HiSeq X Ten"/"Illumina HiSeq X" 모호)
+- 결과는 원문별로 한 번만 계산 (입력 레코드는 많아도 서로 다른 원문은 적으므로 레코드당 비용은 dict 조회 수준)
+"""
+import re
+from collections import namedtuple
+
+NGRAM = 3
+ROMAN_NUMERALS = {'ii': '2', 'iii': '3', 'iv': '4'}
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+# value: 어휘 값(없으면 None), score: 0~1, method: exact/normalized/fuzzy/None
+# runner_up: fuzzy일 때 차순위 (값, 점수) 또는 None, ambiguous: 모호할 때 후보 값 튜플 (자동 적용하지 말 것)
+VocabMatch = namedtuple('VocabMatch', 'value score method runner_up ambiguous', defaults=((),))
+NO_MATCH = VocabMatch(None, 0.0, None, None)
+
+
+def tokenize(text):
+    return tuple(ROMAN_NUMERALS.get(token, token) for token in _TOKEN_RE.findall(text.lower()))
+
+
+def normalize(text):
+    return ''.join(tokenize(text))
+
+
+def ngrams(text, n=NGRAM):
+    padded = f"^{text}$"
+    if len(padded) <= n:
+        return {padded}
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+class VocabularyIndex:
+    def __init__(self, values):
+        self.values = list(dict.fromkeys(values))
+        self.exact = set(self.values)
+        # 정규화 결과가 겹치면 앞의 값 사용
+        self.normalized = {}
+        for value in self.values:
+            self.normalized.setdefault(normalize(value), value)
+        # n-gram → 정규화 키 목록 역색인
+        self.keys = list(self.normalized)
+        self.key_grams = [ngrams(key) for key in self.keys]
+        self.gram_index = {}
+        for i, grams in enumerate(self.key_grams):
+            for gram in grams:
+                self.gram_index.setdefault(gram, []).append(i)
+        # 정규화 키별 값의 토큰
+        self.key_tokens = [tokenize(self.normalized[key]) for key in self.keys]
+        self._memo = {}
+
+    def candidates(self, text, limit=3):
+        """text와 n-gram이 겹치는 어휘 값을 Dice 계수 순으로 최대 limit개 반환 [(값, 점수), ...]"""
+        grams = ngrams(normalize(text))
+        shared = {}
+        for gram in grams:
+            for i in self.gram_index.get(gram, ()):
+                shared[i] = shared.get(i, 0) + 1
+        ranked = sorted(
+            ((2.0 * count / (len(grams) + len(self.key_grams[i])), i) for i, count in shared.items()),
+            key=lambda item: (-item[0], item[1]),
+        )
+        return [(self.normalized[self.keys[i]], score) for score, i in ranked[:limit]]
+
+    def match(self, text):
+        """text → VocabMatch (원문별 memo)"""
+        if not isinstance(text, str):
+            return NO_MATCH
+        result = self._memo.get(text)
+        if result is None:
+            result = self._memo[text] = self._match(text)
+        return result
+
+    def _match(self, text):
+        if not text.strip():
+            return NO_MATCH
+        if text in self.exact:
+            return VocabMatch(text, 1.0, 'exact', None)
+        value = self.normalized.get(normalize(text))
+        if value is not None:
+            return VocabMatch(value, 1.0, 'normalized', None)
+        ranked = self.candidates(text, 2)
+        if not ranked:
+            return NO_MATCH
+        value, score = ranked[0]
+        runner_up = ranked[1] if len(ranked) > 1 else None
+        words = tokenize(text)
+        extended = [self.normalized[key] for key, tokens in zip(self.keys, self.key_tokens)
+                    if len(tokens) > len(words) and tokens[:len(words)] == words]
+        if len(extended) > 1:
+            return VocabMatch(value, score, 'fuzzy', runner_up, tuple(extended))
+        contained = self._contained(set(words))
+        if len(contained) > 1:
+            return VocabMatch(value, score, 'fuzzy', runner_up, tuple(contained))
+        if contained and contained[0] != value:
+            runner_up = (value, score)
+            value = contained[0]
+            score = self.similarity(text, value)
+        return VocabMatch(value, score, 'fuzzy', runner_up)
+
+    def _contained(self, words):
+        # 토큰이 모두 words에 들어 있는 값 중 다른 값의 토큰에 포함되지 않는 값
+        found = [(set(tokens), i) for i, tokens in enumerate(self.key_tokens) if tokens and set(tokens) <= words]
+        return [self.normalized[self.keys[i]] for tokens, i in found
+                if not any(tokens < other for other, _ in found)]
+
+    def similarity(self, text, value):
+        """text와 value의 정규화 문자열 n-gram Dice 계수"""
+        a, b = ngrams(normalize(text)), ngrams(normalize(value))
+        return 2.0 * len(a & b) / (len(a) + len(b))
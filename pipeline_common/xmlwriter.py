@@ -0,0 +1,176 @@
+"""
+증분(스트리밍) XML 작성기
+- xmltodict 형식의 dict를 lxml.etree.xmlfile로 요소 단위로 바로 파일에 기록
+  → 전체 문서를 하나의 문자열로 만들지 않으므로 메모리 사용량이 절반으로 줄고 첫 바이트가 바로 기록됨
+- 출력 형식은 xmltodict.unparse(pretty=True)와 동일 (탭 들여쓰기, 빈 요소는 <TAG></TAG>)
+- self_closing에 지정한 태그는 빈 요소일 때 <TAG/>로 기록 (문자열 치환 불필요)
+- compact 모드(pretty=False): 들여쓰기/줄바꿈 없이 기록, XMLMETA_COMPACT=1 환경변수로 전체 파이프라인에 적용
+- 파일 쓰기는 buffer_size 단위로 버퍼링
+- build_tree: 같은 규칙으로 lxml 트리를 만들어 직렬화 없이 XSD 검증에 사용
+  (요소마다 기록될 파일의 줄 번호를 sourceline으로 지정 → 에러 메시지의 줄 번호가 저장한 파일 검증과 동일)
+"""
+import io
+import os
+
+from lxml import etree
+
+XML_HEADER = '<?xml version="1.0" encoding="utf-8"?>\n'
+
+# compact 모드 선택: "1"/"true"/"yes"이면 들여쓰기 없이 기록
+COMPACT_ENV = "XMLMETA_COMPACT"
+
+DEFAULT_BUFFER_SIZE = 1 << 20
+
+ATTR_PREFIX = '@'
+CDATA_KEY = '#text'
+INDENT = '\t'
+NEWLINE = '\n'
+
+
+def default_pretty():
+    return os.environ.get(COMPACT_ENV, "").strip().lower() not in ("1", "true", "yes")
+
+
+def _to_str(value):
+    # xmltodict와 같은 문자열 변환 (bool은 소문자)
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return str(value)
+
+
+def _iter_values(value):
+    # 리스트면 같은 태그를 반복, 그 외(문자열/dict/None 등)는 요소 1개
+    if not hasattr(value, '__iter__') or isinstance(value, (str, bytes, dict)):
+        return [value]
+    return value
+
+
+def _split_value(v):
+    # 요소 값 → (텍스트, 속성 dict, (자식 키, 값) 목록): _write_element와 build_tree 공용
+    if v is None:
+        v = {}
+    elif not isinstance(v, (dict, str)):
+        v = _to_str(v)
+    if isinstance(v, str):
+        v = {CDATA_KEY: v}
+    cdata = None
+    attrs = {}
+    children = []
+    for ik, iv in v.items():
+        if ik == CDATA_KEY:
+            cdata = None if iv is None else _to_str(iv)
+        elif ik.startswith(ATTR_PREFIX):
+            attrs[ik[len(ATTR_PREFIX):]] = '' if iv is None else _to_str(iv)
+        elif not (isinstance(iv, list) and not iv):
+            children.append((ik, iv))
+    return cdata, attrs, children
+
+
+def _write_element(xf, key, v, depth, pretty, self_closing):
+    """
+    xmltodict._emit과 같은 규칙으로 key 요소 하나를 xf에 기록
+    (요소 앞 들여쓰기/뒤 줄바꿈은 호출하는 쪽에서 기록)
+    """
+    cdata, attrs, children = _split_value(v)
+    if not children:
+        # 자식이 없는 요소는 한 번에 기록, text가 None이면 lxml이 <TAG/>로 직렬화
+        elem = etree.Element(key, attrs)
+        if cdata or key not in self_closing:
+            elem.text = cdata or ''
+        xf.write(elem)
+        return
+    indent = (depth + 1) * INDENT
+    with xf.element(key, attrs):
+        if pretty:
+            xf.write(NEWLINE)
+        for child_key, child_value in children:
+            for cv in _iter_values(child_value):
+                if pretty:
+                    xf.write(indent)
+                _write_element(xf, child_key, cv, depth + 1, pretty, self_closing)
+                if pretty:
+                    xf.write(NEWLINE)
+        if cdata is not None:
+            xf.write(cdata)
+        if pretty:
+            xf.write(depth * INDENT)
+
+
+def write_elements(f, doc, depth=0, pretty=None, self_closing=()):
+    """
+    doc(dict)의 각 최상위 키를 바이너리 파일 객체 f에 이어서 기록
+    (XML 선언 없이 요소만 기록하므로 레코드 조각/문서 본문 모두에 사용)
+    lxml.etree.xmlfile은 요소 밖의 텍스트를 허용하지 않으므로 최상위 들여쓰기/줄바꿈은 f에 직접 기록
+    """
+    if pretty is None:
+        pretty = default_pretty()
+    self_closing = frozenset(self_closing)
+    for key, value in doc.items():
+        for v in _iter_values(value):
+            if pretty and depth:
+                f.write((depth * INDENT).encode('utf-8'))
+            with etree.xmlfile(f, encoding='utf-8') as xf:
+                _write_element(xf, key, v, depth, pretty, self_closing)
+            if pretty and depth:
+                f.write(NEWLINE.encode('utf-8'))
+
+
+def write_xml(doc, path, pretty=None, self_closing=(), buffer_size=DEFAULT_BUFFER_SIZE):
+    """doc(xmltodict 형식, 루트 1개)를 XML 문서로 path에 바로 기록"""
+    with open(path, 'wb', buffering=buffer_size) as f:
+        f.write(XML_HEADER.encode('utf-8'))
+        write_elements(f, doc, pretty=pretty, self_closing=self_closing)
+
+
+def render_fragment(tag, record, depth=1, pretty=None, self_closing=()):
+    """
+    레코드 하나를 문자열 조각으로 렌더링
+    (xmltodict.unparse({tag: record}, full_document=False, depth=depth)와 같은 형식)
+    """
+    buf = io.BytesIO()
+    write_elements(buf, {tag: record}, depth, pretty, self_closing)
+    return buf.getvalue().decode('utf-8')
+
+
+# libxml2 요소 줄 번호 상한 (unsigned short, 넘으면 상한값으로 표시)
+_MAX_LINE = 65535
+
+
+def _build_element(parent, key, v, line, pretty):
+    """
+    key 요소 하나를 parent 아래(parent가 None이면 새 루트)에 만들고 (요소, 요소가 끝나는 줄) 반환
+    line: 요소가 시작되는 줄 (_write_element가 기록하는 위치와 같게 계산)
+    """
+    cdata, attrs, children = _split_value(v)
+    elem = etree.Element(key, attrs) if parent is None else etree.SubElement(parent, key, attrs)
+    elem.sourceline = min(line, _MAX_LINE)
+    if not children:
+        elem.text = cdata or ''
+        return elem, line + elem.text.count('\n')
+    if pretty:
+        line += 1
+    last = None
+    for child_key, child_value in children:
+        for cv in _iter_values(child_value):
+            last, line = _build_element(elem, child_key, cv, line, pretty)
+            if pretty:
+                line += 1
+    if cdata is not None:
+        if last is None:
+            elem.text = cdata
+        else:
+            last.tail = cdata
+        line += cdata.count('\n')
+    return elem, line
+
+
+def build_tree(doc, pretty=None):
+    """
+    doc(xmltodict 형식, 루트 1개)을 write_xml로 저장했을 때와 같은 내용의 lxml 루트 요소로 변환
+    (들여쓰기 공백은 넣지 않음, 빈 요소 표기(self_closing)는 검증 결과와 무관하므로 구분하지 않음)
+    """
+    if pretty is None:
+        pretty = default_pretty()
+    (key, value), = doc.items()
+    # 1번 줄은 XML 선언
+    return _build_element(None, key, value, 2, pretty)[0]
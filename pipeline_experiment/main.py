@@ -1,19 +1,57 @@
 import xmltodict
-from lxml import etree
-import subprocess
 import os
-from collections import OrderedDict
-import csv
-import difflib
+import sys
+import argparse
+
+# 공용 모듈(pipeline_common) import를 위해 저장소 루트를 경로에 추가
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pipeline_common.xmlwriter import write_xml
+from pipeline_common.manifest import load_manifest, CallRecorder
+from pipeline_common.emit import emit_groups, emit_groups_once, default_jobs
+from pipeline_common.corpus import Corpus, count_records
+from pipeline_common.submission_map import open_submission_map
+from pipeline_common.metrics import create_metrics, NULL_METRICS
+from pipeline_common.vocab import VocabularyIndex
+from pipeline_common.rewrite import TreeRewriter, EMPTY_VALUES
+from pipeline_common.schema_order import ChildOrder
+from pipeline_common.prevalidate import PreValidator, group_violations, print_precheck_summary
+from pipeline_common.streaming import iter_records, render_record, StreamDocumentWriter, GroupSpool, emit_spool
 
 XSD_PATH = "pub/docs/dra/xsd/1-6/SRA.experiment.xsd"
 INPUT_XML = "xml_submitted/ddbj_bioExperiment.xml"
 EXAMPLE_XML = "real_examples/kobic-0352.experiment.xml"
 OUTPUT_XML = "xml_fixed/ddbj_bioExperiment.fixed.xml"
 REPORT_PATH = "xml_fixed/experiment_report.txt"
+MANIFEST_PATH = "xml_fixed/experiment_manifest.json"
+SUBMISSION_CSV = "xml_submitted/KRA_after_20240311_pp_lib.csv"
+# 빈 요소일 때 self-closing(<PAIRED/>)으로 기록할 태그
+SELF_CLOSING_TAGS = ('PAIRED', 'SINGLE')
 
-# XSD의 모든 플랫폼별 INSTRUMENT_MODEL 값 통합
-PLATFORM_INSTRUMENTS = {
+EXPERIMENT_PATH = 'EXPERIMENT_SET/EXPERIMENT'
+PLATFORM_PATH = EXPERIMENT_PATH + '/PLATFORM'
+LIBRARY_PATH = EXPERIMENT_PATH + '/DESIGN/LIBRARY_DESCRIPTOR'
+
+# XSD에서 자식 순서를 찾지 못할 때(XSD 없음 등) 쓰는 DESIGN/LIBRARY_DESCRIPTOR 자식 순서
+DESIGN_CHILD_ORDER = {
+    EXPERIMENT_PATH + '/DESIGN': ['DESIGN_DESCRIPTION', 'SAMPLE_DESCRIPTOR', 'LIBRARY_DESCRIPTOR', 'SPOT_DESCRIPTOR'],
+    LIBRARY_PATH: [
+        'LIBRARY_NAME', 'LIBRARY_STRATEGY', 'LIBRARY_SOURCE', 'LIBRARY_SELECTION', 'LIBRARY_LAYOUT',
+        'TARGETED_LOCI', 'POOLING_STRATEGY', 'LIBRARY_CONSTRUCTION_PROTOCOL',
+    ],
+}
+SCHEMA_ORDER = ChildOrder(XSD_PATH, DESIGN_CHILD_ORDER)
+
+# XSD에서 enumeration을 찾지 못할 때(XSD 없음 등) 쓰는 LIBRARY_SELECTION, LIBRARY_STRATEGY, LIBRARY_SOURCE 허용값
+LIBRARY_VOCABULARY = {
+    LIBRARY_PATH + '/LIBRARY_SELECTION': ["RANDOM", "PCR", "RT-PCR", "HMPR", "MF", "CF", "size fractionation", "cDNA", "ChIP", "MNase", "DNase", "Hybrid Selection", "Reduced Representation", "Restriction Digest", "Inverse rRNA", "PolyA", "Oligo-dT", "other"],
+    LIBRARY_PATH + '/LIBRARY_STRATEGY': ["WGS", "WGA", "WXS", "RNA-Seq", "ssRNA-seq", "miRNA-Seq", "ncRNA-Seq", "FL-cDNA", "EST", "Hi-C", "ATAC-seq", "WCS", "RAD-Seq", "CLONE", "POOLCLONE", "AMPLICON", "CLONEEND", "FINISHING", "ChIP-Seq", "MNase-Seq", "DNase-Hypersensitivity", "Bisulfite-Seq", "CTS", "MRE-Seq", "MeDIP-Seq", "MBD-Seq", "Tn-Seq", "VALIDATION", "FAIRE-seq", "SELEX", "NOMe-Seq", "RIP-Seq", "ChIA-PET", "Synthetic-Long-Read", "Targeted-Capture", "Tethered Chromatin Conformation Capture", "OTHER"],
+    LIBRARY_PATH + '/LIBRARY_SOURCE': ["GENOMIC", "TRANSCRIPTOMIC", "METAGENOMIC", "SYNTHETIC", "VIRAL RNA", "OTHER"],
+}
+# XSD 제약 표(enumeration/필수 속성·요소/최대 횟수)로 EXPERIMENT 레코드 사전 검사 + 허용값 조회
+PRECHECK = PreValidator(XSD_PATH, LIBRARY_VOCABULARY)
+
+# XSD에서 플랫폼별 INSTRUMENT_MODEL enumeration을 찾지 못할 때(XSD 없음 등) 쓰는 값
+DEFAULT_PLATFORM_INSTRUMENTS = {
     'LS454': [
         "454 GS", "454 GS 20", "454 GS FLX", "454 GS FLX+", "454 GS FLX Titanium", "454 GS Junior", "unspecified"
     ],
@@ -66,34 +104,40 @@ PLATFORM_INSTRUMENTS = {
         "Tapestri", "unspecified"
     ],
 }
+
+def schema_platform_instruments(defaults):
+    """
+    XSD의 PLATFORM 자식(플랫폼 태그)별 INSTRUMENT_MODEL enumeration
+    XSD에서 PLATFORM 자식을 찾지 못하면 defaults의 플랫폼, enumeration을 찾지 못한 플랫폼은 defaults의 값
+    """
+    instruments = {}
+    for platform_tag in SCHEMA_ORDER.schema_order(PLATFORM_PATH) or defaults:
+        models = PRECHECK.enumeration(f"{PLATFORM_PATH}/{platform_tag}/INSTRUMENT_MODEL") or defaults.get(platform_tag)
+        if models:
+            instruments[platform_tag] = list(models)
+    return instruments
+
+# XSD의 모든 플랫폼별 INSTRUMENT_MODEL 값 통합
+PLATFORM_INSTRUMENTS = schema_platform_instruments(DEFAULT_PLATFORM_INSTRUMENTS)
 # 모든 기기명 통합 리스트 (중복 제거 + 알파벳 정렬)
 allowed_instrument = sorted(set(sum(PLATFORM_INSTRUMENTS.values(), [])))
+# 기기명 → 플랫폼 태그 (여러 플랫폼에 있는 값(unspecified)은 PLATFORM_INSTRUMENTS에서 먼저 나온 플랫폼)
+INSTRUMENT_PLATFORM = {}
+for _platform_tag, _models in PLATFORM_INSTRUMENTS.items():
+    for _model in _models:
+        INSTRUMENT_PLATFORM.setdefault(_model, _platform_tag)
+# 기기명 색인: 정확히 일치 / 대소문자·구두점 정규화 / 문자 n-gram 유사도 (pipeline_common.vocab)
+INSTRUMENT_INDEX = VocabularyIndex(INSTRUMENT_PLATFORM)
+# --instrument-auto 기본 기준 점수, 1·2순위 후보 점수 차가 이보다 작으면 모호한 것으로 보고 적용하지 않음
+DEFAULT_INSTRUMENT_THRESHOLD = 0.8
+INSTRUMENT_MARGIN = 0.05
 
 def parse_xml(path):
     with open(path, encoding="utf-8") as f:
         return xmltodict.parse(f.read())
 
 def save_xml(doc, path):
-    xml_str = xmltodict.unparse(doc, pretty=True)
-    # 빈 태그를 self-closing으로 치환
-    xml_str = xml_str.replace('<PAIRED></PAIRED>', '<PAIRED/>').replace('<SINGLE></SINGLE>', '<SINGLE/>')
-    with open(path, "w", encoding="utf-8") as f:
-        f.write(xml_str)
-
-def clean_attributes(d):
-    # 불필요한 속성(refcenter, refname 등) 제거
-    if isinstance(d, dict):
-        keys_to_del = []
-        for k in d:
-            if k.startswith('@') and k in ['@refcenter', '@refname']:
-                keys_to_del.append(k)
-        for k in keys_to_del:
-            del d[k]
-        for v in d.values():
-            clean_attributes(v)
-    elif isinstance(d, list):
-        for item in d:
-            clean_attributes(item)
+    write_xml(doc, path, self_closing=SELF_CLOSING_TAGS)
 
 def fix_identifiers(ident, parent_accession=None, id_type=None, exp_accession=None):
     # id_type: "BioProject" or "BioSample"
@@ -154,261 +198,336 @@ def fix_identifiers(ident, parent_accession=None, id_type=None, exp_accession=No
     return ident
 
 def get_platform_tag_for_instrument(instrument):
-    for platform_tag, models in PLATFORM_INSTRUMENTS.items():
-        if instrument in models:
-            return platform_tag
-    return None
-
-def fix_structure(doc):
-    # 1. 빈 값(""), None, 빈 리스트, 빈 dict 제거
-    def remove_empty(d):
-        if isinstance(d, dict):
-            return {k: remove_empty(v) for k, v in d.items() if v not in ("", None, [], {})}
-        elif isinstance(d, list):
-            return [remove_empty(i) for i in d if i not in ("", None, [], {})]
-        else:
-            return d
-    doc = remove_empty(doc)
-
-    # 재귀적으로 불필요한 속성 제거 및 IDENTIFIERS 보정
-    def recursive_fix(d, parent_accession=None, id_type=None, exp_accession=None):
-        if isinstance(d, dict):
-            clean_attributes(d)
-            for k, v in d.items():
-                # STUDY_REF, SAMPLE_DESCRIPTOR 등에서 accession 값을 넘김
-                if k == 'STUDY_REF' and isinstance(v, dict):
-                    acc = v.get('@accession')
-                    if 'IDENTIFIERS' in v:
-                        v['IDENTIFIERS'] = fix_identifiers(v['IDENTIFIERS'], parent_accession=acc, id_type="BioProject")
-                    recursive_fix(v, parent_accession=acc, id_type="BioProject")
-                elif k == 'SAMPLE_DESCRIPTOR' and isinstance(v, dict):
-                    acc = v.get('@accession')
-                    if 'IDENTIFIERS' in v:
-                        v['IDENTIFIERS'] = fix_identifiers(v['IDENTIFIERS'], parent_accession=acc, id_type="BioSample")
-                    recursive_fix(v, parent_accession=acc, id_type="BioSample")
-                elif k == 'IDENTIFIERS':
-                    # EXPERIMENT의 IDENTIFIERS라면 exp_accession을 넘김
-                    if id_type is None and exp_accession:
-                        d[k] = fix_identifiers(v, exp_accession=exp_accession)
-                    elif not (id_type in ["BioProject", "BioSample"]):
-                        d[k] = fix_identifiers(v)
-                else:
-                    # EXPERIMENT 루트에서 recursive_fix를 호출할 때 exp_accession을 넘김
-                    if k == 'EXPERIMENT' and isinstance(v, dict):
-                        acc = v.get('@accession')
-                        d[k] = recursive_fix(v, exp_accession=acc)
-                    else:
-                        d[k] = recursive_fix(v)
-        elif isinstance(d, list):
-            return [recursive_fix(i) for i in d]
-        return d
-    doc = recursive_fix(doc)
-
-    # 2. LIBRARY_SELECTION, LIBRARY_STRATEGY, LIBRARY_SOURCE 등 허용값만 남기기
-    allowed_selection = {"RANDOM", "PCR", "RT-PCR", "HMPR", "MF", "CF", "size fractionation", "cDNA", "ChIP", "MNase", "DNase", "Hybrid Selection", "Reduced Representation", "Restriction Digest", "Inverse rRNA", "PolyA", "Oligo-dT", "other"}
-    allowed_strategy = {"WGS", "WGA", "WXS", "RNA-Seq", "ssRNA-seq", "miRNA-Seq", "ncRNA-Seq", "FL-cDNA", "EST", "Hi-C", "ATAC-seq", "WCS", "RAD-Seq", "CLONE", "POOLCLONE", "AMPLICON", "CLONEEND", "FINISHING", "ChIP-Seq", "MNase-Seq", "DNase-Hypersensitivity", "Bisulfite-Seq", "CTS", "MRE-Seq", "MeDIP-Seq", "MBD-Seq", "Tn-Seq", "VALIDATION", "FAIRE-seq", "SELEX", "NOMe-Seq", "RIP-Seq", "ChIA-PET", "Synthetic-Long-Read", "Targeted-Capture", "Tethered Chromatin Conformation Capture", "OTHER"}
-    allowed_source = {"GENOMIC", "TRANSCRIPTOMIC", "METAGENOMIC", "SYNTHETIC", "VIRAL RNA", "OTHER"}
-
-    def fix_experiment(exp):
-        acc = exp.get('@accession')
-        title = exp.get('TITLE')
-        if acc and title and not title.strip().endswith(f"({acc})"):
-            exp['TITLE'] = f"{title} ({acc})"
-        # DESIGN 하위 DESIGN_DESCRIPTION 보정
-        if 'DESIGN' in exp and isinstance(exp['DESIGN'], dict):
-            design = exp['DESIGN']
-            desc = design.get('DESIGN_DESCRIPTION', None)
-            if desc is None or (isinstance(desc, str) and desc.strip() == ""):
-                design['DESIGN_DESCRIPTION'] = 'missing'
-            exp['DESIGN'] = design
-        # 1. DESIGN 하위 DESIGN_DESCRIPTION(텍스트), SAMPLE_DESCRIPTOR(속성/빈태그), LIBRARY_DESCRIPTOR 모두 존재, 순서 보장
-        if 'DESIGN' in exp and isinstance(exp['DESIGN'], dict):
-            design = exp['DESIGN']
-            # DESIGN_DESCRIPTION
-            desc = design.get('DESIGN_DESCRIPTION', '')
-            if not isinstance(desc, str):
-                desc = ''
-            # EXPERIMENT의 SAMPLE_DESCRIPTOR를 DESIGN 하위로 이동 (여러 개일 수 있음)
-            sample_desc = None
-            if 'SAMPLE_DESCRIPTOR' in exp:
-                sample_desc = exp.pop('SAMPLE_DESCRIPTOR')
-            elif 'SAMPLE_DESCRIPTOR' in design:
-                sample_desc = design.pop('SAMPLE_DESCRIPTOR')
-            if sample_desc is not None:
-                if not isinstance(sample_desc, list):
-                    sample_desc = [sample_desc]
+    if not isinstance(instrument, str):
+        return None
+    return INSTRUMENT_PLATFORM.get(instrument)
+
+class InstrumentResolver:
+    """
+    INSTRUMENT_MODEL 원문 → (기기명, 플랫폼 태그) 결정 및 결정 내역 기록
+    - 정확히 일치하는 값은 항상 적용
+    - threshold가 주어지면(--instrument-auto) 정규화/유사도 매칭 점수가 threshold 이상이고
+      차순위 후보와 INSTRUMENT_MARGIN 이상 차이 나는 경우 자동 적용 (대화형 선택 없음)
+    - 토큰 단위로 후보가 여럿인 원문(예: "Illumina HiSeq", "Illumina Hiseq X Ten")은 점수와 무관하게 적용하지 않고
+      후보 목록을 리포트에 기록
+    - threshold가 None이면 정확히 일치하지 않는 값은 그대로 두고 후보만 리포트에 기록
+    """
+
+    def __init__(self, threshold=None, index=INSTRUMENT_INDEX):
+        self.threshold = threshold
+        self.index = index
+        self.decisions = {}     # 원문 → [VocabMatch, 적용 여부, 레코드 수] (정확히 일치한 값 제외)
+
+    def resolve(self, raw):
+        match = self.index.match(raw)
+        if match.method == 'exact':
+            return raw, INSTRUMENT_PLATFORM[raw]
+        decision = self.decisions.get(raw) if isinstance(raw, str) else None
+        if decision is None:
+            decision = [match, self._accept(match), 0]
+            if isinstance(raw, str):
+                self.decisions[raw] = decision
+        decision[2] += 1
+        if decision[1]:
+            return match.value, INSTRUMENT_PLATFORM[match.value]
+        return raw, None
+
+    def _accept(self, match):
+        if self.threshold is None or match.value is None or match.ambiguous or match.score < self.threshold:
+            return False
+        return match.runner_up is None or match.score - match.runner_up[1] >= INSTRUMENT_MARGIN
+
+    def report_lines(self):
+        lines = []
+        for raw, (match, applied, count) in self.decisions.items():
+            if match.value is None:
+                lines.append(f"[INSTRUMENT] {raw!r}: 후보 없음 ({count}건, PLATFORM 미변환)")
+                continue
+            detail = f"{match.method}, score {match.score:.2f}"
+            if match.runner_up:
+                detail += f", 차순위 {match.runner_up[0]!r} {match.runner_up[1]:.2f}"
+            if applied:
+                status = "적용"
+            elif match.ambiguous:
+                status = f"미적용 (모호: 후보 {', '.join(repr(value) for value in match.ambiguous)})"
+            elif self.threshold is None:
+                status = "미적용 (--instrument-auto로 자동 적용 가능)"
             else:
-                sample_desc = []
-            # EXPERIMENT의 LIBRARY_DESCRIPTOR를 DESIGN 하위로 이동
-            lib_desc = None
-            if 'LIBRARY_DESCRIPTOR' in exp:
-                lib_desc = exp.pop('LIBRARY_DESCRIPTOR')
-            elif 'LIBRARY_DESCRIPTOR' in design:
-                lib_desc = design.pop('LIBRARY_DESCRIPTOR')
-            # LIBRARY_NAME 반드시 추가
-            library_name = None
-            if isinstance(lib_desc, dict):
-                if 'LIBRARY_NAME' in lib_desc:
-                    library_name = lib_desc['LIBRARY_NAME']
-                elif 'LIBRARY_NAME' in exp:
-                    library_name = exp['LIBRARY_NAME']
-                # LIBRARY_NAME을 LIBRARY_DESCRIPTOR 하위에 추가
-                if library_name:
-                    lib_desc['LIBRARY_NAME'] = library_name
-                # LIBRARY_LAYOUT 분리
-                layout = None
-                if 'LIBRARY_LAYOUT' in lib_desc:
-                    layout = lib_desc.pop('LIBRARY_LAYOUT')
-                if layout is None and 'LIBRARY_LAYOUT' in exp:
-                    layout = exp.pop('LIBRARY_LAYOUT')
-                # LIBRARY_CONSTRUCTION_PROTOCOL 분리
+                status = f"미적용 (기준 {self.threshold:.2f} 미달 또는 모호)"
+            lines.append(f"[INSTRUMENT] {raw!r} → {match.value!r} ({INSTRUMENT_PLATFORM[match.value]}, {detail}, {count}건): {status}")
+        return lines
+
+    def write_report(self, report_path):
+        """결정 내역을 출력하고 리포트 파일 끝에 추가 (정확히 일치하지 않은 값이 있을 때만)"""
+        lines = self.report_lines()
+        if not lines:
+            return
+        for line in lines:
+            print(line)
+        with open(report_path, 'a', encoding='utf-8') as rf:
+            if rf.tell():
+                rf.write('\n')
+            rf.write('\n'.join(lines))
+
+# 기본 결정기: 정확히 일치하는 값만 적용 (main()에서 --instrument-auto에 따라 교체)
+INSTRUMENTS = InstrumentResolver()
+
+# LIBRARY_SELECTION, LIBRARY_STRATEGY, LIBRARY_SOURCE 허용값 (XSD enumeration, 없으면 LIBRARY_VOCABULARY)
+allowed_selection = PRECHECK.allowed(LIBRARY_PATH + '/LIBRARY_SELECTION')
+allowed_strategy = PRECHECK.allowed(LIBRARY_PATH + '/LIBRARY_STRATEGY')
+allowed_source = PRECHECK.allowed(LIBRARY_PATH + '/LIBRARY_SOURCE')
+
+def fix_experiment(exp, instruments=None):
+    instruments = instruments or INSTRUMENTS
+    acc = exp.get('@accession')
+    title = exp.get('TITLE')
+    if acc and title and not title.strip().endswith(f"({acc})"):
+        exp['TITLE'] = f"{title} ({acc})"
+    # DESIGN 하위 DESIGN_DESCRIPTION 보정
+    if 'DESIGN' in exp and isinstance(exp['DESIGN'], dict):
+        design = exp['DESIGN']
+        desc = design.get('DESIGN_DESCRIPTION', None)
+        if desc is None or (isinstance(desc, str) and desc.strip() == ""):
+            design['DESIGN_DESCRIPTION'] = 'missing'
+        exp['DESIGN'] = design
+    # 1. DESIGN 하위 DESIGN_DESCRIPTION(텍스트), SAMPLE_DESCRIPTOR(속성/빈태그), LIBRARY_DESCRIPTOR 모두 존재, 순서 보장
+    if 'DESIGN' in exp and isinstance(exp['DESIGN'], dict):
+        design = exp['DESIGN']
+        # DESIGN_DESCRIPTION
+        desc = design.get('DESIGN_DESCRIPTION', '')
+        if not isinstance(desc, str):
+            desc = ''
+        # EXPERIMENT의 SAMPLE_DESCRIPTOR를 DESIGN 하위로 이동 (여러 개일 수 있음)
+        sample_desc = None
+        if 'SAMPLE_DESCRIPTOR' in exp:
+            sample_desc = exp.pop('SAMPLE_DESCRIPTOR')
+        elif 'SAMPLE_DESCRIPTOR' in design:
+            sample_desc = design.pop('SAMPLE_DESCRIPTOR')
+        if sample_desc is not None:
+            if not isinstance(sample_desc, list):
+                sample_desc = [sample_desc]
+        else:
+            sample_desc = []
+        # EXPERIMENT의 LIBRARY_DESCRIPTOR를 DESIGN 하위로 이동
+        lib_desc = None
+        if 'LIBRARY_DESCRIPTOR' in exp:
+            lib_desc = exp.pop('LIBRARY_DESCRIPTOR')
+        elif 'LIBRARY_DESCRIPTOR' in design:
+            lib_desc = design.pop('LIBRARY_DESCRIPTOR')
+        # LIBRARY_NAME 반드시 추가
+        library_name = None
+        if isinstance(lib_desc, dict):
+            if 'LIBRARY_NAME' in lib_desc:
+                library_name = lib_desc['LIBRARY_NAME']
+            elif 'LIBRARY_NAME' in exp:
+                library_name = exp['LIBRARY_NAME']
+            # LIBRARY_NAME을 LIBRARY_DESCRIPTOR 하위에 추가
+            if library_name:
+                lib_desc['LIBRARY_NAME'] = library_name
+            # LIBRARY_LAYOUT 분리
+            layout = None
+            if 'LIBRARY_LAYOUT' in lib_desc:
+                layout = lib_desc.pop('LIBRARY_LAYOUT')
+            if layout is None and 'LIBRARY_LAYOUT' in exp:
+                layout = exp.pop('LIBRARY_LAYOUT')
+            # LIBRARY_CONSTRUCTION_PROTOCOL 분리
+            construction_protocol = None
+            if 'LIBRARY_CONSTRUCTION_PROTOCOL' in lib_desc:
+                construction_protocol = lib_desc.pop('LIBRARY_CONSTRUCTION_PROTOCOL')
+            # LIBRARY_SELECTION이 없으면 필수로 추가하고 construction_protocol은 추가하지 않음
+            if 'LIBRARY_SELECTION' not in lib_desc:
+                lib_desc['LIBRARY_SELECTION'] = 'other'
                 construction_protocol = None
-                if 'LIBRARY_CONSTRUCTION_PROTOCOL' in lib_desc:
-                    construction_protocol = lib_desc.pop('LIBRARY_CONSTRUCTION_PROTOCOL')
-                # 순서: LIBRARY_STRATEGY → LIBRARY_SOURCE → LIBRARY_SELECTION → LIBRARY_LAYOUT (LIBRARY_SELECTION이 있을 때만 바로 뒤에)
-                new_lib = OrderedDict()
-                has_selection = 'LIBRARY_SELECTION' in lib_desc
-                # LIBRARY_SELECTION이 없으면 construction_protocol도 추가하지 않음
-                if not has_selection:
-                    construction_protocol = None
-                for k in ['LIBRARY_NAME', 'LIBRARY_STRATEGY', 'LIBRARY_SOURCE', 'LIBRARY_SELECTION']:
-                    if k in lib_desc:
-                        new_lib[k] = lib_desc[k]
-                    if k == 'LIBRARY_SELECTION' and layout is not None and has_selection:
-                        new_lib['LIBRARY_LAYOUT'] = layout
-                # LIBRARY_SELECTION이 없으면 필수로 추가
-                if not has_selection:
-                    new_lib['LIBRARY_SELECTION'] = 'other'
-                    if layout is not None:
-                        new_lib['LIBRARY_LAYOUT'] = layout
-                # 나머지 필드 유지 (LIBRARY_LAYOUT, LIBRARY_NAME, LIBRARY_CONSTRUCTION_PROTOCOL 제외)
-                for k, v in lib_desc.items():
-                    if k not in ('LIBRARY_NAME', 'LIBRARY_STRATEGY', 'LIBRARY_SOURCE', 'LIBRARY_SELECTION', 'LIBRARY_LAYOUT', 'LIBRARY_CONSTRUCTION_PROTOCOL'):
-                        new_lib[k] = v
-                # 마지막에 LIBRARY_CONSTRUCTION_PROTOCOL 추가
-                if construction_protocol is not None:
-                    new_lib['LIBRARY_CONSTRUCTION_PROTOCOL'] = construction_protocol
-                lib_desc = new_lib
-            # 순서: DESIGN_DESCRIPTION → SAMPLE_DESCRIPTOR → LIBRARY_DESCRIPTOR
-            new_design = OrderedDict()
-            new_design['DESIGN_DESCRIPTION'] = desc
-            if sample_desc:
-                if len(sample_desc) == 1:
-                    new_design['SAMPLE_DESCRIPTOR'] = sample_desc[0]
-                else:
-                    new_design['SAMPLE_DESCRIPTOR'] = sample_desc
-            if lib_desc is not None:
-                new_design['LIBRARY_DESCRIPTOR'] = lib_desc
-            # 나머지 필드 유지
-            for k, v in design.items():
-                if k not in ('DESIGN_DESCRIPTION', 'SAMPLE_DESCRIPTOR', 'LIBRARY_DESCRIPTOR', 'LIBRARY_LAYOUT'):
-                    new_design[k] = v
-            exp['DESIGN'] = new_design
-        # 2. INSTRUMENT_MODEL 값 보정 및 PLATFORM 구조 자동 변환
-        if 'PLATFORM' in exp:
-            plat = exp['PLATFORM']
-            if isinstance(plat, dict):
-                selected_platform = None
-                selected_instrument = None
-                # 1. 기존 구조에서 INSTRUMENT_MODEL 추출
-                for platform_key, v in plat.items():
-                    if isinstance(v, dict) and 'INSTRUMENT_MODEL' in v:
-                        model = v['INSTRUMENT_MODEL']
-                        selected_instrument = model
-                        break
-                    elif platform_key == 'INSTRUMENT_MODEL':
-                        selected_instrument = v
-                        break
-                # 2. INSTRUMENT_MODEL이 있으면, 올바른 플랫폼 태그로 변환
-                if selected_instrument:
-                    platform_tag = get_platform_tag_for_instrument(selected_instrument)
-                    if platform_tag:
-                        exp['PLATFORM'] = {
-                            platform_tag: {
-                                'INSTRUMENT_MODEL': selected_instrument
-                            }
+            if layout is not None:
+                lib_desc['LIBRARY_LAYOUT'] = layout
+            if construction_protocol is not None:
+                lib_desc['LIBRARY_CONSTRUCTION_PROTOCOL'] = construction_protocol
+            # 순서: XSD의 LIBRARY_DESCRIPTOR 자식 순서 (NAME → STRATEGY → SOURCE → SELECTION → LAYOUT → ... → CONSTRUCTION_PROTOCOL)
+            SCHEMA_ORDER.reorder(lib_desc, LIBRARY_PATH)
+        design['DESIGN_DESCRIPTION'] = desc
+        if sample_desc:
+            if len(sample_desc) == 1:
+                design['SAMPLE_DESCRIPTOR'] = sample_desc[0]
+            else:
+                design['SAMPLE_DESCRIPTOR'] = sample_desc
+        if lib_desc is not None:
+            design['LIBRARY_DESCRIPTOR'] = lib_desc
+        design.pop('LIBRARY_LAYOUT', None)
+        # 순서: XSD의 DESIGN 자식 순서 (DESIGN_DESCRIPTION → SAMPLE_DESCRIPTOR → LIBRARY_DESCRIPTOR), 나머지는 뒤에
+        SCHEMA_ORDER.reorder(design, EXPERIMENT_PATH + '/DESIGN')
+    # 2. INSTRUMENT_MODEL 값 보정 및 PLATFORM 구조 자동 변환
+    if 'PLATFORM' in exp:
+        plat = exp['PLATFORM']
+        if isinstance(plat, dict):
+            selected_platform = None
+            selected_instrument = None
+            # 1. 기존 구조에서 INSTRUMENT_MODEL 추출
+            for platform_key, v in plat.items():
+                if isinstance(v, dict) and 'INSTRUMENT_MODEL' in v:
+                    model = v['INSTRUMENT_MODEL']
+                    selected_instrument = model
+                    break
+                elif platform_key == 'INSTRUMENT_MODEL':
+                    selected_instrument = v
+                    break
+            # 2. INSTRUMENT_MODEL이 있으면, 올바른 플랫폼 태그로 변환
+            if selected_instrument:
+                instrument, platform_tag = instruments.resolve(selected_instrument)
+                if platform_tag:
+                    exp['PLATFORM'] = {
+                        platform_tag: {
+                            'INSTRUMENT_MODEL': instrument
                         }
-        # 3. LIBRARY_SELECTION/LIBRARY_STRATEGY/LIBRARY_SOURCE 등 허용값만 남기기 (LIBRARY_STRATEGY는 'OTHER'로 보정)
-        lib = exp.get('DESIGN', {}).get('LIBRARY_DESCRIPTOR', {})
-        if isinstance(lib, dict):
-            if 'LIBRARY_SELECTION' in lib and lib['LIBRARY_SELECTION'] not in allowed_selection:
-                lib['LIBRARY_SELECTION'] = 'other'
-            if 'LIBRARY_STRATEGY' in lib and lib['LIBRARY_STRATEGY'] not in allowed_strategy:
-                lib['LIBRARY_STRATEGY'] = 'OTHER'
-            if 'LIBRARY_SOURCE' in lib and lib['LIBRARY_SOURCE'] not in allowed_source:
-                lib['LIBRARY_SOURCE'] = 'OTHER'
-        # 4. PAIRED의 NOMINAL_LENGTH 정수 체크
-        design = exp.get('DESIGN', {})
-        if isinstance(design, dict) and 'PAIRED' in design:
-            paired = design['PAIRED']
-            if isinstance(paired, dict):
-                try:
-                    val = int(paired.get('@NOMINAL_LENGTH', 0))
-                    if val < 0:
-                        paired['@NOMINAL_LENGTH'] = '0'
-                    else:
-                        paired['@NOMINAL_LENGTH'] = str(val)
-                except Exception:
+                    }
+    # 3. LIBRARY_SELECTION/LIBRARY_STRATEGY/LIBRARY_SOURCE 등 허용값만 남기기 (LIBRARY_STRATEGY는 'OTHER'로 보정)
+    lib = exp.get('DESIGN', {}).get('LIBRARY_DESCRIPTOR', {})
+    if isinstance(lib, dict):
+        if 'LIBRARY_SELECTION' in lib and lib['LIBRARY_SELECTION'] not in allowed_selection:
+            lib['LIBRARY_SELECTION'] = 'other'
+        if 'LIBRARY_STRATEGY' in lib and lib['LIBRARY_STRATEGY'] not in allowed_strategy:
+            lib['LIBRARY_STRATEGY'] = 'OTHER'
+        if 'LIBRARY_SOURCE' in lib and lib['LIBRARY_SOURCE'] not in allowed_source:
+            lib['LIBRARY_SOURCE'] = 'OTHER'
+    # 4. PAIRED의 NOMINAL_LENGTH 정수 체크
+    design = exp.get('DESIGN', {})
+    if isinstance(design, dict) and 'PAIRED' in design:
+        paired = design['PAIRED']
+        if isinstance(paired, dict):
+            try:
+                val = int(paired.get('@NOMINAL_LENGTH', 0))
+                if val < 0:
                     paired['@NOMINAL_LENGTH'] = '0'
-        return exp
+                else:
+                    paired['@NOMINAL_LENGTH'] = str(val)
+            except Exception:
+                paired['@NOMINAL_LENGTH'] = '0'
+    return exp
 
-    # EXPERIMENT 반복 처리
-    root = doc.get('EXPERIMENT_SET', doc)
-    exps = root.get('EXPERIMENT', [])
-    if isinstance(exps, dict):
-        exps = [exps]
+# EXPERIMENT 루트 보정: DESIGN/PLATFORM/허용값(fix_experiment) 후 IDENTIFIERS에 accession 반영
+def finish_experiment(exp, instruments=None):
+    exp = fix_experiment(exp, instruments)
+    if 'IDENTIFIERS' in exp:
+        exp['IDENTIFIERS'] = fix_identifiers(exp['IDENTIFIERS'], exp_accession=exp.get('@accession'))
+    return exp
+
+# 단일 순회 재작성 규칙 (pipeline_common.rewrite)
+# - 모든 요소: 빈 값(""/None/[]/{}) 제거, refcenter/refname 속성 제거
+# - IDENTIFIERS: 부모 문맥에 따라 fix_identifiers (EXPERIMENT 하위면 exp_accession, STUDY_REF/SAMPLE_DESCRIPTOR 하위면 그 요소에서 보정)
+# - STUDY_REF/SAMPLE_DESCRIPTOR: 자신의 accession으로 IDENTIFIERS 보정 (BioProject/BioSample ID)
+# - EXPERIMENT_SET 바로 아래 EXPERIMENT: finish_experiment 후 리스트로 통일
+# 문맥(ctx): (종류, accession) — root: 문서 루트, set: EXPERIMENT_SET 하위, experiment: EXPERIMENT 하위, ref: STUDY_REF/SAMPLE_DESCRIPTOR 하위
+ROOT_CTX = ('root', None)
+SET_CTX = ('set', None)
+REF_CTX = ('ref', None)
+
+def _experiment_set_enter(value, ctx):
+    return SET_CTX if ctx == ROOT_CTX else None
+
+def _experiment_enter(value, ctx):
+    return ('experiment', value.get('@accession')) if isinstance(value, dict) else None
+
+def _experiment_exit(value, ctx, instruments):
+    if ctx != SET_CTX:
+        return value
+    exps = [value] if isinstance(value, dict) else value
     for i, exp in enumerate(exps):
-        exps[i] = fix_experiment(exp)
-        # EXPERIMENT 루트의 IDENTIFIERS에 accession을 넘겨서 보정
-        if 'IDENTIFIERS' in exps[i]:
-            exps[i]['IDENTIFIERS'] = fix_identifiers(exps[i]['IDENTIFIERS'], exp_accession=exps[i].get('@accession'))
-    if 'EXPERIMENT' in root:
-        root['EXPERIMENT'] = exps
-    return doc
-
-def validate_xsd(xml_path, xsd_path):
-    result = subprocess.run([
-        "xmllint", "--schema", xsd_path, "--noout", xml_path
-    ], capture_output=True, text=True)
-    return result.returncode == 0, result.stderr
-
-def parse_submission_csv(csv_path):
+        exps[i] = finish_experiment(exp, instruments)
+    return exps
+
+def _ref_enter(value, ctx):
+    return REF_CTX if isinstance(value, dict) else None
+
+def _ref_exit(id_type):
+    def exit(value, ctx, instruments):
+        if isinstance(value, dict) and 'IDENTIFIERS' in value:
+            value['IDENTIFIERS'] = fix_identifiers(value['IDENTIFIERS'], parent_accession=value.get('@accession'), id_type=id_type)
+        return value
+    return exit
+
+def _identifiers_exit(ident, ctx, instruments):
+    kind, acc = ctx or (None, None)
+    if kind == 'experiment' and acc:
+        return fix_identifiers(ident, exp_accession=acc)
+    if kind == 'ref':
+        return ident
+    return fix_identifiers(ident)
+
+EXPERIMENT_REWRITER = TreeRewriter(drop_keys=('@refcenter', '@refname'))
+EXPERIMENT_REWRITER.register('EXPERIMENT_SET', enter=_experiment_set_enter)
+EXPERIMENT_REWRITER.register('EXPERIMENT', enter=_experiment_enter, exit=_experiment_exit)
+EXPERIMENT_REWRITER.register('STUDY_REF', enter=_ref_enter, exit=_ref_exit('BioProject'))
+EXPERIMENT_REWRITER.register('SAMPLE_DESCRIPTOR', enter=_ref_enter, exit=_ref_exit('BioSample'))
+EXPERIMENT_REWRITER.register('IDENTIFIERS', exit=_identifiers_exit, opaque=True)
+
+def fix_structure(doc, instruments=None, manifest=None):
     """
-    CSV에서 (experiment_id, run_id) → (submission_id, access_type) 매핑 생성
+    EXPERIMENT_REWRITER 규칙으로 문서를 한 번만 순회하여 보정한 새 문서 반환 (입력 doc은 수정하지 않음)
+    EXPERIMENT_SET이 없으면 문서 루트 바로 아래 EXPERIMENT를 보정
+    manifest(--incremental)가 주어지면 EXPERIMENT는 레코드별로 보정(fix_experiment_record)하고
+    입력 해시(EXPERIMENT + 자동 적용 기준)가 같은 EXPERIMENT는 이전 보정 결과 사용 (INSTRUMENT 결정은 다시 호출하여 리포트 유지)
     """
-    mapping = {}
-    with open(csv_path, encoding='iso-8859-1') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            submission_id = row.get('KRA submission ID')
-            experiment_id = row.get('Experiment ID')
-            run_id = row.get('Run ID')
-            access_type = row.get('Library Layout')
-            if submission_id and experiment_id and run_id:
-                mapping[(experiment_id.strip(), run_id.strip())] = (submission_id.strip(), (access_type or '').strip().lower())
-    return mapping
-
-def save_experiment_grouped_by_submission_id(doc, submission_map, output_dir, xsd_path=None, report_path=None):
+    root = doc.get('EXPERIMENT_SET')
+    # EXPERIMENT 리스트 항목은 fix_experiment_record와 같은 문맥으로 보정되므로 리스트일 때만 레코드별로 보정
+    if manifest is not None and isinstance(root, dict) and isinstance(root.get('EXPERIMENT'), list):
+        instruments = instruments or INSTRUMENTS
+        recorder = CallRecorder(instruments, 'resolve')
+        exps = [exp for exp in root['EXPERIMENT'] if exp not in EMPTY_VALUES]
+        # 루트는 EXPERIMENT를 뺀 나머지(속성)만 같은 규칙으로 보정
+        fixed_root = EXPERIMENT_REWRITER.rewrite({k: v for k, v in root.items() if k != 'EXPERIMENT'}, SET_CTX, instruments)
+        fixed = manifest.fix_records(exps, lambda exp: fix_experiment_record(exp, recorder), lambda exp: instruments.threshold, recorder)
+        if fixed:
+            fixed_root['EXPERIMENT'] = fixed
+        return {'EXPERIMENT_SET': fixed_root} if fixed_root else {}
+    ctx = ROOT_CTX if root not in EMPTY_VALUES else SET_CTX
+    return EXPERIMENT_REWRITER.rewrite(doc, ctx, instruments)
+
+def fix_experiment_record(exp, instruments=None):
     """
-    (experiment_id, run_id) → (submission_id, access_type) 매핑을 사용하여, submission_id별로 <EXPERIMENT_SET>에 해당하는 모든 EXPERIMENT를 모아 그룹화하여 저장
-    xsd_path가 주어지면 각 파일에 대해 XSD 검증도 수행
-    report_path가 주어지면 결과를 해당 파일에 기록
+    EXPERIMENT 레코드 하나에 fix_structure와 같은 보정을 적용 (--stream 모드용)
+    EXPERIMENT_SET 하위 리스트 항목으로 처리될 때와 같은 순서로 실행
+    """
+    return finish_experiment(EXPERIMENT_REWRITER.rewrite(exp, None, instruments), instruments)
+
+# access_type에 따라 LIBRARY_LAYOUT 보정 (기타 값은 기존대로 유지)
+def apply_library_layout(exp, access_type):
+    design = exp.get('DESIGN', {})
+    lib_desc = design.get('LIBRARY_DESCRIPTOR', {})
+    if isinstance(lib_desc, dict):
+        if access_type == 'paired':
+            lib_desc['LIBRARY_LAYOUT'] = {'PAIRED': None}
+        elif access_type == 'single':
+            lib_desc['LIBRARY_LAYOUT'] = {'SINGLE': None}
+        design['LIBRARY_DESCRIPTOR'] = lib_desc
+        exp['DESIGN'] = design
+
+def library_layout_state(exp):
+    """apply_library_layout이 바꿀 수 있는 부분 (EXPERIMENT/DESIGN/LIBRARY_DESCRIPTOR 키 순서, LIBRARY_LAYOUT 값)"""
+    design = exp.get('DESIGN')
+    if not isinstance(design, dict):
+        return tuple(exp), None, None, None
+    lib_desc = design.get('LIBRARY_DESCRIPTOR')
+    if not isinstance(lib_desc, dict):
+        return tuple(exp), tuple(design), None, None
+    return tuple(exp), tuple(design), tuple(lib_desc), repr(lib_desc.get('LIBRARY_LAYOUT'))
+
+def group_experiments_by_submission_id(doc, submission_map):
+    """
+    submission_id별로 EXPERIMENT 분류 (CSV에 없는 EXPERIMENT는 자기 accession이 그룹)
+    submission_map: 컴파일된 제출 매핑 (pipeline_common.submission_map.SubmissionMap)
+    반환: (submission_id → [EXPERIMENT, ...], submission_id → access_type)
     """
-    import os
-    os.makedirs(output_dir, exist_ok=True)
     root = doc.get('EXPERIMENT_SET', doc)
     exps = root.get('EXPERIMENT', [])
     if isinstance(exps, dict):
         exps = [exps]
-    # submission_id별로 EXPERIMENT 분류 및 access_type 매핑
     submission_groups = {}
     exp_access_type_map = {}
     for exp in exps:
         exp_id = exp.get('@accession')
-        # run_id는 알 수 없으므로, submission_map에서 experiment_id가 일치하는 모든 submission_id, access_type을 찾음
-        matched = [(sub_id, access_type) for (e_id, _), (sub_id, access_type) in submission_map.items() if e_id == exp_id]
+        # run_id는 알 수 없으므로 experiment_id가 일치하는 모든 (submission_id, access_type)
+        matched = submission_map.experiment_submissions(exp_id)
         if matched:
-            for submission_id, access_type in set(matched):
+            for submission_id, access_type in matched:
                 if submission_id not in submission_groups:
                     submission_groups[submission_id] = []
                 submission_groups[submission_id].append(exp)
@@ -421,30 +540,95 @@ def save_experiment_grouped_by_submission_id(doc, submission_map, output_dir, xs
             submission_groups[submission_id].append(exp)
             if submission_id not in exp_access_type_map:
                 exp_access_type_map[submission_id] = None
-    # 각 그룹별로 <EXPERIMENT_SET> 생성 및 저장 + XSD 검증 + 리포트
-    report_lines = []
+    return submission_groups, exp_access_type_map
+
+def iter_experiment_groups(submission_groups, exp_access_type_map, output_dir, pristine=None, manifest=None):
+    """
+    그룹 순서대로 (그룹 파일 경로, <EXPERIMENT_SET> 문서) 반환
+    같은 EXPERIMENT가 여러 그룹에 속할 수 있으므로 LIBRARY_LAYOUT 보정은 그룹을 꺼낼 때마다 적용
+    pristine(id(EXPERIMENT) → (전체 보정본 위치, 보정 전 library_layout_state))이 주어지면
+    (경로, 문서, 레코드 위치 목록)을 반환 (LIBRARY_LAYOUT 보정으로 전체 보정본과 달라진 레코드가 있으면 None)
+    manifest(--incremental)가 주어지면 그룹 해시를 EXPERIMENT 입력 해시 + LIBRARY_LAYOUT 보정 후 상태로 등록
+    """
     for submission_id, group_exps in submission_groups.items():
         # access_type에 따라 LIBRARY_LAYOUT 보정
         access_type = exp_access_type_map.get(submission_id)
         for exp in group_exps:
-            design = exp.get('DESIGN', {})
-            lib_desc = design.get('LIBRARY_DESCRIPTOR', {})
-            if isinstance(lib_desc, dict):
-                # LIBRARY_LAYOUT 보정
-                if access_type == 'paired':
-                    lib_desc['LIBRARY_LAYOUT'] = {'PAIRED': None}
-                elif access_type == 'single':
-                    lib_desc['LIBRARY_LAYOUT'] = {'SINGLE': None}
-                # 기타 값은 기존대로 유지
-                design['LIBRARY_DESCRIPTOR'] = lib_desc
-                exp['DESIGN'] = design
+            apply_library_layout(exp, access_type)
         group_doc = {'EXPERIMENT_SET': {'EXPERIMENT': group_exps}}
         out_path = os.path.join(output_dir, f"{submission_id}.experiment.xml")
-        save_xml(group_doc, out_path)
+        if manifest is not None:
+            manifest.set_group_inputs(out_path, group_exps, [library_layout_state(exp) for exp in group_exps])
+        if pristine is None:
+            yield out_path, group_doc
+            continue
+        indices = []
+        for exp in group_exps:
+            position, state = pristine[id(exp)]
+            if library_layout_state(exp) != state:
+                indices = None
+                break
+            indices.append(position)
+        yield out_path, group_doc, indices
+
+def prechecked_groups(groups, precheck, group_precheck):
+    """
+    그룹을 그대로 넘기면서 그룹의 사전 검사 위반 목록을 group_precheck[그룹 파일 경로]에 채움 (emit_groups는 그룹을 꺼낸 뒤 조회)
+    레코드 위치 목록이 있으면 precheck(EXPERIMENT 위치 → 위반 목록)에서 모으고,
+    없으면(LIBRARY_LAYOUT 보정으로 달라진 그룹, 위치를 모르는 경우) 그룹 레코드를 다시 검사
+    """
+    for group in groups:
+        out_path, group_doc = group[:2]
+        indices = group[2] if len(group) > 2 else None
+        if indices is None:
+            group_precheck[out_path] = [line for exp in group_doc['EXPERIMENT_SET']['EXPERIMENT']
+                                        for line in PRECHECK.check(exp, EXPERIMENT_PATH)]
+        else:
+            group_precheck[out_path] = group_violations(precheck, indices)
+        yield group
+
+def save_experiment_grouped_by_submission_id(doc, submission_map, output_dir, xsd_path=None, report_path=None, jobs=1, manifest=None, metrics=NULL_METRICS, document=None, precheck=None):
+    """
+    (experiment_id, run_id) → (submission_id, access_type) 매핑을 사용하여, submission_id별로 <EXPERIMENT_SET>에 해당하는 모든 EXPERIMENT를 모아 그룹화하여 저장
+    xsd_path가 주어지면 각 파일에 대해 XSD 검증도 수행
+    document(이미 저장한 doc의 전체 보정본 경로)가 주어지면 그룹 파일 대신 document를 한 번만 검증하여
+    에러를 submission_id별로 나누고 document의 (통과 여부, 리포트)를 반환 (emit_groups_once)
+    LIBRARY_LAYOUT 보정으로 전체 보정본과 내용이 달라진 그룹만 그룹 파일을 개별 검증
+    precheck(EXPERIMENT 위치 → 사전 검사 위반 목록, PRECHECK.check_document)가 주어지면 위반이 있는 그룹은 XSD 검증 대신 위반 목록을 리포트
+    report_path가 주어지면 결과를 해당 파일에 기록
+    jobs > 1이면 그룹 저장/검증을 프로세스 풀로 병렬 처리 (출력/리포트 순서는 동일)
+    manifest가 주어지면 변경 없는 그룹은 다시 저장/검증하지 않고 이전 결과를 리포트에 사용 (--incremental)
+    metrics가 주어지면 그룹화/저장/검증 단계를 계측 (--metrics)
+    """
+    import os
+    os.makedirs(output_dir, exist_ok=True)
+    with metrics.stage('group') as st:
+        submission_groups, exp_access_type_map = group_experiments_by_submission_id(doc, submission_map)
+        st.records_in = count_records(doc, 'EXPERIMENT_SET', 'EXPERIMENT')
+        st.records_out = len(submission_groups)
+    # 각 그룹별로 <EXPERIMENT_SET> 생성 및 저장 + XSD 검증 + 리포트
+    report_lines = []
+    document_result = None
+    if document and xsd_path:
+        # EXPERIMENT → (document 루트 아래 위치, LIBRARY_LAYOUT 보정 전 상태): 그룹을 꺼낼 때마다 보정되므로 미리 기록
+        exps = doc.get('EXPERIMENT_SET', doc).get('EXPERIMENT', [])
+        pristine = {id(exp): (i, library_layout_state(exp)) for i, exp in enumerate(exps if isinstance(exps, list) else [exps])}
+        groups = iter_experiment_groups(submission_groups, exp_access_type_map, output_dir, pristine, manifest)
+    else:
+        groups = iter_experiment_groups(submission_groups, exp_access_type_map, output_dir, manifest=manifest)
+    group_precheck = None
+    if precheck is not None:
+        group_precheck = {}
+        groups = prechecked_groups(groups, precheck, group_precheck)
+    if document and xsd_path:
+        results, document_result = emit_groups_once(groups, save_xml, xsd_path, document, jobs, manifest, metrics, group_precheck)
+    else:
+        results = emit_groups(groups, save_xml, xsd_path, jobs, manifest, metrics, group_precheck)
+    for (submission_id, group_exps), (valid, xsd_report) in zip(submission_groups.items(), results):
+        out_path = os.path.join(output_dir, f"{submission_id}.experiment.xml")
         print(f"[INFO] Saved {len(group_exps)} EXPERIMENTs to {out_path}")
         # XSD 검증 및 리포트 기록
         if xsd_path:
-            valid, xsd_report = validate_xsd(out_path, xsd_path)
             result_str = f"[XSD] {submission_id}.experiment.xml: {'PASS' if valid else 'FAIL'}"
             print(result_str)
             if not valid:
@@ -456,21 +640,145 @@ def save_experiment_grouped_by_submission_id(doc, submission_map, output_dir, xs
     if report_path and report_lines:
         with open(report_path, 'w', encoding='utf-8') as rf:
             rf.write('\n'.join(report_lines))
+    return document_result
 
-def main():
+def run_pipeline(corpus, jobs=1, incremental=False, metrics=NULL_METRICS, instruments=None):
+    """instruments: INSTRUMENT_MODEL 결정기 (InstrumentResolver, 기본: 정확히 일치하는 값만 적용)"""
+    instruments = instruments or INSTRUMENTS
     print("=== Experiment Pipeline Start ===")
     os.makedirs("xml_fixed", exist_ok=True)
     os.makedirs("xml_fixed/ddbj_experiment_fixed", exist_ok=True)
-    submission_map = parse_submission_csv('xml_submitted/KRA_after_20240311_pp_lib.csv')
-    doc = parse_xml(INPUT_XML)
-    doc_fixed = fix_structure(doc)
-    save_xml(doc_fixed, OUTPUT_XML)
-    # submission_id별로 EXPERIMENT_SET 분리 저장 + XSD 검증 + 리포트 저장
-    save_experiment_grouped_by_submission_id(doc_fixed, submission_map, "xml_fixed/ddbj_experiment_fixed", XSD_PATH, REPORT_PATH)
-    valid, xsd_report = validate_xsd(OUTPUT_XML, XSD_PATH)
+    # --incremental: 입력이 그대로인 EXPERIMENT는 보정하지 않고, 그대로인 그룹은 저장/검증하지 않음
+    manifest = load_manifest(MANIFEST_PATH, os.path.abspath(__file__), XSD_PATH) if incremental else None
+    with metrics.stage('parse') as st:
+        # fix_structure는 입력을 수정하지 않고 새 문서를 만들므로 공유 입력을 그대로 사용
+        doc = corpus.get('experiment')
+        # 제출 매핑 CSV는 컴파일된 색인으로 읽음 (CSV가 바뀌었을 때만 다시 컴파일)
+        submission_map = corpus.get('submission_csv')
+        records = st.records_out = count_records(doc, 'EXPERIMENT_SET', 'EXPERIMENT')
+    with metrics.stage('fix_structure', records, records):
+        doc_fixed = fix_structure(doc, instruments, manifest)
+    with metrics.stage('precheck', records, records):
+        # XSD 제약 표(enumeration/필수/최대 횟수)로 EXPERIMENT별 사전 검사 (LIBRARY_LAYOUT 보정 전)
+        precheck = PRECHECK.check_document(doc_fixed, 'EXPERIMENT_SET', 'EXPERIMENT', metrics)
+    with metrics.stage('serialize', records, records):
+        save_xml(doc_fixed, OUTPUT_XML)
+    metrics.add_file(OUTPUT_XML)
+    # submission_id별로 EXPERIMENT_SET 분리 저장 + 전체 보정본을 한 번만 검증하여 submission_id별 리포트 저장
+    valid, xsd_report = save_experiment_grouped_by_submission_id(doc_fixed, submission_map, "xml_fixed/ddbj_experiment_fixed", XSD_PATH, REPORT_PATH, jobs, manifest, metrics, OUTPUT_XML, precheck)
+    instruments.write_report(REPORT_PATH)
+    if manifest is not None:
+        manifest.save()
+        print(manifest.summary('experiment'))
     print("# XSD Validation: {}\n".format("PASS" if valid else "FAIL"))
     print(xsd_report)
     print("Pipeline complete. See fixed XML:", OUTPUT_XML)
 
+def run_pipeline_stream(jobs=1, incremental=False, metrics=NULL_METRICS, instruments=None):
+    """
+    --stream 모드: ddbj_bioExperiment.xml의 EXPERIMENT를 하나씩 읽어 보정한 뒤
+    전체 보정본과 submission_id별 스풀 파일에 바로 기록 (메모리는 가장 큰 EXPERIMENT 크기로 제한)
+    - 여러 그룹에 속한 EXPERIMENT는 그룹 등장 순서대로 LIBRARY_LAYOUT을 보정하며 그룹마다 따로 렌더링
+    - 전체 보정본의 XSD 검증은 그룹 파일 검증으로 대체
+    """
+    print("=== Experiment Pipeline Start (stream) ===")
+    instruments = instruments or INSTRUMENTS
+    output_dir = "xml_fixed/ddbj_experiment_fixed"
+    os.makedirs(output_dir, exist_ok=True)
+    with metrics.stage('aux_maps') as st:
+        submission_map = open_submission_map(SUBMISSION_CSV)
+        st.records_out = len(submission_map)
+    spool = GroupSpool('EXPERIMENT_SET')
+    precheck = {}
+    failed = 0
+    group_order = {}
+    exp_access_type_map = {}
+    root_attrs = {}
+    records = metrics.timed_iter('parse', iter_records(INPUT_XML, 'EXPERIMENT', root_attrs))
+    try:
+        # 첫 레코드를 읽어야 루트 속성이 채워지므로 writer는 첫 레코드 이후 생성
+        writer = None
+        for exp in records:
+            if exp in ("", None, {}):
+                continue
+            with metrics.stage('fix_structure', 1, 1):
+                exp = fix_experiment_record(exp, instruments)
+            with metrics.stage('precheck', 1, 1):
+                violations = PRECHECK.check(exp, EXPERIMENT_PATH)
+                state = library_layout_state(exp)
+            with metrics.stage('serialize', 1, 1):
+                if writer is None:
+                    writer = StreamDocumentWriter(OUTPUT_XML, 'EXPERIMENT_SET', root_attrs)
+                # 전체 보정본은 LIBRARY_LAYOUT 보정 전 상태로 기록
+                writer.write(render_record('EXPERIMENT', exp, self_closing=SELF_CLOSING_TAGS))
+            # 그룹별 LIBRARY_LAYOUT 보정 + 조각 렌더링은 group 단계로 집계
+            with metrics.stage('group', 1) as st:
+                exp_id = exp.get('@accession')
+                matched = submission_map.experiment_submissions(exp_id)
+                if not matched:
+                    matched = [(exp_id or 'UNKNOWN_SUBMISSION', None)]
+                for submission_id, access_type in matched:
+                    if submission_id not in group_order:
+                        group_order[submission_id] = len(group_order)
+                        exp_access_type_map[submission_id] = access_type
+                failed += bool(violations)
+                for submission_id in sorted({sid for sid, _ in matched}, key=group_order.get):
+                    apply_library_layout(exp, exp_access_type_map[submission_id])
+                    spool.add(submission_id, render_record('EXPERIMENT', exp, self_closing=SELF_CLOSING_TAGS))
+                    st.records_out += 1
+                    # LIBRARY_LAYOUT 보정으로 달라졌으면 다시 검사
+                    group_lines = violations if library_layout_state(exp) == state else PRECHECK.check(exp, EXPERIMENT_PATH)
+                    if group_lines:
+                        precheck.setdefault(submission_id, []).extend(group_lines)
+        if writer is None:
+            writer = StreamDocumentWriter(OUTPUT_XML, 'EXPERIMENT_SET', root_attrs)
+        writer.close()
+        metrics.add_file(OUTPUT_XML)
+        print(f"[INFO] Streamed {writer.count} EXPERIMENTs to {OUTPUT_XML}")
+        print_precheck_summary('EXPERIMENT', failed, writer.count, metrics)
+        # submission_id별 EXPERIMENT_SET 저장 + XSD 검증 + 리포트
+        report_lines = []
+        manifest = load_manifest(MANIFEST_PATH, os.path.abspath(__file__), XSD_PATH) if incremental else None
+        results = emit_spool(spool, lambda sid: os.path.join(output_dir, f"{sid}.experiment.xml"), XSD_PATH, jobs, manifest, metrics, precheck)
+        for submission_id, out_path, count, valid, xsd_report in results:
+            print(f"[INFO] Saved {count} EXPERIMENTs to {out_path}")
+            result_str = f"[XSD] {submission_id}.experiment.xml: {'PASS' if valid else 'FAIL'}"
+            print(result_str)
+            if not valid:
+                print(xsd_report)
+            report_lines.append(result_str)
+            if not valid:
+                report_lines.append(xsd_report)
+        if report_lines:
+            with open(REPORT_PATH, 'w', encoding='utf-8') as rf:
+                rf.write('\n'.join(report_lines))
+        instruments.write_report(REPORT_PATH)
+        if manifest is not None:
+            manifest.save()
+            print(manifest.summary('experiment'))
+    finally:
+        spool.cleanup()
+    print("Pipeline complete. See fixed XML:", OUTPUT_XML)
+
+def main():
+    parser = argparse.ArgumentParser(description="SRA EXPERIMENT XML 변환/검증")
+    parser.add_argument('--jobs', type=int, default=1, help='그룹별 저장/검증 병렬 프로세스 수 (0: CPU 코어 수)')
+    parser.add_argument('--incremental', action='store_true', help='내용이 바뀐 그룹만 다시 저장/검증 (매니페스트: xml_fixed/experiment_manifest.json)')
+    parser.add_argument('--stream', action='store_true', help='EXPERIMENT 단위 스트리밍 처리 (대용량 입력, 메모리 사용량 고정)')
+    parser.add_argument('--metrics', action='store_true', help='단계별 계측 결과 저장 (xml_fixed/experiment_metrics.json, .prom)')
+    parser.add_argument('--instrument-auto', nargs='?', type=float, const=DEFAULT_INSTRUMENT_THRESHOLD, default=None, metavar='THRESHOLD',
+                        help=f'정확히 일치하지 않는 INSTRUMENT_MODEL을 유사도 THRESHOLD(0~1, 기본 {DEFAULT_INSTRUMENT_THRESHOLD}) 이상인 후보로 자동 변환')
+    args = parser.parse_args()
+    jobs = args.jobs or default_jobs()
+    if args.instrument_auto is not None and not 0 < args.instrument_auto <= 1:
+        parser.error("--instrument-auto 기준은 0보다 크고 1 이하여야 합니다")
+    metrics = create_metrics('experiment', args.metrics or None)
+    instruments = InstrumentResolver(args.instrument_auto)
+    if args.stream:
+        run_pipeline_stream(jobs, args.incremental, metrics, instruments)
+    else:
+        run_pipeline(Corpus({'experiment': INPUT_XML}), jobs, args.incremental, metrics, instruments)
+    metrics.save()
+
 if __name__ == "__main__":
     main()
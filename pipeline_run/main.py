@@ -1,8 +1,21 @@
 import xmltodict
-from lxml import etree
 import os
-import subprocess
-import csv
+import sys
+import argparse
+
+# 공용 모듈(pipeline_common) import를 위해 저장소 루트를 경로에 추가
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pipeline_common.xmlwriter import write_xml
+from pipeline_common.manifest import load_manifest
+from pipeline_common.checksum import ChecksumEngine, DEFAULT_WORKERS
+from pipeline_common.emit import emit_groups, emit_groups_once, default_jobs
+from pipeline_common.corpus import Corpus, count_records
+from pipeline_common.submission_map import open_submission_map
+from pipeline_common.filepath_index import open_file_path_index
+from pipeline_common.metrics import create_metrics, NULL_METRICS
+from pipeline_common.fieldspec import cache_dir
+from pipeline_common.prevalidate import PreValidator, group_violations, print_precheck_summary
+from pipeline_common.streaming import iter_records, render_record, StreamDocumentWriter, GroupSpool, emit_spool
 
 XSD_PATH = "pub/docs/dra/xsd/1-6/SRA.run.xsd"
 INPUT_XML = "xml_submitted/ddbj_run.xml"
@@ -10,200 +23,250 @@ EXAMPLE_XML = "real_examples/kobic-0352.run.xml"
 RUN_FILE_PATH_XML = "xml_submitted/ddbj_run_file_path.xml"
 OUTPUT_XML = "xml_fixed/ddbj_run.fixed.xml"
 REPORT_PATH = "xml_fixed/run_report.txt"
-
-# ddbj_run_file_path.xml에서 파일 정보 추출 (DATA_BLOCK용)
-def parse_run_file_path(path):
-    if not os.path.exists(path):
-        return None
-    with open(path, encoding="utf-8") as f:
-        doc = xmltodict.parse(f.read())
-    # 파일 구조에 맞게 DATA_BLOCK 생성 (예시)
-    # 실제 구조에 따라 수정 필요
-    data_block = doc.get("DATA_BLOCK")
-    if data_block:
-        return data_block
-    return None
+MANIFEST_PATH = "xml_fixed/run_manifest.json"
+SUBMISSION_CSV = "xml_submitted/KRA_after_20240311_pp_lib.csv"
+CHECKSUM_CACHE_FILE = "run_checksum_cache.json"    # Read_* 파일 MD5 캐시 (.xmlmeta_cache/checksum/ 아래, 커밋하는 xml_fixed/ 밖)
+CHECKSUM_REPORT = "xml_fixed/run_checksum_report.txt"
+# XSD 제약 표(enumeration/필수 속성·요소/최대 횟수)로 RUN 레코드 사전 검사
+RUN_PATH = 'RUN_SET/RUN'
+PRECHECK = PreValidator(XSD_PATH)
 
 def parse_xml(path):
     with open(path, encoding="utf-8") as f:
         return xmltodict.parse(f.read())
 
 def save_xml(doc, path):
-    xml_str = xmltodict.unparse(doc, pretty=True)
-    with open(path, "w", encoding="utf-8") as f:
-        f.write(xml_str)
+    write_xml(doc, path)
+
+# 빈 값/None/빈 리스트/빈 dict 제거 (새 dict/list를 만들어 반환)
+def remove_empty(d):
+    if isinstance(d, dict):
+        return {k: remove_empty(v) for k, v in d.items() if v not in ("", None, [], {})}
+    elif isinstance(d, list):
+        return [remove_empty(i) for i in d if i not in ("", None, [], {})]
+    else:
+        return d
+
+# SUBMITTER_ID에 namespace 속성 보정
+def fix_submitter_id(d):
+    if isinstance(d, dict):
+        for k, v in d.items():
+            if k == "SUBMITTER_ID":
+                # dict or list or str
+                if isinstance(v, dict):
+                    if "@namespace" not in v:
+                        v["@namespace"] = "KOBIC"
+                elif isinstance(v, list):
+                    for item in v:
+                        if isinstance(item, dict) and "@namespace" not in item:
+                            item["@namespace"] = "KOBIC"
+                elif isinstance(v, str):
+                    d[k] = {"#text": v, "@namespace": "KOBIC"}
+            else:
+                fix_submitter_id(v)
+    elif isinstance(d, list):
+        for item in d:
+            fix_submitter_id(item)
+
+# IDENTIFIERS에 UUID가 없으면 빈 값으로 추가 (기존 PRIMARY_ID -> UUID)
+def ensure_uuid(identifiers):
+    if isinstance(identifiers, dict):
+        if "UUID" not in identifiers:
+            identifiers["UUID"] = ""
+        # PRIMARY_ID가 있으면 제거
+        if "PRIMARY_ID" in identifiers:
+            del identifiers["PRIMARY_ID"]
+    elif isinstance(identifiers, list):
+        for item in identifiers:
+            ensure_uuid(item)
+
+# file_path.xml의 RUN 레코드들을 KAR(accession)별로 색인 (이미 파싱된 문서용, 파이프라인은 open_file_path_index 사용)
+def build_file_path_index(file_path_runs_raw):
+    file_path_runs = {}
+    if isinstance(file_path_runs_raw, dict):
+        file_path_runs_raw = [file_path_runs_raw]
+    for frun in file_path_runs_raw:
+        kar = frun.get("@accession")
+        if kar:
+            file_path_runs[kar] = frun
+    return file_path_runs
+
+# file_path.xml 색인에서 Read_* 파일 경로 목록 (DATA_BLOCK 순서)
+def collect_read_paths(file_path_runs):
+    paths = []
+    for frun in file_path_runs.values():
+        for key, val in frun.items():
+            if key.startswith("Read_") and val:
+                paths.append(val)
+    return paths
+
+def compute_checksums(file_path_runs, workers=DEFAULT_WORKERS):
+    """
+    Read_* 파일의 MD5를 계산 (스레드 풀 + 영구 캐시), 요약은 출력하고 파일별 결과는 CHECKSUM_REPORT에 저장
+    반환: {파일 경로: md5 또는 None}
+    """
+    engine = ChecksumEngine(os.path.join(cache_dir('checksum'), CHECKSUM_CACHE_FILE), workers)
+    checksums = engine.compute(collect_read_paths(file_path_runs))
+    engine.save()
+    for line in engine.format_stats():
+        print(line)
+    with open(CHECKSUM_REPORT, 'w', encoding='utf-8') as rf:
+        rf.write('\n'.join(engine.format_report()))
+    return checksums
+
+# RUN 레코드 하나 보정 (remove_empty/fix_submitter_id 이후 단계)
+# checksums: {파일 경로: md5}, 없거나 계산하지 못한 파일은 빈 값
+def fix_run(run, file_path_runs, checksums=None):
+    accession = run.get("@accession")
+    title = run.get("TITLE")
+    if accession and title:
+        # 이미 괄호와 KAR로 시작하는 값이 있으면 추가하지 않음
+        if not title.strip().endswith(f"({accession})"):
+            run["TITLE"] = f"{title} ({accession})"
+
+    # 5. 각 IDENTIFIERS에 UUID가 없으면 빈 값으로 추가
+    # RUN의 IDENTIFIERS
+    if "IDENTIFIERS" in run:
+        ensure_uuid(run["IDENTIFIERS"])
+    # EXPERIMENT_REF의 IDENTIFIERS
+    exp_ref = run.get("EXPERIMENT_REF")
+    if exp_ref and "IDENTIFIERS" in exp_ref:
+        ensure_uuid(exp_ref["IDENTIFIERS"])
 
-def fix_structure(doc):
+    # 6. DATA_BLOCK 생성: KAR ID로 file_path.xml에서 파일 정보 연결
+    if accession and accession in file_path_runs:
+        frun = file_path_runs[accession]
+        files = []
+        for key, val in frun.items():
+            if key.startswith("Read_") and val:
+                files.append({
+                    "@filename": os.path.basename(val),
+                    "@filetype": "fastq",
+                    "@checksum_method": "MD5",
+                    "@checksum": (checksums or {}).get(val) or ""
+                })
+        if files:
+            # DATA_BLOCK을 RUN_ATTRIBUTES 앞에 삽입
+            data_block = {"DATA_BLOCK": {"FILES": {"FILE": files}}}
+            # 기졸 RUN dict의 순서 보존하며 삽입
+            new_run = {}
+            for k, v in run.items():
+                if k == "RUN_ATTRIBUTES":
+                    new_run.update(data_block)
+                new_run[k] = v
+            # 만약 RUN_ATTRIBUTES가 없으면 마지막에 추가
+            if "DATA_BLOCK" not in new_run:
+                new_run.update(data_block)
+            run.clear()
+            run.update(new_run)
+    return run
+
+# RUN 레코드의 보정에 쓰이는 보조 입력 (file_path.xml 레코드, 그 Read_* 파일의 MD5) — 증분 실행의 RUN 입력 해시용
+def run_inputs(run, file_path_runs, checksums=None):
+    frun = file_path_runs.get(run.get("@accession")) if file_path_runs else None
+    if not frun:
+        return None
+    return [dict(frun), [(checksums or {}).get(val) for key, val in frun.items() if key.startswith("Read_") and val]]
+
+# RUN 레코드 하나에 fix_structure와 같은 보정 적용 (빈 값 제거 → SUBMITTER_ID → fix_run, 새 dict 반환)
+def fix_run_record(run, file_path_runs, checksums=None):
+    run = remove_empty(run)
+    fix_submitter_id(run)
+    fix_run(run, file_path_runs, checksums)
+    return run
+
+# file_path_runs: KAR → file_path.xml RUN 레코드(Read_* 경로) 매핑 (FilePathIndex 또는 build_file_path_index 결과)
+# manifest(--incremental)가 주어지면 RUN은 레코드별로 보정(fix_run_record)하고 입력 해시가 같은 RUN은 이전 보정 결과 사용
+def fix_structure(doc, file_path_runs=None, checksums=None, manifest=None):
+    root = doc.get("RUN_SET")
+    if manifest is not None and isinstance(root, dict) and isinstance(root.get("RUN"), list):
+        # 루트는 RUN을 뺀 나머지(속성)만 보정
+        fixed_root = remove_empty({k: v for k, v in root.items() if k != "RUN"})
+        fix_submitter_id(fixed_root)
+        runs = [run for run in root["RUN"] if run not in ("", None, [], {})]
+        fixed_root["RUN"] = manifest.fix_records(runs, lambda run: fix_run_record(run, file_path_runs or {}, checksums),
+                                                 lambda run: run_inputs(run, file_path_runs, checksums))
+        return {"RUN_SET": fixed_root}
     # 1. 빈 값/None/빈 리스트/빈 dict 제거
-    def remove_empty(d):
-        if isinstance(d, dict):
-            return {k: remove_empty(v) for k, v in d.items() if v not in ("", None, [], {})}
-        elif isinstance(d, list):
-            return [remove_empty(i) for i in d if i not in ("", None, [], {})]
-        else:
-            return d
     doc = remove_empty(doc)
 
     # 2. SUBMITTER_ID에 namespace 속성 보정
-    def fix_submitter_id(d):
-        if isinstance(d, dict):
-            for k, v in d.items():
-                if k == "SUBMITTER_ID":
-                    # dict or list or str
-                    if isinstance(v, dict):
-                        if "@namespace" not in v:
-                            v["@namespace"] = "KOBIC"
-                    elif isinstance(v, list):
-                        for item in v:
-                            if isinstance(item, dict) and "@namespace" not in item:
-                                item["@namespace"] = "KOBIC"
-                    elif isinstance(v, str):
-                        d[k] = {"#text": v, "@namespace": "KOBIC"}
-                else:
-                    fix_submitter_id(v)
-        elif isinstance(d, list):
-            for item in d:
-                fix_submitter_id(item)
     fix_submitter_id(doc)
 
-    # 3. DATA_BLOCK이 없으면 ddbj_run_file_path.xml에서 생성/추가
+    # 3. 각 RUN의 TITLE 끝에 (KAR...) 추가 + IDENTIFIERS/DATA_BLOCK 보정
     root = doc.get("RUN_SET", doc)
-    if "DATA_BLOCK" not in root:
-        data_block = parse_run_file_path(RUN_FILE_PATH_XML)
-        if data_block:
-            root["DATA_BLOCK"] = data_block
-
-    # 4. 각 RUN의 TITLE 끝에 (KAR...) 추가
     runs = root.get("RUN")
     if runs:
         if isinstance(runs, dict):
             runs = [runs]
-
-        # file_path.xml 전체 파싱 (RUN별로 접근 가능하게)
-        file_path_doc = None
-        file_path_runs = {}
-        if os.path.exists(RUN_FILE_PATH_XML):
-            with open(RUN_FILE_PATH_XML, encoding="utf-8") as f:
-                file_path_doc = xmltodict.parse(f.read())
-            file_path_root = file_path_doc.get("RUN_SET", file_path_doc)
-            file_path_runs_raw = file_path_root.get("RUN", [])
-            if isinstance(file_path_runs_raw, dict):
-                file_path_runs_raw = [file_path_runs_raw]
-            for frun in file_path_runs_raw:
-                kar = frun.get("@accession")
-                if kar:
-                    file_path_runs[kar] = frun
-
         for run in runs:
-            accession = run.get("@accession")
-            title = run.get("TITLE")
-            if accession and title:
-                # 이미 괄호와 KAR로 시작하는 값이 있으면 추가하지 않음
-                if not title.strip().endswith(f"({accession})"):
-                    run["TITLE"] = f"{title} ({accession})"
-
-            # 5. 각 IDENTIFIERS에 UUID가 없으면 빈 값으로 추가 (기존 PRIMARY_ID -> UUID)
-            def ensure_uuid(identifiers):
-                if isinstance(identifiers, dict):
-                    if "UUID" not in identifiers:
-                        identifiers["UUID"] = ""
-                    # PRIMARY_ID가 있으면 제거
-                    if "PRIMARY_ID" in identifiers:
-                        del identifiers["PRIMARY_ID"]
-                elif isinstance(identifiers, list):
-                    for item in identifiers:
-                        ensure_uuid(item)
-
-            # RUN의 IDENTIFIERS
-            if "IDENTIFIERS" in run:
-                ensure_uuid(run["IDENTIFIERS"])
-            # EXPERIMENT_REF의 IDENTIFIERS
-            exp_ref = run.get("EXPERIMENT_REF")
-            if exp_ref and "IDENTIFIERS" in exp_ref:
-                ensure_uuid(exp_ref["IDENTIFIERS"])
-
-            # 6. DATA_BLOCK 생성: KAR ID로 file_path.xml에서 파일 정보 연결
-            if accession and accession in file_path_runs:
-                frun = file_path_runs[accession]
-                files = []
-                for key, val in frun.items():
-                    if key.startswith("Read_") and val:
-                        files.append({
-                            "@filename": os.path.basename(val),
-                            "@filetype": "fastq",
-                            "@checksum_method": "MD5",  # 임시 기본값
-                            "@checksum": ""     # 임시값
-                        })
-                if files:
-                    # DATA_BLOCK을 RUN_ATTRIBUTES 앞에 삽입
-                    data_block = {"DATA_BLOCK": {"FILES": {"FILE": files}}}
-                    # 기졸 RUN dict의 순서 보존하며 삽입
-                    new_run = {}
-                    for k, v in run.items():
-                        if k == "RUN_ATTRIBUTES":
-                            new_run.update(data_block)
-                        new_run[k] = v
-                    # 만약 RUN_ATTRIBUTES가 없으면 마지막에 추가
-                    if "DATA_BLOCK" not in new_run:
-                        new_run.update(data_block)
-                    run.clear()
-                    run.update(new_run)
+            fix_run(run, file_path_runs or {}, checksums)
     return doc
 
-def validate_xsd(xml_path, xsd_path):
-    result = subprocess.run([
-        "xmllint", "--schema", xsd_path, "--noout", xml_path
-    ], capture_output=True, text=True)
-    return result.returncode == 0, result.stderr
+# RUN이 속한 submission_id (CSV 매핑에 없으면 {exp_id}_{run_id})
+def get_run_submission_id(run, submission_map):
+    exp_ref = run.get('EXPERIMENT_REF', {})
+    exp_id = exp_ref.get('@accession') if isinstance(exp_ref, dict) else None
+    run_id = run.get('@accession')
+    submission_id = submission_map.submission_id(exp_id, run_id)
+    if not submission_id:
+        submission_id = f"{exp_id}_{run_id}" if exp_id and run_id else 'UNKNOWN_SUBMISSION'
+    return submission_id
 
-def parse_submission_csv(csv_path):
-    """
-    CSV에서 (experiment_id, run_id) → submission_id 매핑 생성
-    """
-    mapping = {}
-    with open(csv_path, encoding='iso-8859-1') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            submission_id = row.get('KRA submission ID')
-            experiment_id = row.get('Experiment ID')
-            run_id = row.get('Run ID')
-            if submission_id and experiment_id and run_id:
-                mapping[(experiment_id.strip(), run_id.strip())] = submission_id.strip()
-    return mapping
-
-def save_run_grouped_by_submission_id(doc, submission_map, output_dir, xsd_path=None, report_path=None):
-    """
-    (experiment_id, run_id) → submission_id 매핑을 사용하여, submission_id별로 <RUN_SET>에 해당하는 모든 RUN을 모아 그룹화하여 저장
-    xsd_path가 주어지면 각 파일에 대해 XSD 검증도 수행
-    report_path가 주어지면 결과를 해당 파일에 기록
-    """
-    os.makedirs(output_dir, exist_ok=True)
+# submission_id → 해당 RUN 리스트 (그룹은 최초 등장 순서)
+def group_runs_by_submission_id(doc, submission_map):
     root = doc.get('RUN_SET', doc)
     runs = root.get('RUN', [])
     if isinstance(runs, dict):
         runs = [runs]
-    # submission_id별로 RUN 분류
     submission_groups = {}
     for run in runs:
-        exp_ref = run.get('EXPERIMENT_REF', {})
-        exp_id = exp_ref.get('@accession') if isinstance(exp_ref, dict) else None
-        run_id = run.get('@accession')
-        submission_id = submission_map.get((exp_id, run_id))
-        if not submission_id:
-            submission_id = f"{exp_id}_{run_id}" if exp_id and run_id else 'UNKNOWN_SUBMISSION'
+        submission_id = get_run_submission_id(run, submission_map)
         if submission_id not in submission_groups:
             submission_groups[submission_id] = []
         submission_groups[submission_id].append(run)
+    return submission_groups
+
+def save_run_grouped_by_submission_id(doc, submission_map, output_dir, xsd_path=None, report_path=None, jobs=1, manifest=None, metrics=NULL_METRICS, document=None, precheck=None):
+    """
+    (experiment_id, run_id) → submission_id 매핑을 사용하여, submission_id별로 <RUN_SET>에 해당하는 모든 RUN을 모아 그룹화하여 저장
+    xsd_path가 주어지면 각 파일에 대해 XSD 검증도 수행
+    document(이미 저장한 doc의 전체 보정본 경로)가 주어지면 그룹 파일 대신 document를 한 번만 검증하여
+    에러를 submission_id별로 나누고 document의 (통과 여부, 리포트)를 반환 (emit_groups_once)
+    precheck(RUN 위치 → 사전 검사 위반 목록, PRECHECK.check_document)가 주어지면 위반이 있는 그룹은 XSD 검증 대신 위반 목록을 리포트
+    report_path가 주어지면 결과를 해당 파일에 기록
+    jobs > 1이면 그룹 저장/검증을 프로세스 풀로 병렬 처리 (출력/리포트 순서는 동일)
+    manifest가 주어지면 변경 없는 그룹은 다시 저장/검증하지 않고 이전 결과를 리포트에 사용 (--incremental)
+    metrics가 주어지면 그룹화/저장/검증 단계를 계측 (--metrics)
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    with metrics.stage('group') as st:
+        submission_groups = group_runs_by_submission_id(doc, submission_map)
+        st.records_in = sum(len(group_runs) for group_runs in submission_groups.values())
+        st.records_out = len(submission_groups)
     # 각 그룹별로 <RUN_SET> 생성 및 저장 + XSD 검증 + 리포트
     report_lines = []
-    for submission_id, group_runs in submission_groups.items():
-        group_doc = {'RUN_SET': {'RUN': group_runs}}
-        out_path = os.path.join(output_dir, f"{submission_id}.run.xml")
-        save_xml(group_doc, out_path)
+    # RUN → document 루트 아래 위치 (그룹 레코드 위치 목록용)
+    runs = doc.get('RUN_SET', doc).get('RUN', [])
+    positions = {id(run): i for i, run in enumerate(runs if isinstance(runs, list) else [runs])}
+    groups = [
+        (os.path.join(output_dir, f"{submission_id}.run.xml"), {'RUN_SET': {'RUN': group_runs}},
+         [positions[id(run)] for run in group_runs])
+        for submission_id, group_runs in submission_groups.items()
+    ]
+    if manifest is not None:
+        for out_path, group_doc, _ in groups:
+            manifest.set_group_inputs(out_path, group_doc['RUN_SET']['RUN'])
+    group_precheck = {out_path: group_violations(precheck, indices) for out_path, _, indices in groups} if precheck else None
+    document_result = None
+    if document and xsd_path:
+        results, document_result = emit_groups_once(groups, save_xml, xsd_path, document, jobs, manifest, metrics, group_precheck)
+    else:
+        results = emit_groups([group[:2] for group in groups], save_xml, xsd_path, jobs, manifest, metrics, group_precheck)
+    for (submission_id, group_runs), (out_path, _, _), (valid, xsd_report) in zip(submission_groups.items(), groups, results):
         print(f"[INFO] Saved {len(group_runs)} RUNs to {out_path}")
         # XSD 검증 및 리포트 기록
         if xsd_path:
-            valid, xsd_report = validate_xsd(out_path, xsd_path)
             result_str = f"[XSD] {submission_id}.run.xml: {'PASS' if valid else 'FAIL'}"
             print(result_str)
             if not valid:
@@ -215,21 +278,145 @@ def save_run_grouped_by_submission_id(doc, submission_map, output_dir, xsd_path=
     if report_path and report_lines:
         with open(report_path, 'w', encoding='utf-8') as rf:
             rf.write('\n'.join(report_lines))
+    return document_result
 
-def main():
+def run_pipeline(corpus, jobs=1, incremental=False, checksum_workers=0, metrics=NULL_METRICS):
+    """
+    checksum_workers > 0이면 DATA_BLOCK의 Read_* 파일 MD5를 해당 스레드 수로 계산하여 채움 (0: 빈 값 유지)
+    metrics: 단계별 계측 (pipeline_common.metrics, --metrics)
+    """
     print("=== Run Pipeline Start ===")
     os.makedirs("xml_fixed", exist_ok=True)
     os.makedirs("xml_fixed/ddbj_run_fixed", exist_ok=True)
-    submission_map = parse_submission_csv('xml_submitted/KRA_after_20240311_pp_lib.csv')
-    doc = parse_xml(INPUT_XML)
-    doc_fixed = fix_structure(doc)
-    save_xml(doc_fixed, OUTPUT_XML)
-    # submission_id별로 RUN_SET 분리 저장 + XSD 검증 + 리포트 저장
-    save_run_grouped_by_submission_id(doc_fixed, submission_map, "xml_fixed/ddbj_run_fixed", XSD_PATH, REPORT_PATH)
-    valid, xsd_report = validate_xsd(OUTPUT_XML, XSD_PATH)
+    # --incremental: 입력이 그대로인 RUN은 보정하지 않고, 그대로인 그룹은 저장/검증하지 않음
+    manifest = load_manifest(MANIFEST_PATH, os.path.abspath(__file__), XSD_PATH) if incremental else None
+    with metrics.stage('parse') as st:
+        # fix_structure는 remove_empty 단계에서 새 dict를 만들므로 공유 입력을 그대로 사용
+        doc = corpus.get('run')
+        # 제출 매핑 CSV는 컴파일된 색인으로 읽음 (CSV가 바뀌었을 때만 다시 컴파일)
+        submission_map = corpus.get('submission_csv')
+        records = st.records_out = count_records(doc, 'RUN_SET', 'RUN')
+    with metrics.stage('aux_maps') as st:
+        # file_path.xml은 파싱하지 않고 KAR별 영구 색인(SQLite)으로 조회 (원본이 바뀌었을 때만 재생성)
+        file_path_runs = open_file_path_index(corpus.paths['run_file_path'])
+        if file_path_runs is not None:
+            print(file_path_runs.summary())
+        st.records_out = len(submission_map)
+    checksums = None
+    if checksum_workers and file_path_runs:
+        with metrics.stage('checksum') as st:
+            checksums = compute_checksums(file_path_runs, checksum_workers)
+            st.records_out = len(checksums)
+    with metrics.stage('fix_structure', records, records):
+        doc_fixed = fix_structure(doc, file_path_runs, checksums, manifest)
+    with metrics.stage('precheck', records, records):
+        # XSD 제약 표(enumeration/필수/최대 횟수)로 RUN별 사전 검사
+        precheck = PRECHECK.check_document(doc_fixed, 'RUN_SET', 'RUN', metrics)
+    with metrics.stage('serialize', records, records):
+        save_xml(doc_fixed, OUTPUT_XML)
+    metrics.add_file(OUTPUT_XML)
+    # submission_id별로 RUN_SET 분리 저장 + 전체 보정본을 한 번만 검증하여 submission_id별 리포트 저장
+    valid, xsd_report = save_run_grouped_by_submission_id(doc_fixed, submission_map, "xml_fixed/ddbj_run_fixed", XSD_PATH, REPORT_PATH, jobs, manifest, metrics, OUTPUT_XML, precheck)
+    if manifest is not None:
+        manifest.save()
+        print(manifest.summary('run'))
     print("# XSD Validation: {}\n".format("PASS" if valid else "FAIL"))
     print(xsd_report)
     print("Pipeline complete. See fixed XML:", OUTPUT_XML)
 
+def run_pipeline_stream(jobs=1, incremental=False, checksum_workers=0, metrics=NULL_METRICS):
+    """
+    --stream 모드: ddbj_run.xml의 RUN을 하나씩 읽어 보정한 뒤
+    전체 보정본과 submission_id별 스풀 파일에 바로 기록 (메모리는 가장 큰 RUN 크기로 제한)
+    - file_path.xml은 KAR별 영구 색인(SQLite)으로 조회
+    - 전체 보정본의 XSD 검증은 그룹 파일 검증으로 대체
+    """
+    print("=== Run Pipeline Start (stream) ===")
+    output_dir = "xml_fixed/ddbj_run_fixed"
+    os.makedirs(output_dir, exist_ok=True)
+    with metrics.stage('aux_maps') as st:
+        submission_map = open_submission_map(SUBMISSION_CSV)
+        file_path_runs = open_file_path_index(RUN_FILE_PATH_XML) or {}
+        if file_path_runs:
+            print(file_path_runs.summary())
+        st.records_out = len(submission_map) + len(file_path_runs)
+    checksums = None
+    if checksum_workers:
+        with metrics.stage('checksum') as st:
+            checksums = compute_checksums(file_path_runs, checksum_workers)
+            st.records_out = len(checksums)
+    spool = GroupSpool('RUN_SET')
+    precheck = {}
+    failed = 0
+    root_attrs = {}
+    records = metrics.timed_iter('parse', iter_records(INPUT_XML, 'RUN', root_attrs))
+    try:
+        # 첫 레코드를 읽어야 루트 속성이 채워지므로 writer는 첫 레코드 이후 생성
+        writer = None
+        for run in records:
+            if run in ("", None, {}):
+                continue
+            with metrics.stage('fix_structure', 1, 1):
+                run = fix_run_record(run, file_path_runs, checksums)
+            with metrics.stage('precheck', 1, 1):
+                violations = PRECHECK.check(run, RUN_PATH)
+            with metrics.stage('serialize', 1, 1):
+                fragment = render_record('RUN', run)
+                if writer is None:
+                    writer = StreamDocumentWriter(OUTPUT_XML, 'RUN_SET', root_attrs)
+                writer.write(fragment)
+            with metrics.stage('group', 1, 1):
+                submission_id = get_run_submission_id(run, submission_map)
+                spool.add(submission_id, fragment)
+                if violations:
+                    failed += 1
+                    precheck.setdefault(submission_id, []).extend(violations)
+        if writer is None:
+            writer = StreamDocumentWriter(OUTPUT_XML, 'RUN_SET', root_attrs)
+        writer.close()
+        metrics.add_file(OUTPUT_XML)
+        print(f"[INFO] Streamed {writer.count} RUNs to {OUTPUT_XML}")
+        print_precheck_summary('RUN', failed, writer.count, metrics)
+        # submission_id별 RUN_SET 저장 + XSD 검증 + 리포트
+        report_lines = []
+        manifest = load_manifest(MANIFEST_PATH, os.path.abspath(__file__), XSD_PATH) if incremental else None
+        results = emit_spool(spool, lambda sid: os.path.join(output_dir, f"{sid}.run.xml"), XSD_PATH, jobs, manifest, metrics, precheck)
+        for submission_id, out_path, count, valid, xsd_report in results:
+            print(f"[INFO] Saved {count} RUNs to {out_path}")
+            result_str = f"[XSD] {submission_id}.run.xml: {'PASS' if valid else 'FAIL'}"
+            print(result_str)
+            if not valid:
+                print(xsd_report)
+            report_lines.append(result_str)
+            if not valid:
+                report_lines.append(xsd_report)
+        if report_lines:
+            with open(REPORT_PATH, 'w', encoding='utf-8') as rf:
+                rf.write('\n'.join(report_lines))
+        if manifest is not None:
+            manifest.save()
+            print(manifest.summary('run'))
+    finally:
+        spool.cleanup()
+    print("Pipeline complete. See fixed XML:", OUTPUT_XML)
+
+def main():
+    parser = argparse.ArgumentParser(description="SRA RUN XML 변환/검증")
+    parser.add_argument('--jobs', type=int, default=1, help='그룹별 저장/검증 병렬 프로세스 수 (0: CPU 코어 수)')
+    parser.add_argument('--incremental', action='store_true', help='내용이 바뀐 그룹만 다시 저장/검증 (매니페스트: xml_fixed/run_manifest.json)')
+    parser.add_argument('--checksum', action='store_true', help='DATA_BLOCK 파일(Read_*)의 MD5 계산 (캐시: .xmlmeta_cache/checksum/run_checksum_cache.json)')
+    parser.add_argument('--checksum-workers', type=int, default=DEFAULT_WORKERS, help=f'MD5 계산 스레드 수 (기본: {DEFAULT_WORKERS})')
+    parser.add_argument('--stream', action='store_true', help='RUN 단위 스트리밍 처리 (대용량 입력, 메모리 사용량 고정)')
+    parser.add_argument('--metrics', action='store_true', help='단계별 계측 결과 저장 (xml_fixed/run_metrics.json, .prom)')
+    args = parser.parse_args()
+    jobs = args.jobs or default_jobs()
+    checksum_workers = max(1, args.checksum_workers) if args.checksum else 0
+    metrics = create_metrics('run', args.metrics or None)
+    if args.stream:
+        run_pipeline_stream(jobs, args.incremental, checksum_workers, metrics)
+    else:
+        run_pipeline(Corpus({'run': INPUT_XML, 'run_file_path': RUN_FILE_PATH_XML}), jobs, args.incremental, checksum_workers, metrics)
+    metrics.save()
+
 if __name__ == "__main__":
     main()
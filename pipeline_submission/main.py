@@ -1,26 +1,26 @@
 import os
 import xmltodict
-from lxml import etree
-import subprocess
 from datetime import datetime, timezone
 import sys
 import argparse
-import csv
+
+# 공용 모듈(pipeline_common) import를 위해 저장소 루트를 경로에 추가
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pipeline_common.validation import validate_doc
+from pipeline_common.xmlwriter import write_xml
+from pipeline_common.manifest import load_manifest, group_digest
+from pipeline_common.corpus import Corpus, count_records
+from pipeline_common.metrics import create_metrics, NULL_METRICS
+
+XSD_PATH = "pub/docs/dra/xsd/1-6/SRA.submission.xsd"
+MANIFEST_PATH = "xml_fixed/submission_manifest.json"
 
 def parse_xml(path):
     with open(path, 'r', encoding='utf-8') as f:
         return xmltodict.parse(f.read())
 
 def save_xml(doc, path):
-    xml_str = xmltodict.unparse(doc, pretty=True)
-    with open(path, 'w', encoding='utf-8') as f:
-        f.write(xml_str)
-
-def validate_xsd(xml_path, xsd_path):
-    result = subprocess.run([
-        "xmllint", "--schema", xsd_path, "--noout", xml_path
-    ], capture_output=True, text=True)
-    return result.returncode == 0, result.stderr
+    write_xml(doc, path)
 
 def make_submission(experiment, run, project_id, submission_id, output_path):
     # output_path를 항상 xml_fixed/ddbj_submission_fixed/ 하위로 강제
@@ -55,74 +55,115 @@ def make_submission(experiment, run, project_id, submission_id, output_path):
         }
     }
     save_xml(submission, output_path)
+    return submission
 
-def parse_submission_csv(csv_path):
+def build_accession_index(exp_doc, run_doc, submission_map):
     """
-    CSV에서 (experiment_id, run_id) → submission_id 매핑 생성
+    EXPERIMENT/RUN을 한 번씩만 순회하여 accession 색인 생성
+    반환: {'experiment': {KAE: EXPERIMENT}, 'run': {KAR: RUN}, 'submission': 제출 매핑(SubmissionMap)}
+    같은 accession이 여러 번 나오면 첫 번째 레코드 사용 (기존 선형 탐색과 동일)
     """
-    mapping = {}
-    with open(csv_path, encoding='iso-8859-1') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            submission_id = row.get('KRA submission ID')
-            experiment_id = row.get('Experiment ID')
-            run_id = row.get('Run ID')
-            if submission_id and experiment_id and run_id:
-                mapping[(experiment_id.strip(), run_id.strip())] = submission_id.strip()
-    return mapping
+    exps = exp_doc['EXPERIMENT_SET']['EXPERIMENT']
+    if isinstance(exps, dict):
+        exps = [exps]
+    runs = run_doc['RUN_SET']['RUN']
+    if isinstance(runs, dict):
+        runs = [runs]
+    exp_index = {}
+    for exp in exps:
+        exp_index.setdefault(exp['@accession'], exp)
+    run_index = {}
+    for run in runs:
+        run_index.setdefault(run['@accession'], run)
+    return {'experiment': exp_index, 'run': run_index, 'submission': submission_map}
 
-def main():
-    os.makedirs("xml_fixed/ddbj_submission_fixed", exist_ok=True)
-    exp_dict = parse_xml('xml_submitted/ddbj_bioExperiment.xml')
-    run_dict = parse_xml('xml_submitted/ddbj_run.xml')
-    # CSV 매핑 파싱
-    submission_map = parse_submission_csv('xml_submitted/KRA_after_20240311_pp_lib.csv')
+def collect_submission_files(run_list, index):
+    """
+    생성할 SUBMISSION 파일 목록
+    반환: (submission_id, 경로) → 마지막으로 매핑된 (experiment, run, project_id), 중복 제거 + 최초 등장 순서 유지
+    같은 submission_id의 파일은 마지막 run 기준으로 한 번만 생성 (기존처럼 덮어쓴 결과와 동일)
+    """
+    generated_files = {}
+    for run in run_list:
+        exp_id = run['EXPERIMENT_REF']['@accession']
+        experiment = index['experiment'].get(exp_id)
+        if experiment is None:
+            print(f"[경고] EXPERIMENT를 찾을 수 없어 건너뜀: experiment_id={exp_id}, run_id={run['@accession']}")
+            continue
+        project_id = experiment['STUDY_REF']['@accession']
+        # CSV 매핑에서 submission_id 가져오기
+        submission_id = index['submission'].submission_id(exp_id, run['@accession'])
+        if not submission_id:
+            print(f"[경고] CSV에서 submission_id를 찾을 수 없음: experiment_id={exp_id}, run_id={run['@accession']}")
+            submission_id = f"{exp_id}_{run['@accession']}"
+        output_path = f"xml_fixed/ddbj_submission_fixed/{submission_id}.xml"
+        generated_files[(submission_id, output_path)] = (experiment, run, project_id)
+    return generated_files
 
-    parser = argparse.ArgumentParser(description="SRA SUBMISSION XML 생성기")
-    parser.add_argument('run_id', nargs='?', help='생성할 run_id (예: KAR24062461)')
-    parser.add_argument('--all', action='store_true', help='모든 run에 대해 일괄 생성')
-    args = parser.parse_args()
+def run_pipeline(corpus, run_id=None, all_runs=False, incremental=False, metrics=NULL_METRICS):
+    """
+    입력 코퍼스(Corpus)의 EXPERIMENT/RUN/CSV 파싱 결과로 SUBMISSION XML 생성
+    run_id: 특정 run만 생성, all_runs=True: 전체 일괄 생성
+    incremental=True: 입력(EXPERIMENT/RUN/submission_id)이 그대로인 파일은 다시 만들지 않고 이전 검증 결과 사용
+      (submission_date는 처음 생성한 시각으로 유지됨)
+    metrics: 단계별 계측 (pipeline_common.metrics, --metrics)
+    """
+    os.makedirs("xml_fixed/ddbj_submission_fixed", exist_ok=True)
+    with metrics.stage('parse') as st:
+        exp_dict = corpus.get('experiment')
+        run_dict = corpus.get('run')
+        # 제출 매핑 CSV는 컴파일된 색인으로 읽음 (CSV가 바뀌었을 때만 다시 컴파일)
+        submission_map = corpus.get('submission_csv')
+        st.records_out = count_records(run_dict, 'RUN_SET', 'RUN')
+    with metrics.stage('aux_maps', len(submission_map)) as st:
+        # KAE→EXPERIMENT, KAR→RUN, (KAE, KAR)→KRA 색인 (run마다 EXPERIMENT 전체를 훑지 않도록)
+        index = build_accession_index(exp_dict, run_dict, submission_map)
+        st.records_out = len(index['experiment']) + len(index['run'])
 
     runs = run_dict['RUN_SET']['RUN']
     if isinstance(runs, dict):
         runs = [runs]
 
-    if not args.run_id and not args.all:
+    if not run_id and not all_runs:
         print("사용법: python main.py <run_id> 또는 python main.py --all")
         print("\n[사용 가능한 run_id 목록]")
         for run in runs:
             print(f"- {run['@accession']}")
         return
 
-    if args.all:
+    if all_runs:
         run_list = runs
     else:
-        run_list = [run for run in runs if run['@accession'] == args.run_id]
+        run_list = [index['run'][run_id]] if run_id in index['run'] else []
         if not run_list:
-            print(f"해당 run_id({args.run_id})를 찾을 수 없습니다.")
+            print(f"해당 run_id({run_id})를 찾을 수 없습니다.")
             return
 
-    xsd_path = 'pub/docs/dra/xsd/1-6/SRA.submission.xsd'
-    generated_files = set()
-    for run in run_list:
-        exp_id = run['EXPERIMENT_REF']['@accession']
-        experiment = next(
-            exp for exp in exp_dict['EXPERIMENT_SET']['EXPERIMENT']
-            if exp['@accession'] == exp_id
-        )
-        project_id = experiment['STUDY_REF']['@accession']
-        # CSV 매핑에서 submission_id 가져오기
-        submission_id = submission_map.get((exp_id, run['@accession']))
-        if not submission_id:
-            print(f"[경고] CSV에서 submission_id를 찾을 수 없음: experiment_id={exp_id}, run_id={run['@accession']}")
-            submission_id = f"{exp_id}_{run['@accession']}"
-        output_path = f"xml_fixed/ddbj_submission_fixed/{submission_id}.xml"
-        make_submission(experiment, run, project_id, submission_id, output_path)
-        generated_files.add((submission_id, output_path))
-    # 중복 없이 파일별로 XSD 검증 및 리포트
+    xsd_path = XSD_PATH
+    with metrics.stage('group', len(run_list)) as st:
+        generated_files = collect_submission_files(run_list, index)
+        st.records_out = len(generated_files)
+    manifest = load_manifest(MANIFEST_PATH, os.path.abspath(__file__), xsd_path) if incremental else None
+    # 중복 없이 파일별로 생성 + XSD 검증 및 리포트
     report_lines = []
-    for submission_id, output_path in generated_files:
-        valid, xsd_report = validate_xsd(output_path, xsd_path)
+    for (submission_id, output_path), (experiment, run, project_id) in generated_files.items():
+        cached = None
+        if manifest is not None:
+            digest = group_digest({'experiment': experiment, 'run': run, 'project_id': project_id, 'submission_id': submission_id})
+            cached = manifest.lookup(output_path, digest)
+        if cached is not None:
+            valid, xsd_report = cached
+            metrics.count('files_unchanged')
+        else:
+            with metrics.stage('serialize', 1, 1):
+                submission = make_submission(experiment, run, project_id, submission_id, output_path)
+            metrics.add_file(output_path)
+            with metrics.stage('validate', 1):
+                # 저장한 파일을 다시 읽지 않고 메모리 상의 문서로 검증
+                valid, xsd_report = validate_doc(submission, xsd_path, output_path)
+            metrics.validation(valid)
+            if manifest is not None:
+                manifest.record(output_path, digest, valid, xsd_report)
         result_str = f"[XSD] {submission_id}.xml: {'PASS' if valid else 'FAIL'}"
         print(f"# XSD Validation: {'PASS' if valid else 'FAIL'}\n{output_path}")
         print(xsd_report)
@@ -134,7 +175,22 @@ def main():
     if report_lines:
         with open(report_path, 'w', encoding='utf-8') as rf:
             rf.write('\n'.join(report_lines))
+    if manifest is not None:
+        # run_id 하나만 만든 실행이면 다른 run의 항목은 그대로 유지
+        manifest.save(partial=not all_runs)
+        print(manifest.summary('submission'))
     print("Pipeline complete. See fixed XMLs in xml_fixed/ddbj_submission_fixed/")
 
+def main():
+    parser = argparse.ArgumentParser(description="SRA SUBMISSION XML 생성기")
+    parser.add_argument('run_id', nargs='?', help='생성할 run_id (예: KAR24062461)')
+    parser.add_argument('--all', action='store_true', help='모든 run에 대해 일괄 생성')
+    parser.add_argument('--incremental', action='store_true', help='입력이 바뀐 SUBMISSION만 다시 생성/검증 (매니페스트: xml_fixed/submission_manifest.json)')
+    parser.add_argument('--metrics', action='store_true', help='단계별 계측 결과 저장 (xml_fixed/submission_metrics.json, .prom)')
+    args = parser.parse_args()
+    metrics = create_metrics('submission', args.metrics or None)
+    run_pipeline(Corpus(), args.run_id, args.all, args.incremental, metrics)
+    metrics.save()
+
 if __name__ == '__main__':
     main()